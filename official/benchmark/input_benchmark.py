@@ -0,0 +1,372 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Benchmarks the input pipelines of the official models without the models.
+
+ExamplesPerSecondHook measures the throughput of whole training steps, which
+does not tell whether the input pipeline is the bottleneck. This module runs
+the input_fn of a model on its own, and reports:
+
+  * The steady-state throughput of the pipeline in examples per second, and
+    the percentiles of the latency of each batch.
+  * The percentiles of the latency of each stage of the pipeline, where stage i
+    is the pipeline truncated after its i-th tf.data transformation. The
+    latency is per element of the stage: a record before the pipeline is
+    batched, and a batch after it, so stages are only comparable on the same
+    side of the batching transformation.
+  * The CPU utilization of the process while the pipeline runs.
+
+The results are logged through the benchmark logger, so that they are written
+to the same benchmark log files as the model runs when --benchmark_log_dir is
+set.
+
+Example usage:
+  python input_benchmark.py --model=cifar10 --data_dir=/tmp/cifar10_data \
+    --batch_size=128 --benchmark_log_dir=/tmp/input_benchmark
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+from tensorflow.python.util import nest  # pylint: disable=g-bad-import-order
+
+from official.utils.arg_parsers import parsers
+from official.utils.logs import logger
+
+_PERCENTILES = (50, 90, 99)
+
+
+################################################################################
+# Functions for benchmarking input pipelines.
+################################################################################
+def _percentiles(latencies):
+  """Returns the percentiles of a list of latencies in seconds, in ms."""
+  return {"p%d" % p: 1000 * np.percentile(latencies, p) for p in _PERCENTILES}
+
+
+def _batch_size(features):
+  """Returns the number of examples in a batch of features."""
+  return tf.shape(nest.flatten(features)[0])[0]
+
+
+def pipeline_stages(dataset):
+  """Returns the stages of an input pipeline.
+
+  Args:
+    dataset: The Dataset returned by an input_fn.
+
+  Returns:
+    A list of (name, dataset) pairs, from the source of the pipeline to the
+    dataset itself. The name of the stage is the index and the class name of
+    its last transformation, e.g. "02_ParallelMap". Only transformations with a
+    single input dataset are followed, so the first stage may be a zip or an
+    interleave of several pipelines.
+  """
+  stages = []
+  while dataset is not None:
+    # tf.compat.v1 wraps every dataset in an adapter.
+    transformation = getattr(dataset, "_dataset", dataset)
+    stages.append((type(transformation).__name__, dataset))
+    dataset = getattr(transformation, "_input_dataset", None)
+
+  stages.reverse()
+  return [("%02d_%s" % (i, name.strip("_").replace("Dataset", "")), dataset)
+          for i, (name, dataset) in enumerate(stages)]
+
+
+def _time_stage(sess, dataset, num_runs, elements_per_run, warmup_runs=1):
+  """Returns the latencies of reading elements of a dataset, in seconds.
+
+  Elements are read elements_per_run at a time in a while loop, so that the
+  per-element overhead of session runs does not dominate cheap stages.
+
+  Args:
+    sess: The session in which to run the dataset.
+    dataset: The Dataset to read.
+    num_runs: The number of timed runs.
+    elements_per_run: The number of elements read in each run.
+    warmup_runs: The number of runs before timing starts, to exclude the time
+      spent filling the buffers of the pipeline.
+
+  Returns:
+    A list with the mean latency of the elements of each run. It is shorter than
+    num_runs if the dataset ends.
+  """
+  iterator = dataset.make_initializable_iterator()
+
+  def _read_element(i):
+    with tf.control_dependencies(nest.flatten(iterator.get_next())):
+      return i + 1
+
+  read_elements = tf.while_loop(
+      lambda i: i < elements_per_run, _read_element, [tf.constant(0)],
+      back_prop=False)
+
+  sess.run(iterator.initializer)
+  latencies = []
+  try:
+    for _ in range(warmup_runs):
+      sess.run(read_elements)
+    for _ in range(num_runs):
+      start_time = time.time()
+      sess.run(read_elements)
+      latencies.append((time.time() - start_time) / elements_per_run)
+  except tf.errors.OutOfRangeError:
+    pass
+  return latencies
+
+
+def benchmark_input_fn(input_fn, num_steps, warmup_steps=10, stage_runs=20,
+                       stage_elements_per_run=10, session_config=None,
+                       benchmark_logger=None):
+  """Measures the throughput and latencies of an input pipeline alone.
+
+  Args:
+    input_fn: A function with no arguments that returns a dataset of
+      (features, labels) batches.
+    num_steps: The number of batches to time.
+    warmup_steps: The number of batches read before timing starts, to exclude
+      the time spent filling the buffers of the pipeline.
+    stage_runs: The number of timed runs of each stage of the pipeline. If 0,
+      the stages are not timed.
+    stage_elements_per_run: The number of elements of a stage read in each run.
+    session_config: Optional ConfigProto for the session.
+    benchmark_logger: Optional benchmark logger to which the results are
+      logged.
+
+  Returns:
+    A dict with the steady-state "examples_per_sec", the percentiles of the
+    "step_latency_ms", the "cpu_utilization" of all cores (between 0 and 1),
+    and the (name, percentiles of the latency in ms) pairs of the
+    "stage_latency_ms" of each stage.
+  """
+  with tf.Graph().as_default():
+    dataset = input_fn()
+    features, _ = dataset.make_one_shot_iterator().get_next()
+    # Only fetch the batch size, so that the time of copying the batches out of
+    # the TensorFlow runtime is not measured.
+    batch_size = _batch_size(features)
+
+    with tf.Session(config=session_config) as sess:
+      try:
+        for _ in range(warmup_steps):
+          sess.run(batch_size)
+      except tf.errors.OutOfRangeError:
+        tf.logging.warning("The input pipeline ended before the %d warmup "
+                           "batches were read, no batch is timed.",
+                           warmup_steps)
+        num_steps = 0
+
+      num_examples = 0
+      step_latencies = []
+      start_cpu_times = os.times()
+      start_time = time.time()
+      try:
+        for _ in range(num_steps):
+          step_start_time = time.time()
+          num_examples += sess.run(batch_size)
+          step_latencies.append(time.time() - step_start_time)
+      except tf.errors.OutOfRangeError:
+        tf.logging.warning("The input pipeline ended before %d batches were "
+                           "read.", num_steps)
+      elapsed_time = time.time() - start_time
+      end_cpu_times = os.times()
+
+      stage_latencies = []
+      if stage_runs:
+        # The last stage is the whole pipeline, timed above.
+        for name, stage in pipeline_stages(dataset)[:-1]:
+          latencies = _time_stage(
+              sess, stage, stage_runs, stage_elements_per_run)
+          if latencies:
+            stage_latencies.append((name, _percentiles(latencies)))
+
+  # User and system time of the process, including all its threads.
+  cpu_time = sum(end - start for start, end in
+                 zip(start_cpu_times[:2], end_cpu_times[:2]))
+  # No time may elapse if no batch is timed.
+  elapsed_time = max(elapsed_time, 1e-6)
+  results = {
+      "examples_per_sec": num_examples / elapsed_time,
+      "step_latency_ms": _percentiles(step_latencies or [elapsed_time]),
+      "cpu_utilization": (
+          cpu_time / elapsed_time / multiprocessing.cpu_count()),
+      "stage_latency_ms": stage_latencies,
+  }
+
+  tf.logging.info("Input pipeline: %d examples in %.2f seconds "
+                  "(%.1f examples/sec), CPU utilization %.1f%%",
+                  num_examples, elapsed_time, results["examples_per_sec"],
+                  100 * results["cpu_utilization"])
+  for name, percentiles in stage_latencies:
+    tf.logging.info("Input stage %s: latency %s ms", name, ", ".join(
+        "%s %.3f" % (p, percentiles[p]) for p in sorted(percentiles)))
+
+  if benchmark_logger is not None:
+    _log_results(benchmark_logger, results, num_steps)
+  return results
+
+
+def _log_results(benchmark_logger, results, global_step):
+  """Logs the results of benchmark_input_fn() as benchmark metrics."""
+  benchmark_logger.log_metric(
+      "input_examples_per_sec", results["examples_per_sec"],
+      unit="examples/sec", global_step=global_step)
+  benchmark_logger.log_metric(
+      "input_cpu_utilization", results["cpu_utilization"],
+      global_step=global_step,
+      extras={"num_cores": str(multiprocessing.cpu_count())})
+  for p, latency in sorted(results["step_latency_ms"].items()):
+    benchmark_logger.log_metric(
+        "input_step_latency_" + p, latency, unit="ms", global_step=global_step)
+  for name, percentiles in results["stage_latency_ms"]:
+    for p, latency in sorted(percentiles.items()):
+      benchmark_logger.log_metric(
+          "input_stage_latency_" + p, latency, unit="ms",
+          global_step=global_step, extras={"stage": name})
+  benchmark_logger.flush()
+
+
+################################################################################
+# Input functions of the official models.
+################################################################################
+# The models are imported when they are benchmarked, as the models themselves
+# use benchmark_input_fn().
+# pylint: disable=g-import-not-at-top
+def _cifar10_input_fn(flags, is_training):
+  from official.resnet import cifar10_main
+  return cifar10_main.input_fn(
+      is_training, flags.data_dir, flags.batch_size,
+      num_epochs=None if is_training else 1,
+      num_parallel_calls=flags.num_parallel_calls)
+
+
+def _imagenet_input_fn(flags, is_training):
+  from official.resnet import imagenet_main
+  return imagenet_main.input_fn(
+      is_training, flags.data_dir, flags.batch_size,
+      num_epochs=None if is_training else 1,
+      num_parallel_calls=flags.num_parallel_calls)
+
+
+def _mnist_input_fn(flags, is_training):
+  """Returns the MNIST pipeline of the input functions in mnist.py."""
+  from official.mnist import dataset
+  if is_training:
+    ds = dataset.train(flags.data_dir)
+    return ds.cache().shuffle(buffer_size=50000).batch(
+        flags.batch_size).repeat()
+  return dataset.test(flags.data_dir).batch(flags.batch_size)
+
+
+def _wide_deep_input_fn(flags, is_training):
+  from official.wide_deep import wide_deep
+  if is_training:
+    return wide_deep.input_fn(
+        os.path.join(flags.data_dir, "adult.data"), None, True,
+        flags.batch_size)
+  return wide_deep.input_fn(
+      os.path.join(flags.data_dir, "adult.test"), 1, False, flags.batch_size)
+# pylint: enable=g-import-not-at-top
+
+
+_MODEL_INPUT_FNS = {
+    "cifar10": _cifar10_input_fn,
+    "imagenet": _imagenet_input_fn,
+    "mnist": _mnist_input_fn,
+    "wide_deep": _wide_deep_input_fn,
+}
+
+
+################################################################################
+# Running the benchmark
+################################################################################
+class InputBenchmarkArgParser(argparse.ArgumentParser):
+  """Arguments for benchmarking the input pipeline of a model."""
+
+  def __init__(self):
+    super(InputBenchmarkArgParser, self).__init__(parents=[
+        parsers.BaseParser(
+            model_dir=False, train_epochs=False, epochs_between_evals=False,
+            stop_threshold=False, multi_gpu=False, hooks=False,
+            export_dir=False),
+        parsers.PerformanceParser(
+            use_synthetic_data=False, max_train_steps=False, dtype=False),
+        parsers.BenchmarkParser(bigquery_uploader=False),
+    ])
+
+    self.add_argument(
+        "--model", "-m", required=True, choices=sorted(_MODEL_INPUT_FNS),
+        help="{%(choices)s} The model whose input pipeline is benchmarked.",
+        metavar="<M>"
+    )
+
+    self.add_argument(
+        "--eval", action="store_true",
+        help="If set, benchmark the evaluation pipeline instead of the "
+             "training pipeline."
+    )
+
+    self.add_argument(
+        "--num_steps", "-ns", type=int, default=100,
+        help="[default: %(default)s] The number of batches to time.",
+        metavar="<NS>"
+    )
+
+    self.add_argument(
+        "--warmup_steps", "-ws", type=int, default=10,
+        help="[default: %(default)s] The number of batches read before timing "
+             "starts.",
+        metavar="<WS>"
+    )
+
+    self.add_argument(
+        "--stage_runs", "-sr", type=int, default=20,
+        help="[default: %(default)s] The number of timed runs of each stage "
+             "of the pipeline. If 0, the stages are not timed.",
+        metavar="<SR>"
+    )
+
+
+def main(argv):
+  parser = InputBenchmarkArgParser()
+  flags = parser.parse_args(args=argv[1:])
+
+  session_config = tf.ConfigProto(
+      inter_op_parallelism_threads=flags.inter_op_parallelism_threads,
+      intra_op_parallelism_threads=flags.intra_op_parallelism_threads)
+
+  benchmark_logger = logger.config_benchmark_logger(
+      flags.benchmark_log_dir, async_logging=flags.async_benchmark_logging)
+  benchmark_logger.log_run_info(flags.model + "_input")
+
+  model_input_fn = _MODEL_INPUT_FNS[flags.model]
+  return benchmark_input_fn(
+      lambda: model_input_fn(flags, not flags.eval), flags.num_steps,
+      warmup_steps=flags.warmup_steps, stage_runs=flags.stage_runs,
+      session_config=session_config, benchmark_logger=benchmark_logger)
+
+
+if __name__ == "__main__":
+  tf.logging.set_verbosity(tf.logging.INFO)
+  main(argv=sys.argv)
@@ -0,0 +1,113 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for the input pipeline benchmark."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import sys
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.benchmark import input_benchmark
+from official.utils.logs import logger
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+_WIDE_DEEP_TEST_CSV = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "wide_deep",
+    "wide_deep_test.csv")
+
+
+def _input_fn():
+  dataset = tf.data.Dataset.range(1000)
+  dataset = dataset.map(lambda x: (tf.fill([4], x), x), num_parallel_calls=2)
+  return dataset.batch(8)
+
+
+class InputBenchmarkTest(tf.test.TestCase):
+
+  def tearDown(self):
+    super(InputBenchmarkTest, self).tearDown()
+    tf.gfile.DeleteRecursively(self.get_temp_dir())
+
+  def test_pipeline_stages(self):
+    with tf.Graph().as_default():
+      stages = input_benchmark.pipeline_stages(_input_fn())
+    self.assertEqual(3, len(stages))
+    self.assertStartsWith(stages[0][0], "00_Range")
+    self.assertIn("Map", stages[1][0])
+    self.assertStartsWith(stages[2][0], "02_Batch")
+
+  def test_benchmark_input_fn(self):
+    results = input_benchmark.benchmark_input_fn(
+        _input_fn, num_steps=50, warmup_steps=2, stage_runs=5)
+
+    self.assertGreater(results["examples_per_sec"], 0)
+    self.assertGreaterEqual(results["cpu_utilization"], 0)
+    self.assertEqual(["p50", "p90", "p99"],
+                     sorted(results["step_latency_ms"]))
+    self.assertEqual(2, len(results["stage_latency_ms"]))
+    for _, percentiles in results["stage_latency_ms"]:
+      self.assertLessEqual(percentiles["p50"], percentiles["p99"])
+
+  def test_benchmark_input_fn_stops_at_end_of_input(self):
+    # The pipeline has 125 batches, fewer than the number of steps.
+    results = input_benchmark.benchmark_input_fn(
+        _input_fn, num_steps=200, warmup_steps=0, stage_runs=0)
+    self.assertEqual([], results["stage_latency_ms"])
+
+  def test_benchmark_input_fn_ends_during_warmup(self):
+    results = input_benchmark.benchmark_input_fn(
+        _input_fn, num_steps=10, warmup_steps=200, stage_runs=0)
+    self.assertEqual(0, results["examples_per_sec"])
+
+  def test_benchmark_logs_metrics(self):
+    log_dir = os.path.join(self.get_temp_dir(), "benchmark_logs")
+    benchmark_logger = logger.BenchmarkFileLogger(log_dir)
+    input_benchmark.benchmark_input_fn(
+        _input_fn, num_steps=10, warmup_steps=0, stage_runs=2,
+        benchmark_logger=benchmark_logger)
+
+    with tf.gfile.GFile(
+        os.path.join(log_dir, logger.METRIC_LOG_FILE_NAME)) as f:
+      metrics = [json.loads(line) for line in f]
+    names = [metric["name"] for metric in metrics]
+    self.assertIn("input_examples_per_sec", names)
+    self.assertIn("input_cpu_utilization", names)
+    self.assertIn("input_step_latency_p99", names)
+    # One for each of the two stages before the last.
+    self.assertEqual(2, names.count("input_stage_latency_p50"))
+
+  def test_wide_deep_main(self):
+    data_dir = os.path.join(self.get_temp_dir(), "census_data")
+    os.makedirs(data_dir)
+    for filename in ["adult.data", "adult.test"]:
+      shutil.copy(_WIDE_DEEP_TEST_CSV, os.path.join(data_dir, filename))
+
+    results = input_benchmark.main([
+        sys.argv[0], "--model", "wide_deep", "--data_dir", data_dir,
+        "--batch_size", "2", "--num_steps", "5", "--warmup_steps", "1",
+        "--stage_runs", "1"])
+    self.assertGreater(results["examples_per_sec"], 0)
+
+
+if __name__ == "__main__":
+  tf.test.main()
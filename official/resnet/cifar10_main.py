@@ -104,7 +104,7 @@ def preprocess_image(image, is_training):
 
 
 def input_fn(is_training, data_dir, batch_size, num_epochs=1,
-             num_parallel_calls=1, multi_gpu=False):
+             num_parallel_calls=1, multi_gpu=False, fused_input_pipeline=False):
   """Input_fn using the tf.data input pipeline for CIFAR-10 dataset.
 
   Args:
@@ -114,10 +114,13 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1,
     num_epochs: The number of epochs to repeat the dataset.
     num_parallel_calls: The number of records that are processed in parallel.
       This can be optimized per data set but for generally homogeneous data
-      sets, should be approximately the number of available CPU cores.
+      sets, should be approximately the number of available CPU cores. A value
+      of 0 or less uses the number of available CPU cores.
     multi_gpu: Whether this is run multi-GPU. Note that this is only required
       currently to handle the batch leftovers, and can be removed
       when that is handled directly by Estimator.
+    fused_input_pipeline: Whether to parse and batch records with a fused
+      map_and_batch.
 
   Returns:
     A dataset that can be used for iteration.
@@ -130,7 +133,8 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1,
   return resnet_run_loop.process_record_dataset(
       dataset, is_training, batch_size, _NUM_IMAGES['train'],
       parse_record, num_epochs, num_parallel_calls,
-      examples_per_epoch=num_images, multi_gpu=multi_gpu)
+      examples_per_epoch=num_images, multi_gpu=multi_gpu,
+      fused=fused_input_pipeline)
 
 
 def get_synth_input_fn():
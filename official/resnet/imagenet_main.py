@@ -18,6 +18,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import os
 import sys
 
@@ -154,8 +155,50 @@ def parse_record(raw_record, is_training):
   return image, label
 
 
+def decode_record(raw_record):
+  """Parses a record and decodes its image, without random distortions.
+
+  Args:
+    raw_record: scalar Tensor tf.string containing a serialized
+      Example protocol buffer.
+
+  Returns:
+    Dict with the decoded and resized uint8 'image', the 'label' and the
+    'bbox' of the example. See parse_decoded_record().
+  """
+  image_buffer, label, bbox = _parse_example_proto(raw_record)
+  image = imagenet_preprocessing.decode_and_resize_image(
+      image_buffer, _NUM_CHANNELS)
+  return {'image': image, 'label': label, 'bbox': bbox}
+
+
+def parse_decoded_record(decoded_record, is_training):
+  """Preprocesses a record returned by decode_record().
+
+  Args:
+    decoded_record: Dict returned by decode_record().
+    is_training: A boolean denoting whether the input is for training.
+
+  Returns:
+    Tuple with processed image tensor and one-hot-encoded label tensor.
+  """
+  image = imagenet_preprocessing.preprocess_decoded_image(
+      image=decoded_record['image'],
+      bbox=decoded_record['bbox'],
+      output_height=_DEFAULT_IMAGE_SIZE,
+      output_width=_DEFAULT_IMAGE_SIZE,
+      num_channels=_NUM_CHANNELS,
+      is_training=is_training)
+
+  label = tf.one_hot(tf.reshape(decoded_record['label'], shape=[]),
+                     _NUM_CLASSES)
+
+  return image, label
+
+
 def input_fn(is_training, data_dir, batch_size, num_epochs=1,
-             num_parallel_calls=1, multi_gpu=False):
+             num_parallel_calls=1, multi_gpu=False, fused_input_pipeline=False,
+             cache_dir=None):
   """Input function which provides batches for train or eval.
 
   Args:
@@ -165,10 +208,17 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1,
     num_epochs: The number of epochs to repeat the dataset.
     num_parallel_calls: The number of records that are processed in parallel.
       This can be optimized per data set but for generally homogeneous data
-      sets, should be approximately the number of available CPU cores.
+      sets, should be approximately the number of available CPU cores. A value
+      of 0 or less uses the number of available CPU cores.
     multi_gpu: Whether this is run multi-GPU. Note that this is only required
       currently to handle the batch leftovers, and can be removed
       when that is handled directly by Estimator.
+    fused_input_pipeline: Whether to read several shards in parallel, and to
+      parse and batch records with a fused map_and_batch.
+    cache_dir: If set, the decoded and resized images are cached in this
+      directory during the first epoch, and later epochs (and later calls) only
+      crop them. When training, the order of the records in the cache is fixed
+      by the first epoch, and only shuffled within the shuffle buffer.
 
   Returns:
     A dataset that can be used for iteration.
@@ -183,12 +233,31 @@ def input_fn(is_training, data_dir, batch_size, num_epochs=1,
   num_images = is_training and _NUM_IMAGES['train'] or _NUM_IMAGES['validation']
 
   # Convert to individual records
-  dataset = dataset.flat_map(tf.data.TFRecordDataset)
+  if fused_input_pipeline:
+    # Read several files at once. The order of the records is only
+    # deterministic for evaluation.
+    dataset = dataset.apply(tf.contrib.data.parallel_interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=resnet_run_loop.get_num_parallel_calls(
+            num_parallel_calls),
+        sloppy=is_training))
+  else:
+    dataset = dataset.flat_map(tf.data.TFRecordDataset)
+
+  if cache_dir:
+    tf.gfile.MakeDirs(cache_dir)
+    return resnet_run_loop.process_record_dataset(
+        dataset, is_training, batch_size, _SHUFFLE_BUFFER,
+        parse_decoded_record, num_epochs, num_parallel_calls,
+        examples_per_epoch=num_images, multi_gpu=multi_gpu,
+        fused=fused_input_pipeline, decode_record_fn=decode_record,
+        cache_filename=os.path.join(
+            cache_dir, 'train' if is_training else 'validation'))
 
   return resnet_run_loop.process_record_dataset(
       dataset, is_training, batch_size, _SHUFFLE_BUFFER, parse_record,
       num_epochs, num_parallel_calls, examples_per_epoch=num_images,
-      multi_gpu=multi_gpu)
+      multi_gpu=multi_gpu, fused=fused_input_pipeline)
 
 
 def get_synth_input_fn():
@@ -313,9 +382,22 @@ def main(argv):
       train_epochs=100
   )
 
+  parser.add_argument(
+      '--input_cache_dir', '-icd', default=None,
+      help='[default: %(default)s] If set, decoded and resized images are '
+           'cached in this directory, so that they are only decoded once. '
+           'Each cache holds a full copy of the (resized) dataset, so this is '
+           'mostly useful for evaluation and small datasets.',
+      metavar='<ICD>'
+  )
+
   flags = parser.parse_args(args=argv[1:])
 
-  input_function = flags.use_synthetic_data and get_synth_input_fn() or input_fn
+  if flags.use_synthetic_data:
+    input_function = get_synth_input_fn()
+  else:
+    input_function = functools.partial(input_fn,
+                                       cache_dir=flags.input_cache_dir)
 
   resnet_run_loop.resnet_main(
       flags, imagenet_model_fn, input_function,
@@ -48,33 +48,29 @@ _CHANNEL_MEANS = [_R_MEAN, _G_MEAN, _B_MEAN]
 _RESIZE_MIN = 256
 
 
-def _decode_crop_and_flip(image_buffer, bbox, num_channels):
-  """Crops the given image to a random part of the image, and randomly flips.
+def _sample_distorted_bounding_box(image_shape, bbox):
+  """Samples a random crop window of an image.
 
-  We use the fused decode_and_crop op, which performs better than the two ops
-  used separately in series, but note that this requires that the image be
-  passed in as an un-decoded string Tensor.
+  A large fraction of image datasets contain a human-annotated bounding box
+  delineating the region of the image containing the object of interest.  We
+  choose to create a new bounding box for the object which is a randomly
+  distorted version of the human-annotated bounding box that obeys an
+  allowed range of aspect ratios, sizes and overlap with the human-annotated
+  bounding box. If no box is supplied, then we assume the bounding box is
+  the entire image.
 
   Args:
-    image_buffer: scalar string Tensor representing the raw JPEG image buffer.
+    image_shape: 1-D int32 Tensor of the [height, width, channels] of the image.
     bbox: 3-D float Tensor of bounding boxes arranged [1, num_boxes, coords]
       where each coordinate is [0, 1) and the coordinates are arranged as
       [ymin, xmin, ymax, xmax].
-    num_channels: Integer depth of the image buffer for decoding.
 
   Returns:
-    3-D tensor with cropped image.
-
+    1-D int32 Tensor [offset_y, offset_x, target_height, target_width] of the
+    crop window.
   """
-  # A large fraction of image datasets contain a human-annotated bounding box
-  # delineating the region of the image containing the object of interest.  We
-  # choose to create a new bounding box for the object which is a randomly
-  # distorted version of the human-annotated bounding box that obeys an
-  # allowed range of aspect ratios, sizes and overlap with the human-annotated
-  # bounding box. If no box is supplied, then we assume the bounding box is
-  # the entire image.
   sample_distorted_bounding_box = tf.image.sample_distorted_bounding_box(
-      tf.image.extract_jpeg_shape(image_buffer),
+      image_shape,
       bounding_boxes=bbox,
       min_object_covered=0.1,
       aspect_ratio_range=[0.75, 1.33],
@@ -86,7 +82,29 @@ def _decode_crop_and_flip(image_buffer, bbox, num_channels):
   # Reassemble the bounding box in the format the crop op requires.
   offset_y, offset_x, _ = tf.unstack(bbox_begin)
   target_height, target_width, _ = tf.unstack(bbox_size)
-  crop_window = tf.stack([offset_y, offset_x, target_height, target_width])
+  return tf.stack([offset_y, offset_x, target_height, target_width])
+
+
+def _decode_crop_and_flip(image_buffer, bbox, num_channels):
+  """Crops the given image to a random part of the image, and randomly flips.
+
+  We use the fused decode_and_crop op, which performs better than the two ops
+  used separately in series, but note that this requires that the image be
+  passed in as an un-decoded string Tensor.
+
+  Args:
+    image_buffer: scalar string Tensor representing the raw JPEG image buffer.
+    bbox: 3-D float Tensor of bounding boxes arranged [1, num_boxes, coords]
+      where each coordinate is [0, 1) and the coordinates are arranged as
+      [ymin, xmin, ymax, xmax].
+    num_channels: Integer depth of the image buffer for decoding.
+
+  Returns:
+    3-D tensor with cropped image.
+
+  """
+  crop_window = _sample_distorted_bounding_box(
+      tf.image.extract_jpeg_shape(image_buffer), bbox)
 
   # Use the fused decode and crop op here, which is faster than each in series.
   cropped = tf.image.decode_and_crop_jpeg(
@@ -97,6 +115,28 @@ def _decode_crop_and_flip(image_buffer, bbox, num_channels):
   return cropped
 
 
+def _crop_and_flip(image, bbox):
+  """Crops a decoded image to a random part of the image, and randomly flips.
+
+  Args:
+    image: a 3-D image tensor.
+    bbox: 3-D float Tensor of bounding boxes arranged [1, num_boxes, coords]
+      where each coordinate is [0, 1) and the coordinates are arranged as
+      [ymin, xmin, ymax, xmax].
+
+  Returns:
+    3-D tensor with cropped image.
+  """
+  offset_y, offset_x, target_height, target_width = tf.unstack(
+      _sample_distorted_bounding_box(tf.shape(image), bbox))
+  cropped = tf.slice(
+      image, [offset_y, offset_x, 0], [target_height, target_width, -1])
+
+  # Flip to add a little more random distortion in.
+  cropped = tf.image.random_flip_left_right(cropped)
+  return cropped
+
+
 def _central_crop(image, crop_height, crop_width):
   """Performs central crops of the given image list.
 
@@ -258,3 +298,57 @@ def preprocess_image(image_buffer, bbox, output_height, output_width,
   image.set_shape([output_height, output_width, num_channels])
 
   return _mean_image_subtraction(image, _CHANNEL_MEANS, num_channels)
+
+
+def decode_and_resize_image(image_buffer, num_channels):
+  """Decodes an image and resizes it, before any random distortion.
+
+  The result is the same for every epoch, so it can be cached and passed to
+  preprocess_decoded_image() instead of decoding the image again. Resizing the
+  smallest side to _RESIZE_MIN keeps cached images small while leaving room for
+  the crops of preprocess_decoded_image().
+
+  Args:
+    image_buffer: scalar string Tensor representing the raw JPEG image buffer.
+    num_channels: Integer depth of the image buffer for decoding.
+
+  Returns:
+    3-D uint8 tensor with the resized image.
+  """
+  image = tf.image.decode_jpeg(image_buffer, channels=num_channels)
+  image = _aspect_preserving_resize(image, _RESIZE_MIN)
+  return tf.saturate_cast(tf.round(image), tf.uint8)
+
+
+def preprocess_decoded_image(image, bbox, output_height, output_width,
+                             num_channels, is_training=False):
+  """Preprocesses an image returned by decode_and_resize_image().
+
+  Evaluation images are preprocessed exactly as in preprocess_image(), up to
+  the rounding of the cached image. Training images are cropped from the
+  resized image rather than from the full-resolution one.
+
+  Args:
+    image: 3-D uint8 image tensor returned by decode_and_resize_image().
+    bbox: 3-D float Tensor of bounding boxes arranged [1, num_boxes, coords]
+      where each coordinate is [0, 1) and the coordinates are arranged as
+      [ymin, xmin, ymax, xmax].
+    output_height: The height of the image after preprocessing.
+    output_width: The width of the image after preprocessing.
+    num_channels: Integer depth of the image.
+    is_training: `True` if we're preprocessing the image for training and
+      `False` otherwise.
+
+  Returns:
+    A preprocessed image.
+  """
+  if is_training:
+    image = _crop_and_flip(image, bbox)
+    image = _resize_image(image, output_height, output_width)
+  else:
+    image = _central_crop(image, output_height, output_width)
+    image = tf.cast(image, tf.float32)
+
+  image.set_shape([output_height, output_width, num_channels])
+
+  return _mean_image_subtraction(image, _CHANNEL_MEANS, num_channels)
@@ -17,11 +17,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import os
 import unittest
 
+import numpy as np
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.resnet import imagenet_main
+from official.resnet import resnet_run_loop
 from official.utils.testing import integration
 
 tf.logging.set_verbosity(tf.logging.ERROR)
@@ -282,6 +285,74 @@ class BaseTest(tf.test.TestCase):
   def test_imagenetmodel_shape_v2(self):
     self._test_imagenetmodel_shape(version=2)
 
+  def _write_fake_records(self, num_records):
+    """Writes a TFRecord file of Examples with random JPEG images."""
+    filename = os.path.join(self.get_temp_dir(), 'fake_records')
+    with tf.Graph().as_default(), self.test_session() as sess:
+      encoded = tf.image.encode_jpeg(tf.cast(
+          tf.random_uniform([300, 400, 3], maxval=256, dtype=tf.int32),
+          tf.uint8))
+      with tf.python_io.TFRecordWriter(filename) as writer:
+        for i in range(num_records):
+          example = tf.train.Example(features=tf.train.Features(feature={
+              'image/encoded': tf.train.Feature(
+                  bytes_list=tf.train.BytesList(value=[sess.run(encoded)])),
+              'image/class/label': tf.train.Feature(
+                  int64_list=tf.train.Int64List(value=[i])),
+          }))
+          writer.write(example.SerializeToString())
+    return filename
+
+  def _read_batches(self, filename, is_training, **kwargs):
+    """Reads all batches of a records file with process_record_dataset."""
+    with tf.Graph().as_default(), self.test_session() as sess:
+      dataset = resnet_run_loop.process_record_dataset(
+          tf.data.TFRecordDataset(filename), is_training, batch_size=2,
+          shuffle_buffer=4, num_parallel_calls=0, **kwargs)
+      next_batch = dataset.make_one_shot_iterator().get_next()
+      batches = []
+      while True:
+        try:
+          batches.append(sess.run(next_batch))
+        except tf.errors.OutOfRangeError:
+          return batches
+
+  def test_cached_eval_input_matches_default(self):
+    filename = self._write_fake_records(5)
+    cache_filename = os.path.join(self.get_temp_dir(), 'cache')
+
+    expected = self._read_batches(
+        filename, False, parse_record_fn=imagenet_main.parse_record)
+    for _ in range(2):  # Fills, then reads the cache.
+      actual = self._read_batches(
+          filename, False, parse_record_fn=imagenet_main.parse_decoded_record,
+          decode_record_fn=imagenet_main.decode_record,
+          cache_filename=cache_filename, fused=True)
+      self.assertTrue(tf.gfile.Glob(cache_filename + '*'))
+
+      self.assertEqual(len(expected), len(actual))
+      for (expected_images, expected_labels), (images, labels) in zip(
+          expected, actual):
+        # Cached images are rounded to uint8.
+        self.assertAllClose(expected_images, images, atol=0.5)
+        self.assertAllEqual(expected_labels, labels)
+
+  def test_cached_train_input_shapes(self):
+    filename = self._write_fake_records(5)
+
+    batches = self._read_batches(
+        filename, True, parse_record_fn=imagenet_main.parse_decoded_record,
+        decode_record_fn=imagenet_main.decode_record,
+        cache_filename=os.path.join(self.get_temp_dir(), 'cache'), fused=True,
+        num_epochs=2)
+    self.assertEqual(5, len(batches))
+    for images, labels in batches:
+      self.assertEqual((224, 224, 3), images.shape[1:])
+      self.assertEqual((_LABEL_CLASSES,), labels.shape[1:])
+    self.assertEqual(
+        [0, 0, 1, 1, 2, 2, 3, 3, 4, 4],
+        sorted(np.concatenate([labels for _, labels in batches]).argmax(1)))
+
   def test_imagenet_end_to_end_synthetic_v1(self):
     integration.run_synthetic(
         main=imagenet_main.main, tmp_root=self.get_temp_dir(),
@@ -318,6 +389,12 @@ class BaseTest(tf.test.TestCase):
         extra_flags=['-v', '2', '-rs', '200']
     )
 
+  def test_imagenet_input_benchmark_only_synthetic(self):
+    integration.run_synthetic(
+        main=imagenet_main.main, tmp_root=self.get_temp_dir(),
+        extra_flags=['--input_benchmark_only', '--fused_input_pipeline']
+    )
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -24,10 +24,12 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import multiprocessing
 import os
 
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
+from official.benchmark import input_benchmark
 from official.resnet import resnet_model
 from official.utils.arg_parsers import parsers
 from official.utils.export import export
@@ -35,13 +37,33 @@ from official.utils.logs import hooks_helper
 from official.utils.logs import logger
 from official.utils.misc import model_helpers
 
+# The number of batches read by --input_benchmark_only if --max_train_steps is
+# not set.
+_INPUT_BENCHMARK_STEPS = 100
+
 
 ################################################################################
 # Functions for input processing.
 ################################################################################
+def get_num_parallel_calls(num_parallel_calls):
+  """Resolves the number of records to process in parallel.
+
+  Args:
+    num_parallel_calls: The requested parallelism. A value of 0 or less selects
+      the number of available CPU cores.
+
+  Returns:
+    A positive number of parallel calls.
+  """
+  if num_parallel_calls <= 0:
+    return multiprocessing.cpu_count()
+  return num_parallel_calls
+
+
 def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
                            parse_record_fn, num_epochs=1, num_parallel_calls=1,
-                           examples_per_epoch=0, multi_gpu=False):
+                           examples_per_epoch=0, multi_gpu=False, fused=False,
+                           decode_record_fn=None, cache_filename=None):
   """Given a Dataset with raw records, return an iterator over the records.
 
   Args:
@@ -51,25 +73,48 @@ def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
     shuffle_buffer: The buffer size to use when shuffling records. A larger
       value results in better randomness, but smaller values reduce startup
       time and use less memory.
-    parse_record_fn: A function that takes a raw record and returns the
-      corresponding (image, label) pair.
+    parse_record_fn: A function that takes a raw record (or a decoded record,
+      if decode_record_fn is given) and returns the corresponding
+      (image, label) pair.
     num_epochs: The number of epochs to repeat the dataset.
     num_parallel_calls: The number of records that are processed in parallel.
       This can be optimized per data set but for generally homogeneous data
-      sets, should be approximately the number of available CPU cores.
+      sets, should be approximately the number of available CPU cores. A value
+      of 0 or less uses the number of available CPU cores.
     examples_per_epoch: The number of examples in the current set that
       are processed each epoch. Note that this is only used for multi-GPU mode,
       and only to handle what will eventually be handled inside of Estimator.
     multi_gpu: Whether this is run multi-GPU. Note that this is only required
       currently to handle the batch leftovers (see below), and can be removed
       when that is handled directly by Estimator.
+    fused: Whether to parse and batch records with the fused map_and_batch
+      transformation instead of a separate map and batch.
+    decode_record_fn: Optional function that deterministically decodes a raw
+      record, before shuffling. Its output is passed to parse_record_fn, which
+      then only needs to apply the random (per-epoch) preprocessing.
+    cache_filename: If not None, the decoded records (or the raw records, if
+      decode_record_fn is None) are cached in this file after the first epoch.
+      An empty string caches them in memory.
 
   Returns:
     Dataset of (image, label) pairs ready for iteration.
   """
+  num_parallel_calls = get_num_parallel_calls(num_parallel_calls)
+
+  if decode_record_fn is not None:
+    dataset = dataset.map(decode_record_fn,
+                          num_parallel_calls=num_parallel_calls)
+
+  # The decoded records do not depend on the epoch, so they can be cached
+  # before shuffling and repeating.
+  if cache_filename is not None:
+    dataset = dataset.cache(cache_filename)
+
   # We prefetch a batch at a time, This can help smooth out the time taken to
-  # load input files as we go through shuffling and processing.
-  dataset = dataset.prefetch(buffer_size=batch_size)
+  # load input files as we go through shuffling and processing. The fused
+  # pipeline relies on the buffer of the shuffle and of map_and_batch instead.
+  if not fused:
+    dataset = dataset.prefetch(buffer_size=batch_size)
   if is_training:
     # Shuffle the records. Note that we shuffle before repeating to ensure
     # that the shuffling respects epoch boundaries.
@@ -91,11 +136,20 @@ def process_record_dataset(dataset, is_training, batch_size, shuffle_buffer,
     total_examples = num_epochs * examples_per_epoch
     dataset = dataset.take(batch_size * (total_examples // batch_size))
 
-  # Parse the raw records into images and labels
-  dataset = dataset.map(lambda value: parse_record_fn(value, is_training),
-                        num_parallel_calls=num_parallel_calls)
+  if fused:
+    # Parse the raw records into images and labels, and batch them in a single
+    # transformation. This avoids materializing the parsed records one at a
+    # time, and keeps at least num_parallel_calls records in flight.
+    dataset = dataset.apply(tf.contrib.data.map_and_batch(
+        lambda value: parse_record_fn(value, is_training),
+        batch_size=batch_size,
+        num_parallel_batches=-(-num_parallel_calls // batch_size)))
+  else:
+    # Parse the raw records into images and labels
+    dataset = dataset.map(lambda value: parse_record_fn(value, is_training),
+                          num_parallel_calls=num_parallel_calls)
 
-  dataset = dataset.batch(batch_size)
+    dataset = dataset.batch(batch_size)
 
   # Operations between the final prefetch and the get_next call to the iterator
   # will happen synchronously during run time. We prefetch here again to
@@ -123,7 +177,7 @@ def get_synth_input_fn(height, width, num_channels, num_classes):
     An input_fn that can be used in place of a real one to return a dataset
     that can be used for iteration.
   """
-  def input_fn(is_training, data_dir, batch_size, *args):  # pylint: disable=unused-argument
+  def input_fn(is_training, data_dir, batch_size, *args, **kwargs):  # pylint: disable=unused-argument
     images = tf.zeros((batch_size, height, width, num_channels), tf.float32)
     labels = tf.zeros((batch_size, num_classes), tf.int32)
     return tf.data.Dataset.from_tensors((images, labels)).repeat()
@@ -383,6 +437,27 @@ def resnet_main(flags, model_function, input_function, shape=None):
       intra_op_parallelism_threads=flags.intra_op_parallelism_threads,
       allow_soft_placement=True)
 
+  benchmark_logger = logger.config_benchmark_logger(
+      flags.benchmark_log_dir, async_logging=flags.async_benchmark_logging)
+  benchmark_logger.log_run_info('resnet')
+
+  def input_fn_train():
+    return input_function(True, flags.data_dir, flags.batch_size,
+                          flags.epochs_between_evals,
+                          flags.num_parallel_calls, flags.multi_gpu,
+                          fused_input_pipeline=flags.fused_input_pipeline)
+
+  def input_fn_eval():
+    return input_function(False, flags.data_dir, flags.batch_size,
+                          1, flags.num_parallel_calls, flags.multi_gpu,
+                          fused_input_pipeline=flags.fused_input_pipeline)
+
+  if flags.input_benchmark_only:
+    input_benchmark.benchmark_input_fn(
+        input_fn_train, flags.max_train_steps or _INPUT_BENCHMARK_STEPS,
+        session_config=session_config, benchmark_logger=benchmark_logger)
+    return
+
   # Set up a RunConfig to save checkpoint and set session config.
   run_config = tf.estimator.RunConfig().replace(save_checkpoints_secs=1e9,
                                                 session_config=session_config)
@@ -398,22 +473,11 @@ def resnet_main(flags, model_function, input_function, shape=None):
           'dtype': flags.dtype
       })
 
-  benchmark_logger = logger.config_benchmark_logger(flags.benchmark_log_dir)
-  benchmark_logger.log_run_info('resnet')
-
   train_hooks = hooks_helper.get_train_hooks(
       flags.hooks,
       batch_size=flags.batch_size,
-      benchmark_log_dir=flags.benchmark_log_dir)
-
-  def input_fn_train():
-    return input_function(True, flags.data_dir, flags.batch_size,
-                          flags.epochs_between_evals,
-                          flags.num_parallel_calls, flags.multi_gpu)
-
-  def input_fn_eval():
-    return input_function(False, flags.data_dir, flags.batch_size,
-                          1, flags.num_parallel_calls, flags.multi_gpu)
+      benchmark_log_dir=flags.benchmark_log_dir,
+      async_benchmark_logging=flags.async_benchmark_logging)
 
   total_training_cycle = flags.train_epochs // flags.epochs_between_evals
   for cycle_index in range(total_training_cycle):
@@ -482,6 +546,19 @@ class ResnetArgParser(argparse.ArgumentParser):
         metavar='<RS>' if resnet_size_choices is None else None
     )
 
+    self.add_argument(
+        '--fused_input_pipeline', '-fip', action='store_true',
+        help='If set, parse and batch records with a fused map_and_batch, and '
+             'read ImageNet shards with a parallel interleave.'
+    )
+
+    self.add_argument(
+        '--input_benchmark_only', '-ibo', action='store_true',
+        help='If set, only measure the throughput and latencies of the '
+             'training input pipeline for --max_train_steps batches (default: '
+             '%d), without building the model.' % _INPUT_BENCHMARK_STEPS
+    )
+
   def parse_args(self, args=None, namespace=None):
     args = super(ResnetArgParser, self).parse_args(
         args=args, namespace=namespace)
@@ -172,7 +172,8 @@ class BaseParser(argparse.ArgumentParser):
                "of train hooks. "
                "Example: --hooks LoggingTensorHook ExamplesPerSecondHook. "
                "Allowed hook names (case-insensitive): LoggingTensorHook, "
-               "ProfilerHook, ExamplesPerSecondHook, LoggingMetricHook."
+               "ProfilerHook, ExamplesPerSecondHook, LoggingMetricHook, "
+               "StepTimeProfilerHook. "
                "See official.utils.logs.hooks_helper for details.",
           metavar="<HK>"
       )
@@ -210,7 +211,7 @@ class PerformanceParser(argparse.ArgumentParser):
                "processed in parallel  during input processing. This can be "
                "optimized per data set but for generally homogeneous data "
                "sets, should be approximately the number of available CPU "
-               "cores.",
+               "cores. If 0, the number of available CPU cores is used.",
           metavar="<NPC>"
       )
 
@@ -307,7 +308,8 @@ class BenchmarkParser(argparse.ArgumentParser):
 
   Args:
     add_help: Create the "--help" flag. False if class instance is a parent.
-    benchmark_log_dir: Create a flag to specify location for benchmark logging.
+    benchmark_log_dir: Create flags to specify location for benchmark logging,
+      and whether to write the benchmark log asynchronously.
   """
 
   def __init__(self, add_help=False, benchmark_log_dir=True,
@@ -319,6 +321,11 @@ class BenchmarkParser(argparse.ArgumentParser):
           help="[default: %(default)s] The location of the benchmark logging.",
           metavar="<BLD>"
       )
+      self.add_argument(
+          "--async_benchmark_logging", "-abl", action="store_true",
+          help="If set, benchmark metrics are written to the benchmark log "
+               "from a background thread, in batches."
+      )
     if bigquery_uploader:
       self.add_argument(
           "--gcp_project", "-gp", default=None,
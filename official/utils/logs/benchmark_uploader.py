@@ -18,24 +18,36 @@
 This library require google cloud bigquery lib as dependency, which can be
 installed with:
   > pip install --upgrade google-cloud-bigquery
+
+The metric log is read incrementally and uploaded in batches. The offset of the
+last uploaded metric is checkpointed next to the metric log, so that an upload
+can be resumed, or can follow the metric log of a live run with --tail. For
+testing without network access, --sqlite_db uploads to a local SQLite database
+instead of BigQuery.
 """
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import argparse
 import json
 import os
+import sqlite3
 import sys
+import time
 import uuid
 
-from google.cloud import bigquery
-
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 
 from official.utils.arg_parsers import parsers
 from official.utils.logs import logger
 
+UPLOAD_CHECKPOINT_SUFFIX = ".upload_checkpoint"
+
+_DEFAULT_BATCH_SIZE = 500
+_DEFAULT_MAX_RETRIES = 5
+
 
 class BigQueryUploader(object):
   """Upload the benchmark and metric info to BigQuery."""
@@ -54,10 +66,17 @@ class BigQueryUploader(object):
         google.oauth2.service_account.Credentials to load credential from local
         file for the case that the test is run out side of GCP.
     """
+    # BigQuery is only required for uploading to BigQuery, not to SQLite.
+    from google.cloud import bigquery  # pylint: disable=g-import-not-at-top
+
     self._logging_dir = logging_dir
     self._bq_client = bigquery.Client(
         project=gcp_project, credentials=credentials)
 
+  def sink(self, dataset_name, table_name):
+    """Returns a BigQuerySink for a table of this project."""
+    return BigQuerySink(self._bq_client, dataset_name, table_name)
+
   def upload_benchmark_run(self, dataset_name, table_name, run_id):
     """Upload benchmark run information to Bigquery.
 
@@ -69,20 +88,16 @@ class BigQueryUploader(object):
       run_id: string, a unique ID that will be attached to the data, usually
         this is a UUID4 format.
     """
-    expected_file = os.path.join(
-        self._logging_dir, logger.BENCHMARK_RUN_LOG_FILE_NAME)
-    with tf.gfile.GFile(expected_file) as f:
-      benchmark_json = json.load(f)
-      benchmark_json["model_id"] = run_id
-      table_ref = self._bq_client.dataset(dataset_name).table(table_name)
-      errors = self._bq_client.insert_rows_json(table_ref, [benchmark_json])
-      if errors:
-        tf.logging.error(
-            "Failed to upload benchmark info to bigquery: {}".format(errors))
-
-  def upload_metric(self, dataset_name, table_name, run_id):
+    upload_benchmark_run(
+        self._logging_dir, self.sink(dataset_name, table_name), run_id)
+
+  def upload_metric(self, dataset_name, table_name, run_id,
+                    batch_size=_DEFAULT_BATCH_SIZE):
     """Upload metric information to Bigquery.
 
+    The metrics are uploaded in batches, starting after the last metric
+    uploaded for this run_id.
+
     Args:
       dataset_name: string, the name of bigquery dataset where the data will be
         uploaded.
@@ -91,38 +106,303 @@ class BigQueryUploader(object):
         benchmark_run table.
       run_id: string, a unique ID that will be attached to the data, usually
         this is a UUID4 format. This should be the same as the benchmark run_id.
+      batch_size: int, the maximum number of metrics uploaded at once.
+
+    Returns:
+      The number of uploaded metrics.
+    """
+    return MetricStreamUploader(
+        os.path.join(self._logging_dir, logger.METRIC_LOG_FILE_NAME),
+        self.sink(dataset_name, table_name), run_id,
+        batch_size=batch_size).upload()
+
+
+class BigQuerySink(object):
+  """Inserts rows into a BigQuery table."""
+
+  def __init__(self, bq_client, dataset_name, table_name):
+    self._bq_client = bq_client
+    self._table_ref = bq_client.dataset(dataset_name).table(table_name)
+
+  def insert_rows(self, rows, row_ids=None):
+    """Inserts rows, and returns a list of errors.
+
+    Args:
+      rows: list of JSON-serializable dicts.
+      row_ids: optional list of unique ids of the rows, used by BigQuery to
+        ignore rows that are inserted again when a request is retried.
+
+    Returns:
+      A list of the errors of the insertion, empty if it succeeded.
     """
-    expected_file = os.path.join(
-        self._logging_dir, logger.METRIC_LOG_FILE_NAME)
-    with tf.gfile.GFile(expected_file) as f:
-      lines = f.readlines()
-      metrics = []
-      for line in filter(lambda l: l.strip(), lines):
-        metric = json.loads(line)
-        metric["run_id"] = run_id
-        metrics.append(metric)
-      table_ref = self._bq_client.dataset(dataset_name).table(table_name)
-      errors = self._bq_client.insert_rows_json(table_ref, metrics)
-      if errors:
-        tf.logging.error(
-            "Failed to upload benchmark info to bigquery: {}".format(errors))
+    return self._bq_client.insert_rows_json(
+        self._table_ref, rows, row_ids=row_ids)
+
+
+class SQLiteSink(object):
+  """Inserts rows into a local SQLite table, as a stand-in for BigQuery.
+
+  Each row is stored as a JSON string, with its run_id. Rows with the id of an
+  existing row are ignored, like BigQuery does for retried requests.
+  """
+
+  def __init__(self, db_path, table_name):
+    self._db_path = db_path
+    self._table_name = table_name
+    self._connect().close()
+
+  def _connect(self):
+    conn = sqlite3.connect(self._db_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS {} (row_id TEXT PRIMARY KEY, run_id TEXT, "
+        "row TEXT)".format(self._table_name))
+    return conn
+
+  def insert_rows(self, rows, row_ids=None):
+    """Inserts rows, and returns a list of errors. See BigQuerySink."""
+    if row_ids is None:
+      row_ids = [str(uuid.uuid4()) for _ in rows]
+    conn = self._connect()
+    try:
+      with conn:  # Commits the insertion.
+        conn.executemany(
+            "INSERT OR IGNORE INTO {} VALUES (?, ?, ?)".format(
+                self._table_name),
+            [(row_id, row.get("run_id"), json.dumps(row))
+             for row_id, row in zip(row_ids, rows)])
+    finally:
+      conn.close()
+    return []
+
+  def read_rows(self):
+    """Returns the inserted rows, in insertion order."""
+    conn = self._connect()
+    try:
+      return [json.loads(row) for row, in conn.execute(
+          "SELECT row FROM {} ORDER BY rowid".format(self._table_name))]
+    finally:
+      conn.close()
+
+
+def upload_benchmark_run(logging_dir, sink, run_id):
+  """Upload benchmark run information to a sink.
+
+  Args:
+    logging_dir: string, logging directory that contains the benchmark log.
+    sink: BigQuerySink or SQLiteSink of the benchmark run table.
+    run_id: string, a unique ID that will be attached to the data.
+  """
+  expected_file = os.path.join(logging_dir, logger.BENCHMARK_RUN_LOG_FILE_NAME)
+  with tf.gfile.GFile(expected_file) as f:
+    benchmark_json = json.load(f)
+    benchmark_json["model_id"] = run_id
+    errors = sink.insert_rows([benchmark_json])
+    if errors:
+      tf.logging.error(
+          "Failed to upload benchmark info to bigquery: {}".format(errors))
+
+
+def read_upload_checkpoint(metric_file):
+  """Returns the upload checkpoint of a metric log, or None if there is none.
+
+  Args:
+    metric_file: string, the path of the metric log.
+
+  Returns:
+    A dict with the "run_id" of the upload, and the "offset" in bytes of the
+    first metric that is not uploaded yet.
+  """
+  checkpoint_file = metric_file + UPLOAD_CHECKPOINT_SUFFIX
+  if not tf.gfile.Exists(checkpoint_file):
+    return None
+  with tf.gfile.GFile(checkpoint_file) as f:
+    return json.load(f)
+
+
+class MetricStreamUploader(object):
+  """Uploads a metric log in batches, resuming from the last uploaded metric.
+
+  Only complete lines are uploaded, so the metric log of a live run can be
+  uploaded while it is written. The offset of the last uploaded line is
+  checkpointed after each batch.
+  """
+
+  def __init__(self, metric_file, sink, run_id, batch_size=_DEFAULT_BATCH_SIZE,
+               max_retries=_DEFAULT_MAX_RETRIES, retry_delay_secs=1):
+    """Initializer for MetricStreamUploader.
+
+    Args:
+      metric_file: string, the path of the metric log.
+      sink: BigQuerySink or SQLiteSink of the metric table.
+      run_id: string, the ID attached to the metrics. The upload checkpoint is
+        only used if it was written for the same run_id.
+      batch_size: int, the maximum number of metrics uploaded at once.
+      max_retries: int, the number of times a failed batch is retried.
+      retry_delay_secs: float, the delay before the first retry. It is doubled
+        for each following retry.
+    """
+    self._metric_file = metric_file
+    self._checkpoint_file = metric_file + UPLOAD_CHECKPOINT_SUFFIX
+    self._sink = sink
+    self._run_id = run_id
+    self._batch_size = batch_size
+    self._max_retries = max_retries
+    self._retry_delay_secs = retry_delay_secs
+
+  def upload(self):
+    """Uploads the complete metric lines after the checkpoint.
+
+    Returns:
+      The number of uploaded metrics.
+
+    Raises:
+      RuntimeError: if a batch could not be uploaded after all retries. The
+        checkpoint is not updated, so the batch is uploaded again by the next
+        call.
+    """
+    if not tf.gfile.Exists(self._metric_file):
+      return 0
+
+    checkpoint = read_upload_checkpoint(self._metric_file)
+    offset = 0
+    if checkpoint and checkpoint["run_id"] == self._run_id:
+      offset = checkpoint["offset"]
+
+    num_uploaded = 0
+    rows = []
+    row_ids = []
+    with tf.gfile.GFile(self._metric_file, "rb") as f:
+      f.seek(offset)
+      while True:
+        line = f.readline()
+        # A line without a newline is still being written.
+        if not line.endswith(b"\n"):
+          break
+        if line.strip():
+          metric = json.loads(line.decode("utf-8"))
+          metric["run_id"] = self._run_id
+          rows.append(metric)
+          # The offset of the line identifies the metric across retries.
+          row_ids.append("{}-{}".format(self._run_id, offset))
+        offset += len(line)
+
+        if len(rows) == self._batch_size:
+          self._insert_with_retry(rows, row_ids)
+          self._write_checkpoint(offset)
+          num_uploaded += len(rows)
+          rows = []
+          row_ids = []
+
+    if rows:
+      self._insert_with_retry(rows, row_ids)
+      num_uploaded += len(rows)
+    if not checkpoint or offset != checkpoint["offset"]:
+      self._write_checkpoint(offset)
+    return num_uploaded
+
+  def tail(self, poll_interval_secs=10, max_idle_secs=None):
+    """Uploads the metrics of a live run as they are logged.
+
+    Args:
+      poll_interval_secs: float, the delay between checks for new metrics.
+      max_idle_secs: float, the time without new metrics after which to stop.
+        If None, tail until interrupted.
+
+    Returns:
+      The number of uploaded metrics.
+    """
+    num_uploaded = 0
+    last_upload_time = time.time()
+    while True:
+      num_new = self.upload()
+      num_uploaded += num_new
+      if num_new:
+        last_upload_time = time.time()
+      elif (max_idle_secs is not None and
+            time.time() - last_upload_time >= max_idle_secs):
+        return num_uploaded
+      time.sleep(poll_interval_secs)
+
+  def _insert_with_retry(self, rows, row_ids):
+    """Inserts a batch of rows, retrying with exponential backoff."""
+    for attempt in range(self._max_retries + 1):
+      try:
+        errors = self._sink.insert_rows(rows, row_ids=row_ids)
+      # The sinks raise different errors for network and database failures.
+      except Exception as e:  # pylint: disable=broad-except
+        errors = [e]
+      if not errors:
+        return
+      if attempt < self._max_retries:
+        delay = self._retry_delay_secs * 2 ** attempt
+        tf.logging.warning(
+            "Failed to upload %d benchmark metrics, retrying in %.1f seconds: "
+            "%s", len(rows), delay, errors)
+        time.sleep(delay)
+    raise RuntimeError(
+        "Failed to upload benchmark metrics: {}".format(errors))
+
+  def _write_checkpoint(self, offset):
+    """Atomically writes the offset of the first metric not uploaded yet."""
+    temp_file = self._checkpoint_file + ".tmp"
+    with tf.gfile.GFile(temp_file, "w") as f:
+      json.dump({"run_id": self._run_id, "offset": offset}, f)
+    tf.gfile.Rename(temp_file, self._checkpoint_file, overwrite=True)
 
 
 def main(argv):
-  parser = parsers.BenchmarkParser()
+  parser = argparse.ArgumentParser(parents=[parsers.BenchmarkParser()])
+  parser.add_argument(
+      "--sqlite_db", "-sdb", default=None,
+      help="[default: %(default)s] If set, upload to the tables of this local "
+           "SQLite database instead of BigQuery.",
+      metavar="<SDB>")
+  parser.add_argument(
+      "--upload_batch_size", "-ubs", type=int, default=_DEFAULT_BATCH_SIZE,
+      help="[default: %(default)s] The number of metrics uploaded at once.",
+      metavar="<UBS>")
+  parser.add_argument(
+      "--tail", action="store_true",
+      help="If set, keep uploading new metrics of a live run until no metric "
+           "is logged for --max_idle_secs.")
+  parser.add_argument(
+      "--max_idle_secs", "-mis", type=float, default=600,
+      help="[default: %(default)s] When tailing, the time without new metrics "
+           "after which to stop.",
+      metavar="<MIS>")
   flags = parser.parse_args(args=argv[1:])
   if not flags.benchmark_log_dir:
     print("Usage: benchmark_uploader.py --benchmark_log_dir=/some/dir")
     sys.exit(1)
 
-  uploader = BigQueryUploader(
-      flags.benchmark_log_dir,
-      gcp_project=flags.gcp_project)
-  run_id = str(uuid.uuid4())
-  uploader.upload_benchmark_run(
-      flags.bigquery_data_set, flags.bigquery_run_table, run_id)
-  uploader.upload_metric(
-      flags.bigquery_data_set, flags.bigquery_metric_table, run_id)
+  if flags.sqlite_db:
+    run_sink = SQLiteSink(flags.sqlite_db, flags.bigquery_run_table)
+    metric_sink = SQLiteSink(flags.sqlite_db, flags.bigquery_metric_table)
+  else:
+    uploader = BigQueryUploader(
+        flags.benchmark_log_dir,
+        gcp_project=flags.gcp_project)
+    run_sink = uploader.sink(flags.bigquery_data_set, flags.bigquery_run_table)
+    metric_sink = uploader.sink(
+        flags.bigquery_data_set, flags.bigquery_metric_table)
+
+  # Resume the upload of the metrics if it was interrupted.
+  metric_file = os.path.join(
+      flags.benchmark_log_dir, logger.METRIC_LOG_FILE_NAME)
+  checkpoint = read_upload_checkpoint(metric_file)
+  if checkpoint:
+    run_id = checkpoint["run_id"]
+  else:
+    run_id = str(uuid.uuid4())
+    upload_benchmark_run(flags.benchmark_log_dir, run_sink, run_id)
+
+  metric_uploader = MetricStreamUploader(
+      metric_file, metric_sink, run_id, batch_size=flags.upload_batch_size)
+  if flags.tail:
+    metric_uploader.tail(max_idle_secs=flags.max_idle_secs)
+  else:
+    metric_uploader.upload()
+  return run_id
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for benchmark uploader, using the SQLite sink."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import tempfile
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+from official.utils.logs import benchmark_uploader
+from official.utils.logs import logger
+
+
+class FlakySink(object):
+  """Sink that fails the first insertions, and then inserts into a sink."""
+
+  def __init__(self, sink, num_failures):
+    self._sink = sink
+    self._num_failures = num_failures
+    self.num_calls = 0
+
+  def insert_rows(self, rows, row_ids=None):
+    self.num_calls += 1
+    if self.num_calls <= self._num_failures:
+      raise IOError("Connection reset")
+    return self._sink.insert_rows(rows, row_ids=row_ids)
+
+
+class MetricStreamUploaderTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(MetricStreamUploaderTest, self).setUp()
+    self.log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    self.metric_file = os.path.join(
+        self.log_dir, logger.METRIC_LOG_FILE_NAME)
+    self.sink = benchmark_uploader.SQLiteSink(
+        os.path.join(self.log_dir, "benchmark.db"), "metric")
+
+  def _log_metrics(self, start, end):
+    file_logger = logger.BenchmarkFileLogger(self.log_dir)
+    for step in range(start, end):
+      file_logger.log_metric("loss", float(step), global_step=step)
+
+  def _uploader(self, run_id="run", batch_size=4, **kwargs):
+    return benchmark_uploader.MetricStreamUploader(
+        self.metric_file, self.sink, run_id, batch_size=batch_size,
+        retry_delay_secs=0, **kwargs)
+
+  def test_upload_in_batches(self):
+    self._log_metrics(0, 10)
+    sink = FlakySink(self.sink, num_failures=0)
+    uploader = benchmark_uploader.MetricStreamUploader(
+        self.metric_file, sink, "run", batch_size=4)
+    self.assertEqual(10, uploader.upload())
+    self.assertEqual(3, sink.num_calls)
+
+    rows = self.sink.read_rows()
+    self.assertEqual(list(range(10)), [row["global_step"] for row in rows])
+    self.assertEqual(["run"] * 10, [row["run_id"] for row in rows])
+    self.assertEqual(
+        {"run_id": "run", "offset": os.path.getsize(self.metric_file)},
+        benchmark_uploader.read_upload_checkpoint(self.metric_file))
+
+  def test_resume_from_checkpoint(self):
+    self._log_metrics(0, 5)
+    self.assertEqual(5, self._uploader().upload())
+    self.assertEqual(0, self._uploader().upload())
+
+    self._log_metrics(5, 7)
+    self.assertEqual(2, self._uploader().upload())
+    self.assertEqual(
+        list(range(7)), [row["global_step"] for row in self.sink.read_rows()])
+
+  def test_new_run_id_uploads_from_start(self):
+    self._log_metrics(0, 3)
+    self.assertEqual(3, self._uploader(run_id="run1").upload())
+    self.assertEqual(3, self._uploader(run_id="run2").upload())
+    self.assertEqual(6, len(self.sink.read_rows()))
+
+  def test_partial_line_not_uploaded(self):
+    self._log_metrics(0, 2)
+    metric = json.dumps({"name": "loss", "value": 2.0, "global_step": 2})
+    with open(self.metric_file, "a") as f:
+      f.write(metric[:10])
+    self.assertEqual(2, self._uploader().upload())
+
+    with open(self.metric_file, "a") as f:
+      f.write(metric[10:] + "\n")
+    self.assertEqual(1, self._uploader().upload())
+    self.assertEqual(
+        [0, 1, 2], [row["global_step"] for row in self.sink.read_rows()])
+
+  def test_retry_failed_batch(self):
+    self._log_metrics(0, 6)
+    sink = FlakySink(self.sink, num_failures=2)
+    uploader = benchmark_uploader.MetricStreamUploader(
+        self.metric_file, sink, "run", batch_size=4, max_retries=2,
+        retry_delay_secs=0)
+    self.assertEqual(6, uploader.upload())
+    self.assertEqual(4, sink.num_calls)
+    self.assertEqual(6, len(self.sink.read_rows()))
+
+  def test_failed_batch_not_checkpointed(self):
+    self._log_metrics(0, 4)
+    self.assertEqual(4, self._uploader().upload())
+    checkpoint = benchmark_uploader.read_upload_checkpoint(self.metric_file)
+
+    self._log_metrics(4, 6)
+    uploader = benchmark_uploader.MetricStreamUploader(
+        self.metric_file, FlakySink(self.sink, num_failures=2), "run",
+        max_retries=1, retry_delay_secs=0)
+    with self.assertRaises(RuntimeError):
+      uploader.upload()
+    self.assertEqual(
+        checkpoint,
+        benchmark_uploader.read_upload_checkpoint(self.metric_file))
+
+    # The metrics of the failed batch are uploaded by the next call.
+    self.assertEqual(2, uploader.upload())
+    self.assertEqual(6, len(self.sink.read_rows()))
+
+  def test_tail(self):
+    self._log_metrics(0, 3)
+    self.assertEqual(
+        3, self._uploader().tail(poll_interval_secs=0, max_idle_secs=0))
+
+  def test_main_with_sqlite_db(self):
+    with open(os.path.join(self.log_dir, logger.BENCHMARK_RUN_LOG_FILE_NAME),
+              "w") as f:
+      json.dump({"model_name": "resnet"}, f)
+    self._log_metrics(0, 3)
+    db = os.path.join(self.log_dir, "main.db")
+    argv = ["benchmark_uploader", "--benchmark_log_dir", self.log_dir,
+            "--sqlite_db", db]
+    run_id = benchmark_uploader.main(argv)
+
+    # A resumed upload uses the run_id of the checkpoint.
+    self._log_metrics(3, 4)
+    self.assertEqual(run_id, benchmark_uploader.main(argv))
+
+    runs = benchmark_uploader.SQLiteSink(db, "benchmark_run").read_rows()
+    self.assertEqual([{"model_name": "resnet", "model_id": run_id}], runs)
+    metrics = benchmark_uploader.SQLiteSink(db, "benchmark_metric").read_rows()
+    self.assertEqual([run_id] * 4, [metric["run_id"] for metric in metrics])
+
+
+if __name__ == "__main__":
+  tf.test.main()
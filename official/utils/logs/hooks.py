@@ -13,15 +13,30 @@
 # limitations under the License.
 # ==============================================================================
 
-"""Hook that counts examples per second every N steps or seconds."""
+"""Hooks that measure the training speed.
+
+ExamplesPerSecondHook counts examples per second every N steps or seconds.
+StepTimeProfilerHook logs step latency percentiles and the input stall ratio
+every N steps.
+"""
 
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+
+import numpy as np
 import tensorflow as tf
 
+from official.utils.logs import logger
+
+# Columns of the step time ring buffer of StepTimeProfilerHook.
+_STEP_TIME, _RUN_TIME, _INPUT_TIME = range(3)
+
+_GET_NEXT_OP_TYPES = ('IteratorGetNext', 'IteratorGetNextSync')
+
 
 class ExamplesPerSecondHook(tf.train.SessionRunHook):
   """Hook to print out examples per second.
@@ -113,3 +128,133 @@ class ExamplesPerSecondHook(tf.train.SessionRunHook):
         tf.logging.info('Batch [%g]:  current exp/sec = %g, average exp/sec = '
                         '%g', self._total_steps, current_examples_per_sec,
                         average_examples_per_sec)
+
+
+class StepTimeProfilerHook(tf.train.SessionRunHook):
+  """Hook to log step latency percentiles and the input stall ratio.
+
+  For each step, the hook records in a fixed-size ring buffer the wall time of
+  the step, the time spent in session.run(), and the time blocked in the
+  get_next op of the input iterator. Every N steps, the p50/p90/p99 step
+  latency and the ratio of time blocked on input to step time, over the steps
+  in the buffer, are logged with the benchmark logger.
+
+  The time blocked on input is read from a software trace of session.run(),
+  which has a small cost per op. It is only recorded every
+  `trace_every_n_steps` steps, unlike ProfilerHook, which traces everything and
+  writes a timeline.
+  """
+
+  def __init__(self,
+               every_n_steps=100,
+               buffer_size=1000,
+               trace_every_n_steps=10,
+               metric_logger=None):
+    """Initializer for StepTimeProfilerHook.
+
+    Args:
+      every_n_steps: Log stats every n steps.
+      buffer_size: The number of most recent steps the stats are computed
+        over.
+      trace_every_n_steps: Record the time blocked on input every n steps.
+      metric_logger: instance of `BenchmarkLogger`, the benchmark logger that
+        the hook should use to log the stats. If not set, use the global
+        benchmark logger.
+
+    Raises:
+      ValueError: if `every_n_steps`, `buffer_size` or `trace_every_n_steps` is
+      non-positive.
+    """
+    if min(every_n_steps, buffer_size, trace_every_n_steps) < 1:
+      raise ValueError('every_n_steps, buffer_size and trace_every_n_steps '
+                       'should be positive.')
+
+    self._every_n_steps = every_n_steps
+    self._trace_every_n_steps = trace_every_n_steps
+    self._metric_logger = metric_logger
+    self._step_times = np.full([buffer_size, 3], np.nan)
+    self._num_steps = 0
+    self._last_step_end_time = None
+
+  def begin(self):
+    """Called once before using the session to find the input ops."""
+    self._global_step_tensor = tf.train.get_global_step()
+    if self._global_step_tensor is None:
+      raise RuntimeError(
+          'Global step should be created to use StepTimeProfilerHook.')
+    # The global benchmark logger may be configured after the hook is created.
+    self._logger = self._metric_logger or logger.get_benchmark_logger()
+    # The hook may be reused by several calls to train(). The first step of a
+    # run is timed from its own start, not from the end of the previous run.
+    self._last_step_end_time = None
+    self._get_next_ops = set(
+        op.name for op in tf.get_default_graph().get_operations()
+        if op.type in _GET_NEXT_OP_TYPES)
+
+  def before_run(self, run_context):  # pylint: disable=unused-argument
+    """Called before each call to run().
+
+    Args:
+      run_context: A SessionRunContext object.
+
+    Returns:
+      A SessionRunArgs object, which requests a trace on traced steps.
+    """
+    self._trace_step = bool(self._get_next_ops) and (
+        self._num_steps % self._trace_every_n_steps == 0)
+    options = None
+    if self._trace_step:
+      options = tf.RunOptions(trace_level=tf.RunOptions.SOFTWARE_TRACE)
+    self._run_start_time = time.time()
+    return tf.train.SessionRunArgs(self._global_step_tensor, options=options)
+
+  def after_run(self, run_context, run_values):  # pylint: disable=unused-argument
+    """Called after each call to run().
+
+    Args:
+      run_context: A SessionRunContext object.
+      run_values: A SessionRunValues object.
+    """
+    end_time = time.time()
+    # The step time includes the host work between calls to run().
+    step_start_time = self._last_step_end_time or self._run_start_time
+    self._last_step_end_time = end_time
+
+    input_time = np.nan
+    if self._trace_step:
+      input_time = sum(
+          node.all_end_rel_micros
+          for device in run_values.run_metadata.step_stats.dev_stats
+          for node in device.node_stats
+          if node.node_name in self._get_next_ops) / 1e6
+
+    index = self._num_steps % len(self._step_times)
+    self._step_times[index] = [end_time - step_start_time,
+                               end_time - self._run_start_time,
+                               input_time]
+    self._num_steps += 1
+
+    if self._num_steps % self._every_n_steps == 0:
+      self._log_stats(run_values.results)
+
+  def end(self, session):  # pylint: disable=unused-argument
+    self._logger.flush()
+
+  def _log_stats(self, global_step):
+    """Logs the stats of the steps in the ring buffer."""
+    step_times = self._step_times[:self._num_steps]
+    latencies = np.percentile(step_times[:, _STEP_TIME] * 1000, [50, 90, 99])
+    for percentile, latency in zip([50, 90, 99], latencies):
+      self._logger.log_metric('step_latency_p%d' % percentile, latency,
+                              unit='ms', global_step=global_step)
+    self._logger.log_metric(
+        'session_run_latency_p50',
+        np.percentile(step_times[:, _RUN_TIME], 50) * 1000,
+        unit='ms', global_step=global_step)
+
+    traced = ~np.isnan(step_times[:, _INPUT_TIME])
+    if traced.any():
+      input_stall_ratio = (np.sum(step_times[traced, _INPUT_TIME]) /
+                           np.sum(step_times[traced, _STEP_TIME]))
+      self._logger.log_metric('input_stall_ratio', input_stall_ratio,
+                              global_step=global_step)
@@ -40,8 +40,9 @@ def get_train_hooks(name_list, **kwargs):
 
   Args:
     name_list: a list of strings to name desired hook classes. Allowed:
-      LoggingTensorHook, ProfilerHook, ExamplesPerSecondHook, which are defined
-      as keys in HOOKS
+      LoggingTensorHook, ProfilerHook, ExamplesPerSecondHook,
+      LoggingMetricHook, StepTimeProfilerHook, which are defined as keys in
+      HOOKS
     **kwargs: a dictionary of arguments to the hooks.
 
   Returns:
@@ -127,6 +128,7 @@ def get_examples_per_second_hook(every_n_steps=100,
 def get_logging_metric_hook(benchmark_log_dir=None,
                             tensors_to_log=None,
                             every_n_secs=600,
+                            async_benchmark_logging=False,
                             **kwargs):  # pylint: disable=unused-argument
   """Function to get LoggingMetricHook.
 
@@ -136,24 +138,53 @@ def get_logging_metric_hook(benchmark_log_dir=None,
       names. If not set, log _TENSORS_TO_LOG by default.
     every_n_secs: `int`, the frequency for logging the metric. Default to every
       10 mins.
+    async_benchmark_logging: `bool`, whether to write the metric log from a
+      background thread.
 
   Returns:
     Returns a ProfilerHook that writes out timelines that can be loaded into
     profiling tools like chrome://tracing.
   """
-  logger.config_benchmark_logger(benchmark_log_dir)
+  # Reuses the benchmark logger if the model already configured it, so that
+  # the hook does not write to the metric log concurrently with the model.
+  metric_logger = logger.config_benchmark_logger(
+      benchmark_log_dir, async_logging=async_benchmark_logging)
   if tensors_to_log is None:
     tensors_to_log = _TENSORS_TO_LOG
   return metric_hook.LoggingMetricHook(
       tensors=tensors_to_log,
-      metric_logger=logger.get_benchmark_logger(),
+      metric_logger=metric_logger,
       every_n_secs=every_n_secs)
 
 
+def get_step_time_profiler_hook(every_n_steps=100,
+                                buffer_size=1000,
+                                trace_every_n_steps=10,
+                                **kwargs):  # pylint: disable=unused-argument
+  """Function to get StepTimeProfilerHook.
+
+  Args:
+    every_n_steps: `int`, log step latency percentiles and the input stall
+      ratio every N steps.
+    buffer_size: `int`, the number of most recent steps the stats are computed
+      over.
+    trace_every_n_steps: `int`, record the time blocked on input every N steps.
+    **kwargs: a dictionary of arguments to StepTimeProfilerHook.
+
+  Returns:
+    Returns a StepTimeProfilerHook that logs its stats with the benchmark
+    logger.
+  """
+  return hooks.StepTimeProfilerHook(every_n_steps=every_n_steps,
+                                    buffer_size=buffer_size,
+                                    trace_every_n_steps=trace_every_n_steps)
+
+
 # A dictionary to map one hook name and its corresponding function
 HOOKS = {
     'loggingtensorhook': get_logging_tensor_hook,
     'profilerhook': get_profiler_hook,
     'examplespersecondhook': get_examples_per_second_hook,
     'loggingmetrichook': get_logging_metric_hook,
+    'steptimeprofilerhook': get_step_time_profiler_hook,
 }
@@ -63,5 +63,9 @@ class BaseTest(unittest.TestCase):
     self.validate_train_hook_name(test_hook_name, 'loggingmetrichook',
                                   benchmark_log_dir='/tmp')
 
+  def test_get_step_time_profiler_hook(self):
+    self.validate_train_hook_name('StepTimeProfilerHook',
+                                  'steptimeprofilerhook')
+
 if __name__ == '__main__':
   tf.test.main()
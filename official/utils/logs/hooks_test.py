@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import time
 
+import numpy as np
 import tensorflow as tf  # pylint: disable=g-bad-import-order
 from tensorflow.python.training import monitored_session  # pylint: disable=g-bad-import-order
 
@@ -144,5 +145,95 @@ class ExamplesPerSecondHookTest(tf.test.TestCase):
       self._validate_log_every_n_secs(sess, 5)
 
 
+class MockMetricLogger(object):
+
+  def __init__(self):
+    self.logged_metric = []
+    self.num_flushes = 0
+
+  def log_metric(self, name, value, unit=None, global_step=None, extras=None):  # pylint: disable=unused-argument
+    self.logged_metric.append(
+        {'name': name, 'value': value, 'unit': unit,
+         'global_step': global_step})
+
+  def flush(self):
+    self.num_flushes += 1
+
+
+class StepTimeProfilerHookTest(tf.test.TestCase):
+  """Tests for the StepTimeProfilerHook."""
+
+  def setUp(self):
+    self.graph = tf.Graph()
+    with self.graph.as_default():
+      self.global_step = tf.train.get_or_create_global_step()
+      dataset = tf.data.Dataset.range(100).repeat()
+      value = dataset.make_one_shot_iterator().get_next()
+      self.train_op = tf.group(tf.assign_add(self.global_step, 1), value)
+    self.logger = MockMetricLogger()
+
+  def test_raise_in_non_positive_steps(self):
+    with self.assertRaises(ValueError):
+      hooks.StepTimeProfilerHook(every_n_steps=0)
+    with self.assertRaises(ValueError):
+      hooks.StepTimeProfilerHook(buffer_size=0)
+
+  def _run_steps(self, hook, num_steps):
+    with self.graph.as_default(), tf.Session() as sess:
+      hook.begin()
+      mon_sess = monitored_session._HookedSession(sess, [hook])  # pylint: disable=protected-access
+      sess.run(tf.global_variables_initializer())
+      for _ in range(num_steps):
+        mon_sess.run(self.train_op)
+      hook.end(sess)
+
+  def test_log_every_n_steps(self):
+    hook = hooks.StepTimeProfilerHook(
+        every_n_steps=5, trace_every_n_steps=2, metric_logger=self.logger)
+    self._run_steps(hook, 12)
+
+    names = [metric['name'] for metric in self.logger.logged_metric]
+    self.assertEqual(
+        ['step_latency_p50', 'step_latency_p90', 'step_latency_p99',
+         'session_run_latency_p50', 'input_stall_ratio'] * 2, names)
+    self.assertEqual(
+        [5] * 5 + [10] * 5,
+        [metric['global_step'] for metric in self.logger.logged_metric])
+    latencies = [metric['value'] for metric in self.logger.logged_metric[:3]]
+    self.assertEqual(sorted(latencies), latencies)
+    self.assertGreater(latencies[0], 0)
+    input_stall_ratio = self.logger.logged_metric[4]['value']
+    self.assertGreater(input_stall_ratio, 0)
+    self.assertLess(input_stall_ratio, 1)
+    self.assertEqual(1, self.logger.num_flushes)
+
+  def test_reused_hook_does_not_time_gap_between_runs(self):
+    hook = hooks.StepTimeProfilerHook(
+        every_n_steps=100, buffer_size=4, metric_logger=self.logger)
+    self._run_steps(hook, 2)
+    # E.g. an evaluation between two calls to train().
+    time.sleep(1)
+    self._run_steps(hook, 2)
+
+    # pylint: disable=protected-access
+    self.assertLess(np.max(hook._step_times[:, 0]), 0.5)
+    # pylint: enable=protected-access
+
+  def test_ring_buffer(self):
+    hook = hooks.StepTimeProfilerHook(
+        every_n_steps=100, buffer_size=4, trace_every_n_steps=4,
+        metric_logger=self.logger)
+    self._run_steps(hook, 6)
+
+    # pylint: disable=protected-access
+    self.assertEqual((4, 3), hook._step_times.shape)
+    self.assertFalse(np.isnan(hook._step_times[:, :2]).any())
+    # Steps 0 and 4 are traced, and step 4 overwrote step 0.
+    self.assertEqual(
+        [False, True, True, True], list(np.isnan(hook._step_times[:, 2])))
+    # pylint: enable=protected-access
+    self.assertEqual([], self.logger.logged_metric)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -22,6 +22,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import atexit
 import datetime
 import json
 import multiprocessing
@@ -29,6 +30,7 @@ import numbers
 import os
 import threading
 
+from six.moves import queue
 import tensorflow as tf
 from tensorflow.python.client import device_lib
 
@@ -42,13 +44,40 @@ _benchmark_logger = None
 _logger_lock = threading.Lock()
 
 
-def config_benchmark_logger(logging_dir):
-  """Config the global benchmark logger"""
+def config_benchmark_logger(logging_dir, async_logging=False):
+  """Config the global benchmark logger.
+
+  Args:
+    logging_dir: string, the directory of the benchmark log files. If empty,
+      the metrics are logged to STDOUT.
+    async_logging: bool, whether to write the metrics from a background thread
+      with an AsyncBenchmarkFileLogger.
+
+  If the global benchmark logger already logs to logging_dir the same way, it
+  is reused, so that only one writer appends to the log files. Otherwise, the
+  previous logger is closed before it is replaced.
+
+  Returns:
+    The configured benchmark logger.
+  """
+  if logging_dir and async_logging:
+    logger_class = AsyncBenchmarkFileLogger
+  elif logging_dir:
+    logger_class = BenchmarkFileLogger
+  else:
+    logger_class = BaseBenchmarkLogger
+
   _logger_lock.acquire()
   try:
     global _benchmark_logger
+    previous_logger = _benchmark_logger
+    if (type(previous_logger) is logger_class and  # pylint: disable=unidiomatic-typecheck
+        getattr(previous_logger, "logging_dir", None) == (logging_dir or None)):
+      return previous_logger
+    if previous_logger:
+      previous_logger.close()
     if logging_dir:
-      _benchmark_logger = BenchmarkFileLogger(logging_dir)
+      _benchmark_logger = logger_class(logging_dir)
     else:
       _benchmark_logger = BaseBenchmarkLogger()
   finally:
@@ -86,10 +115,7 @@ class BaseBenchmarkLogger(object):
         self.log_metric(key, eval_results[key], global_step=global_step)
 
   def log_metric(self, name, value, unit=None, global_step=None, extras=None):
-    """Log the benchmark metric information to local file.
-
-    Currently the logging is done in a synchronized way. This should be updated
-    to log asynchronously.
+    """Log the benchmark metric information to STDOUT.
 
     Args:
       name: string, the name of the metric to log.
@@ -112,6 +138,14 @@ class BaseBenchmarkLogger(object):
   def log_run_info(self, model_name):
     tf.logging.info("Benchmark run: %s", _gather_run_info(model_name))
 
+  def flush(self):
+    """Waits until all the logged metrics are written."""
+    pass
+
+  def close(self):
+    """Writes the logged metrics, before the logger is replaced."""
+    self.flush()
+
 
 class BenchmarkFileLogger(BaseBenchmarkLogger):
   """Class to log the benchmark information to local disk."""
@@ -122,11 +156,15 @@ class BenchmarkFileLogger(BaseBenchmarkLogger):
     if not tf.gfile.IsDirectory(self._logging_dir):
       tf.gfile.MakeDirs(self._logging_dir)
 
+  @property
+  def logging_dir(self):
+    return self._logging_dir
+
   def log_metric(self, name, value, unit=None, global_step=None, extras=None):
     """Log the benchmark metric information to local file.
 
-    Currently the logging is done in a synchronized way. This should be updated
-    to log asynchronously.
+    The metric is written synchronously. See AsyncBenchmarkFileLogger to write
+    metrics from a background thread.
 
     Args:
       name: string, the name of the metric to log.
@@ -136,28 +174,38 @@ class BenchmarkFileLogger(BaseBenchmarkLogger):
       global_step: int, the global_step when the metric is logged.
       extras: map of string:string, the extra information about the metric.
     """
+    line = self._metric_line(name, value, unit, global_step, extras)
+    if line is not None:
+      self._write_metric_lines([line])
+
+  def _metric_line(self, name, value, unit, global_step, extras):
+    """Returns the JSON line of a metric, or None if it cannot be logged."""
     if not isinstance(value, numbers.Number):
       tf.logging.warning(
           "Metric value to log should be a number. Got %s", type(value))
-      return
+      return None
     extras = _convert_to_json_dict(extras)
 
+    metric = {
+        "name": name,
+        "value": float(value),
+        "unit": unit,
+        "global_step": global_step,
+        "timestamp": datetime.datetime.utcnow().strftime(
+            _DATE_TIME_FORMAT_PATTERN),
+        "extras": extras}
+    try:
+      return json.dumps(metric) + "\n"
+    except (TypeError, ValueError) as e:
+      tf.logging.warning("Failed to dump metric to log file: "
+                         "name %s, value %s, error %s", name, value, e)
+      return None
+
+  def _write_metric_lines(self, lines):
+    """Appends JSON lines of metrics to the metric log file."""
     with tf.gfile.GFile(
         os.path.join(self._logging_dir, METRIC_LOG_FILE_NAME), "a") as f:
-      metric = {
-          "name": name,
-          "value": float(value),
-          "unit": unit,
-          "global_step": global_step,
-          "timestamp": datetime.datetime.utcnow().strftime(
-              _DATE_TIME_FORMAT_PATTERN),
-          "extras": extras}
-      try:
-        json.dump(metric, f)
-        f.write("\n")
-      except (TypeError, ValueError) as e:
-        tf.logging.warning("Failed to dump metric to log file: "
-                           "name %s, value %s, error %s", name, value, e)
+      f.write("".join(lines))
 
   def log_run_info(self, model_name):
     """Collect most of the TF runtime information for the local env.
@@ -179,6 +227,132 @@ class BenchmarkFileLogger(BaseBenchmarkLogger):
                            e)
 
 
+class AsyncBenchmarkFileLogger(BenchmarkFileLogger):
+  """Class to log the benchmark information to local disk asynchronously.
+
+  log_metric() only serializes the metric and puts it in a bounded queue. A
+  background thread writes the queued metrics in batches, so that the metric
+  file is opened once per batch instead of once per metric, outside of the
+  training loop.
+
+  When the queue is full, log_metric() blocks until the writer catches up, or
+  drops the metric if drop_when_full is set. Metrics logged before a call to
+  flush() are written when it returns; the logger is flushed when the process
+  exits.
+  """
+
+  def __init__(self, logging_dir, max_queue_size=1000, max_batch_size=100,
+               drop_when_full=False):
+    """Initializer for AsyncBenchmarkFileLogger.
+
+    Args:
+      logging_dir: string, the directory of the benchmark log files.
+      max_queue_size: int, the maximum number of metrics waiting to be written.
+      max_batch_size: int, the maximum number of metrics written at once.
+      drop_when_full: bool, whether to drop metrics instead of blocking when
+        the queue is full.
+    """
+    super(AsyncBenchmarkFileLogger, self).__init__(logging_dir)
+    self._queue = queue.Queue(maxsize=max_queue_size)
+    self._max_batch_size = max_batch_size
+    self._drop_when_full = drop_when_full
+    self._num_dropped = 0
+    self._closed = False
+    self._closed_lock = threading.Lock()
+
+    self._writer = threading.Thread(target=self._write_queued_metrics)
+    self._writer.daemon = True
+    self._writer.start()
+    atexit.register(self.close)
+
+  def log_metric(self, name, value, unit=None, global_step=None, extras=None):
+    """Queue the benchmark metric information to be written to local file.
+
+    Args:
+      name: string, the name of the metric to log.
+      value: number, the value of the metric. The value will not be logged if it
+        is not a number type.
+      unit: string, the unit of the metric, E.g "image per second".
+      global_step: int, the global_step when the metric is logged.
+      extras: map of string:string, the extra information about the metric.
+    """
+    line = self._metric_line(name, value, unit, global_step, extras)
+    if line is None:
+      return
+
+    with self._closed_lock:
+      if not self._closed:
+        self._enqueue(line)
+        return
+    self._write_metric_lines([line])
+
+  def _enqueue(self, line):
+    """Queues a metric line, applying the policy for a full queue."""
+    if not self._drop_when_full:
+      self._queue.put(line)
+      return
+    try:
+      self._queue.put_nowait(line)
+    except queue.Full:
+      if not self._num_dropped:
+        tf.logging.warning("Benchmark metric queue is full, dropping metrics.")
+      self._num_dropped += 1
+
+  def flush(self):
+    """Waits until all the metrics logged so far are written."""
+    with self._closed_lock:
+      if self._closed:
+        return
+      written = threading.Event()
+      self._queue.put(written)
+    written.wait()
+    self._warn_dropped()
+
+  def close(self):
+    """Writes the queued metrics and stops the writer thread.
+
+    Metrics logged after the logger is closed are written synchronously.
+    """
+    with self._closed_lock:
+      if self._closed:
+        return
+      self._closed = True
+      self._queue.put(None)
+    self._writer.join()
+    self._warn_dropped()
+
+  def _warn_dropped(self):
+    if self._num_dropped:
+      tf.logging.warning("Dropped %d benchmark metrics.", self._num_dropped)
+      self._num_dropped = 0
+
+  def _write_queued_metrics(self):
+    """Writes batches of queued metrics until the logger is closed."""
+    while True:
+      items = [self._queue.get()]
+      while len(items) < self._max_batch_size:
+        try:
+          items.append(self._queue.get_nowait())
+        except queue.Empty:
+          break
+
+      lines = [item for item in items if isinstance(item, str)]
+      if lines:
+        try:
+          self._write_metric_lines(lines)
+        except (IOError, tf.errors.OpError) as e:
+          tf.logging.warning("Failed to write %d benchmark metrics: %s",
+                             len(lines), e)
+
+      # Flush requests and the stop request are only handled after the metrics
+      # queued before them are written.
+      for item in items:
+        if item is None:
+          return
+        if isinstance(item, threading.Event):
+          item.set()
+
+
 def _gather_run_info(model_name):
   """Collect the benchmark run information for the local environment."""
   run_info = {
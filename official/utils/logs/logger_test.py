@@ -22,6 +22,7 @@ from __future__ import print_function
 import json
 import os
 import tempfile
+import threading
 import unittest
 
 import tensorflow as tf  # pylint: disable=g-bad-import-order
@@ -45,6 +46,40 @@ class BenchmarkLoggerTest(tf.test.TestCase):
     self.assertIsInstance(logger.get_benchmark_logger(),
                           logger.BenchmarkFileLogger)
 
+  def test_config_async_benchmark_file_logger(self):
+    logger.config_benchmark_logger("/tmp/abc", async_logging=True)
+    self.assertIsInstance(logger.get_benchmark_logger(),
+                          logger.AsyncBenchmarkFileLogger)
+    logger.get_benchmark_logger().close()
+
+  def test_config_reuses_async_benchmark_file_logger(self):
+    log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    logger.config_benchmark_logger(None)
+    num_threads = threading.active_count()
+    first_logger = logger.config_benchmark_logger(log_dir, async_logging=True)
+    second_logger = logger.config_benchmark_logger(log_dir, async_logging=True)
+    self.assertIs(first_logger, second_logger)
+    # A single writer thread appends to the metric log.
+    self.assertEqual(num_threads + 1, threading.active_count())
+
+    other_logger = logger.config_benchmark_logger(
+        tempfile.mkdtemp(dir=self.get_temp_dir()), async_logging=True)
+    self.assertIsNot(first_logger, other_logger)
+    self.assertEqual(num_threads + 1, threading.active_count())
+    other_logger.close()
+
+  def test_config_closes_replaced_logger(self):
+    log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    async_logger = logger.config_benchmark_logger(log_dir, async_logging=True)
+    async_logger.log_metric("accuracy", 0.9)
+    sync_logger = logger.config_benchmark_logger(log_dir)
+    self.assertIsInstance(sync_logger, logger.BenchmarkFileLogger)
+    self.assertNotIsInstance(sync_logger, logger.AsyncBenchmarkFileLogger)
+    # The replaced logger wrote its metrics before the new one is used.
+    with tf.gfile.GFile(
+        os.path.join(log_dir, logger.METRIC_LOG_FILE_NAME)) as f:
+      self.assertEqual("accuracy", json.loads(f.readline())["name"])
+
 
 class BaseBenchmarkLoggerTest(tf.test.TestCase):
 
@@ -173,6 +208,53 @@ class BenchmarkFileLoggerTest(tf.test.TestCase):
     metric_log = os.path.join(log_dir, "metric.log")
     self.assertFalse(tf.gfile.Exists(metric_log))
 
+  def test_log_metric_async(self):
+    log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    log = logger.AsyncBenchmarkFileLogger(log_dir, max_batch_size=7)
+    for step in range(50):
+      log.log_metric("loss", 0.5, global_step=step)
+    log.flush()
+
+    metric_log = os.path.join(log_dir, "metric.log")
+    with tf.gfile.GFile(metric_log) as f:
+      metrics = [json.loads(line) for line in f]
+    self.assertEqual([m["global_step"] for m in metrics], list(range(50)))
+    self.assertEqual(metrics[0]["name"], "loss")
+    self.assertEqual(metrics[0]["value"], 0.5)
+
+    # Metrics logged after closing are written synchronously.
+    log.close()
+    log.log_metric("accuracy", 0.9, global_step=50)
+    with tf.gfile.GFile(metric_log) as f:
+      self.assertEqual(len(f.readlines()), 51)
+
+  def test_log_metric_async_drops_when_full(self):
+    log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
+    log = logger.AsyncBenchmarkFileLogger(
+        log_dir, max_queue_size=2, max_batch_size=1, drop_when_full=True)
+
+    # Block the writer thread on the first metric.
+    writing = threading.Event()
+    resume = threading.Event()
+    write_metric_lines = log._write_metric_lines
+    def blocking_write_metric_lines(lines):
+      writing.set()
+      resume.wait()
+      write_metric_lines(lines)
+    log._write_metric_lines = blocking_write_metric_lines
+
+    log.log_metric("loss", 0.5, global_step=0)
+    writing.wait()
+    for step in range(1, 5):
+      log.log_metric("loss", 0.5, global_step=step)
+    resume.set()
+    log.close()
+
+    with tf.gfile.GFile(os.path.join(log_dir, "metric.log")) as f:
+      metrics = [json.loads(line) for line in f]
+    # The metrics of steps 3 and 4 did not fit in the queue.
+    self.assertEqual([m["global_step"] for m in metrics], [0, 1, 2])
+
   def test_collect_tensorflow_info(self):
     run_info = {}
     logger._collect_tensorflow_info(run_info)
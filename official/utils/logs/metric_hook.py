@@ -88,6 +88,8 @@ class LoggingMetricHook(tf.train.LoggingTensorHook):
     if self._log_at_end:
       values = session.run(self._current_tensors)
       self._log_metric(values)
+    # Asynchronous loggers may still be writing the metrics of the last steps.
+    self._logger.flush()
 
   def _log_metric(self, tensor_values):
     self._timer.update_last_triggered_step(self._iter_count)
@@ -37,6 +37,7 @@ class LoggingMetricHookTest(tf.test.TestCase):
 
       def __init__(self):
         self.logged_metric = []
+        self.num_flushes = 0
 
       def log_metric(self, name, value, unit=None, global_step=None,
                      extras=None):
@@ -47,6 +48,9 @@ class LoggingMetricHookTest(tf.test.TestCase):
             "global_step": global_step,
             "extras": extras})
 
+      def flush(self):
+        self.num_flushes += 1
+
     self._log_dir = tempfile.mkdtemp(dir=self.get_temp_dir())
     self._logger = MockMetricLogger()
 
@@ -89,6 +93,7 @@ class LoggingMetricHookTest(tf.test.TestCase):
       self.assertEqual(metric["value"], 42.0)
       self.assertEqual(metric["unit"], None)
       self.assertEqual(metric["global_step"], 0)
+      self.assertEqual(self._logger.num_flushes, 1)
 
   def test_global_step_not_found(self):
     with tf.Graph().as_default(), tf.Session() as sess:
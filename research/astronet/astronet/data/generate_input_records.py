@@ -87,6 +87,7 @@ import pandas as pd
 import tensorflow as tf
 
 from astronet.data import preprocess
+from light_curve_util import light_curve_store
 
 
 parser = argparse.ArgumentParser()
@@ -114,6 +115,23 @@ parser.add_argument(
     required=True,
     help="Directory in which to save the output.")
 
+parser.add_argument(
+    "--light_curve_store_dir",
+    type=str,
+    default="",
+    help="Optional directory containing a light curve store of the Kepler data "
+    "(see generate_light_curve_store.py), to read light curves from instead "
+    "of the .fits files in --kepler_data_dir.")
+
+parser.add_argument(
+    "--light_curve_cache_dir",
+    type=str,
+    default="",
+    help="Optional directory in which to cache the normalized light curves of "
+    "each Kepler ID, so that re-runs skip reading the .fits files and fitting "
+    "the normalization splines. Light curves are not cached across runs if "
+    "empty.")
+
 parser.add_argument(
     "--num_train_shards",
     type=int,
@@ -130,6 +148,9 @@ parser.add_argument(
 _LABEL_COLUMN = "av_training_set"
 _ALLOWED_LABELS = {"PC", "AFP", "NTP"}
 
+# The light curve store of --light_curve_store_dir, opened by each process.
+_store = None
+
 
 def _set_float_feature(ex, name, value):
   """Sets the value of a float feature in a tensorflow.train.Example proto."""
@@ -150,28 +171,49 @@ def _set_int64_feature(ex, name, value):
   ex.features.feature[name].int64_list.value.extend([int(v) for v in value])
 
 
-def _process_tce(tce):
-  """Processes the light curve for a Kepler TCE and returns an Example proto.
+def _read_light_curve(kepid):
+  """Reads and processes the light curve of a Kepler ID.
 
   Args:
-    tce: Row of the input TCE table.
+    kepid: Kepler id of the target star.
 
   Returns:
-    A tensorflow.train.Example proto containing TCE features.
+    time: 1D NumPy array; the time values of the light curve.
+    flux: 1D NumPy array; the normalized flux values of the light curve.
 
   Raises:
     IOError: If the light curve files for this Kepler ID cannot be found.
   """
-  # Read and process the light curve.
-  time, flux = preprocess.read_and_process_light_curve(tce.kepid,
-                                                       FLAGS.kepler_data_dir)
+  global _store
+  if FLAGS.light_curve_store_dir and _store is None:
+    # Opened lazily, so that each worker process maps the store itself.
+    _store = light_curve_store.LightCurveStore(FLAGS.light_curve_store_dir)
+
+  if FLAGS.light_curve_cache_dir:
+    return preprocess.read_and_process_light_curve_cached(
+        kepid, FLAGS.kepler_data_dir, FLAGS.light_curve_cache_dir,
+        store=_store)
+  return preprocess.read_and_process_light_curve(
+      kepid, FLAGS.kepler_data_dir, store=_store)
+
+
+def _process_tce(tce, time, flux):
+  """Processes the light curve for a Kepler TCE and returns an Example proto.
+
+  Args:
+    tce: Row of the input TCE table.
+    time: 1D NumPy array; the time values of the light curve of the TCE's star.
+    flux: 1D NumPy array; the normalized flux values of the light curve.
+
+  Returns:
+    A tensorflow.train.Example proto containing TCE features.
+  """
   time, flux = preprocess.phase_fold_and_sort_light_curve(
       time, flux, tce.tce_period, tce.tce_time0bk)
 
   # Generate the local and global views.
-  global_view = preprocess.global_view(time, flux, tce.tce_period)
-  local_view = preprocess.local_view(time, flux, tce.tce_period,
-                                     tce.tce_duration)
+  global_view, local_view = preprocess.global_and_local_views(
+      time, flux, tce.tce_period, tce.tce_duration)
 
   # Make output proto.
   ex = tf.train.Example()
@@ -208,15 +250,19 @@ def _process_file_shard(tce_table, file_name):
 
   with tf.python_io.TFRecordWriter(file_name) as writer:
     num_processed = 0
-    for _, tce in tce_table.iterrows():
-      example = _process_tce(tce)
-      if example is not None:
-        writer.write(example.SerializeToString())
-
-      num_processed += 1
-      if not num_processed % 10:
-        tf.logging.info("%s: Processed %d/%d items in shard %s", process_name,
-                        num_processed, shard_size, shard_name)
+    # Process the TCEs of each star together, so that its light curve is only
+    # read and normalized once.
+    for kepid, star_tces in tce_table.groupby("kepid", sort=False):
+      time, flux = _read_light_curve(kepid)
+      for _, tce in star_tces.iterrows():
+        example = _process_tce(tce, time, flux)
+        if example is not None:
+          writer.write(example.SerializeToString())
+
+        num_processed += 1
+        if not num_processed % 10:
+          tf.logging.info("%s: Processed %d/%d items in shard %s",
+                          process_name, num_processed, shard_size, shard_name)
 
   tf.logging.info("%s: Wrote %d items in shard %s", process_name, shard_size,
                   shard_name)
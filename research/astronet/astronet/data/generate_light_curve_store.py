@@ -0,0 +1,80 @@
+# Copyright 2018 The TensorFlow Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Converts Kepler light curves into a memory-mappable light curve store.
+
+Reading the .fits files of every Kepler target star is the slowest part of
+reading light curves. This script reads them once, and writes the light curves
+of all targets in a CSV file into a light curve store (see
+light_curve_util/light_curve_store.py). The store can be passed to
+generate_input_records.py with --light_curve_store_dir.
+
+Example usage:
+  python generate_light_curve_store.py \
+    --kepler_csv_file=dr24_tce.csv \
+    --kepler_data_dir=${HOME}/astronet/kepler \
+    --output_dir=${HOME}/astronet/light_curve_store
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import csv
+import sys
+
+from light_curve_util import light_curve_store
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument(
+    "--kepler_csv_file",
+    type=str,
+    required=True,
+    help="CSV file containing Kepler targets to convert. Must contain a "
+    "'kepid' column.")
+
+parser.add_argument(
+    "--kepler_data_dir",
+    type=str,
+    required=True,
+    help="Base folder containing Kepler data.")
+
+parser.add_argument(
+    "--output_dir",
+    type=str,
+    required=True,
+    help="Directory in which to write the light curve store.")
+
+
+def main(argv):
+  del argv  # Unused.
+
+  # Read Kepler targets.
+  kepids = set()
+  with open(FLAGS.kepler_csv_file) as f:
+    reader = csv.DictReader(row for row in f if not row.startswith("#"))
+    for row in reader:
+      kepids.add(int(row["kepid"]))
+
+  num_stored = light_curve_store.write_light_curve_store(
+      FLAGS.output_dir, FLAGS.kepler_data_dir, kepids)
+  print("Wrote light curves of {}/{} Kepler targets to {}".format(
+      num_stored, len(kepids), FLAGS.output_dir))
+
+
+if __name__ == "__main__":
+  FLAGS, unparsed = parser.parse_known_args()
+  main(argv=[sys.argv[0]] + unparsed)
@@ -18,6 +18,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import hashlib
+import io
+import os
+
 import numpy as np
 import tensorflow as tf
 
@@ -26,8 +30,18 @@ from light_curve_util import median_filter
 from light_curve_util import util
 from third_party.kepler_spline import kepler_spline
 
+# Logarithmically sampled candidate break point spacings between 0.5 and 20
+# days.
+_BKSPACES = np.logspace(np.log10(0.5), np.log10(20), num=20)
+
+# Penalty coefficient of the number of spline parameters in the BIC.
+_PENALTY_COEFF = 1.0
+
 
-def read_and_process_light_curve(kepid, kepler_data_dir, max_gap_width=0.75):
+def read_and_process_light_curve(kepid,
+                                 kepler_data_dir,
+                                 max_gap_width=0.75,
+                                 store=None):
   """Reads a light curve, fits a B-spline and divides the curve by the spline.
 
   Args:
@@ -36,6 +50,9 @@ def read_and_process_light_curve(kepid, kepler_data_dir, max_gap_width=0.75):
         kepler_io.kepler_filenames().
     max_gap_width: Gap size (in days) above which the light curve is split for
         the fitting of B-splines.
+    store: Optional light_curve_store.LightCurveStore of the light curves in
+        kepler_data_dir, to read the light curve from instead of the .fits
+        files.
 
   Returns:
     time: 1D NumPy array; the time values of the light curve.
@@ -46,23 +63,23 @@ def read_and_process_light_curve(kepid, kepler_data_dir, max_gap_width=0.75):
     ValueError: If the spline could not be fit.
   """
   # Read the Kepler light curve.
-  file_names = kepler_io.kepler_filenames(kepler_data_dir, kepid)
-  if not file_names:
-    raise IOError("Failed to find .fits files in %s for Kepler ID %s" %
-                  (kepler_data_dir, kepid))
+  if store is not None:
+    all_time, all_flux = store.read_light_curve(kepid)
+  else:
+    file_names = kepler_io.kepler_filenames(kepler_data_dir, kepid)
+    if not file_names:
+      raise IOError("Failed to find .fits files in %s for Kepler ID %s" %
+                    (kepler_data_dir, kepid))
 
-  all_time, all_flux = kepler_io.read_kepler_light_curve(file_names)
+    all_time, all_flux = kepler_io.read_kepler_light_curve(file_names)
 
   # Split on gaps.
   all_time, all_flux = util.split(all_time, all_flux, gap_width=max_gap_width)
 
-  # Logarithmically sample candidate break point spacings between 0.5 and 20
-  # days.
-  bkspaces = np.logspace(np.log10(0.5), np.log10(20), num=20)
-
-  # Generate spline.
+  # Generate spline. Pruning break-point spacings does not change the spline.
   spline = kepler_spline.choose_kepler_spline(
-      all_time, all_flux, bkspaces, penalty_coeff=1.0, verbose=False)[0]
+      all_time, all_flux, _BKSPACES, penalty_coeff=_PENALTY_COEFF,
+      verbose=False, prune=True)[0]
 
   if spline is None:
     raise ValueError("Failed to fit spline with Kepler ID %s", kepid)
@@ -89,6 +106,82 @@ def read_and_process_light_curve(kepid, kepler_data_dir, max_gap_width=0.75):
   return time, flux
 
 
+def light_curve_cache_dir(cache_dir, kepler_data_dir, max_gap_width=0.75):
+  """Returns the subdirectory of cache_dir for processed light curves.
+
+  The subdirectory name identifies the Kepler data directory and the parameters
+  of read_and_process_light_curve(), so that light curves processed differently
+  are never read from the cache.
+
+  Args:
+    cache_dir: Base directory of the light curve cache.
+    kepler_data_dir: Base directory containing Kepler data.
+    max_gap_width: Gap size (in days) above which the light curve is split for
+        the fitting of B-splines.
+
+  Returns:
+    The directory containing the cached light curves.
+  """
+  key = hashlib.sha1()
+  key.update(os.path.abspath(kepler_data_dir).encode("utf-8"))
+  key.update(np.array([max_gap_width, _PENALTY_COEFF]).tobytes())
+  key.update(_BKSPACES.tobytes())
+  return os.path.join(cache_dir, key.hexdigest()[:16])
+
+
+def read_and_process_light_curve_cached(kepid,
+                                        kepler_data_dir,
+                                        cache_dir,
+                                        max_gap_width=0.75,
+                                        store=None):
+  """Like read_and_process_light_curve(), but caches the output on disk.
+
+  The normalized light curve of each Kepler ID is saved as a .npz file in
+  light_curve_cache_dir(cache_dir, ...), and read from there by later calls,
+  skipping the reading of the .fits files and the spline fitting.
+
+  Args:
+    kepid: Kepler id of the target star.
+    kepler_data_dir: Base directory containing Kepler data. See
+        kepler_io.kepler_filenames().
+    cache_dir: Base directory of the light curve cache.
+    max_gap_width: Gap size (in days) above which the light curve is split for
+        the fitting of B-splines.
+    store: Optional light_curve_store.LightCurveStore of the light curves in
+        kepler_data_dir. See read_and_process_light_curve().
+
+  Returns:
+    time: 1D NumPy array; the time values of the light curve.
+    flux: 1D NumPy array; the normalized flux values of the light curve.
+
+  Raises:
+    IOError: If the light curve files for this Kepler ID cannot be found.
+    ValueError: If the spline could not be fit.
+  """
+  cache_subdir = light_curve_cache_dir(cache_dir, kepler_data_dir,
+                                       max_gap_width)
+  filename = os.path.join(cache_subdir, "%.9d.npz" % int(kepid))
+  if tf.gfile.Exists(filename):
+    with tf.gfile.GFile(filename, "rb") as f:
+      cached = np.load(io.BytesIO(f.read()))
+    return cached["time"], cached["flux"]
+
+  time, flux = read_and_process_light_curve(kepid, kepler_data_dir,
+                                            max_gap_width, store)
+
+  # Write to a temporary file first, so that concurrent processes never read a
+  # partially written file.
+  buf = io.BytesIO()
+  np.savez(buf, time=time, flux=flux)
+  tf.gfile.MakeDirs(cache_subdir)
+  tmp_filename = "%s.tmp-%d" % (filename, os.getpid())
+  with tf.gfile.GFile(tmp_filename, "wb") as f:
+    f.write(buf.getvalue())
+  tf.gfile.Rename(tmp_filename, filename, overwrite=True)
+
+  return time, flux
+
+
 def phase_fold_and_sort_light_curve(time, flux, period, t0):
   """Phase folds a light curve and sorts by ascending time.
 
@@ -133,14 +226,63 @@ def generate_view(time, flux, num_bins, bin_width, t_min, t_max,
     1D NumPy array of size num_bins containing the median flux values of
     uniformly spaced bins on the phase-folded time axis.
   """
-  view = median_filter.median_filter(time, flux, num_bins, bin_width, t_min,
-                                     t_max)
+  return generate_views(time, flux, [(num_bins, bin_width, t_min, t_max)],
+                        normalize)[0]
+
+
+def generate_views(time, flux, bins, normalize=True):
+  """Generates several views of a phase-folded light curve at once.
+
+  Args:
+    time: 1D array of time values, sorted in ascending order.
+    flux: 1D array of flux values.
+    bins: List of (num_bins, bin_width, t_min, t_max) tuples; the bins of each
+        view. See generate_view().
+    normalize: Whether to center the median at 0 and minimum value at -1.
+
+  Returns:
+    List of 1D NumPy arrays containing the median flux values of the bins of
+    each view.
+  """
+  views = median_filter.median_filters(time, flux, bins)
 
   if normalize:
-    view -= np.median(view)
-    view /= np.abs(np.min(view))
+    for view in views:
+      view -= np.median(view)
+      view /= np.abs(np.min(view))
+
+  return views
 
-  return view
+
+def global_view_bins(period, num_bins=2001, bin_width_factor=1 / 2001):
+  """Returns the (num_bins, bin_width, t_min, t_max) of a 'global view'.
+
+  Args:
+    period: The period of the event (in days).
+    num_bins: The number of intervals to divide the time axis into.
+    bin_width_factor: Width of the bins, as a fraction of period.
+  """
+  return num_bins, period * bin_width_factor, -period / 2, period / 2
+
+
+def local_view_bins(period,
+                    duration,
+                    num_bins=201,
+                    bin_width_factor=0.16,
+                    num_durations=4):
+  """Returns the (num_bins, bin_width, t_min, t_max) of a 'local view'.
+
+  Args:
+    period: The period of the event (in days).
+    duration: The duration of the event (in days).
+    num_bins: The number of intervals to divide the time axis into.
+    bin_width_factor: Width of the bins, as a fraction of duration.
+    num_durations: The number of durations to consider on either side of 0 (the
+        event is assumed to be centered at 0).
+  """
+  return (num_bins, duration * bin_width_factor,
+          max(-period / 2, -duration * num_durations),
+          min(period / 2, duration * num_durations))
 
 
 def global_view(time, flux, period, num_bins=2001, bin_width_factor=1 / 2001):
@@ -161,12 +303,7 @@ def global_view(time, flux, period, num_bins=2001, bin_width_factor=1 / 2001):
     uniformly spaced bins on the phase-folded time axis.
   """
   return generate_view(
-      time,
-      flux,
-      num_bins=num_bins,
-      bin_width=period * bin_width_factor,
-      t_min=-period / 2,
-      t_max=period / 2)
+      time, flux, *global_view_bins(period, num_bins, bin_width_factor))
 
 
 def local_view(time,
@@ -196,9 +333,26 @@ def local_view(time,
     uniformly spaced bins on the phase-folded time axis.
   """
   return generate_view(
-      time,
-      flux,
-      num_bins=num_bins,
-      bin_width=duration * bin_width_factor,
-      t_min=max(-period / 2, -duration * num_durations),
-      t_max=min(period / 2, duration * num_durations))
+      time, flux,
+      *local_view_bins(period, duration, num_bins, bin_width_factor,
+                       num_durations))
+
+
+def global_and_local_views(time, flux, period, duration):
+  """Generates the 'global view' and 'local view' of a light curve at once.
+
+  Args:
+    time: 1D array of time values, sorted in ascending order.
+    flux: 1D array of flux values.
+    period: The period of the event (in days).
+    duration: The duration of the event (in days).
+
+  Returns:
+    global_view: 1D NumPy array; see global_view().
+    local_view: 1D NumPy array; see local_view().
+  """
+  return tuple(
+      generate_views(time, flux, [
+          global_view_bins(period),
+          local_view_bins(period, duration),
+      ]))
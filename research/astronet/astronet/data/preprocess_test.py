@@ -0,0 +1,79 @@
+# Copyright 2018 The TensorFlow Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for preprocess.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+import shutil
+
+from absl import flags
+from absl.testing import absltest
+import numpy as np
+
+from astronet.data import preprocess
+
+FLAGS = flags.FLAGS
+
+_DATA_DIR = "light_curve_util/test_data/"
+
+
+class PreprocessTest(absltest.TestCase):
+
+  def setUp(self):
+    # A copy of the test data, which the test deletes.
+    self.kepler_data_dir = os.path.join(FLAGS.test_tmpdir, self.id(), "kepler")
+    shutil.copytree(os.path.join(FLAGS.test_srcdir, _DATA_DIR),
+                    self.kepler_data_dir)
+    self.cache_dir = os.path.join(FLAGS.test_tmpdir, self.id(), "cache")
+
+  def tearDown(self):
+    shutil.rmtree(os.path.join(FLAGS.test_tmpdir, self.id()))
+
+  def testReadAndProcessLightCurveCached(self):
+    time, flux = preprocess.read_and_process_light_curve_cached(
+        11442793, self.kepler_data_dir, self.cache_dir)
+    expected_time, expected_flux = preprocess.read_and_process_light_curve(
+        11442793, self.kepler_data_dir)
+    np.testing.assert_array_equal(expected_time, time)
+    np.testing.assert_array_equal(expected_flux, flux)
+
+    cache_subdir = preprocess.light_curve_cache_dir(self.cache_dir,
+                                                    self.kepler_data_dir)
+    self.assertEqual(["011442793.npz"], os.listdir(cache_subdir))
+
+    # The second call reads the cache, not the deleted .fits files.
+    shutil.rmtree(self.kepler_data_dir)
+    os.mkdir(self.kepler_data_dir)
+    cached_time, cached_flux = preprocess.read_and_process_light_curve_cached(
+        11442793, self.kepler_data_dir, self.cache_dir)
+    np.testing.assert_array_equal(time, cached_time)
+    np.testing.assert_array_equal(flux, cached_flux)
+
+    # Light curves processed with other parameters are not read from the cache.
+    self.assertNotEqual(
+        cache_subdir,
+        preprocess.light_curve_cache_dir(self.cache_dir, self.kepler_data_dir,
+                                         max_gap_width=1.0))
+    with self.assertRaises(IOError):
+      preprocess.read_and_process_light_curve_cached(
+          11442793, self.kepler_data_dir, self.cache_dir, max_gap_width=1.0)
+
+
+if __name__ == "__main__":
+  FLAGS.test_srcdir = ""
+  absltest.main()
@@ -0,0 +1,188 @@
+# Copyright 2018 The TensorFlow Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A columnar, memory-mappable store of Kepler light curves.
+
+Reading a light curve with kepler_io.read_kepler_light_curve() opens one .fits
+file per quarter. A light curve store holds the same light curves, with NaN
+flux values already removed, in a directory with the following files:
+
+  time.bin: The time values of all light curves, as one contiguous array.
+  flux.bin: The flux values of all light curves, as one contiguous array.
+  index.npz: The sorted Kepler ids of the stars, the offsets of the segments
+      (one per .fits file) of each star, and the offsets of the values of each
+      segment in time.bin and flux.bin.
+
+The value files are memory-mapped, so reading a light curve from the store only
+slices the mapped arrays.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+
+import numpy as np
+
+from light_curve_util import kepler_io
+
+_TIME_FILENAME = "time.bin"
+_FLUX_FILENAME = "flux.bin"
+_INDEX_FILENAME = "index.npz"
+
+# Values are stored in native byte order; .fits files are big-endian.
+_TIME_DTYPE = np.float64
+_FLUX_DTYPE = np.float32
+
+
+def write_light_curve_store(store_dir,
+                            kepler_data_dir,
+                            kep_ids,
+                            long_cadence=True,
+                            light_curve_extension="LIGHTCURVE"):
+  """Reads the light curves of Kepler target stars and writes them to a store.
+
+  Args:
+    store_dir: Directory in which to write the store. Created if it does not
+        exist.
+    kepler_data_dir: Base directory containing Kepler data. See
+        kepler_io.kepler_filenames().
+    kep_ids: Ids of the Kepler target stars. Stars without .fits files are
+        not included in the store.
+    long_cadence: Whether to read long cadence light curves as opposed to short
+        cadence light curves.
+    light_curve_extension: Name of the HDU 1 extension containing light curves.
+
+  Returns:
+    The number of stars written to the store.
+  """
+  if not os.path.isdir(store_dir):
+    os.makedirs(store_dir)
+
+  stored_kep_ids = []
+  star_offsets = [0]  # Index of the first segment of each star.
+  segment_offsets = [0]  # Index of the first value of each segment.
+  with open(os.path.join(store_dir, _TIME_FILENAME), "wb") as time_file, \
+      open(os.path.join(store_dir, _FLUX_FILENAME), "wb") as flux_file:
+    for kep_id in sorted(set(int(kep_id) for kep_id in kep_ids)):
+      filenames = kepler_io.kepler_filenames(
+          kepler_data_dir, kep_id, long_cadence=long_cadence)
+      if not filenames:
+        continue
+
+      all_time, all_flux = kepler_io.read_kepler_light_curve(
+          filenames, light_curve_extension=light_curve_extension)
+      for time, flux in zip(all_time, all_flux):
+        time.astype(_TIME_DTYPE).tofile(time_file)
+        flux.astype(_FLUX_DTYPE).tofile(flux_file)
+        segment_offsets.append(segment_offsets[-1] + len(time))
+
+      stored_kep_ids.append(kep_id)
+      star_offsets.append(len(segment_offsets) - 1)
+
+  np.savez(
+      os.path.join(store_dir, _INDEX_FILENAME),
+      kep_ids=np.array(stored_kep_ids, dtype=np.int64),
+      star_offsets=np.array(star_offsets, dtype=np.int64),
+      segment_offsets=np.array(segment_offsets, dtype=np.int64))
+
+  return len(stored_kep_ids)
+
+
+class LightCurveStore(object):
+  """Reads light curves from a store written by write_light_curve_store()."""
+
+  def __init__(self, store_dir):
+    """Opens a light curve store.
+
+    Args:
+      store_dir: Directory containing the store.
+
+    Raises:
+      IOError: If the store does not exist.
+    """
+    index_filename = os.path.join(store_dir, _INDEX_FILENAME)
+    if not os.path.isfile(index_filename):
+      raise IOError("No light curve store in %s" % store_dir)
+
+    with np.load(index_filename) as index:
+      self._kep_ids = index["kep_ids"]
+      self._star_offsets = index["star_offsets"]
+      self._segment_offsets = index["segment_offsets"]
+
+    self._time = self._memmap(
+        os.path.join(store_dir, _TIME_FILENAME), _TIME_DTYPE)
+    self._flux = self._memmap(
+        os.path.join(store_dir, _FLUX_FILENAME), _FLUX_DTYPE)
+
+  def _memmap(self, filename, dtype):
+    # np.memmap cannot map empty files.
+    if not self._segment_offsets[-1]:
+      return np.zeros([0], dtype=dtype)
+    return np.memmap(filename, dtype=dtype, mode="r")
+
+  @property
+  def kep_ids(self):
+    """The sorted ids of the Kepler target stars in the store."""
+    return self._kep_ids
+
+  def __len__(self):
+    return len(self._kep_ids)
+
+  def __contains__(self, kep_id):
+    return self._find(kep_id) is not None
+
+  def _find(self, kep_id):
+    """Returns the index of a Kepler id in the store, or None if absent."""
+    i = np.searchsorted(self._kep_ids, int(kep_id))
+    if i < len(self._kep_ids) and self._kep_ids[i] == int(kep_id):
+      return i
+    return None
+
+  def read_light_curve(self, kep_id, invert=False):
+    """Reads time and flux measurements for a Kepler target star.
+
+    The returned arrays are read-only views of the memory-mapped store, unless
+    invert is True.
+
+    Args:
+      kep_id: Id of the Kepler target star. May be an int or a possibly zero-
+          padded string.
+      invert: Whether to invert the flux measurements by multiplying by -1.
+
+    Returns:
+      all_time: A list of numpy arrays; the time values of the light curve.
+      all_flux: A list of numpy arrays corresponding to the time arrays in
+          all_time.
+
+    Raises:
+      IOError: If the light curve of this Kepler ID is not in the store.
+    """
+    i = self._find(kep_id)
+    if i is None:
+      raise IOError("Kepler ID %s is not in the light curve store" % kep_id)
+
+    all_time = []
+    all_flux = []
+    for segment in range(self._star_offsets[i], self._star_offsets[i + 1]):
+      start = self._segment_offsets[segment]
+      end = self._segment_offsets[segment + 1]
+      all_time.append(self._time[start:end])
+      flux = self._flux[start:end]
+      if invert:
+        flux = -flux
+      all_flux.append(flux)
+
+    return all_time, all_flux
@@ -0,0 +1,87 @@
+# Copyright 2018 The TensorFlow Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for light_curve_store.py."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os.path
+from absl import flags
+from absl.testing import absltest
+import numpy as np
+
+from light_curve_util import kepler_io
+from light_curve_util import light_curve_store
+
+FLAGS = flags.FLAGS
+
+_DATA_DIR = "light_curve_util/test_data/"
+
+
+class LightCurveStoreTest(absltest.TestCase):
+
+  def setUp(self):
+    self.data_dir = os.path.join(FLAGS.test_srcdir, _DATA_DIR)
+    self.store_dir = os.path.join(FLAGS.test_tmpdir, self.id())
+
+  def testReadLightCurve(self):
+    # Kepler ID 1234567 has no .fits files and is not stored.
+    num_stars = light_curve_store.write_light_curve_store(
+        self.store_dir, self.data_dir, [11442793, "011442793", 1234567])
+    self.assertEqual(1, num_stars)
+
+    store = light_curve_store.LightCurveStore(self.store_dir)
+    self.assertLen(store, 1)
+    np.testing.assert_array_equal([11442793], store.kep_ids)
+    self.assertIn(11442793, store)
+    self.assertIn("011442793", store)
+    self.assertNotIn(1234567, store)
+    with self.assertRaises(IOError):
+      store.read_light_curve(1234567)
+
+    expected_time, expected_flux = kepler_io.read_kepler_light_curve(
+        kepler_io.kepler_filenames(self.data_dir, 11442793))
+    all_time, all_flux = store.read_light_curve(11442793)
+    self.assertLen(all_time, 3)
+    self.assertLen(all_flux, 3)
+    for expected, actual in zip(expected_time + expected_flux,
+                                all_time + all_flux):
+      np.testing.assert_array_equal(expected, actual)
+      self.assertEqual(expected.dtype.newbyteorder("="), actual.dtype)
+      # Light curves are views of the memory-mapped store.
+      self.assertIsInstance(actual, np.memmap)
+
+    _, inverted_flux = store.read_light_curve(11442793, invert=True)
+    for expected, actual in zip(expected_flux, inverted_flux):
+      np.testing.assert_array_equal(-expected, actual)
+
+  def testEmptyStore(self):
+    num_stars = light_curve_store.write_light_curve_store(
+        self.store_dir, self.data_dir, [1234567])
+    self.assertEqual(0, num_stars)
+
+    store = light_curve_store.LightCurveStore(self.store_dir)
+    self.assertEmpty(store)
+    self.assertNotIn(11442793, store)
+
+  def testMissingStore(self):
+    with self.assertRaises(IOError):
+      light_curve_store.LightCurveStore(self.store_dir)
+
+
+if __name__ == "__main__":
+  FLAGS.test_srcdir = ""
+  absltest.main()
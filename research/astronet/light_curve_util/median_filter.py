@@ -20,32 +20,16 @@ from __future__ import print_function
 
 import numpy as np
 
+# median_filters() copies the contents of all bins of a filter, unless they hold
+# more than this many times the number of values of the light curve.
+_MAX_BIN_CONTENTS_FACTOR = 4
 
-def median_filter(x, y, num_bins, bin_width=None, x_min=None, x_max=None):
-  """Computes the median y-value in uniform intervals (bins) along the x-axis.
-
-  The interval [x_min, x_max) is divided into num_bins uniformly spaced
-  intervals of width bin_width. The value computed for each bin is the median
-  of all y-values whose corresponding x-value is in the interval.
-
-  NOTE: x must be sorted in ascending order or the results will be incorrect.
 
-  Args:
-    x: 1D array of x-coordinates sorted in ascending order. Must have at least 2
-        elements, and all elements cannot be the same value.
-    y: 1D array of y-coordinates with the same size as x.
-    num_bins: The number of intervals to divide the x-axis into. Must be at
-        least 2.
-    bin_width: The width of each bin on the x-axis. Must be positive, and less
-        than x_max - x_min. Defaults to (x_max - x_min) / num_bins.
-    x_min: The inclusive leftmost value to consider on the x-axis. Must be less
-        than or equal to the largest value of x. Defaults to min(x).
-    x_max: The exclusive rightmost value to consider on the x-axis. Must be
-        greater than x_min. Defaults to max(x).
+def _validate_args(x, y, num_bins, bin_width, x_min, x_max):
+  """Validates the arguments of median_filter() and fills in the defaults.
 
   Returns:
-    1D NumPy array of size num_bins containing the median y-values of uniformly
-    spaced bins on the x-axis.
+    bin_width, x_min, x_max: The validated arguments, with defaults filled in.
 
   Raises:
     ValueError: If an argument has an inappropriate value.
@@ -81,6 +65,42 @@ def median_filter(x, y, num_bins, bin_width=None, x_min=None, x_max=None):
         "bin_width (got: %d) must be less than x_max - x_min (got: %d)" %
         (bin_width, x_max - x_min))
 
+  return bin_width, x_min, x_max
+
+
+def median_filter(x, y, num_bins, bin_width=None, x_min=None, x_max=None):
+  """Computes the median y-value in uniform intervals (bins) along the x-axis.
+
+  The interval [x_min, x_max) is divided into num_bins uniformly spaced
+  intervals of width bin_width. The value computed for each bin is the median
+  of all y-values whose corresponding x-value is in the interval.
+
+  NOTE: x must be sorted in ascending order or the results will be incorrect.
+
+  Args:
+    x: 1D array of x-coordinates sorted in ascending order. Must have at least 2
+        elements, and all elements cannot be the same value.
+    y: 1D array of y-coordinates with the same size as x.
+    num_bins: The number of intervals to divide the x-axis into. Must be at
+        least 2.
+    bin_width: The width of each bin on the x-axis. Must be positive, and less
+        than x_max - x_min. Defaults to (x_max - x_min) / num_bins.
+    x_min: The inclusive leftmost value to consider on the x-axis. Must be less
+        than or equal to the largest value of x. Defaults to min(x).
+    x_max: The exclusive rightmost value to consider on the x-axis. Must be
+        greater than x_min. Defaults to max(x).
+
+  Returns:
+    1D NumPy array of size num_bins containing the median y-values of uniformly
+    spaced bins on the x-axis.
+
+  Raises:
+    ValueError: If an argument has an inappropriate value.
+  """
+  bin_width, x_min, x_max = _validate_args(x, y, num_bins, bin_width, x_min,
+                                           x_max)
+
+  x_len = len(x)
   bin_spacing = (x_max - x_min - bin_width) / (num_bins - 1)
 
   # Bins with no y-values will fall back to the global median.
@@ -118,3 +138,99 @@ def median_filter(x, y, num_bins, bin_width=None, x_min=None, x_max=None):
     bin_max += bin_spacing
 
   return result
+
+
+def median_filters(x, y, bins):
+  """Computes several median filters of the same data with vectorized numpy.
+
+  Equivalent to [median_filter(x, y, *b) for b in bins], without Python loops
+  over the bins. The bin boundaries are found with np.searchsorted, and the
+  medians of all bins of all filters are computed with a single sort of the
+  (possibly overlapping) bin contents.
+
+  The bin contents are copied, so a filter whose bins hold more than
+  _MAX_BIN_CONTENTS_FACTOR * len(x) values in total (wide, overlapping bins) is
+  computed with median_filter() instead.
+
+  NOTE: x must be sorted in ascending order or the results will be incorrect.
+
+  Args:
+    x: 1D array of x-coordinates sorted in ascending order. Must have at least 2
+        elements, and all elements cannot be the same value.
+    y: 1D array of y-coordinates with the same size as x.
+    bins: List of (num_bins, bin_width, x_min, x_max) tuples; the arguments of
+        each median filter. See median_filter(). bin_width, x_min and x_max may
+        be None.
+
+  Returns:
+    List of 1D NumPy arrays; the result of each median filter.
+
+  Raises:
+    ValueError: If an argument has an inappropriate value.
+  """
+  x = np.asarray(x)
+  y = np.asarray(y)
+  results = [None] * len(bins)
+  vectorized = []  # Indices of the filters computed with vectorized numpy.
+  bin_starts = []
+  bin_ends = []
+  for i, (num_bins, bin_width, x_min, x_max) in enumerate(bins):
+    bin_width, x_min, x_max = _validate_args(x, y, num_bins, bin_width, x_min,
+                                             x_max)
+    bin_spacing = (x_max - x_min - bin_width) / (num_bins - 1)
+    # Accumulate the bin endpoints like median_filter(), so that points on the
+    # bin boundaries fall in the same bins.
+    steps = np.repeat(bin_spacing, num_bins)
+    steps[0] = x_min
+    bin_mins = np.cumsum(steps)
+    steps[0] = x_min + bin_width
+    bin_maxs = np.cumsum(steps)
+    # The bin at index i contains y[j] for starts[i] <= j < ends[i], that is,
+    # all j such that bin_mins[i] <= x[j] < bin_maxs[i].
+    starts = np.searchsorted(x, bin_mins, side="left")
+    ends = np.searchsorted(x, bin_maxs, side="left")
+    if np.sum(np.maximum(ends - starts, 0)) > _MAX_BIN_CONTENTS_FACTOR * len(x):
+      results[i] = median_filter(x, y, num_bins, bin_width, x_min, x_max)
+    else:
+      vectorized.append(i)
+      bin_starts.append(starts)
+      bin_ends.append(ends)
+
+  if vectorized:
+    medians = _bin_medians(y, np.concatenate(bin_starts),
+                           np.concatenate(bin_ends))
+    num_bins = [len(starts) for starts in bin_starts]
+    for i, result in zip(vectorized,
+                         np.split(medians, np.cumsum(num_bins)[:-1])):
+      results[i] = result
+
+  return results
+
+
+def _bin_medians(y, bin_starts, bin_ends):
+  """Returns the medians of y[bin_starts[i]:bin_ends[i]] for all bins i.
+
+  Bins with no y-values fall back to the global median.
+  """
+  counts = np.maximum(bin_ends - bin_starts, 0)
+
+  # Indices into y of the contents of every bin, concatenated.
+  offsets = np.cumsum(counts) - counts
+  bin_ids = np.repeat(np.arange(len(counts)), counts)
+  indices = np.arange(np.sum(counts)) - offsets[bin_ids] + bin_starts[bin_ids]
+
+  # Sort the contents of every bin by y, using the rank of each y-value as a
+  # sort key within its bin.
+  order = np.argsort(y, kind="mergesort")
+  ranks = np.empty_like(order)
+  ranks[order] = np.arange(len(y))
+  keys = np.sort(bin_ids * len(y) + ranks[indices])
+  sorted_y = y[order][keys % len(y)]
+
+  result = np.repeat(np.median(y), len(counts))
+  nonempty = counts > 0
+  lower = offsets[nonempty] + (counts[nonempty] - 1) // 2
+  upper = offsets[nonempty] + counts[nonempty] // 2
+  result[nonempty] = (sorted_y[lower] + sorted_y[upper]) / 2
+
+  return result
@@ -123,6 +123,67 @@ class MedianFilterTest(absltest.TestCase):
     result = median_filter.median_filter(x, y, num_bins=5)
     np.testing.assert_array_equal([7, 1, 5, 2, 3], result)
 
+  def testMedianFiltersErrors(self):
+    x = [1, 2, 3]
+    y = [4, 5, 6]
+    with self.assertRaises(ValueError):
+      median_filter.median_filters(x, y, [(5, None, None, None), (1, 1, 0, 2)])
+
+  def testMedianFiltersMatchesMedianFilter(self):
+    rs = np.random.RandomState(0)
+    x = np.sort(rs.uniform(-10, 10, size=1000))
+    x[100:110] = x[100]  # Repeated x-values.
+    y = rs.randn(1000)
+    bins = [
+        (2001, 20 / 2001, -10, 10),  # Global view: adjacent bins.
+        (201, 0.16, -4, 4),  # Local view: overlapping bins.
+        (7, 0.5, -12, 3),  # Narrow bins, some of them empty.
+        (50, None, None, None),  # Default arguments.
+        (5, 2, -5, 5),  # Bin boundaries on integers.
+    ]
+    results = median_filter.median_filters(x, y, bins)
+    self.assertEqual(len(results), len(bins))
+    for args, result in zip(bins, results):
+      np.testing.assert_array_equal(
+          median_filter.median_filter(x, y, *args), result)
+
+    # Integer values, with bin boundaries on the x-values.
+    x = np.array([-4, -2, -2, 0, 0, 0, 2, 2, 2, 2, 3, 3, 3, 3, 3])
+    y = np.array([0, -1, 1, 4, 5, 6, 2, 2, 4, 4, 1, 1, 1, 1, -1])
+    bins = [(5, 2, -5, 5), (5, None, None, None), (7, 1, 0, 7), (5, 1, -4, 4)]
+    results = median_filter.median_filters(x, y, bins)
+    for args, result in zip(bins, results):
+      np.testing.assert_array_equal(
+          median_filter.median_filter(x, y, *args), result)
+
+  def testMedianFiltersFallsBackForWideBins(self):
+    rs = np.random.RandomState(0)
+    x = np.sort(rs.uniform(-10, 10, size=1000))
+    y = rs.randn(1000)
+    bins = [
+        (201, 0.16, -4, 4),  # Vectorized.
+        (2001, 10, -10, 10),  # Each bin holds half the values.
+        (7, 0.5, -12, 3),  # Vectorized.
+    ]
+
+    fallback_bins = []
+    original_median_filter = median_filter.median_filter
+
+    def _median_filter(x, y, num_bins, *args):
+      fallback_bins.append(num_bins)
+      return original_median_filter(x, y, num_bins, *args)
+
+    median_filter.median_filter = _median_filter
+    try:
+      results = median_filter.median_filters(x, y, bins)
+    finally:
+      median_filter.median_filter = original_median_filter
+
+    self.assertEqual([2001], fallback_bins)
+    for args, result in zip(bins, results):
+      np.testing.assert_array_equal(
+          median_filter.median_filter(x, y, *args), result)
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -17,7 +17,8 @@ class SplineError(Exception):
   pass
 
 
-def kepler_spline(time, flux, bkspace=1.5, maxiter=5, outlier_cut=3):
+def kepler_spline(time, flux, bkspace=1.5, maxiter=5, outlier_cut=3,
+                  initial_mask=None):
   """Computes a best-fit spline curve for a light curve segment.
 
   The spline is fit using an iterative process to remove outliers that may cause
@@ -35,6 +36,9 @@ def kepler_spline(time, flux, bkspace=1.5, maxiter=5, outlier_cut=3):
         fit points.
     outlier_cut: The maximum number of standard deviations from the median
         spline residual before a point is considered an outlier.
+    initial_mask: Optional boolean mask of the points used to fit the first
+        spline, e.g. the mask of a spline previously fit with another bkspace.
+        All points are used by default.
 
   Returns:
     spline: The values of the fitted spline corresponding to the input time
@@ -55,7 +59,10 @@ def kepler_spline(time, flux, bkspace=1.5, maxiter=5, outlier_cut=3):
 
   for _ in range(maxiter):
     if spline is None:
-      mask = np.ones_like(time, dtype=np.bool)  # Try to fit all points.
+      if initial_mask is None:
+        mask = np.ones_like(time, dtype=np.bool)  # Try to fit all points.
+      else:
+        mask = initial_mask
     else:
       # Choose points where the absolute deviation from the median residual is
       # less than 3*sigma, where sigma is a robust estimate of the standard
@@ -88,12 +95,131 @@ def kepler_spline(time, flux, bkspace=1.5, maxiter=5, outlier_cut=3):
   return spline, mask
 
 
+def _bic_lower_bound(ssr, nparams, min_npoints, max_npoints, sigma,
+                     penalty_coeff):
+  """Returns a lower bound of the BIC of a partially fit piecewise spline.
+
+  Args:
+    ssr: Sum of squared residuals of the segments fit so far.
+    nparams: Total number of free parameters of the piecewise spline.
+    min_npoints: Lower bound of the total number of points used in the fit.
+    max_npoints: Upper bound of the total number of points used in the fit.
+    sigma: Standard deviation of the Gaussian white noise about the spline.
+    penalty_coeff: Coefficient of the penalty term of the BIC.
+
+  Returns:
+    A lower bound of the BIC of the piecewise spline.
+  """
+  # The remaining segments only add to ssr. The BIC is concave in the number of
+  # points, so it is minimized at one of the bounds of the number of points.
+  def _bic(npoints):
+    return (npoints * np.log(2 * np.pi * sigma**2) + ssr / sigma**2 +
+            penalty_coeff * nparams * np.log(npoints))
+
+  return min(_bic(max(min_npoints, 1)), _bic(max_npoints))
+
+
+def _fit_piecewise_spline(all_time,
+                          all_flux,
+                          bkspace,
+                          maxiter,
+                          sigma,
+                          penalty_coeff,
+                          max_bic=None,
+                          initial_masks=None):
+  """Fits a spline to each segment with the same break-point spacing.
+
+  Args:
+    all_time: List of 1D numpy arrays; the time values of the light curve.
+    all_flux: List of 1D numpy arrays; the flux values of the light curve.
+    bkspace: Break-point spacing.
+    maxiter: Maximum number of attempts to fit each spline after removing badly
+        fit points.
+    sigma: Standard deviation of the Gaussian white noise about the spline.
+    penalty_coeff: Coefficient of the penalty term of the BIC.
+    max_bic: If not None, the fit is abandoned as soon as its BIC is known to be
+        greater than max_bic.
+    initial_masks: Optional list with the initial mask of each segment. See
+        kepler_spline().
+
+  Returns:
+    spline: List of numpy arrays; values of the spline corresponding to the
+        input flux arrays, or None if the fit was abandoned.
+    spline_mask: List of boolean numpy arrays indicating which points in the
+        flux arrays were used to fit the spline, or None if the fit was
+        abandoned.
+    bic: The Bayesian Information Criterion of the spline, or None if the fit
+        was abandoned.
+
+  Raises:
+    SplineError: If the spline could not be fit on one of the segments.
+  """
+  # Total number of free parameters in the piecewise spline. It only depends on
+  # the segment lengths, and is known before fitting.
+  nparams = 0
+  max_npoints = 0  # Upper bound of the total number of points used in the fit.
+  for time in all_time:
+    if len(time) >= 4:
+      total_time = np.max(time) - np.min(time)
+      nknots = int(total_time / bkspace) + 1  # From the bspline implementation.
+      nparams += nknots + 3 - 1  # number of knots + degree of spline - 1
+      max_npoints += len(time)
+
+  npoints = 0  # Total number of data points used to fit the piecewise spline.
+  ssr = 0  # Sum of squared residuals between the model and the spline.
+
+  spline = [None] * len(all_time)
+  spline_mask = [None] * len(all_time)
+  # Fit the longest segments first, so that the lower bound of the BIC grows
+  # quickly when pruning.
+  for i in sorted(range(len(all_time)), key=lambda i: -len(all_time[i])):
+    time = all_time[i]
+    flux = all_flux[i]
+    # Don't fit a spline on less than 4 points.
+    if len(time) < 4:
+      spline[i] = flux
+      spline_mask[i] = np.ones_like(flux, dtype=np.bool)
+      continue
+
+    if max_bic is not None and _bic_lower_bound(
+        ssr, nparams, npoints, max_npoints, sigma, penalty_coeff) > max_bic:
+      return None, None, None
+
+    # Fit B-spline to this light-curve segment.
+    spline_piece, mask = kepler_spline(
+        time,
+        flux,
+        bkspace=bkspace,
+        maxiter=maxiter,
+        initial_mask=initial_masks[i] if initial_masks else None)
+
+    spline[i] = spline_piece
+    spline_mask[i] = mask
+
+    # Accumulate the number of points and the squared residuals.
+    npoints += np.sum(mask)
+    max_npoints -= len(time) - np.sum(mask)
+    ssr += np.sum((flux[mask] - spline_piece[mask])**2)
+
+  # The following term is -2*ln(L), where L is the likelihood of the data
+  # given the model, under the assumption that the model errors are iid
+  # Gaussian with mean 0 and standard deviation sigma.
+  likelihood_term = npoints * np.log(2 * np.pi * sigma**2) + ssr / sigma**2
+
+  # Bayesian information criterion.
+  bic = likelihood_term + penalty_coeff * nparams * np.log(npoints)
+
+  return spline, spline_mask, bic
+
+
 def choose_kepler_spline(all_time,
                          all_flux,
                          bkspaces,
                          maxiter=5,
                          penalty_coeff=1.0,
-                         verbose=True):
+                         verbose=True,
+                         prune=False,
+                         warm_start=False):
   """Computes the best-fit Kepler spline across a break-point spacings.
 
   Some Kepler light curves have low-frequency variability, while others have
@@ -121,6 +247,14 @@ def choose_kepler_spline(all_time,
     verbose: Whether to log individual spline errors. Note that if bkspaces
         contains many values (particularly small ones) then this may cause
         logging pollution if calling this function for many light curves.
+    prune: Whether to stop fitting a break-point spacing as soon as a lower
+        bound of its BIC exceeds the best BIC so far. The chosen spline is
+        unchanged, but break-point spacings that are pruned before reaching a
+        failing segment are not reported in bad_bkspaces.
+    warm_start: Whether to start fitting each segment from the mask of the
+        previous successfully fit break-point spacing, rather than from all
+        points. This saves spline fits, but may converge to slightly different
+        masks.
 
   Returns:
     spline: List of numpy arrays; values of the best-fit spline corresponding to
@@ -130,70 +264,65 @@ def choose_kepler_spline(all_time,
     bkspace: The break-point spacing used for the best-fit spline.
     bad_bkspaces: List of break-point spacing values that failed.
   """
+
   # Compute the assumed standard deviation of Gaussian white noise about the
   # spline model.
   abs_deviations = np.concatenate([np.abs(f[1:] - f[:-1]) for f in all_flux])
   sigma = np.median(abs_deviations) * 1.48 / np.sqrt(2)
 
+  # The best BIC so far, when pruning.
   best_bic = None
+  # The masks of the previous successful fit when warm starting.
+  warm_masks = None
+
+  # The (spline, spline_mask, bic) of each break-point spacing, or None if it
+  # fails.
+  results = []
+  for bkspace in bkspaces:
+    try:
+      spline, spline_mask, bic = _fit_piecewise_spline(
+          all_time,
+          all_flux,
+          bkspace,
+          maxiter,
+          sigma,
+          penalty_coeff,
+          max_bic=best_bic if prune else None,
+          initial_masks=warm_masks if warm_start else None)
+
+    # It's expected to get a SplineError occasionally for small values of
+    # bkspace.
+    except SplineError as e:
+      if verbose:
+        warnings.warn("Bad bkspace %.4f: %s" % (bkspace, e))
+      results.append(None)
+      continue
+
+    if bic is not None:
+      warm_masks = spline_mask
+      if best_bic is None or bic < best_bic:
+        best_bic = bic
+    results.append((spline, spline_mask, bic))
+
   best_spline = None
   best_spline_mask = None
   best_bkspace = None
   bad_bkspaces = []
-  for bkspace in bkspaces:
-    nparams = 0  # Total number of free parameters in the piecewise spline.
-    npoints = 0  # Total number of data points used to fit the piecewise spline.
-    ssr = 0  # Sum of squared residuals between the model and the spline.
-
-    spline = []
-    spline_mask = []
-    bad_bkspace = False  # Indicates that the current bkspace should be skipped.
-    for time, flux in zip(all_time, all_flux):
-      # Don't fit a spline on less than 4 points.
-      if len(time) < 4:
-        spline.append(flux)
-        spline_mask.append(np.ones_like(flux), dtype=np.bool)
-        continue
-
-      # Fit B-spline to this light-curve segment.
-      try:
-        spline_piece, mask = kepler_spline(
-            time, flux, bkspace=bkspace, maxiter=maxiter)
-
-      # It's expected to get a SplineError occasionally for small values of
-      # bkspace.
-      except SplineError as e:
-        if verbose:
-          warnings.warn("Bad bkspace %.4f: %s" % (bkspace, e))
-        bad_bkspaces.append(bkspace)
-        bad_bkspace = True
-        break
-
-      spline.append(spline_piece)
-      spline_mask.append(mask)
-
-      # Accumulate the number of free parameters.
-      total_time = np.max(time) - np.min(time)
-      nknots = int(total_time / bkspace) + 1  # From the bspline implementation.
-      nparams += nknots + 3 - 1  # number of knots + degree of spline - 1
-
-      # Accumulate the number of points and the squared residuals.
-      npoints += np.sum(mask)
-      ssr += np.sum((flux[mask] - spline_piece[mask])**2)
-
-    if bad_bkspace:
+  chosen_bic = None
+  # Choose the first of the break-point spacings with minimal BIC, as in an
+  # exhaustive search. Pruning only discards spacings with a strictly larger
+  # BIC.
+  for bkspace, result in zip(bkspaces, results):
+    if result is None:
+      bad_bkspaces.append(bkspace)
       continue
 
-    # The following term is -2*ln(L), where L is the likelihood of the data
-    # given the model, under the assumption that the model errors are iid
-    # Gaussian with mean 0 and standard deviation sigma.
-    likelihood_term = npoints * np.log(2 * np.pi * sigma**2) + ssr / sigma**2
-
-    # Bayesian information criterion.
-    bic = likelihood_term + penalty_coeff * nparams * np.log(npoints)
+    spline, spline_mask, bic = result
+    if bic is None:
+      continue  # Pruned.
 
-    if best_bic is None or bic < best_bic:
-      best_bic = bic
+    if chosen_bic is None or bic < chosen_bic:
+      chosen_bic = bic
       best_spline = spline
       best_spline_mask = spline_mask
       best_bkspace = bkspace
@@ -107,6 +107,67 @@ class KeplerSplineTest(absltest.TestCase):
     self.assertAlmostEqual(bkspace, 1.89634509537)
     self.assertEmpty(bad_bkspaces)
 
+  def testChooseKeplerSplineMatchesExhaustiveSearch(self):
+    # Noisy sine waves with outliers, in segments of different lengths.
+    rs = np.random.RandomState(123)
+    time = [np.arange(0, 30, 0.05), np.arange(30, 35, 0.05), [36, 37],
+            np.arange(40, 100, 0.05)]
+    time = [np.array(t, dtype=np.float64) for t in time]
+    flux = [np.sin(t) + 0.01 * rs.randn(len(t)) for t in time]
+    flux[0][100] = 5
+    flux[3][500] = -5
+    bkspaces = np.logspace(np.log10(0.3), np.log10(10), num=10)
+
+    spline, mask, bkspace, bad_bkspaces = kepler_spline.choose_kepler_spline(
+        time, flux, bkspaces, verbose=False)
+    self.assertIsNotNone(bkspace)
+
+    # Count the spline fits of each search.
+    num_fits = [0]
+    original_kepler_spline = kepler_spline.kepler_spline
+
+    def _kepler_spline(*args, **kwargs):
+      num_fits[0] += 1
+      return original_kepler_spline(*args, **kwargs)
+
+    kepler_spline.kepler_spline = _kepler_spline
+    try:
+      kepler_spline.choose_kepler_spline(time, flux, bkspaces, verbose=False)
+      num_exhaustive_fits = num_fits[0]
+      num_fits[0] = 0
+      (pruned_spline, pruned_mask, pruned_bkspace,
+       _) = kepler_spline.choose_kepler_spline(
+           time, flux, bkspaces, verbose=False, prune=True)
+      num_pruned_fits = num_fits[0]
+    finally:
+      kepler_spline.kepler_spline = original_kepler_spline
+
+    # Pruning skips fits, and chooses the same spline.
+    self.assertLess(num_pruned_fits, num_exhaustive_fits)
+    self.assertEqual(pruned_bkspace, bkspace)
+    for expected, actual in zip(spline + mask, pruned_spline + pruned_mask):
+      np.testing.assert_array_equal(expected, actual)
+
+    # Warm starts may converge to slightly different masks, but choose the same
+    # break-point spacing.
+    warm_bkspace = kepler_spline.choose_kepler_spline(
+        time, flux, bkspaces, verbose=False, prune=True, warm_start=True)[2]
+    self.assertEqual(warm_bkspace, bkspace)
+
+  def testKeplerSplineInitialMask(self):
+    time = np.arange(0, 10, 0.1)
+    flux = np.sin(time)
+    flux[35] = 10
+
+    # The first spline is fit on the points of the initial mask.
+    initial_mask = np.ones_like(time, dtype=np.bool)
+    initial_mask[35] = False
+    spline, mask = kepler_spline.kepler_spline(
+        time, flux, bkspace=0.5, maxiter=1, initial_mask=initial_mask)
+    np.testing.assert_array_equal(mask, initial_mask)
+    rmse = np.sqrt(np.mean((flux[mask] - spline[mask])**2))
+    self.assertLess(rmse, 1e-4)
+
 
 if __name__ == "__main__":
   absltest.main()
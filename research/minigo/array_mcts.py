@@ -0,0 +1,295 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""An array-backed Monte Carlo Tree Search implementation.
+
+MCTSTree runs the same search as mcts.MCTSNode, but keeps all nodes of a tree in
+a pool of preallocated arrays and refers to nodes by their integer index:
+  child_N, child_W, child_prior, original_prior, illegal_moves: float32 arrays
+    of shape [capacity, N * N + 1], with the statistics of the children of
+    every node in one contiguous row.
+  children: an int32 array of the same shape with the index of every child
+    node, or NO_NODE if the child has not been added yet.
+  parent, fmove: the parent and the move leading to every node. As in MCTSNode,
+    the visit count and total value of a node are stored in its parent's row,
+    at child_N[parent, fmove] and child_W[parent, fmove].
+Row 0 is a dummy parent for the root. The pool grows geometrically, and
+play_move discards all nodes outside of the subtree of the new root.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import math
+
+import coords
+from mcts import c_PUCT, D_NOISE_ALPHA
+import numpy as np
+
+NO_NODE = -1
+INITIAL_CAPACITY = 256
+
+_DUMMY_NODE = 0
+
+
+class MCTSTree(object):
+  """A MCTS search tree stored in a node pool.
+
+  Methods take and return node indices. The per-node methods mirror those of
+  mcts.MCTSNode, e.g. tree.add_virtual_loss(leaf, up_to=tree.root) is
+  leaf.add_virtual_loss(up_to=root).
+  """
+  # pylint: disable=invalid-name
+
+  def __init__(self, board_size, position, capacity=INITIAL_CAPACITY):
+    """Initialize the tree.
+
+    Args:
+      board_size: the go board size.
+      position: the go.Position of the root.
+      capacity: the initial number of nodes of the pool.
+    """
+    self.board_size = board_size
+    self.num_moves = board_size * board_size + 1
+    self._allocate(max(capacity, 2))
+    self.num_nodes = 1  # the dummy node
+    self.root = self._new_node(position, _DUMMY_NODE, 0)
+
+  def _allocate(self, capacity):
+    shape = [capacity, self.num_moves]
+    self.child_N = np.zeros(shape, dtype=np.float32)
+    self.child_W = np.zeros(shape, dtype=np.float32)
+    self.child_prior = np.zeros(shape, dtype=np.float32)
+    self.original_prior = np.zeros(shape, dtype=np.float32)
+    self.illegal_moves = np.zeros(shape, dtype=np.float32)
+    self.children = np.full(shape, NO_NODE, dtype=np.int32)
+    # Per-node scalars are lists, which are faster to index one at a time.
+    self.parent = [_DUMMY_NODE] * capacity
+    self.fmove = [0] * capacity
+    self.is_expanded = [False] * capacity
+    self.losses_applied = [0] * capacity
+    self.positions = [None] * capacity
+
+  def _grow(self):
+    """Doubles the capacity of the pool."""
+    num_nodes = self.num_nodes
+    arrays = [self.child_N, self.child_W, self.child_prior,
+              self.original_prior, self.illegal_moves, self.children]
+    lists = [self.parent, self.fmove, self.is_expanded, self.losses_applied,
+             self.positions]
+    self._allocate(2 * self.child_N.shape[0])
+    for new, old in zip([self.child_N, self.child_W, self.child_prior,
+                         self.original_prior, self.illegal_moves,
+                         self.children], arrays):
+      new[:num_nodes] = old[:num_nodes]
+    for new, old in zip([self.parent, self.fmove, self.is_expanded,
+                         self.losses_applied, self.positions], lists):
+      new[:num_nodes] = old[:num_nodes]
+
+  def _new_node(self, position, parent, fmove):
+    if self.num_nodes == self.child_N.shape[0]:
+      self._grow()
+    node = self.num_nodes
+    self.num_nodes += 1
+    self.parent[node] = parent
+    self.fmove[node] = fmove
+    self.positions[node] = position
+    self.illegal_moves[node] = 1000 * (1 - position.all_legal_moves())
+    self.children[parent, fmove] = node
+    return node
+
+  def N(self, node):
+    return self.child_N[self.parent[node], self.fmove[node]]
+
+  def W(self, node):
+    return self.child_W[self.parent[node], self.fmove[node]]
+
+  def Q(self, node):
+    return self.W(node) / (1 + self.N(node))
+
+  def Q_perspective(self, node):
+    """Return value of position, from perspective of player to play."""
+    return self.Q(node) * self.positions[node].to_play
+
+  def child_action_score(self, node):
+    child_N = self.child_N[node]
+    child_Q = self.child_W[node] / (1 + child_N)
+    child_U = (c_PUCT * math.sqrt(1 + self.N(node)) *
+               self.child_prior[node] / (1 + child_N))
+    return (child_Q * self.positions[node].to_play
+            + child_U - self.illegal_moves[node])
+
+  def select_leaf(self):
+    """Selects a leaf from the root, incrementing the visits along the way."""
+    node = self.root
+    pass_move = self.num_moves - 1
+    while True:
+      # Not cached in a local, maybe_add_child may grow the pool.
+      self.child_N[self.parent[node], self.fmove[node]] += 1
+      # if a node has never been evaluated, we have no basis to select a child.
+      if not self.is_expanded[node]:
+        break
+      # HACK: if last move was a pass, always investigate double-pass first
+      # to avoid situations where we auto-lose by passing too early.
+      position = self.positions[node]
+      if (position.recent
+          and position.recent[-1].move is None
+          and self.child_N[node, pass_move] == 0):
+        node = self.maybe_add_child(node, pass_move)
+        continue
+
+      best_move = int(np.argmax(self.child_action_score(node)))
+      node = self.maybe_add_child(node, best_move)
+    return node
+
+  def maybe_add_child(self, node, fcoord):
+    """Add child node for fcoord if it doesn't already exist, and returns it."""
+    child = self.children[node, fcoord]
+    if child == NO_NODE:
+      new_position = self.positions[node].play_move(
+          coords.from_flat(self.board_size, fcoord))
+      child = self._new_node(new_position, node, fcoord)
+    return int(child)
+
+  def _path_to(self, node, up_to):
+    """Yields (parent, fmove) of node and its ancestors, up to up_to."""
+    while True:
+      parent = self.parent[node]
+      yield parent, self.fmove[node]
+      if parent == _DUMMY_NODE or node == up_to:
+        return
+      node = parent
+
+  def add_virtual_loss(self, node, up_to):
+    """Propagate a virtual loss up to the up_to node."""
+    while True:
+      self.losses_applied[node] += 1
+      # This is a "win" for the current node; hence a loss for its parent node
+      # who will be deciding whether to investigate this node again.
+      parent = self.parent[node]
+      self.child_W[parent, self.fmove[node]] += self.positions[node].to_play
+      if parent == _DUMMY_NODE or node == up_to:
+        return
+      node = parent
+
+  def revert_virtual_loss(self, node, up_to):
+    while True:
+      self.losses_applied[node] -= 1
+      parent = self.parent[node]
+      self.child_W[parent, self.fmove[node]] -= self.positions[node].to_play
+      if parent == _DUMMY_NODE or node == up_to:
+        return
+      node = parent
+
+  def revert_visits(self, node, up_to):
+    """Revert the visit increments of a repeatedly selected leaf."""
+    for parent, fmove in self._path_to(node, up_to):
+      self.child_N[parent, fmove] -= 1
+
+  def incorporate_results(self, node, move_probabilities, value, up_to):
+    assert move_probabilities.shape == (self.num_moves,)
+    # A finished game should not be going through this code path - should
+    # directly call backup_value() on the result of the game.
+    assert not self.positions[node].is_game_over()
+    if self.is_expanded[node]:
+      self.revert_visits(node, up_to=up_to)
+      return
+    self.is_expanded[node] = True
+    self.original_prior[node] = self.child_prior[node] = move_probabilities
+    # initialize child Q as current node's value, see
+    # mcts.MCTSNode.incorporate_results.
+    self.child_W[node] = value
+    self.backup_value(node, value, up_to=up_to)
+
+  def backup_value(self, node, value, up_to):
+    """Propagates a value estimation up to the up_to node.
+
+    Args:
+      node: the node to start from.
+      value: the value to be propagated (1 = black wins, -1 = white wins)
+      up_to: the node to propagate until.
+    """
+    for parent, fmove in self._path_to(node, up_to):
+      self.child_W[parent, fmove] += value
+
+  def is_done(self, node):
+    # True if the last two moves were Pass or if the position is at a move
+    # greater than the max depth.
+    max_depth = (self.board_size ** 2) * 1.4  # 505 moves for 19x19, 113 for 9x9
+    position = self.positions[node]
+    return position.is_game_over() or position.n >= max_depth
+
+  def inject_noise(self, node):
+    dirch = np.random.dirichlet([D_NOISE_ALPHA(self.board_size)] *
+                                self.num_moves)
+    self.child_prior[node] = self.child_prior[node] * 0.75 + dirch * 0.25
+
+  def children_as_pi(self, node, squash=False):
+    """Returns the child visit counts as a probability distribution, pi."""
+    probs = self.child_N[node].copy()
+    if squash:
+      probs **= .95
+    return probs / np.sum(probs)
+
+  def play_move(self, fcoord):
+    """Makes the child for fcoord the root and discards all other subtrees.
+
+    Args:
+      fcoord: the flattened coordinate of the move.
+
+    Returns:
+      The new root. All node indices of the tree change.
+    """
+    new_root = self.maybe_add_child(self.root, fcoord)
+    # Collect the subtree of the new root, level by level.
+    levels = [np.array([new_root], dtype=np.int32)]
+    while True:
+      next_level = self.children[levels[-1]].ravel()
+      next_level = next_level[next_level != NO_NODE]
+      if not next_level.size:
+        break
+      levels.append(next_level)
+    old_nodes = np.concatenate(levels)
+    num_nodes = old_nodes.size + 1
+
+    new_index = np.full([self.num_nodes + 1], NO_NODE, dtype=np.int32)
+    new_index[old_nodes] = np.arange(1, num_nodes, dtype=np.int32)
+    root_N = self.N(new_root)
+    root_W = self.W(new_root)
+    root_fmove = self.fmove[new_root]
+    arrays = [self.child_N, self.child_W, self.child_prior,
+              self.original_prior, self.illegal_moves]
+    children = self.children
+    parent, fmove, is_expanded, losses_applied, positions = (
+        self.parent, self.fmove, self.is_expanded, self.losses_applied,
+        self.positions)
+
+    self._allocate(max(INITIAL_CAPACITY, 2 * num_nodes))
+    for new, old in zip([self.child_N, self.child_W, self.child_prior,
+                         self.original_prior, self.illegal_moves], arrays):
+      new[1:num_nodes] = old[old_nodes]
+    # NO_NODE maps to new_index[-1], which is NO_NODE.
+    self.children[1:num_nodes] = new_index[children[old_nodes]]
+    for i, old in enumerate(old_nodes.tolist(), 1):
+      self.parent[i] = int(new_index[parent[old]])
+      self.fmove[i] = fmove[old]
+      self.is_expanded[i] = is_expanded[old]
+      self.losses_applied[i] = losses_applied[old]
+      self.positions[i] = positions[old]
+    self.num_nodes = num_nodes
+    self.root = 1
+    self.parent[self.root] = _DUMMY_NODE
+    self.child_N[_DUMMY_NODE, root_fmove] = root_N
+    self.child_W[_DUMMY_NODE, root_fmove] = root_W
+    return self.root
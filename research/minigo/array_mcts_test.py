@@ -0,0 +1,209 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for array_mcts."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import array_mcts
+import fast_go
+import go
+from mcts import MCTSNode
+import mcts_test
+import numpy as np
+import utils_test
+
+tf.logging.set_verbosity(tf.logging.ERROR)
+
+
+def fake_evaluation(board_size, position):
+  """Returns deterministic, position dependent priors and value."""
+  random_state = np.random.RandomState(position.zobrist_hash % (2 ** 32))
+  probs = random_state.dirichlet([1.0] * (board_size * board_size + 1))
+  return probs.astype(np.float32), random_state.uniform(-1, 1)
+
+
+class TestMCTSTree(utils_test.MiniGoUnitTest):
+
+  def _search(self, board_size, root_position, num_steps, num_parallel=8):
+    """Runs the same search with an MCTSNode and an MCTSTree."""
+    root = MCTSNode(board_size, root_position)
+    tree = array_mcts.MCTSTree(board_size, root_position, capacity=4)
+    for _ in range(num_steps):
+      leaves = []
+      tree_leaves = []
+      for _ in range(num_parallel):
+        leaf = root.select_leaf()
+        tree_leaf = tree.select_leaf()
+        self.assertEqual(leaf.position.recent, tree.positions[tree_leaf].recent)
+        if leaf.is_done():
+          self.assertTrue(tree.is_done(tree_leaf))
+          value = 1 if leaf.position.score() > 0 else -1
+          leaf.backup_value(value, up_to=root)
+          tree.backup_value(tree_leaf, value, up_to=tree.root)
+          continue
+        leaf.add_virtual_loss(up_to=root)
+        tree.add_virtual_loss(tree_leaf, up_to=tree.root)
+        leaves.append(leaf)
+        tree_leaves.append(tree_leaf)
+      for leaf, tree_leaf in zip(leaves, tree_leaves):
+        probs, value = fake_evaluation(board_size, leaf.position)
+        leaf.revert_virtual_loss(up_to=root)
+        tree.revert_virtual_loss(tree_leaf, up_to=tree.root)
+        leaf.incorporate_results(probs, value, up_to=root)
+        tree.incorporate_results(tree_leaf, probs, value, up_to=tree.root)
+    return root, tree
+
+  def assertEqualTrees(self, node, tree, tree_node):
+    self.assertEqual(node.N, tree.N(tree_node))
+    self.assertAlmostEqual(node.W, tree.W(tree_node), places=4)
+    self.assertEqual(node.is_expanded, tree.is_expanded[tree_node])
+    self.assertEqual(node.losses_applied, tree.losses_applied[tree_node])
+    self.assertEqualNPArray(node.child_N, tree.child_N[tree_node])
+    if node.is_expanded:
+      self.assertAllClose(node.child_W, tree.child_W[tree_node])
+    for fmove, child in node.children.items():
+      tree_child = tree.children[tree_node, fmove]
+      self.assertNotEqual(tree_child, array_mcts.NO_NODE)
+      self.assertEqual(tree.parent[tree_child], tree_node)
+      self.assertEqualTrees(child, tree, tree_child)
+    self.assertEqual(
+        len(node.children),
+        np.sum(tree.children[tree_node] != array_mcts.NO_NODE))
+
+  def test_search_matches_mcts_node(self):
+    root, tree = self._search(utils_test.BOARD_SIZE,
+                              go.Position(utils_test.BOARD_SIZE), 40)
+    self.assertGreater(tree.num_nodes, 100)
+    self.assertEqualTrees(root, tree, tree.root)
+    self.assertEqualNPArray(root.children_as_pi(),
+                            tree.children_as_pi(tree.root))
+    self.assertNoPendingVirtualLosses(root)
+    self.assertEqual(sum(tree.losses_applied), 0)
+
+  def test_search_near_end_of_game(self):
+    root, tree = self._search(utils_test.BOARD_SIZE,
+                              mcts_test.SEND_TWO_RETURN_ONE, 20)
+    self.assertEqualTrees(root, tree, tree.root)
+
+  def test_play_move_keeps_subtree(self):
+    root, tree = self._search(utils_test.BOARD_SIZE,
+                              go.Position(utils_test.BOARD_SIZE), 40)
+    fmove = int(np.argmax(root.child_N))
+    num_nodes = tree.num_nodes
+    new_root = tree.play_move(fmove)
+    self.assertEqual(new_root, tree.root)
+    self.assertLess(tree.num_nodes, num_nodes)
+    self.assertEqualTrees(root.children[fmove], tree, tree.root)
+    # Searching on from the new root still matches.
+    child = root.children[fmove]
+    for _ in range(5):
+      leaf = child.select_leaf()
+      tree_leaf = tree.select_leaf()
+      self.assertEqual(leaf.position.recent, tree.positions[tree_leaf].recent)
+      probs, value = fake_evaluation(utils_test.BOARD_SIZE, leaf.position)
+      leaf.incorporate_results(probs, value, up_to=child)
+      tree.incorporate_results(tree_leaf, probs, value, up_to=tree.root)
+    self.assertEqualTrees(child, tree, tree.root)
+
+  def test_incorporate_results_twice_reverts_visits(self):
+    tree = array_mcts.MCTSTree(utils_test.BOARD_SIZE,
+                               go.Position(utils_test.BOARD_SIZE))
+    probs, value = fake_evaluation(utils_test.BOARD_SIZE,
+                                   tree.positions[tree.root])
+    leaf = tree.select_leaf()
+    tree.incorporate_results(leaf, probs, value, up_to=tree.root)
+    leaf = tree.select_leaf()
+    leaf2 = tree.select_leaf()
+    self.assertEqual(tree.N(tree.root), 3)
+    tree.incorporate_results(leaf, probs, value, up_to=tree.root)
+    tree.incorporate_results(leaf2, probs, value, up_to=tree.root)
+    self.assertEqual(leaf, leaf2)
+    self.assertEqual(tree.N(leaf), 1)
+    self.assertEqual(tree.N(tree.root), 2)
+
+
+class _MCTSNodeSearch(object):
+  """The leaf operations of MCTSPlayerMixin.tree_search on an MCTSNode."""
+
+  def __init__(self, position):
+    self.root = MCTSNode(position.board_size, position)
+
+  def select_leaf(self):
+    leaf = self.root.select_leaf()
+    if leaf.is_done():
+      leaf.backup_value(1, up_to=self.root)
+      return None
+    leaf.add_virtual_loss(up_to=self.root)
+    return leaf
+
+  def incorporate(self, leaf, probs, value):
+    leaf.revert_virtual_loss(up_to=self.root)
+    leaf.incorporate_results(probs, value, up_to=self.root)
+
+
+class _MCTSTreeSearch(object):
+  """The leaf operations of MCTSPlayerMixin.tree_search on an MCTSTree."""
+
+  def __init__(self, position):
+    self.tree = array_mcts.MCTSTree(position.board_size, position)
+
+  def select_leaf(self):
+    tree = self.tree
+    leaf = tree.select_leaf()
+    if tree.is_done(leaf):
+      tree.backup_value(leaf, 1, up_to=tree.root)
+      return None
+    tree.add_virtual_loss(leaf, up_to=tree.root)
+    return leaf
+
+  def incorporate(self, leaf, probs, value):
+    self.tree.revert_virtual_loss(leaf, up_to=self.tree.root)
+    self.tree.incorporate_results(leaf, probs, value, up_to=self.tree.root)
+
+
+class MCTSTreeBenchmark(tf.test.Benchmark):
+
+  def _benchmark_readouts_per_second(self, name, search_class, board_size,
+                                     num_readouts=1600, num_parallel=8):
+    position = fast_go.Position(board_size)
+    probs, value = fake_evaluation(board_size, position)
+    # Never pass, so that the search does not end the game.
+    probs[-1] = 0
+    search = search_class(position)
+    start_time = time.time()
+    for _ in range(num_readouts // num_parallel):
+      leaves = [search.select_leaf() for _ in range(num_parallel)]
+      for leaf in leaves:
+        if leaf is not None:
+          search.incorporate(leaf, probs, value)
+    wall_time = (time.time() - start_time) / num_readouts
+    self.report_benchmark(
+        name=name, iters=num_readouts, wall_time=wall_time,
+        extras={'readouts_per_second': 1.0 / wall_time})
+
+  def benchmark_readouts(self):
+    for board_size in [9, 19]:
+      self._benchmark_readouts_per_second(
+          'mcts_node_%d' % board_size, _MCTSNodeSearch, board_size)
+      self._benchmark_readouts_per_second(
+          'mcts_tree_%d' % board_size, _MCTSTreeSearch, board_size)
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -96,13 +96,16 @@ class DualNetRunner(object):
         [position], use_random_symmetry=use_random_symmetry)
     return probs[0], values[0]
 
-  def run_many(self, positions, use_random_symmetry=True):
+  def run_many(self, positions, use_random_symmetry=True,
+               symmetries_used=None):
     """Compute the policy and value output for given positions.
 
     Args:
       positions: A list of positions for go board status
       use_random_symmetry: Apply random symmetry (defined in symmetries.py) to
         the extracted features (defined in features.py) of the given positions
+      symmetries_used: A list with the symmetry to apply to each position. If
+        given, use_random_symmetry is ignored.
 
     Returns:
       probabilities, value: The policy and value outputs (defined in
@@ -113,18 +116,35 @@ class DualNetRunner(object):
     processed = list(map(_extract_features, positions))
     # processed = [
     #  features.extract_features(self.hparams.board_size, p) for p in positions]
-    if use_random_symmetry:
+    if symmetries_used is not None:
+      syms_used = symmetries_used
+      processed = [symmetries.apply_symmetry_feat(s, f)
+                   for s, f in zip(syms_used, processed)]
+    elif use_random_symmetry:
       syms_used, processed = symmetries.randomize_symmetries_feat(processed)
+    probabilities, value = self.run_features(processed)
+    if symmetries_used is not None or use_random_symmetry:
+      probabilities = symmetries.invert_symmetries_pi(
+          self.hparams.board_size, syms_used, probabilities)
+    return probabilities, value
+
+  def run_features(self, processed):
+    """Compute the policy and value output for extracted features.
+
+    Args:
+      processed: A list or array of the features of positions, as returned by
+        features.extract_features.
+
+    Returns:
+      probabilities, value: The policy and value outputs (defined in
+        dualnet_model.py)
+    """
     # feed_dict is a dict object to provide the input examples for the step of
     # inference. sess.run() returns the inference predictions (indicated by
     # self.inference_output) of the given input as outputs
     outputs = self.sess.run(
         self.inference_output, feed_dict={self.inference_input: processed})
-    probabilities, value = outputs['policy_output'], outputs['value_output']
-    if use_random_symmetry:
-      probabilities = symmetries.invert_symmetries_pi(
-          self.hparams.board_size, syms_used, probabilities)
-    return probabilities, value
+    return outputs['policy_output'], outputs['value_output']
 
 
 def get_inference_input(params):
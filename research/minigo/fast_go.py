@@ -0,0 +1,353 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""A compact, incremental implementation of go.Position.
+
+go.Position deep-copies a LibertyTracker of Group namedtuples and frozensets on
+every move. This Position keeps the same API and rules, but stores its state in
+a few flat arrays which are cheap to copy:
+  board: a flat int8 numpy array (the 2D `board` attribute is a view of it).
+  chains: every stone points to the root stone of its chain, and the stones of
+    a chain form a circular linked list. When two chains merge, the stones of
+    the smaller one are relabelled (union by size).
+  liberties: every chain root holds the number, sum and sum of squares of its
+    pseudo-liberties (empty neighbors, counted once per adjacent stone). A chain
+    has no liberties if the count is zero, and is in atari if all of its
+    pseudo-liberties are the same point, i.e. if count * sum_sq == sum ** 2.
+  zobrist_hash: the xor of the Zobrist keys of all stones on the board.
+    board_hashes holds the hashes of all earlier boards for positional superko.
+Board deltas are stored as sparse (indices, values) records and only expanded
+into the dense `board_deltas` array when features are extracted.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import coords
+import go
+from go import BLACK, EMPTY, IllegalMove, MISSING_GROUP_ID, PlayerMove
+import numpy as np
+
+# Number of board deltas to keep, enough to extract the last 8 board states.
+_NUM_BOARD_DELTAS = 7
+
+_NEIGHBORS = {}
+
+
+def get_flat_neighbors(board_size):
+  """Return a tuple with the tuple of flat neighbors of every flat coord."""
+  if board_size not in _NEIGHBORS:
+    neighbors, _ = go.get_neighbors_diagonals(board_size)
+    _NEIGHBORS[board_size] = tuple(
+        tuple(coords.to_flat(board_size, n)
+              for n in neighbors[coords.from_flat(board_size, c)])
+        for c in range(board_size * board_size))
+  return _NEIGHBORS[board_size]
+
+
+class Position(go.Position):
+  """A go.Position with flat, array-backed chain and liberty tracking.
+
+  It has no `lib_tracker`; use get_liberties to get the liberty counts.
+  """
+
+  def __init__(self, board_size, board=None, n=0, komi=7.5, caps=(0, 0),
+               lib_tracker=None, ko=None, recent=tuple(),
+               board_deltas=None, to_play=BLACK, zobrist_hash=None,
+               board_hashes=None):
+    """Initialize position class.
+
+    Args:
+      board_size: the go board size.
+      board: a numpy array
+      n: an int representing moves played so far
+      komi: a float, representing points given to the second player.
+      caps: a (int, int) tuple of captures for B, W.
+      lib_tracker: ignored, liberties are always computed from the board.
+      ko: a Move
+      recent: a tuple of PlayerMoves, such that recent[-1] is the last move.
+      board_deltas: a np.array of shape (n, go.N, go.N) representing changes
+        made to the board at each move (played move and captures).
+      to_play: BLACK or WHITE
+      zobrist_hash: ignored, the hash is always computed from the board.
+      board_hashes: a frozenset with the Zobrist hashes of all boards of the
+        game so far, see go.Position.
+    """
+    if not isinstance(recent, tuple):
+      raise TypeError('Recent must be a tuple!')
+    num_points = board_size * board_size
+    self.board_size = board_size
+    self.n = n
+    self.komi = komi
+    self.caps = caps
+    self.ko = ko
+    self.recent = recent
+    self.to_play = to_play
+    self.last_eight = None
+    self._neighbors = get_flat_neighbors(board_size)
+    self._zobrist_table = go.get_zobrist_table(board_size)
+    self.zobrist_hash = 0
+    self._flat_board = np.zeros([num_points], dtype=np.int8)
+    self.board = self._flat_board.reshape([board_size, board_size])
+    self._chain = [MISSING_GROUP_ID] * num_points
+    self._next = list(range(num_points))
+    self._chain_size = [0] * num_points
+    self._num_libs = [0] * num_points
+    self._lib_sum = [0] * num_points
+    self._lib_sum_sq = [0] * num_points
+    if board is not None:
+      for c in np.flatnonzero(board):
+        self._add_stone(int(c), int(board.flat[c]))
+    self.board_hashes = (board_hashes if board_hashes is not None else
+                         frozenset([self.zobrist_hash]))
+    if board_deltas is None:
+      self._deltas = ()
+    else:
+      self._deltas = tuple(
+          (tuple(np.flatnonzero(delta)), tuple(delta[delta != 0]))
+          for delta in board_deltas[:_NUM_BOARD_DELTAS])
+
+  def __deepcopy__(self, memodict=None):
+    pos = Position.__new__(Position)
+    pos.__dict__.update(self.__dict__)
+    pos._flat_board = self._flat_board.copy()
+    pos.board = pos._flat_board.reshape([self.board_size, self.board_size])
+    pos._chain = self._chain[:]
+    pos._next = self._next[:]
+    pos._chain_size = self._chain_size[:]
+    pos._num_libs = self._num_libs[:]
+    pos._lib_sum = self._lib_sum[:]
+    pos._lib_sum_sq = self._lib_sum_sq[:]
+    return pos
+
+  @property
+  def board_deltas(self):
+    deltas = np.zeros([len(self._deltas), self.board_size * self.board_size],
+                      dtype=np.int8)
+    for delta, (indices, values) in zip(deltas, self._deltas):
+      delta[list(indices)] = values
+    return deltas.reshape([-1, self.board_size, self.board_size])
+
+  def _add_stone(self, c, color):
+    """Places a stone, merging it with friendly chains. Returns its chain."""
+    board = self._flat_board
+    chain = self._chain
+    num_libs = self._num_libs
+    lib_sum = self._lib_sum
+    lib_sum_sq = self._lib_sum_sq
+    board[c] = color
+    self.zobrist_hash ^= self._zobrist_table[color][c]
+    chain[c] = c
+    self._next[c] = c
+    self._chain_size[c] = 1
+    num_libs[c] = lib_sum[c] = lib_sum_sq[c] = 0
+    for n in self._neighbors[c]:
+      root = chain[n]
+      if root == MISSING_GROUP_ID:
+        num_libs[c] += 1
+        lib_sum[c] += n
+        lib_sum_sq[c] += n * n
+      else:
+        num_libs[root] -= 1
+        lib_sum[root] -= c
+        lib_sum_sq[root] -= c * c
+    root = c
+    for n in self._neighbors[c]:
+      if board[n] == color and chain[n] != root:
+        root = self._merge_chains(root, chain[n])
+    return root
+
+  def _merge_chains(self, root1, root2):
+    """Merges two chains and returns the root of the merged chain."""
+    chain_size = self._chain_size
+    if chain_size[root1] < chain_size[root2]:
+      root1, root2 = root2, root1
+    chain = self._chain
+    next_stone = self._next
+    s = root2
+    while True:
+      chain[s] = root1
+      s = next_stone[s]
+      if s == root2:
+        break
+    next_stone[root1], next_stone[root2] = next_stone[root2], next_stone[root1]
+    chain_size[root1] += chain_size[root2]
+    self._num_libs[root1] += self._num_libs[root2]
+    self._lib_sum[root1] += self._lib_sum[root2]
+    self._lib_sum_sq[root1] += self._lib_sum_sq[root2]
+    return root1
+
+  def _remove_chain(self, root):
+    """Removes the stones of a chain from the board and returns them."""
+    board = self._flat_board
+    chain = self._chain
+    zobrist_keys = self._zobrist_table[int(board[root])]
+    stones = []
+    s = root
+    while True:
+      stones.append(s)
+      board[s] = EMPTY
+      chain[s] = MISSING_GROUP_ID
+      self.zobrist_hash ^= zobrist_keys[s]
+      s = self._next[s]
+      if s == root:
+        break
+    for s in stones:
+      for n in self._neighbors[s]:
+        neighbor_root = chain[n]
+        if neighbor_root != MISSING_GROUP_ID:
+          self._num_libs[neighbor_root] += 1
+          self._lib_sum[neighbor_root] += s
+          self._lib_sum_sq[neighbor_root] += s * s
+    return stones
+
+  def _is_in_atari(self, root):
+    num_libs = self._num_libs[root]
+    return (num_libs > 0 and
+            num_libs * self._lib_sum_sq[root] == self._lib_sum[root] ** 2)
+
+  def is_move_suicidal(self, move):
+    c = move[0] * self.board_size + move[1]
+    for n in self._neighbors[c]:
+      root = self._chain[n]
+      if root == MISSING_GROUP_ID:
+        # at least one liberty after playing here, so not a suicide
+        return False
+      if self._flat_board[n] == self.to_play:
+        if not self._is_in_atari(root):
+          return False
+      elif self._is_in_atari(root):
+        # would capture an opponent group if they only had one lib.
+        return False
+    return True
+
+  def _capture_zobrist_deltas(self):
+    zobrist_keys = self._zobrist_table[-self.to_play]
+    board = self._flat_board.tolist()
+    num_libs = self._num_libs
+    lib_sum = self._lib_sum
+    lib_sum_sq = self._lib_sum_sq
+    deltas = {}
+    for root in set(self._chain):
+      if root == MISSING_GROUP_ID or board[root] == self.to_play:
+        continue
+      # Inlined _is_in_atari.
+      if num_libs[root] and (
+          num_libs[root] * lib_sum_sq[root] == lib_sum[root] ** 2):
+        liberty = lib_sum[root] // num_libs[root]
+        s = root
+        while True:
+          deltas[liberty] = deltas.get(liberty, 0) ^ zobrist_keys[s]
+          s = self._next[s]
+          if s == root:
+            break
+    return deltas
+
+  def is_move_superko(self, move):
+    c = move[0] * self.board_size + move[1]
+    zobrist_keys = self._zobrist_table[-self.to_play]
+    zobrist_hash = self.zobrist_hash ^ self._zobrist_table[self.to_play][c]
+    captured_roots = set(
+        self._chain[n] for n in self._neighbors[c]
+        if self._flat_board[n] == -self.to_play and
+        self._is_in_atari(self._chain[n]))
+    for root in captured_roots:
+      s = root
+      while True:
+        zobrist_hash ^= zobrist_keys[s]
+        s = self._next[s]
+        if s == root:
+          break
+    return zobrist_hash in self.board_hashes
+
+  def get_liberties(self):
+    liberties = np.zeros([self.board_size * self.board_size], dtype=np.uint8)
+    chain = np.array(self._chain)
+    for root in set(self._chain) - set([MISSING_GROUP_ID]):
+      stones = np.flatnonzero(chain == root)
+      chain_liberties = set(
+          n for s in stones for n in self._neighbors[s]
+          if self._chain[n] == MISSING_GROUP_ID)
+      liberties[stones] = len(chain_liberties)
+    return liberties.reshape([self.board_size, self.board_size])
+
+  def pass_move(self, mutate=False):
+    pos = self if mutate else self.__deepcopy__()
+    pos.n += 1
+    pos.recent += (PlayerMove(pos.to_play, None),)
+    pos._deltas = (((), ()),) + pos._deltas[:_NUM_BOARD_DELTAS - 1]
+    pos.to_play *= -1
+    pos.ko = None
+    return pos
+
+  def play_move(self, c, color=None, mutate=False):
+    """Obeys CGOS Rules of Play, see go.Position.play_move.
+
+    Args:
+      c: the coordinate to play from.
+      color: the color of the player to play.
+      mutate: if True, plays the move on this position instead of a copy.
+
+    Returns:
+      The position of next move.
+
+    Raises:
+      IllegalMove: if the input c is an illegal move.
+    """
+    if color is None:
+      color = self.to_play
+
+    if c is None:
+      return self.pass_move(mutate=mutate)
+
+    if not self.is_move_legal(c):
+      raise IllegalMove('{} move at {} is illegal: \n{}'.format(
+          'Black' if self.to_play == BLACK else 'White',
+          coords.to_kgs(self.board_size, c), self))
+
+    pos = self if mutate else self.__deepcopy__()
+    flat_c = c[0] * self.board_size + c[1]
+    opp_color = -1 * color
+    potential_ko = all(pos._flat_board[n] == opp_color
+                       for n in pos._neighbors[flat_c])
+
+    pos._add_stone(flat_c, color)
+    captured_stones = []
+    for n in pos._neighbors[flat_c]:
+      root = pos._chain[n]
+      if (root != MISSING_GROUP_ID and pos._flat_board[n] == opp_color and
+          pos._num_libs[root] == 0):
+        captured_stones.extend(pos._remove_chain(root))
+
+    if len(captured_stones) == 1 and potential_ko:
+      new_ko = coords.from_flat(self.board_size, captured_stones[0])
+    else:
+      new_ko = None
+
+    if pos.to_play == BLACK:
+      new_caps = (pos.caps[0] + len(captured_stones), pos.caps[1])
+    else:
+      new_caps = (pos.caps[0], pos.caps[1] + len(captured_stones))
+
+    pos.n += 1
+    pos.caps = new_caps
+    pos.ko = new_ko
+    pos.recent += (PlayerMove(color, c),)
+    pos.board_hashes |= frozenset([pos.zobrist_hash])
+    pos._deltas = (
+        ((flat_c,) + tuple(captured_stones),
+         (color,) * (len(captured_stones) + 1)),
+    ) + pos._deltas[:_NUM_BOARD_DELTAS - 1]
+    pos.to_play *= -1
+    return pos
@@ -0,0 +1,231 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for fast_go."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import copy
+import random
+import time
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import coords
+import fast_go
+import features
+import go
+from go import BLACK, WHITE
+import numpy as np
+import utils_test
+
+EMPTY_ROW = '.' * utils_test.BOARD_SIZE + '\n'
+
+
+def random_game_moves(board_size, num_moves, seed):
+  """Returns the moves of a random game, mostly avoiding filling eyes."""
+  rng = random.Random(seed)
+  position = go.Position(board_size)
+  moves = []
+  while len(moves) < num_moves and not position.is_game_over():
+    legal_moves = np.flatnonzero(position.all_legal_moves()).tolist()
+    candidates = [
+        coords.from_flat(board_size, fc) for fc in legal_moves[:-1]
+        if go.is_eyeish(board_size, position.board,
+                        coords.from_flat(board_size, fc)) is None]
+    move = rng.choice(candidates) if candidates else None
+    moves.append(move)
+    position = position.play_move(move)
+  return moves
+
+
+class TestFastPosition(utils_test.MiniGoUnitTest):
+
+  def assertEqualFastPosition(self, pos, fast_pos):
+    self.assertEqualNPArray(pos.board, fast_pos.board)
+    self.assertEqualNPArray(pos.get_liberties(), fast_pos.get_liberties())
+    self.assertEqualNPArray(pos.board_deltas, fast_pos.board_deltas)
+    self.assertEqualNPArray(pos.all_legal_moves(), fast_pos.all_legal_moves())
+    self.assertEqual(pos.n, fast_pos.n)
+    self.assertEqual(pos.caps, fast_pos.caps)
+    self.assertEqual(pos.ko, fast_pos.ko)
+    self.assertEqual(pos.recent, fast_pos.recent)
+    self.assertEqual(pos.to_play, fast_pos.to_play)
+    self.assertEqual(pos.zobrist_hash, fast_pos.zobrist_hash)
+    self.assertEqual(pos.board_hashes, fast_pos.board_hashes)
+
+  def test_random_games_match_go_position(self):
+    for seed in range(3):
+      pos = go.Position(utils_test.BOARD_SIZE)
+      fast_pos = fast_go.Position(utils_test.BOARD_SIZE)
+      for move in random_game_moves(utils_test.BOARD_SIZE, 200, seed):
+        pos = pos.play_move(move)
+        fast_pos = fast_pos.play_move(move)
+        self.assertEqualFastPosition(pos, fast_pos)
+      self.assertEqual(pos.score(), fast_pos.score())
+      self.assertEqualNPArray(
+          features.extract_features(utils_test.BOARD_SIZE, pos),
+          features.extract_features(utils_test.BOARD_SIZE, fast_pos))
+
+  def test_play_move_does_not_mutate(self):
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE)
+    moves = random_game_moves(utils_test.BOARD_SIZE, 40, seed=1)
+    for move in moves:
+      fast_pos = fast_pos.play_move(move)
+    board = np.copy(fast_pos.board)
+    liberties = fast_pos.get_liberties()
+    zobrist_hash = fast_pos.zobrist_hash
+    for fc in np.flatnonzero(fast_pos.all_legal_moves()):
+      fast_pos.play_move(coords.from_flat(utils_test.BOARD_SIZE, fc))
+    self.assertEqualNPArray(board, fast_pos.board)
+    self.assertEqualNPArray(liberties, fast_pos.get_liberties())
+    self.assertEqual(zobrist_hash, fast_pos.zobrist_hash)
+
+  def test_mutate(self):
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE)
+    same_pos = fast_pos.play_move((0, 0), mutate=True)
+    self.assertIs(fast_pos, same_pos)
+    self.assertEqual(fast_pos.board[0, 0], BLACK)
+    fast_pos.pass_move(mutate=True)
+    self.assertEqual(fast_pos.n, 2)
+    self.assertEqual(fast_pos.to_play, BLACK)
+
+  def test_from_board(self):
+    board = utils_test.load_board('''
+      .XO.XO.OO
+      X.XXOOOO.
+      XXXXXOOOO
+      XXXXXOOOO
+      .XXXXOOO.
+      XXXXXOOOO
+      .XXXXOOO.
+      XXXXXOOOO
+      XXXXOOOOO
+    ''')
+    pos = go.Position(utils_test.BOARD_SIZE, board=board, to_play=BLACK)
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE, board=board,
+                                to_play=BLACK)
+    self.assertEqualFastPosition(pos, fast_pos)
+    for move in ['B9', 'D9', 'G9', 'A9']:
+      c = coords.from_kgs(utils_test.BOARD_SIZE, move)
+      self.assertEqual(pos.is_move_legal(c), fast_pos.is_move_legal(c))
+
+  def test_ko(self):
+    start_board = utils_test.load_board('''
+      .OX......
+      OX.......
+    ''' + EMPTY_ROW * 7)
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE, board=start_board,
+                                to_play=BLACK)
+    fast_pos = fast_pos.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'A9'))
+    self.assertEqual(fast_pos.ko, coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+    self.assertEqual(fast_pos.caps, (1, 0))
+    with self.assertRaises(go.IllegalMove):
+      fast_pos.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+    fast_pos = fast_pos.play_move(None)
+    self.assertIsNone(fast_pos.ko)
+    # Retaking after two passes recreates the start board (superko).
+    fast_pos = fast_pos.play_move(None)
+    with self.assertRaises(go.IllegalMove):
+      fast_pos.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+
+  def test_positional_superko_matches_go_position(self):
+    start_board = utils_test.load_board('''
+      .OX......
+      OX.......
+    ''' + EMPTY_ROW * 7)
+    start_position = go.Position(utils_test.BOARD_SIZE, board=start_board,
+                                 to_play=BLACK)
+    a9 = coords.from_kgs(utils_test.BOARD_SIZE, 'A9')
+    e5 = coords.from_kgs(utils_test.BOARD_SIZE, 'E5')
+    # A capturing and a plain move which both repeat an earlier board.
+    board_hashes = frozenset([start_position.zobrist_hash,
+                              start_position.play_move(a9).zobrist_hash,
+                              start_position.play_move(e5).zobrist_hash])
+    pos = go.Position(utils_test.BOARD_SIZE, board=start_board,
+                      to_play=BLACK, board_hashes=board_hashes)
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE, board=start_board,
+                                to_play=BLACK, board_hashes=board_hashes)
+    self.assertEqualFastPosition(pos, fast_pos)
+    legal_moves = fast_pos.all_legal_moves()
+    for move in [a9, e5]:
+      self.assertEqual(
+          legal_moves[coords.to_flat(utils_test.BOARD_SIZE, move)], 0)
+    self.assertEqual(np.sum(legal_moves),
+                     np.sum(start_position.all_legal_moves()) - 2)
+
+  def test_suicide(self):
+    board = utils_test.load_board('''
+      .X.......
+      X........
+    ''' + EMPTY_ROW * 7)
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE, board=board,
+                                to_play=WHITE)
+    with self.assertRaises(go.IllegalMove):
+      fast_pos.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'A9'))
+
+  def test_zobrist_hash(self):
+    moves = random_game_moves(utils_test.BOARD_SIZE, 60, seed=2)
+    fast_pos = fast_go.Position(utils_test.BOARD_SIZE)
+    for move in moves:
+      fast_pos = fast_pos.play_move(move)
+    from_board = fast_go.Position(utils_test.BOARD_SIZE, board=fast_pos.board)
+    self.assertEqual(fast_pos.zobrist_hash, from_board.zobrist_hash)
+    self.assertNotEqual(fast_pos.zobrist_hash,
+                        fast_go.Position(utils_test.BOARD_SIZE).zobrist_hash)
+
+
+class FastPositionBenchmark(tf.test.Benchmark):
+
+  def _benchmark_moves_per_second(self, name, position_fn, board_size, moves,
+                                  baseline_wall_time=None):
+    start_time = time.time()
+    num_moves = 0
+    for _ in range(3):
+      position = position_fn(board_size)
+      for move in moves:
+        # Like MCTS, play every move on a copy of the position.
+        position = position.play_move(move)
+        num_moves += 1
+    wall_time = (time.time() - start_time) / num_moves
+    extras = {'moves_per_second': 1.0 / wall_time}
+    if baseline_wall_time is not None:
+      extras['speedup'] = baseline_wall_time / wall_time
+    self.report_benchmark(
+        name=name, iters=num_moves, wall_time=wall_time, extras=extras)
+    return wall_time
+
+  def benchmark_play_move(self):
+    for board_size in [9, 19]:
+      moves = random_game_moves(board_size, board_size * board_size, seed=0)
+      go_wall_time = self._benchmark_moves_per_second(
+          'go_position_%d' % board_size, go.Position, board_size, moves)
+      self._benchmark_moves_per_second(
+          'fast_go_position_%d' % board_size, fast_go.Position, board_size,
+          moves, baseline_wall_time=go_wall_time)
+
+  def benchmark_copy(self):
+    position = fast_go.Position(19)
+    for move in random_game_moves(19, 100, seed=0):
+      position = position.play_move(move)
+    start_time = time.time()
+    for _ in range(1000):
+      copy.deepcopy(position)
+    self.report_benchmark(name='fast_go_copy_19', iters=1000,
+                          wall_time=(time.time() - start_time) / 1000)
+
+
+if __name__ == '__main__':
+  tf.test.main()
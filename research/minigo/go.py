@@ -29,6 +29,7 @@ from __future__ import print_function
 from collections import namedtuple
 import copy
 import itertools
+import random
 
 import coords
 import numpy as np
@@ -63,6 +64,52 @@ def get_neighbors_diagonals(board_size):
   return neighbors, diagonals
 
 
+_ZOBRIST_TABLES = {}
+
+
+def get_zobrist_table(board_size):
+  """Return the Zobrist keys of stones on a go board.
+
+  The hash of a board is the xor of the keys of all of its stones. The keys are
+  generated from a fixed seed, so hashes agree across processes.
+
+  Args:
+    board_size: the go board size.
+
+  Returns:
+    A dict mapping BLACK and WHITE to lists of board_size ** 2 random 64 bit
+    integers, one per flattened coordinate.
+  """
+  if board_size not in _ZOBRIST_TABLES:
+    rng = random.Random(board_size)
+    _ZOBRIST_TABLES[board_size] = {
+        color: [rng.getrandbits(64) for _ in range(board_size * board_size)]
+        for color in (BLACK, WHITE)}
+  return _ZOBRIST_TABLES[board_size]
+
+
+def get_zobrist_hash(board_size, board):
+  """Return the Zobrist hash of a board, the xor of the keys of its stones."""
+  zobrist_table = get_zobrist_table(board_size)
+  zobrist_hash = 0
+  for color in (BLACK, WHITE):
+    for c in np.flatnonzero(board == color):
+      zobrist_hash ^= zobrist_table[color][c]
+  return zobrist_hash
+
+
+_ZOBRIST_ARRAYS = {}
+
+
+def _get_zobrist_arrays(board_size):
+  """Return the Zobrist keys of get_zobrist_table as uint64 numpy arrays."""
+  if board_size not in _ZOBRIST_ARRAYS:
+    _ZOBRIST_ARRAYS[board_size] = {
+        color: np.array(keys, dtype=np.uint64)
+        for color, keys in get_zobrist_table(board_size).items()}
+  return _ZOBRIST_ARRAYS[board_size]
+
+
 class IllegalMove(Exception):
   pass
 
@@ -315,7 +362,8 @@ class Position(object):
 
   def __init__(self, board_size, board=None, n=0, komi=7.5, caps=(0, 0),
                lib_tracker=None, ko=None, recent=tuple(),
-               board_deltas=None, to_play=BLACK):
+               board_deltas=None, to_play=BLACK, zobrist_hash=None,
+               board_hashes=None):
     """Initialize position class.
 
     Args:
@@ -331,6 +379,10 @@ class Position(object):
         made to the board at each move (played move and captures).
         Should satisfy next_pos.board - next_pos.board_deltas[0] == pos.board
       to_play: BLACK or WHITE
+      zobrist_hash: the Zobrist hash of board, see get_zobrist_hash.
+      board_hashes: a frozenset with the Zobrist hashes of all boards of the
+        game so far, including the current one. Moves recreating any of these
+        boards are illegal (positional superko).
     """
     if not isinstance(recent, tuple):
       raise TypeError('Recent must be a tuple!')
@@ -347,6 +399,10 @@ class Position(object):
     self.board_deltas = (board_deltas if board_deltas is not None else
                          -np.zeros([0, board_size, board_size], dtype=np.int8))
     self.to_play = to_play
+    self.zobrist_hash = (zobrist_hash if zobrist_hash is not None else
+                         get_zobrist_hash(board_size, self.board))
+    self.board_hashes = (board_hashes if board_hashes is not None else
+                         frozenset([self.zobrist_hash]))
     self.last_eight = None
     self.neighbors, _ = get_neighbors_diagonals(board_size)
 
@@ -355,7 +411,8 @@ class Position(object):
     new_lib_tracker = copy.deepcopy(self.lib_tracker)
     return Position(
         self.board_size, new_board, self.n, self.komi, self.caps,
-        new_lib_tracker, self.ko, self.recent, self.board_deltas, self.to_play)
+        new_lib_tracker, self.ko, self.recent, self.board_deltas, self.to_play,
+        self.zobrist_hash, self.board_hashes)
 
   def __str__(self):
     pretty_print_map = {
@@ -408,8 +465,45 @@ class Position(object):
     potential_libs -= set([move])
     return not potential_libs
 
+  def _capture_zobrist_deltas(self):
+    """Return the hash changes from captures by the player to play.
+
+    Returns:
+      A dict mapping the flattened coordinates of moves that capture stones to
+      the xor of the Zobrist keys of the captured stones.
+    """
+    zobrist_keys = get_zobrist_table(self.board_size)[-self.to_play]
+    deltas = {}
+    for group in self.lib_tracker.groups.values():
+      if group.color != self.to_play and len(group.liberties) == 1:
+        (liberty,) = group.liberties
+        fc = coords.to_flat(self.board_size, liberty)
+        for s in group.stones:
+          deltas[fc] = deltas.get(fc, 0) ^ zobrist_keys[
+              coords.to_flat(self.board_size, s)]
+    return deltas
+
+  def is_move_superko(self, move):
+    """Checks if a move on an empty space would recreate an earlier board."""
+    zobrist_table = get_zobrist_table(self.board_size)
+    zobrist_hash = self.zobrist_hash ^ zobrist_table[self.to_play][
+        coords.to_flat(self.board_size, move)]
+    captured_group_ids = set()
+    for n in self.neighbors[move]:
+      group_id = self.lib_tracker.group_index[n]
+      if group_id != MISSING_GROUP_ID:
+        group = self.lib_tracker.groups[group_id]
+        if group.color != self.to_play and len(group.liberties) == 1:
+          captured_group_ids.add(group_id)
+    for group_id in captured_group_ids:
+      for s in self.lib_tracker.groups[group_id].stones:
+        zobrist_hash ^= zobrist_table[-self.to_play][
+            coords.to_flat(self.board_size, s)]
+    return zobrist_hash in self.board_hashes
+
   def is_move_legal(self, move):
-    """Checks that a move is on an empty space, not on ko, and not suicide."""
+    """Checks that a move is on an empty space, not on ko, not suicide, and
+    does not repeat an earlier board (positional superko)."""
     if move is None:
       return True
     if self.board[move] != EMPTY:
@@ -418,6 +512,8 @@ class Position(object):
       return False
     if self.is_move_suicidal(move):
       return False
+    if self.is_move_superko(move):
+      return False
 
     return True
 
@@ -447,6 +543,23 @@ class Position(object):
     if self.ko is not None:
       legal_moves[self.ko] = 0
 
+    # ...as is recreating an earlier board. The hash after a move is the
+    # current hash xor the key of the new stone xor the keys of the captured
+    # stones, the latter only for the few moves which capture.
+    if len(self.board_hashes) > 1:
+      move_hashes = (np.uint64(self.zobrist_hash) ^
+                     _get_zobrist_arrays(self.board_size)[self.to_play])
+      for fc, zobrist_delta in self._capture_zobrist_deltas().items():
+        move_hashes[fc] ^= np.uint64(zobrist_delta)
+      flat_legal_moves = legal_moves.ravel()
+      candidates = np.flatnonzero(flat_legal_moves)
+      candidate_hashes = move_hashes[candidates].tolist()
+      # Repetitions are rare, only look for them if there is one.
+      if not self.board_hashes.isdisjoint(candidate_hashes):
+        for fc, zobrist_hash in zip(candidates.tolist(), candidate_hashes):
+          if zobrist_hash in self.board_hashes:
+            flat_legal_moves[fc] = 0
+
     # and pass is always legal
     return np.concatenate([legal_moves.ravel(), [1]])
 
@@ -476,7 +589,7 @@ class Position(object):
     In short:
     No suicides
     Chinese/area scoring
-    Positional superko (this is very crudely approximate at the moment.)
+    Positional superko, using the Zobrist hashes of all earlier boards.
 
     Args:
       c: the coordinate to play from.
@@ -511,6 +624,13 @@ class Position(object):
 
     opp_color = -1 * color
 
+    zobrist_table = get_zobrist_table(self.board_size)
+    pos.zobrist_hash ^= zobrist_table[color][coords.to_flat(self.board_size, c)]
+    for s in captured_stones:
+      pos.zobrist_hash ^= zobrist_table[opp_color][
+          coords.to_flat(self.board_size, s)]
+    pos.board_hashes |= frozenset([pos.zobrist_hash])
+
     new_board_delta = np.zeros([self.board_size, self.board_size],
                                dtype=np.int8)
     new_board_delta[c] = color
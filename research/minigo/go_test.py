@@ -585,24 +585,89 @@ class TestPosition(utils_test.MiniGoUnitTest):
     # Check that retaking ko is illegal until two intervening moves
     with self.assertRaises(go.IllegalMove):
       actual_position.play_move(coords.from_kgs(utils_test.BOARD_SIZE, 'B9'))
+    # ...which change the board: after two passes the retake would recreate
+    # the start board, which positional superko forbids.
+    b9 = coords.from_kgs(utils_test.BOARD_SIZE, 'B9')
     pass_twice = actual_position.pass_move().pass_move()
-    ko_delayed_retake = pass_twice.play_move(coords.from_kgs(
-        utils_test.BOARD_SIZE, 'B9'))
+    self.assertFalse(pass_twice.is_move_legal(b9))
+    self.assertEqual(
+        pass_twice.all_legal_moves()[coords.to_flat(utils_test.BOARD_SIZE, b9)],
+        0)
+    with self.assertRaises(go.IllegalMove):
+      pass_twice.play_move(b9)
+    two_moves = actual_position.play_move(
+        coords.from_kgs(utils_test.BOARD_SIZE, 'E5')).play_move(
+            coords.from_kgs(utils_test.BOARD_SIZE, 'E1'))
+    ko_delayed_retake = two_moves.play_move(b9)
+    expected_board = utils_test.load_board('''
+      .OX......
+      OX.......
+      .........
+      .........
+      ....O....
+      .........
+      .........
+      .........
+      ....X....
+    ''')
     expected_position = Position(
         utils_test.BOARD_SIZE,
-        board=start_board,
+        board=expected_board,
         n=4,
         komi=6.5,
         caps=(2, 3),
         ko=coords.from_kgs(utils_test.BOARD_SIZE, 'A9'),
         recent=(
             PlayerMove(BLACK, coords.from_kgs(utils_test.BOARD_SIZE, 'A9')),
-            PlayerMove(WHITE, None),
-            PlayerMove(BLACK, None),
-            PlayerMove(WHITE, coords.from_kgs(utils_test.BOARD_SIZE, 'B9')),),
+            PlayerMove(WHITE, coords.from_kgs(utils_test.BOARD_SIZE, 'E5')),
+            PlayerMove(BLACK, coords.from_kgs(utils_test.BOARD_SIZE, 'E1')),
+            PlayerMove(WHITE, b9),),
         to_play=BLACK)
     self.assertEqualPositions(ko_delayed_retake, expected_position)
 
+  def test_positional_superko(self):
+    start_board = utils_test.load_board('''
+      .OX......
+      OX.......
+    ''' + EMPTY_ROW * 7)
+    start_position = Position(utils_test.BOARD_SIZE, board=start_board,
+                              to_play=BLACK)
+    a9 = coords.from_kgs(utils_test.BOARD_SIZE, 'A9')
+    e5 = coords.from_kgs(utils_test.BOARD_SIZE, 'E5')
+    capture_hash = start_position.play_move(a9).zobrist_hash
+    placement_hash = start_position.play_move(e5).zobrist_hash
+    # Pretend that the boards after both moves occurred earlier in the game.
+    position = Position(
+        utils_test.BOARD_SIZE, board=start_board, to_play=BLACK,
+        board_hashes=frozenset([start_position.zobrist_hash, capture_hash,
+                                placement_hash]))
+    legal_moves = position.all_legal_moves()
+    for move in [a9, e5]:
+      self.assertFalse(position.is_move_legal(move))
+      self.assertEqual(
+          legal_moves[coords.to_flat(utils_test.BOARD_SIZE, move)], 0)
+      with self.assertRaises(go.IllegalMove):
+        position.play_move(move)
+    expected_legal_moves = start_position.all_legal_moves()
+    expected_legal_moves[coords.to_flat(utils_test.BOARD_SIZE, a9)] = 0
+    expected_legal_moves[coords.to_flat(utils_test.BOARD_SIZE, e5)] = 0
+    self.assertEqualNPArray(legal_moves, expected_legal_moves)
+
+  def test_zobrist_hash(self):
+    position = Position(utils_test.BOARD_SIZE)
+    self.assertEqual(position.zobrist_hash, 0)
+    self.assertEqual(position.board_hashes, frozenset([0]))
+    for move in ['E5', 'C3', 'D4', 'C4']:
+      position = position.play_move(
+          coords.from_kgs(utils_test.BOARD_SIZE, move))
+    self.assertEqual(
+        position.zobrist_hash,
+        go.get_zobrist_hash(utils_test.BOARD_SIZE, position.board))
+    self.assertEqual(len(position.board_hashes), 5)
+    passed = position.pass_move()
+    self.assertEqual(passed.zobrist_hash, position.zobrist_hash)
+    self.assertEqual(passed.board_hashes, position.board_hashes)
+
   def test_is_game_over(self):
     root = go.Position(utils_test.BOARD_SIZE)
     self.assertFalse(root.is_game_over())
@@ -0,0 +1,163 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""An LRU cache of network evaluations, shared by MCTS trees and games.
+
+MCTS reaches the same position through different move orders, and self-play
+games of the same model repeat their openings. CachedNetwork wraps a network
+(e.g. a DualNetRunner) and only sends the positions it has not evaluated yet to
+run_many.
+
+The network output depends on the features of a position, i.e. on the last
+eight boards and the color to play (see features.py), and on the symmetry
+applied to the features. The cache key is made of the Zobrist hash of the
+board, the board deltas of the older boards, the color to play and the
+symmetry.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import random
+
+import symmetries
+
+# The number of board deltas from which features.stone_features computes the
+# last eight boards.
+_NUM_FEATURE_DELTAS = 7
+
+
+def position_key(position):
+  """Returns a hashable key which identifies the features of a position."""
+  return (position.zobrist_hash, position.to_play,
+          position.board_deltas[:_NUM_FEATURE_DELTAS].tobytes())
+
+
+class EvaluationCache(object):
+  """An LRU cache of (move probabilities, value) network outputs."""
+
+  def __init__(self, max_size):
+    """Initialize the cache.
+
+    Args:
+      max_size: the maximum number of cached evaluations. The least recently
+        used evaluation is evicted when the cache is full.
+    """
+    self.max_size = max_size
+    self.hits = 0
+    self.misses = 0
+    self._evaluations = collections.OrderedDict()
+
+  def __len__(self):
+    return len(self._evaluations)
+
+  @property
+  def hit_rate(self):
+    lookups = self.hits + self.misses
+    return self.hits / lookups if lookups else 0.0
+
+  def get(self, key):
+    """Returns the cached evaluation for key, or None on a miss."""
+    evaluation = self._evaluations.get(key)
+    if evaluation is None:
+      self.misses += 1
+    else:
+      self.hits += 1
+      self._evaluations.move_to_end(key)
+    return evaluation
+
+  def put(self, key, move_probabilities, value):
+    """Caches an evaluation. The probabilities must not be modified after."""
+    self._evaluations[key] = (move_probabilities, value)
+    self._evaluations.move_to_end(key)
+    while len(self._evaluations) > self.max_size:
+      self._evaluations.popitem(last=False)
+
+  def clear(self):
+    self._evaluations.clear()
+    self.hits = 0
+    self.misses = 0
+
+
+class CachedNetwork(object):
+  """A network whose evaluations are looked up in an EvaluationCache first.
+
+  It has the run/run_many interface of DualNetRunner. The wrapped network must
+  accept a `symmetries_used` argument in run_many, like DualNetRunner.
+  """
+
+  def __init__(self, network, cache=None, max_size=100000):
+    """Initialize the cached network.
+
+    Args:
+      network: the network to evaluate positions which are not in the cache.
+      cache: an EvaluationCache, possibly shared with other CachedNetworks. If
+        None, a new cache with max_size entries is created.
+      max_size: the size of the new cache, if cache is None.
+    """
+    self.network = network
+    self.cache = cache if cache is not None else EvaluationCache(max_size)
+
+  def __getattr__(self, name):
+    # Other attributes, e.g. save_file, are those of the wrapped network.
+    if name == 'network':
+      raise AttributeError(name)
+    return getattr(self.network, name)
+
+  def run(self, position, use_random_symmetry=True):
+    probs, values = self.run_many(
+        [position], use_random_symmetry=use_random_symmetry)
+    return probs[0], values[0]
+
+  def run_many(self, positions, use_random_symmetry=True):
+    """Compute the policy and value output for given positions.
+
+    Args:
+      positions: A list of positions for go board status
+      use_random_symmetry: Apply a random symmetry to the features of every
+        position. The symmetry is chosen before the cache lookup, so a cached
+        evaluation is only reused for the same symmetry.
+
+    Returns:
+      probabilities, value: lists of the policy and value outputs.
+    """
+    if use_random_symmetry:
+      symmetries_used = [random.choice(symmetries.SYMMETRIES)
+                         for _ in positions]
+    else:
+      symmetries_used = ['identity'] * len(positions)
+    keys = [position_key(position) + (s,)
+            for position, s in zip(positions, symmetries_used)]
+    evaluations = [self.cache.get(key) for key in keys]
+
+    # Evaluate the missing positions, once each even if repeated in the batch.
+    missing = collections.OrderedDict()
+    for i, (key, evaluation) in enumerate(zip(keys, evaluations)):
+      if evaluation is None:
+        missing.setdefault(key, i)
+    if missing:
+      indices = list(missing.values())
+      probs, values = self.network.run_many(
+          [positions[i] for i in indices],
+          symmetries_used=[symmetries_used[i] for i in indices])
+      new_evaluations = {}
+      for key, prob, value in zip(missing.keys(), probs, values):
+        self.cache.put(key, prob, value)
+        new_evaluations[key] = (prob, value)
+      evaluations = [new_evaluations[key] if evaluation is None else evaluation
+                     for key, evaluation in zip(keys, evaluations)]
+
+    return ([prob for prob, _ in evaluations],
+            [value for _, value in evaluations])
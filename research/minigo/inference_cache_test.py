@@ -0,0 +1,142 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for inference_cache."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import coords
+import go
+import inference_cache
+import numpy as np
+from strategies import MCTSPlayerMixin
+import utils_test
+
+
+class CountingNet(object):
+  """A fake network which records the positions and symmetries it evaluates."""
+
+  def __init__(self):
+    self.positions = []
+    self.symmetries_used = []
+
+  def run_many(self, positions, symmetries_used):
+    self.positions.extend(positions)
+    self.symmetries_used.extend(symmetries_used)
+    probs = np.ones([len(positions), utils_test.BOARD_SIZE ** 2 + 1],
+                    dtype=np.float32) / (utils_test.BOARD_SIZE ** 2 + 1)
+    values = np.array([p.n / 100 for p in positions], dtype=np.float32)
+    return probs, values
+
+
+def play_moves(position, moves):
+  for move in moves:
+    position = position.play_move(coords.from_kgs(utils_test.BOARD_SIZE, move))
+  return position
+
+
+class TestInferenceCache(utils_test.MiniGoUnitTest):
+
+  def test_transpositions_hit_cache(self):
+    network = CountingNet()
+    cached = inference_cache.CachedNetwork(network)
+    root = go.Position(utils_test.BOARD_SIZE)
+    # The same board after different move orders.
+    pos1 = play_moves(root, ['E5', 'C3', 'D4', 'C4'])
+    pos2 = play_moves(root, ['D4', 'C3', 'E5', 'C4'])
+    self.assertEqual(pos1.zobrist_hash, pos2.zobrist_hash)
+    prob, value = cached.run(pos1, use_random_symmetry=False)
+    self.assertEqual(len(network.positions), 1)
+    # Different history, so different features: a miss.
+    cached.run(pos2, use_random_symmetry=False)
+    self.assertEqual(len(network.positions), 2)
+    # The same position again: a hit.
+    same_prob, same_value = cached.run(
+        play_moves(root, ['E5', 'C3', 'D4', 'C4']), use_random_symmetry=False)
+    self.assertEqual(len(network.positions), 2)
+    self.assertIs(prob, same_prob)
+    self.assertEqual(value, same_value)
+    self.assertEqual(cached.cache.hits, 1)
+    self.assertEqual(cached.cache.misses, 2)
+    self.assertAlmostEqual(cached.cache.hit_rate, 1 / 3)
+
+  def test_forwards_network_attributes(self):
+    network = CountingNet()
+    network.save_file = '/tmp/minigo/000001-model'
+    cached = inference_cache.CachedNetwork(network)
+    self.assertEqual(cached.save_file, network.save_file)
+
+  def test_key_includes_features(self):
+    root = go.Position(utils_test.BOARD_SIZE)
+    position = play_moves(root, ['E5'])
+    key = inference_cache.position_key(position)
+    self.assertEqual(key, inference_cache.position_key(
+        play_moves(root, ['E5'])))
+    self.assertNotEqual(key, inference_cache.position_key(
+        position.pass_move()))
+    # Same board and color to play, but one more board in the history.
+    self.assertNotEqual(
+        inference_cache.position_key(position.pass_move().pass_move()), key)
+
+  def test_run_many_deduplicates_and_keys_symmetries(self):
+    network = CountingNet()
+    cached = inference_cache.CachedNetwork(network)
+    position = play_moves(go.Position(utils_test.BOARD_SIZE), ['E5'])
+    probs, values = cached.run_many([position] * 3, use_random_symmetry=False)
+    self.assertEqual(len(probs), 3)
+    self.assertEqual(len(values), 3)
+    self.assertEqual(network.symmetries_used, ['identity'])
+    for _ in range(100):
+      cached.run(position)
+    self.assertLessEqual(len(network.positions), 9)
+    self.assertEqual(len(set(network.symmetries_used)), len(network.positions))
+
+  def test_lru_eviction(self):
+    cache = inference_cache.EvaluationCache(max_size=2)
+    prob = np.zeros([utils_test.BOARD_SIZE ** 2 + 1])
+    cache.put('a', prob, 0.1)
+    cache.put('b', prob, 0.2)
+    self.assertIsNotNone(cache.get('a'))
+    cache.put('c', prob, 0.3)
+    self.assertEqual(len(cache), 2)
+    self.assertIsNone(cache.get('b'))
+    self.assertEqual(cache.get('a')[1], 0.1)
+    self.assertEqual(cache.get('c')[1], 0.3)
+    cache.clear()
+    self.assertEqual(len(cache), 0)
+    self.assertEqual(cache.hit_rate, 0.0)
+
+  def test_shared_across_games(self):
+    network = CountingNet()
+    cache = inference_cache.EvaluationCache(max_size=10000)
+    num_evaluations = []
+    for _ in range(2):
+      player = MCTSPlayerMixin(
+          utils_test.BOARD_SIZE,
+          inference_cache.CachedNetwork(network, cache))
+      player.initialize_game()
+      for _ in range(10):
+        player.tree_search()
+      num_evaluations.append(len(network.positions))
+    # The second game only evaluates positions with new symmetries.
+    self.assertGreater(cache.hits, 0)
+    self.assertLess(num_evaluations[1] - num_evaluations[0],
+                    num_evaluations[0])
+
+
+if __name__ == '__main__':
+  tf.test.main()
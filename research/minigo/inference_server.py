@@ -0,0 +1,239 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""An inference server process shared by self-play worker processes.
+
+The server process loads the network once. Workers play games with a
+RemoteDualNetRunner, which extracts the features of positions in the worker and
+sends them to the server over a queue. The server waits for a request from every
+active worker (or for batch_timeout seconds after the first request), runs all
+requests as a single batch and sends every worker its part of the outputs.
+
+Usage:
+  server = inference_server.InferenceServer(
+      functools.partial(dualnet.DualNetRunner, model_path, params), num_workers)
+  server.start()
+  # In worker process i:
+  network = server.client(i, model_path, params)
+  ... play games with network ...
+  network.close()
+  # Back in the main process:
+  server.join()
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import dualnet
+import numpy as np
+from six.moves import queue
+
+
+# How often blocked processes check that the processes they wait for are alive.
+_POLL_INTERVAL_SECS = 1.0
+
+
+class ServerError(object):
+  """Sent to the workers instead of outputs when the server failed."""
+
+  def __init__(self, message):
+    self.message = message
+
+
+def spawn_context():
+  """Returns a multiprocessing context that spawns processes, if supported.
+
+  Spawned processes share no TensorFlow state with their parent. Python 2 can
+  only fork processes.
+  """
+  if hasattr(multiprocessing, 'get_context'):
+    return multiprocessing.get_context('spawn')
+  return multiprocessing
+
+
+def _serve(network_fn, request_queue, response_queues, batch_timeout,
+           parent_pid):
+  """Runs inference requests until every worker has closed its client."""
+  try:
+    _serve_requests(network_fn, request_queue, response_queues, batch_timeout,
+                    parent_pid)
+  except Exception:
+    # Fail the pending and future requests of the workers instead of leaving
+    # them waiting for outputs.
+    error = ServerError(traceback.format_exc())
+    for response_queue in response_queues:
+      response_queue.put(error)
+    raise
+
+
+def _serve_requests(network_fn, request_queue, response_queues, batch_timeout,
+                    parent_pid):
+  """Batches and runs the requests of the workers. See _serve."""
+  network = network_fn()
+  active_workers = set(range(len(response_queues)))
+  num_batches = 0
+  num_positions = 0
+  while active_workers:
+    requests = []
+    deadline = None
+    while len(requests) < len(active_workers):
+      if deadline is None:
+        timeout = _POLL_INTERVAL_SECS
+      else:
+        timeout = max(0.0, deadline - time.time())
+      try:
+        worker_index, processed = request_queue.get(timeout=timeout)
+      except queue.Empty:
+        if deadline is not None:
+          break
+        # Orphaned processes are adopted by another process.
+        if os.getppid() != parent_pid:
+          raise RuntimeError('The parent of the inference server exited.')
+        continue
+      # Workers are closed by their client, or dropped by the parent process
+      # when they exit, so a worker may be closed twice.
+      if worker_index not in active_workers:
+        continue
+      if processed is None:
+        active_workers.discard(worker_index)
+        requests = [r for r in requests if r[0] != worker_index]
+        continue
+      if deadline is None:
+        deadline = time.time() + batch_timeout
+      requests.append((worker_index, processed))
+    if not requests:
+      continue
+
+    probabilities, values = network.run_features(
+        np.concatenate([processed for _, processed in requests]))
+    offset = 0
+    for worker_index, processed in requests:
+      end = offset + len(processed)
+      response_queues[worker_index].put(
+          (probabilities[offset:end], values[offset:end]))
+      offset = end
+    num_batches += 1
+    num_positions += offset
+  print('Inference server: %d batches of %.1f positions on average' % (
+      num_batches, num_positions / max(num_batches, 1)), file=sys.stderr)
+
+
+class RemoteDualNetRunner(dualnet.DualNetRunner):
+  """A DualNetRunner whose inference runs in an InferenceServer.
+
+  Features and symmetries are computed in the worker, as in DualNetRunner.
+  It has no graph or session of its own.
+
+  If the server fails, run_features raises a RuntimeError instead of waiting for
+  outputs. A server process that is killed is only detected by clients in the
+  process that started it; the clients of worker processes rely on that process
+  to terminate them (see minigo._selfplay_with_workers).
+  """
+
+  def __init__(self, save_file, params, worker_index, request_queue,
+               response_queue, server_process=None):
+    # pylint: disable=super-init-not-called
+    self.save_file = save_file
+    self.hparams = params
+    self.worker_index = worker_index
+    self.request_queue = request_queue
+    self.response_queue = response_queue
+    self._server_process = server_process
+
+  def __getstate__(self):
+    # Processes can only be checked by the process that started them.
+    state = self.__dict__.copy()
+    state['_server_process'] = None
+    return state
+
+  def run_features(self, processed):
+    self.request_queue.put((self.worker_index, np.asarray(processed)))
+    while True:
+      try:
+        response = self.response_queue.get(timeout=_POLL_INTERVAL_SECS)
+      except queue.Empty:
+        if (self._server_process is not None and
+            not self._server_process.is_alive()):
+          raise RuntimeError('The inference server exited with code %s.' %
+                             self._server_process.exitcode)
+        continue
+      if isinstance(response, ServerError):
+        raise RuntimeError('The inference server failed:\n' + response.message)
+      return response
+
+  def close(self):
+    """Tells the server that this worker will not send more requests."""
+    self.request_queue.put((self.worker_index, None))
+
+
+class InferenceServer(object):
+  """Batches the inference requests of worker processes in one process."""
+
+  def __init__(self, network_fn, num_workers, batch_timeout=0.01):
+    """Initialize the server.
+
+    Args:
+      network_fn: a picklable function returning the network used for
+        inference, with a DualNetRunner-like run_features method. It is called
+        in the server process.
+      num_workers: the number of worker processes (clients).
+      batch_timeout: the maximum number of seconds to wait for the requests of
+        other workers after receiving a request.
+    """
+    # Processes are spawned if possible, so that no TensorFlow state is forked.
+    context = spawn_context()
+    self._request_queue = context.Queue()
+    self._response_queues = [context.Queue() for _ in range(num_workers)]
+    self._process = context.Process(
+        target=_serve,
+        args=(network_fn, self._request_queue, self._response_queues,
+              batch_timeout, os.getpid()))
+
+  def start(self):
+    self._process.start()
+
+  def client(self, worker_index, save_file, params):
+    """Returns the RemoteDualNetRunner of a worker, to pass to its process."""
+    return RemoteDualNetRunner(save_file, params, worker_index,
+                               self._request_queue,
+                               self._response_queues[worker_index],
+                               server_process=self._process)
+
+  def drop_worker(self, worker_index):
+    """Closes the client of a worker whose process has exited.
+
+    The server stops waiting for the requests of the worker, whether or not the
+    worker closed its client before exiting.
+    """
+    self._request_queue.put((worker_index, None))
+
+  def is_alive(self):
+    return self._process.is_alive()
+
+  @property
+  def exitcode(self):
+    return self._process.exitcode
+
+  def terminate(self):
+    self._process.terminate()
+
+  def join(self, timeout=None):
+    """Waits until all clients are closed and the server has exited."""
+    self._process.join(timeout)
@@ -0,0 +1,168 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for inference_server."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import threading
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import features
+import go
+import inference_server
+import model_params
+import numpy as np
+import utils_test
+
+
+class FeatureNet(object):
+  """Returns the stones of the player to play as policy, the batch size as value.
+
+  Runs in the server process, so it must be picklable.
+  """
+
+  def run_features(self, processed):
+    processed = np.asarray(processed)
+    num_positions = processed.shape[0]
+    probabilities = np.concatenate(
+        [processed[:, :, :, 0].reshape(num_positions, -1),
+         np.zeros([num_positions, 1])], axis=1)
+    values = np.full([num_positions], num_positions, dtype=np.float32)
+    return probabilities, values
+
+
+class FailingNet(object):
+  """Fails to run features, like a network that cannot be loaded."""
+
+  def run_features(self, processed):
+    raise ValueError('Failed to run features')
+
+
+def _fail_to_load_network():
+  raise IOError('Failed to load the model')
+
+
+class TestInferenceServer(utils_test.MiniGoUnitTest):
+
+  def setUp(self):
+    self.params = model_params.DummyMiniGoParams()
+    self.positions = [
+        go.Position(utils_test.BOARD_SIZE).play_move(
+            (i % utils_test.BOARD_SIZE, i // utils_test.BOARD_SIZE))
+        for i in range(6)]
+
+  def expected_probabilities(self, positions):
+    processed = [features.extract_features(utils_test.BOARD_SIZE, p)
+                 for p in positions]
+    return FeatureNet().run_features(processed)[0]
+
+  def test_run_many(self):
+    server = inference_server.InferenceServer(FeatureNet, num_workers=1)
+    server.start()
+    network = server.client(0, 'model', self.params)
+    probabilities, values = network.run_many(
+        self.positions, use_random_symmetry=False)
+    self.assertEqualNPArray(probabilities,
+                            self.expected_probabilities(self.positions))
+    self.assertEqualNPArray(values, [len(self.positions)] * 6)
+    # Symmetries are inverted in the worker.
+    probabilities, _ = network.run_many(
+        self.positions, symmetries_used=['rot90'] * 6)
+    self.assertAllClose(probabilities,
+                        self.expected_probabilities(self.positions))
+    probability, value = network.run(self.positions[0])
+    self.assertEqualNPArray(probability,
+                            self.expected_probabilities(self.positions[:1])[0])
+    self.assertEqual(value, 1)
+    network.close()
+    server.join()
+
+  def test_batches_across_workers(self):
+    num_workers = 3
+    # A long timeout, so that the requests of all workers are batched.
+    server = inference_server.InferenceServer(
+        FeatureNet, num_workers, batch_timeout=60)
+    server.start()
+    results = [None] * num_workers
+
+    def _worker(worker_index):
+      network = server.client(worker_index, 'model', self.params)
+      positions = self.positions[:worker_index + 1]
+      results[worker_index] = network.run_many(
+          positions, use_random_symmetry=False)
+      network.close()
+
+    threads = [threading.Thread(target=_worker, args=(i,))
+               for i in range(num_workers)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    server.join()
+    for worker_index, (probabilities, values) in enumerate(results):
+      self.assertEqualNPArray(
+          probabilities,
+          self.expected_probabilities(self.positions[:worker_index + 1]))
+      # All 1 + 2 + 3 positions were evaluated in one batch.
+      self.assertEqualNPArray(values, [6] * (worker_index + 1))
+
+
+  def test_network_fn_raises(self):
+    server = inference_server.InferenceServer(
+        _fail_to_load_network, num_workers=1)
+    server.start()
+    network = server.client(0, 'model', self.params)
+    with self.assertRaisesRegex(RuntimeError, 'Failed to load the model'):
+      network.run(self.positions[0])
+    server.join()
+    self.assertNotEqual(server.exitcode, 0)
+
+  def test_run_features_raises(self):
+    server = inference_server.InferenceServer(FailingNet, num_workers=2)
+    server.start()
+    network = server.client(0, 'model', self.params)
+    with self.assertRaisesRegex(RuntimeError, 'Failed to run features'):
+      network.run(self.positions[0])
+    # The other worker fails without sending a request.
+    with self.assertRaisesRegex(RuntimeError, 'Failed to run features'):
+      server.client(1, 'model', self.params).run(self.positions[0])
+    server.join()
+
+  def test_server_killed(self):
+    server = inference_server.InferenceServer(FeatureNet, num_workers=1)
+    server.start()
+    server.terminate()
+    server.join()
+    network = server.client(0, 'model', self.params)
+    with self.assertRaisesRegex(RuntimeError, 'exited'):
+      network.run(self.positions[0])
+
+  def test_drop_worker(self):
+    server = inference_server.InferenceServer(FeatureNet, num_workers=2)
+    server.start()
+    network = server.client(0, 'model', self.params)
+    # Worker 1 exits without sending a request or closing its client.
+    server.drop_worker(1)
+    _, value = network.run(self.positions[0])
+    self.assertEqual(value, 1)
+    network.close()
+    server.join(timeout=60)
+    self.assertEqual(server.exitcode, 0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
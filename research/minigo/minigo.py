@@ -30,6 +30,7 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import functools
 import os
 import random
 import socket
@@ -41,6 +42,8 @@ import tensorflow as tf  # pylint: disable=g-bad-import-order
 import dualnet
 import evaluation
 import go
+import inference_cache
+import inference_server
 import model_params
 import preprocessing
 import selfplay_mcts
@@ -80,7 +83,7 @@ def bootstrap(estimator_model_dir, trained_models_dir, params):
 
 
 def selfplay(model_name, trained_models_dir, selfplay_dir, holdout_dir, sgf_dir,
-             params):
+             params, evaluation_cache=None):
   """Perform selfplay with a specific model.
 
   Args:
@@ -92,6 +95,8 @@ def selfplay(model_name, trained_models_dir, selfplay_dir, holdout_dir, sgf_dir,
     sgf_dir: Where to write the sgf (Smart Game Format) files. Set as
       'base_dir/sgf/'.
     params: An object of hyperparameters for the model.
+    evaluation_cache: An optional inference_cache.EvaluationCache of the
+      network evaluations of model_name, shared by the games of this model.
   """
   print('Playing a game with model {}'.format(model_name))
   # Set paths for the model with 'model_name'
@@ -108,16 +113,142 @@ def selfplay(model_name, trained_models_dir, selfplay_dir, holdout_dir, sgf_dir,
   _ensure_dir_exists(clean_sgf)
   _ensure_dir_exists(full_sgf)
 
+  if params.selfplay_workers > 0:
+    _selfplay_with_workers(model_path, output_dir, holdout_dir, clean_sgf,
+                           full_sgf, params)
+    return
+
   with utils.logged_timer('Loading weights from {} ... '.format(model_path)):
     network = dualnet.DualNetRunner(model_path, params)
+  _play_selfplay_games(network, output_dir, holdout_dir, clean_sgf, full_sgf,
+                       params, evaluation_cache)
+
 
-  with utils.logged_timer('Playing game'):
-    player = selfplay_mcts.play(
-        params.board_size, network, params.selfplay_readouts,
-        params.selfplay_resign_threshold, params.simultaneous_leaves,
-        params.selfplay_verbose)
+def _play_selfplay_games(network, output_dir, holdout_dir, clean_sgf, full_sgf,
+                         params, evaluation_cache=None, name_suffix=''):
+  """Plays selfplay games with a network and writes them.
 
-  output_name = '{}-{}'.format(int(time.time()), socket.gethostname())
+  Args:
+    network: The DualNetRunner to play with.
+    output_dir: Where to write the games.
+    holdout_dir: Where to write the holdout games.
+    clean_sgf: Where to write the sgf files without comments.
+    full_sgf: Where to write the sgf files with comments.
+    params: An object of hyperparameters for the model.
+    evaluation_cache: An optional inference_cache.EvaluationCache.
+    name_suffix: A suffix for the output names, unique for this process.
+  """
+  if evaluation_cache is not None:
+    network = inference_cache.CachedNetwork(network, evaluation_cache)
+
+  if params.selfplay_concurrent_games > 1:
+    # Play several games at once, batching the inference of all their trees.
+    game_indices = iter(range(params.selfplay_concurrent_games))
+
+    def _write_finished_game(player):
+      output_name = '{}-{}{}-{}'.format(
+          int(time.time()), socket.gethostname(), name_suffix,
+          next(game_indices))
+      _write_selfplay_game(player, output_name, output_dir, holdout_dir,
+                           clean_sgf, full_sgf, params)
+
+    with utils.logged_timer('Playing {} games'.format(
+        params.selfplay_concurrent_games)):
+      selfplay_mcts.play_many(
+          params.board_size, network, params.selfplay_concurrent_games,
+          params.selfplay_concurrent_games, params.selfplay_readouts,
+          params.selfplay_resign_threshold, params.simultaneous_leaves,
+          _write_finished_game, params.selfplay_verbose)
+  else:
+    with utils.logged_timer('Playing game'):
+      player = selfplay_mcts.play(
+          params.board_size, network, params.selfplay_readouts,
+          params.selfplay_resign_threshold, params.simultaneous_leaves,
+          params.selfplay_verbose)
+    output_name = '{}-{}{}'.format(
+        int(time.time()), socket.gethostname(), name_suffix)
+    _write_selfplay_game(player, output_name, output_dir, holdout_dir,
+                         clean_sgf, full_sgf, params)
+  if evaluation_cache is not None:
+    print('Evaluation cache: {} entries, {:.1%} hit rate'.format(
+        len(evaluation_cache), evaluation_cache.hit_rate))
+
+
+def _selfplay_worker(network, output_dir, holdout_dir, clean_sgf, full_sgf,
+                     params):
+  """Plays the selfplay games of a worker process of _selfplay_with_workers."""
+  if params.selfplay_cache_size:
+    evaluation_cache = inference_cache.EvaluationCache(
+        params.selfplay_cache_size)
+  else:
+    evaluation_cache = None
+  try:
+    _play_selfplay_games(
+        network, output_dir, holdout_dir, clean_sgf, full_sgf, params,
+        evaluation_cache, name_suffix='-{}'.format(network.worker_index))
+  finally:
+    network.close()
+
+
+def _selfplay_with_workers(model_path, output_dir, holdout_dir, clean_sgf,
+                           full_sgf, params):
+  """Plays selfplay games in worker processes sharing one inference server.
+
+  The model is only loaded by the server process, which batches the inference
+  requests of all params.selfplay_workers workers.
+  """
+  server = inference_server.InferenceServer(
+      functools.partial(dualnet.DualNetRunner, model_path, params),
+      params.selfplay_workers)
+  server.start()
+  context = inference_server.spawn_context()
+  workers = [
+      context.Process(
+          target=_selfplay_worker,
+          args=(server.client(i, model_path, params), output_dir, holdout_dir,
+                clean_sgf, full_sgf, params))
+      for i in range(params.selfplay_workers)]
+  with utils.logged_timer('Playing games in {} workers'.format(
+      params.selfplay_workers)):
+    for worker in workers:
+      worker.start()
+    try:
+      _wait_for_workers(server, workers)
+    finally:
+      # Only still alive if a process failed.
+      for process in workers + [server]:
+        if process.is_alive():
+          process.terminate()
+      for worker in workers:
+        worker.join()
+      server.join()
+
+
+def _wait_for_workers(server, workers):
+  """Waits for the selfplay workers, and raises if a process fails.
+
+  Exited workers are dropped from the server, in case they exited without
+  closing their client.
+  """
+  running = dict(enumerate(workers))
+  while running:
+    for i, worker in list(running.items()):
+      worker.join(timeout=0.1)
+      if worker.exitcode is None:
+        continue
+      del running[i]
+      server.drop_worker(i)
+      if worker.exitcode:
+        raise RuntimeError('Selfplay worker {} exited with code {}'.format(
+            i, worker.exitcode))
+    if running and not server.is_alive():
+      raise RuntimeError('The inference server exited with code {}'.format(
+          server.exitcode))
+
+
+def _write_selfplay_game(player, output_name, output_dir, holdout_dir,
+                         clean_sgf, full_sgf, params):
+  """Writes the sgf files and the tf.Examples of a finished selfplay game."""
 
   def _write_sgf_data(dir_sgf, use_comments):
     with tf.gfile.GFile(
@@ -349,18 +480,25 @@ def main(_):
   for rl_iter in range(params.max_iters_per_pipeline):
     print('RL_iteration: {}'.format(rl_iter))
 
+    # Network evaluations of best_model_so_far, shared by all its games.
+    if params.selfplay_cache_size:
+      evaluation_cache = inference_cache.EvaluationCache(
+          params.selfplay_cache_size)
+    else:
+      evaluation_cache = None
+
     # Self-play to generate at least params.max_games_per_generation games
     selfplay(best_model_so_far, dirs.trained_models_dir, dirs.selfplay_dir,
-             dirs.holdout_dir, dirs.sgf_dir, params)
+             dirs.holdout_dir, dirs.sgf_dir, params, evaluation_cache)
     games = tf.gfile.Glob(
         os.path.join(dirs.selfplay_dir, best_model_so_far, '*.zz'))
     while len(games) < params.max_games_per_generation:
       selfplay(best_model_so_far, dirs.trained_models_dir, dirs.selfplay_dir,
-               dirs.holdout_dir, dirs.sgf_dir, params)
+               dirs.holdout_dir, dirs.sgf_dir, params, evaluation_cache)
       if FLAGS.validation:
         params = model_params.DummyValidationParams()
         selfplay(best_model_so_far, dirs.trained_models_dir, dirs.selfplay_dir,
-                 dirs.holdout_dir, dirs.sgf_dir, params)
+                 dirs.holdout_dir, dirs.sgf_dir, params, evaluation_cache)
       games = tf.gfile.Glob(
           os.path.join(dirs.selfplay_dir, best_model_so_far, '*.zz'))
 
@@ -50,6 +50,14 @@ class MiniGoParams(object):
 
   # the number of simultaneous leaves in MCTS
   simultaneous_leaves = 8
+  # the number of games played concurrently, with batched inference, by each
+  # selfplay call; 1 plays a single game
+  selfplay_concurrent_games = 1
+  # the number of selfplay worker processes sharing one inference server
+  # process, each playing selfplay_concurrent_games games; 0 plays in-process
+  selfplay_workers = 0
+  # the number of network evaluations cached per model, 0 disables the cache
+  selfplay_cache_size = 100000
 
   holdout_pct = 0.05  # How many games to hold out for validation
   holdout_generation = 50  # How many recent generations/models for holdout data
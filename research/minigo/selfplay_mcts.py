@@ -12,11 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ==============================================================================
-"""Play a self-play match with a given DualNet model."""
+"""Play self-play matches with a given DualNet model.
+
+play plays a single game. play_many plays many games concurrently and evaluates
+the leaves selected in all of their trees in a single run_many batch, which
+keeps inference batches large.
+"""
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import random
 import sys
 import time
@@ -24,6 +30,35 @@ import time
 import coords
 from gtp_wrapper import MCTSPlayer
 
+SelfPlayStats = collections.namedtuple(
+    'SelfPlayStats',
+    ['num_games', 'num_batches', 'average_batch_size', 'games_per_hour'])
+
+
+def _new_player(board_size, network, resign_threshold, simultaneous_leaves,
+                verbosity):
+  player = MCTSPlayer(board_size, network, resign_threshold=resign_threshold,
+                      verbosity=verbosity, num_parallel=simultaneous_leaves)
+  # Disable resign in 5% of games
+  if random.random() < 0.05:
+    player.resign_threshold = -1.0
+
+  player.initialize_game()
+  return player
+
+
+def _play_searched_move(player):
+  """Resigns or plays the picked move after a search. Returns if game ended."""
+  if player.should_resign():
+    player.set_result(-1 * player.root.position.to_play, was_resign=True)
+    return True
+  move = player.pick_move()
+  player.play_move(move)
+  if player.root.is_done():
+    player.set_result(player.root.position.result(), was_resign=False)
+    return True
+  return False
+
 
 def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
          verbosity=0):
@@ -43,13 +78,8 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
     the n-ary tensor of floats representing the original value-net estimate
       where n is the number of moves in the game.
   """
-  player = MCTSPlayer(board_size, network, resign_threshold=resign_threshold,
-                      verbosity=verbosity, num_parallel=simultaneous_leaves)
-  # Disable resign in 5% of games
-  if random.random() < 0.05:
-    player.resign_threshold = -1.0
-
-  player.initialize_game()
+  player = _new_player(board_size, network, resign_threshold,
+                       simultaneous_leaves, verbosity)
 
   # Must run this once at the start, so that noise injection actually
   # affects the first move of the game.
@@ -69,13 +99,7 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
       print(player.root.position)
       print(player.root.describe())
 
-    if player.should_resign():
-      player.set_result(-1 * player.root.position.to_play, was_resign=True)
-      break
-    move = player.pick_move()
-    player.play_move(move)
-    if player.root.is_done():
-      player.set_result(player.root.position.result(), was_resign=False)
+    if _play_searched_move(player):
       break
 
     if (verbosity >= 2) or (
@@ -94,3 +118,104 @@ def play(board_size, network, readouts, resign_threshold, simultaneous_leaves,
           player.root.position.score(), file=sys.stderr)
 
   return player
+
+
+class _ConcurrentGame(object):
+  """A game of play_many and the number of readouts to reach before moving."""
+
+  def __init__(self, player):
+    self.player = player
+    self.target_readouts = None
+
+
+def play_many(board_size, network, num_games, num_concurrent_games, readouts,
+              resign_threshold, simultaneous_leaves, game_finished_fn,
+              verbosity=0):
+  """Plays out self-play matches concurrently.
+
+  Every step selects `simultaneous_leaves` leaves in the tree of every active
+  game, and evaluates all of them with a single network.run_many call.
+
+  Args:
+    board_size: the go board size
+    network: the DualNet model
+    num_games: the number of games to play
+    num_concurrent_games: the number of games to play at the same time. A new
+      game is started as soon as one finishes.
+    readouts: the number of readouts in MCTS
+    resign_threshold: the threshold to resign at in the match
+    simultaneous_leaves: the number of simultaneous leaves in MCTS, per game
+    game_finished_fn: called with the MCTSPlayer of every finished game
+    verbosity: the verbosity of the self-play match
+
+  Returns:
+    A SelfPlayStats.
+  """
+  start = time.time()
+  games = []
+  num_started = 0
+  num_finished = 0
+  num_batches = 0
+  num_evaluations = 0
+  while num_finished < num_games:
+    while len(games) < num_concurrent_games and num_started < num_games:
+      games.append(_ConcurrentGame(_new_player(
+          board_size, network, resign_threshold, simultaneous_leaves,
+          verbosity)))
+      num_started += 1
+
+    leaves = []
+    for game in games:
+      root = game.player.root
+      if not root.is_expanded:
+        # Evaluate the root once, so that noise injection affects its priors.
+        leaves.append(game.player.select_leaves(1))
+        continue
+      if game.target_readouts is None:
+        root.inject_noise()
+        # we want to do "X additional readouts", rather than "up to X readouts".
+        game.target_readouts = root.N + readouts
+      leaves.append(game.player.select_leaves())
+
+    positions = [leaf.position for game_leaves in leaves
+                 for leaf in game_leaves]
+    if positions:
+      move_probs, values = network.run_many(positions)
+      num_batches += 1
+      num_evaluations += len(positions)
+
+    active_games = []
+    offset = 0
+    for game, game_leaves in zip(games, leaves):
+      if game_leaves:
+        game.player.incorporate_leaves(
+            game_leaves, move_probs[offset:offset + len(game_leaves)],
+            values[offset:offset + len(game_leaves)])
+        offset += len(game_leaves)
+      if (game.target_readouts is None or
+          game.player.root.N < game.target_readouts):
+        active_games.append(game)
+      elif _play_searched_move(game.player):
+        num_finished += 1
+        if verbosity >= 1:
+          print('Game %d finished after %d moves: %s' % (
+              num_finished, game.player.root.position.n,
+              game.player.result_string), file=sys.stderr)
+        game_finished_fn(game.player)
+      else:
+        game.target_readouts = None
+        active_games.append(game)
+    games = active_games
+
+  hours = (time.time() - start) / 3600
+  stats = SelfPlayStats(
+      num_games=num_finished,
+      num_batches=num_batches,
+      average_batch_size=num_evaluations / max(num_batches, 1),
+      games_per_hour=num_finished / max(hours, 1e-9))
+  if verbosity >= 1:
+    print('Played %d games in %.1f seconds: %.1f games/hour, %d inference '
+          'batches of %.1f positions on average' % (
+              stats.num_games, hours * 3600, stats.games_per_hour,
+              stats.num_batches, stats.average_batch_size), file=sys.stderr)
+  return stats
@@ -0,0 +1,72 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for selfplay_mcts."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf  # pylint: disable=g-bad-import-order
+
+import selfplay_mcts
+from strategies_test import DummyNet
+import utils_test
+
+
+class BatchSizeRecordingNet(DummyNet):
+
+  def __init__(self):
+    DummyNet.__init__(self)
+    self.batch_sizes = []
+
+  def run_many(self, positions):
+    self.batch_sizes.append(len(positions))
+    return DummyNet.run_many(self, positions)
+
+
+class TestSelfPlay(utils_test.MiniGoUnitTest):
+
+  def test_play(self):
+    player = selfplay_mcts.play(
+        utils_test.BOARD_SIZE, DummyNet(), readouts=8, resign_threshold=0.95,
+        simultaneous_leaves=4)
+    self.assertTrue(player.is_done())
+    self.assertEqual(len(list(player.extract_data())),
+                     player.root.position.n)
+
+  def test_play_many(self):
+    network = BatchSizeRecordingNet()
+    finished_players = []
+    stats = selfplay_mcts.play_many(
+        utils_test.BOARD_SIZE, network, num_games=5, num_concurrent_games=3,
+        readouts=8, resign_threshold=0.95, simultaneous_leaves=4,
+        game_finished_fn=finished_players.append)
+    self.assertEqual(len(finished_players), 5)
+    for player in finished_players:
+      self.assertTrue(player.is_done())
+      self.assertNoPendingVirtualLosses(player.root)
+      self.assertEqual(len(list(player.extract_data())),
+                       player.root.position.n)
+    self.assertEqual(stats.num_games, 5)
+    self.assertEqual(stats.num_batches, len(network.batch_sizes))
+    self.assertAlmostEqual(stats.average_batch_size,
+                           sum(network.batch_sizes) / stats.num_batches)
+    # Leaves of up to three games are evaluated together.
+    self.assertGreater(max(network.batch_sizes), 4)
+    self.assertLessEqual(max(network.batch_sizes), 12)
+    self.assertGreater(stats.games_per_hour, 0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
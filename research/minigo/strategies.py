@@ -167,6 +167,25 @@ class MCTSPlayerMixin(object):
     return coords.from_flat(self.board_size, fcoord)
 
   def tree_search(self, num_parallel=None):
+    leaves = self.select_leaves(num_parallel)
+    if leaves:
+      move_probs, values = self.network.run_many(
+          [leaf.position for leaf in leaves])
+      self.incorporate_leaves(leaves, move_probs, values)
+
+  def select_leaves(self, num_parallel=None):
+    """Selects up to num_parallel leaves to evaluate, with virtual losses.
+
+    Leaves of finished games are backed up with their score immediately. The
+    other leaves must be passed to incorporate_leaves with their evaluation.
+
+    Args:
+      num_parallel: the number of leaves to select, defaults to
+        self.num_parallel.
+
+    Returns:
+      A list of the selected MCTSNodes.
+    """
     if num_parallel is None:
       num_parallel = self.num_parallel
     leaves = []
@@ -183,12 +202,13 @@ class MCTSPlayerMixin(object):
         continue
       leaf.add_virtual_loss(up_to=self.root)
       leaves.append(leaf)
-    if leaves:
-      move_probs, values = self.network.run_many(
-          [leaf.position for leaf in leaves])
-      for leaf, move_prob, value in zip(leaves, move_probs, values):
-        leaf.revert_virtual_loss(up_to=self.root)
-        leaf.incorporate_results(move_prob, value, up_to=self.root)
+    return leaves
+
+  def incorporate_leaves(self, leaves, move_probs, values):
+    """Reverts the virtual losses of leaves and backs up their evaluation."""
+    for leaf, move_prob, value in zip(leaves, move_probs, values):
+      leaf.revert_virtual_loss(up_to=self.root)
+      leaf.incorporate_results(move_prob, value, up_to=self.root)
 
   def show_path_to_root(self, node):
     max_depth = (self.board_size ** 2) * 1.4  # 505 moves for 19x19, 113 for 9x9
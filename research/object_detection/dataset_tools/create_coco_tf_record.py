@@ -24,6 +24,12 @@ Example usage:
       --val_annotations_file="${VAL_ANNOTATIONS_FILE}" \
       --testdev_annotations_file="${TESTDEV_ANNOTATIONS_FILE}" \
       --output_dir="${OUTPUT_DIR}"
+
+With --num_shards greater than 1 every output is written to
+<output>-?????-of-<num_shards> shards; image k of the annotations file goes to
+shard k % num_shards. Shards are written one at a time by a pool of
+--num_workers processes and only appear under their final name once complete,
+so with --resume a failed conversion restarts after the last complete shard.
 """
 from __future__ import absolute_import
 from __future__ import division
@@ -32,6 +38,7 @@ from __future__ import print_function
 import hashlib
 import io
 import json
+import multiprocessing
 import os
 import numpy as np
 import PIL.Image
@@ -39,6 +46,7 @@ import PIL.Image
 from pycocotools import mask
 import tensorflow as tf
 
+from object_detection.dataset_tools import oid_tfrecord_creation
 from object_detection.utils import dataset_util
 from object_detection.utils import label_map_util
 
@@ -60,6 +68,12 @@ tf.flags.DEFINE_string('val_annotations_file', '',
 tf.flags.DEFINE_string('testdev_annotations_file', '',
                        'Test-dev annotations JSON file.')
 tf.flags.DEFINE_string('output_dir', '/tmp/', 'Output data directory.')
+tf.flags.DEFINE_integer('num_shards', 1, 'Number of output shards per split.')
+tf.flags.DEFINE_integer('num_workers', 1,
+                        'Number of processes reading and encoding images.')
+tf.flags.DEFINE_boolean('resume', False,
+                        'Whether to keep the complete output shards of a '
+                        'previous run instead of writing them again.')
 
 FLAGS = flags.FLAGS
 
@@ -187,55 +201,110 @@ def create_tf_example(image,
   return key, example, num_annotations_skipped
 
 
+def _create_serialized_tf_example(args):
+  """Converts an image to a serialized tf.Example.
+
+  Args:
+    args: tuple of (image, annotations_list, image_dir, category_index,
+      include_masks), see create_tf_example.
+
+  Returns:
+    serialized_example: The serialized tf.Example.
+    num_annotations_skipped: Number of (invalid) annotations that were ignored.
+  """
+  _, tf_example, num_annotations_skipped = create_tf_example(*args)
+  return tf_example.SerializeToString(), num_annotations_skipped
+
+
 def _create_tf_record_from_coco_annotations(
-    annotations_file, image_dir, output_path, include_masks):
+    annotations_file, image_dir, output_path, include_masks, num_shards=1,
+    num_workers=1, resume=False):
   """Loads COCO annotation json files and converts to tf.Record format.
 
   Args:
     annotations_file: JSON file containing bounding box annotations.
     image_dir: Directory containing the image files.
-    output_path: Path to output tf.Record file.
+    output_path: Path to output tf.Record file. If num_shards is greater than
+      1, the base path of the output shards.
     include_masks: Whether to include instance segmentations masks
       (PNG encoded) in the result. default: False.
+    num_shards: Number of output shards. Image k is written to shard
+      k % num_shards.
+    num_workers: Number of processes converting the images.
+    resume: Whether to keep existing output shards instead of writing them
+      again.
   """
   with tf.gfile.GFile(annotations_file, 'r') as fid:
     groundtruth_data = json.load(fid)
-    images = groundtruth_data['images']
-    category_index = label_map_util.create_category_index(
-        groundtruth_data['categories'])
-
-    annotations_index = {}
-    if 'annotations' in groundtruth_data:
-      tf.logging.info(
-          'Found groundtruth annotations. Building annotations index.')
-      for annotation in groundtruth_data['annotations']:
-        image_id = annotation['image_id']
-        if image_id not in annotations_index:
-          annotations_index[image_id] = []
-        annotations_index[image_id].append(annotation)
-    missing_annotation_count = 0
-    for image in images:
-      image_id = image['id']
+  images = groundtruth_data['images']
+  category_index = label_map_util.create_category_index(
+      groundtruth_data['categories'])
+
+  annotations_index = {}
+  if 'annotations' in groundtruth_data:
+    tf.logging.info(
+        'Found groundtruth annotations. Building annotations index.')
+    for annotation in groundtruth_data['annotations']:
+      image_id = annotation['image_id']
       if image_id not in annotations_index:
-        missing_annotation_count += 1
         annotations_index[image_id] = []
-    tf.logging.info('%d images are missing annotations.',
-                    missing_annotation_count)
+      annotations_index[image_id].append(annotation)
+  missing_annotation_count = 0
+  for image in images:
+    image_id = image['id']
+    if image_id not in annotations_index:
+      missing_annotation_count += 1
+      annotations_index[image_id] = []
+  tf.logging.info('%d images are missing annotations.',
+                  missing_annotation_count)
+
+  if num_shards > 1:
+    shard_paths = oid_tfrecord_creation.sharded_output_filenames(
+        output_path, num_shards)
+  else:
+    shard_paths = [output_path]
 
-    tf.logging.info('writing to output path: %s', output_path)
-    writer = tf.python_io.TFRecordWriter(output_path)
+  tf.logging.info('writing to output path: %s', output_path)
+  pool = multiprocessing.Pool(num_workers) if num_workers > 1 else None
+  try:
+    num_images_done = 0
     total_num_annotations_skipped = 0
-    for idx, image in enumerate(images):
-      if idx % 100 == 0:
-        tf.logging.info('On image %d of %d', idx, len(images))
-      annotations_list = annotations_index[image['id']]
-      _, tf_example, num_annotations_skipped = create_tf_example(
-          image, annotations_list, image_dir, category_index, include_masks)
-      total_num_annotations_skipped += num_annotations_skipped
-      writer.write(tf_example.SerializeToString())
-    writer.close()
-    tf.logging.info('Finished writing, skipped %d annotations.',
-                    total_num_annotations_skipped)
+    for shard_idx, shard_path in enumerate(shard_paths):
+      shard_images = images[shard_idx::num_shards]
+      if resume and tf.gfile.Exists(shard_path):
+        tf.logging.info('Keeping complete shard %s', shard_path)
+        num_images_done += len(shard_images)
+        continue
+      tasks = [(image, annotations_index[image['id']], image_dir,
+                category_index, include_masks) for image in shard_images]
+      if pool:
+        results = pool.imap(_create_serialized_tf_example, tasks,
+                            chunksize=max(1, len(tasks) // (4 * num_workers)))
+      else:
+        results = (_create_serialized_tf_example(task) for task in tasks)
+      # Write to a temporary file so that only complete shards carry the final
+      # name.
+      temp_path = shard_path + '.incomplete'
+      with tf.python_io.TFRecordWriter(temp_path) as writer:
+        for serialized_example, num_annotations_skipped in results:
+          if num_images_done % 100 == 0:
+            tf.logging.info('On image %d of %d', num_images_done, len(images))
+          num_images_done += 1
+          total_num_annotations_skipped += num_annotations_skipped
+          writer.write(serialized_example)
+      tf.gfile.Rename(temp_path, shard_path, overwrite=True)
+  except BaseException:
+    # Drops the pending tasks, including on KeyboardInterrupt.
+    if pool:
+      pool.terminate()
+    raise
+  finally:
+    # Reaps the worker processes.
+    if pool:
+      pool.close()
+      pool.join()
+  tf.logging.info('Finished writing, skipped %d annotations.',
+                  total_num_annotations_skipped)
 
 
 def main(_):
@@ -256,17 +325,26 @@ def main(_):
       FLAGS.train_annotations_file,
       FLAGS.train_image_dir,
       train_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      num_shards=FLAGS.num_shards,
+      num_workers=FLAGS.num_workers,
+      resume=FLAGS.resume)
   _create_tf_record_from_coco_annotations(
       FLAGS.val_annotations_file,
       FLAGS.val_image_dir,
       val_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      num_shards=FLAGS.num_shards,
+      num_workers=FLAGS.num_workers,
+      resume=FLAGS.resume)
   _create_tf_record_from_coco_annotations(
       FLAGS.testdev_annotations_file,
       FLAGS.test_image_dir,
       testdev_output_path,
-      FLAGS.include_masks)
+      FLAGS.include_masks,
+      num_shards=FLAGS.num_shards,
+      num_workers=FLAGS.num_workers,
+      resume=FLAGS.resume)
 
 
 if __name__ == '__main__':
@@ -15,6 +15,7 @@
 """Test for create_coco_tf_record.py."""
 
 import io
+import json
 import os
 
 import numpy as np
@@ -183,6 +184,78 @@ class CreateCocoTFRecordTest(tf.test.TestCase):
                          [0, 0, 0, 0, 0, 0, 0, 1], [0, 0, 0, 0, 0, 0, 1, 1],
                          [0, 0, 0, 0, 0, 1, 1, 1], [0, 0, 0, 0, 1, 1, 1, 1]])
 
+  def _create_annotations_file(self, num_images):
+    tmp_dir = self.get_temp_dir()
+    images = []
+    annotations = []
+    for image_id in range(num_images):
+      image_file_name = 'tmp_image_{}.jpg'.format(image_id)
+      image_data = np.random.randint(256, size=(8, 8, 3)).astype(np.uint8)
+      PIL.Image.fromarray(image_data, 'RGB').save(
+          os.path.join(tmp_dir, image_file_name))
+      images.append({
+          'file_name': image_file_name,
+          'height': 8,
+          'width': 8,
+          'id': image_id,
+      })
+      annotations.append({
+          'area': .5,
+          'iscrowd': 0,
+          'image_id': image_id,
+          'bbox': [0, 0, 4, 4],
+          'category_id': 1,
+          'id': 1000 + image_id,
+      })
+    annotations_file = os.path.join(tmp_dir, 'annotations.json')
+    with open(annotations_file, 'w') as fid:
+      json.dump({
+          'images': images,
+          'annotations': annotations,
+          'categories': [{'name': 'dog', 'id': 1}],
+      }, fid)
+    return annotations_file
+
+  def _read_source_ids(self, path):
+    source_ids = []
+    for record in tf.python_io.tf_record_iterator(path):
+      example = tf.train.Example.FromString(record)
+      source_ids.extend(example.features.feature[
+          'image/source_id'].bytes_list.value)
+    return source_ids
+
+  def test_create_sharded_tf_record(self):
+    annotations_file = self._create_annotations_file(5)
+    output_path = os.path.join(self.get_temp_dir(), 'coco.record')
+
+    create_coco_tf_record._create_tf_record_from_coco_annotations(
+        annotations_file, self.get_temp_dir(), output_path,
+        include_masks=False, num_shards=2, num_workers=2)
+
+    self.assertEqual(
+        self._read_source_ids(output_path + '-00000-of-00002'),
+        [b'0', b'2', b'4'])
+    self.assertEqual(
+        self._read_source_ids(output_path + '-00001-of-00002'), [b'1', b'3'])
+
+  def test_resume_sharded_tf_record(self):
+    annotations_file = self._create_annotations_file(4)
+    output_path = os.path.join(self.get_temp_dir(), 'coco_resume.record')
+    first_shard_path = output_path + '-00000-of-00002'
+    second_shard_path = output_path + '-00001-of-00002'
+    # A complete first shard from a previous run, which must be kept.
+    with tf.python_io.TFRecordWriter(first_shard_path):
+      pass
+
+    create_coco_tf_record._create_tf_record_from_coco_annotations(
+        annotations_file, self.get_temp_dir(), output_path,
+        include_masks=False, num_shards=2, resume=True)
+
+    self.assertEqual(self._read_source_ids(first_shard_path), [])
+    self.assertEqual(
+        self._read_source_ids(second_shard_path), [b'1', b'3'])
+    self.assertFalse(tf.gfile.Exists(second_shard_path + '.incomplete'))
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -88,6 +88,22 @@ def tf_example_from_annotations_data_frame(annotations_data_frame, label_map,
   return tf.train.Example(features=tf.train.Features(feature=feature_map))
 
 
+def sharded_output_filenames(base_path, num_shards):
+  """Returns the paths of all TFRecord shards.
+
+  Args:
+    base_path: The base path for all shards
+    num_shards: The number of shards
+
+  Returns:
+    The list of shard paths. Position k in the list corresponds to shard k.
+  """
+  return [
+      '{}-{:05d}-of-{:05d}'.format(base_path, idx, num_shards)
+      for idx in range(num_shards)
+  ]
+
+
 def open_sharded_output_tfrecords(exit_stack, base_path, num_shards):
   """Opens all TFRecord shards for writing and adds them to an exit stack.
 
@@ -100,10 +116,7 @@ def open_sharded_output_tfrecords(exit_stack, base_path, num_shards):
   Returns:
     The list of opened TFRecords. Position k in the list corresponds to shard k.
   """
-  tf_record_output_filenames = [
-      '{}-{:05d}-of-{:05d}'.format(base_path, idx, num_shards)
-      for idx in range(num_shards)
-  ]
+  tf_record_output_filenames = sharded_output_filenames(base_path, num_shards)
 
   tfrecords = [
       exit_stack.enter_context(tf.python_io.TFRecordWriter(file_name))
@@ -50,6 +50,52 @@ def build_input(tfrecord_paths):
   return serialized_example_tensor, image_tensor
 
 
+def build_batched_input(tfrecord_paths, batch_size, num_parallel_reads=1,
+                        num_parallel_calls=1, prefetch_buffer_size=2):
+  """Builds a tf.data based input producing batches of zero-padded images.
+
+  Args:
+    tfrecord_paths: List of paths to the input TFRecords
+    batch_size: Number of images per batch. The last batch may be smaller.
+    num_parallel_reads: Number of TFRecord files read in parallel.
+    num_parallel_calls: Number of examples parsed and decoded in parallel.
+    prefetch_buffer_size: Number of batches prefetched.
+
+  Returns:
+    serialized_examples_tensor: The next serialized examples. String Tensor,
+        shape=[batch_size]
+    image_tensor: The decoded images of the examples, padded with zeros at the
+        bottom and right to the size of the largest image in the batch. Uint8
+        tensor, shape=[batch_size, None, None, 3]
+    image_shape_tensor: The height and width of every image before padding.
+        Int32 tensor, shape=[batch_size, 2]
+  """
+  dataset = tf.data.Dataset.from_tensor_slices(tfrecord_paths)
+  dataset = dataset.apply(
+      tf.contrib.data.parallel_interleave(
+          tf.data.TFRecordDataset, cycle_length=num_parallel_reads))
+
+  def decode(serialized_example):
+    features = tf.parse_single_example(
+        serialized_example,
+        features={
+            standard_fields.TfExampleFields.image_encoded:
+                tf.FixedLenFeature([], tf.string),
+        })
+    encoded_image = features[standard_fields.TfExampleFields.image_encoded]
+    image = tf.image.decode_image(encoded_image, channels=3)
+    image.set_shape([None, None, 3])
+    return serialized_example, image, tf.shape(image)[:2]
+
+  dataset = dataset.map(decode, num_parallel_calls=num_parallel_calls)
+  dataset = dataset.padded_batch(
+      batch_size, padded_shapes=([], [None, None, 3], [2]))
+  dataset = dataset.prefetch(prefetch_buffer_size)
+  serialized_examples_tensor, image_tensor, image_shape_tensor = (
+      dataset.make_one_shot_iterator().get_next())
+  return serialized_examples_tensor, image_tensor, image_shape_tensor
+
+
 def build_inference_graph(image_tensor, inference_graph_path):
   """Loads the inference graph and connects it to the input image.
 
@@ -95,6 +141,59 @@ def build_inference_graph(image_tensor, inference_graph_path):
   return detected_boxes_tensor, detected_scores_tensor, detected_labels_tensor
 
 
+def build_batched_inference_graph(image_tensor, image_shape_tensor,
+                                  inference_graph_path):
+  """Loads the inference graph and connects it to a batch of padded images.
+
+  The detected boxes are normalized with respect to the padded images by the
+  inference graph; they are rescaled to be normalized with respect to the
+  images before padding and clipped to them.
+
+  Args:
+    image_tensor: The input images. uint8 tensor,
+        shape=[batch_size, None, None, 3]
+    image_shape_tensor: The height and width of every image before padding.
+        Int32 tensor, shape=[batch_size, 2]
+    inference_graph_path: Path to the inference graph with embedded weights
+
+  Returns:
+    num_detections_tensor: Number of valid detections per image. Int32 tensor,
+        shape=[batch_size]
+    detected_boxes_tensor: Detected boxes. Float tensor,
+        shape=[batch_size, max_detections, 4]
+    detected_scores_tensor: Detected scores. Float tensor,
+        shape=[batch_size, max_detections]
+    detected_labels_tensor: Detected labels. Int64 tensor,
+        shape=[batch_size, max_detections]
+  """
+  with tf.gfile.Open(inference_graph_path, 'r') as graph_def_file:
+    graph_content = graph_def_file.read()
+  graph_def = tf.GraphDef()
+  graph_def.MergeFromString(graph_content)
+
+  tf.import_graph_def(
+      graph_def, name='', input_map={'image_tensor': image_tensor})
+
+  g = tf.get_default_graph()
+
+  num_detections_tensor = tf.cast(
+      g.get_tensor_by_name('num_detections:0'), tf.int32)
+
+  padded_shape = tf.cast(tf.shape(image_tensor)[1:3], tf.float32)
+  scale = padded_shape / tf.cast(image_shape_tensor, tf.float32)
+  scale = tf.expand_dims(tf.tile(scale, [1, 2]), 1)
+  detected_boxes_tensor = tf.clip_by_value(
+      g.get_tensor_by_name('detection_boxes:0') * scale, 0.0, 1.0)
+
+  detected_scores_tensor = g.get_tensor_by_name('detection_scores:0')
+
+  detected_labels_tensor = tf.cast(
+      g.get_tensor_by_name('detection_classes:0'), tf.int64)
+
+  return (num_detections_tensor, detected_boxes_tensor, detected_scores_tensor,
+          detected_labels_tensor)
+
+
 def infer_detections_and_add_to_example(
     serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
     detected_labels_tensor, discard_image_pixels):
@@ -112,12 +211,92 @@ def infer_detections_and_add_to_example(
   Returns:
     The de-serialized TF example augmented with the inferred detections.
   """
-  tf_example = tf.train.Example()
   (serialized_example, detected_boxes, detected_scores,
    detected_classes) = tf.get_default_session().run([
        serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
        detected_labels_tensor
    ])
+  return _add_detections_to_example(serialized_example, detected_boxes,
+                                    detected_scores, detected_classes,
+                                    discard_image_pixels)
+
+
+def infer_detections_and_add_to_examples(
+    serialized_examples_tensor, num_detections_tensor, detected_boxes_tensor,
+    detected_scores_tensor, detected_labels_tensor, discard_image_pixels):
+  """Runs a batch of inference and adds the detections to the examples.
+
+  Args:
+    serialized_examples_tensor: Serialized TF examples. String tensor,
+        shape=[batch_size]
+    num_detections_tensor: Number of valid detections per image. Int32 tensor,
+        shape=[batch_size]
+    detected_boxes_tensor: Detected boxes. Float tensor,
+        shape=[batch_size, max_detections, 4]
+    detected_scores_tensor: Detected scores. Float tensor,
+        shape=[batch_size, max_detections]
+    detected_labels_tensor: Detected labels. Int64 tensor,
+        shape=[batch_size, max_detections]
+    discard_image_pixels: If true, discards the images from the results
+  Returns:
+    The list of de-serialized TF examples of the batch augmented with the
+    inferred detections.
+  """
+  (serialized_examples, num_detections, detected_boxes, detected_scores,
+   detected_classes) = tf.get_default_session().run([
+       serialized_examples_tensor, num_detections_tensor,
+       detected_boxes_tensor, detected_scores_tensor, detected_labels_tensor
+   ])
+  return add_detections_to_examples(
+      serialized_examples, num_detections, detected_boxes, detected_scores,
+      detected_classes, discard_image_pixels)
+
+
+def add_detections_to_examples(serialized_examples, num_detections,
+                               detected_boxes, detected_scores,
+                               detected_classes, discard_image_pixels):
+  """Adds the detections of a batch of inference to the examples.
+
+  Args:
+    serialized_examples: Serialized TF examples. Numpy array of strings,
+        shape=[batch_size]
+    num_detections: Number of valid detections per image. Int32 numpy array,
+        shape=[batch_size]
+    detected_boxes: Detected boxes. Float numpy array,
+        shape=[batch_size, max_detections, 4]
+    detected_scores: Detected scores. Float numpy array,
+        shape=[batch_size, max_detections]
+    detected_classes: Detected labels. Int64 numpy array,
+        shape=[batch_size, max_detections]
+    discard_image_pixels: If true, discards the images from the results
+  Returns:
+    The list of de-serialized TF examples of the batch augmented with the
+    inferred detections.
+  """
+  tf_examples = []
+  for i, serialized_example in enumerate(serialized_examples):
+    tf_examples.append(_add_detections_to_example(
+        serialized_example, detected_boxes[i, :num_detections[i]],
+        detected_scores[i, :num_detections[i]],
+        detected_classes[i, :num_detections[i]], discard_image_pixels))
+  return tf_examples
+
+
+def _add_detections_to_example(serialized_example, detected_boxes,
+                               detected_scores, detected_classes,
+                               discard_image_pixels):
+  """Parses a serialized TF example and adds detections to it.
+
+  Args:
+    serialized_example: Serialized TF example.
+    detected_boxes: Float numpy array of shape [num_detections, 4].
+    detected_scores: Float numpy array of shape [num_detections].
+    detected_classes: Int64 numpy array of shape [num_detections].
+    discard_image_pixels: If true, discards the image from the result
+  Returns:
+    The de-serialized TF example augmented with the detections.
+  """
+  tf_example = tf.train.Example()
   detected_boxes = detected_boxes.T
 
   tf_example.ParseFromString(serialized_example)
@@ -48,6 +48,32 @@ def create_mock_tfrecord():
     writer.write(tf_example.SerializeToString())
 
 
+def get_mock_batched_tfrecord_path():
+  return os.path.join(tf.test.get_temp_dir(), 'mock_batched.tfrec')
+
+
+def create_mock_batched_tfrecord():
+  images = [
+      np.array([[[123, 0, 0]]], dtype=np.uint8),
+      np.array([[[1, 0, 0], [0, 0, 0]], [[0, 0, 0], [0, 0, 1]]],
+               dtype=np.uint8),
+  ]
+  with tf.python_io.TFRecordWriter(
+      get_mock_batched_tfrecord_path()) as writer:
+    for index, image in enumerate(images):
+      image_output_stream = StringIO.StringIO()
+      Image.fromarray(image, 'RGB').save(image_output_stream, format='png')
+      feature_map = {
+          'test_field':
+              dataset_util.float_list_feature([index]),
+          standard_fields.TfExampleFields.image_encoded:
+              dataset_util.bytes_feature(image_output_stream.getvalue()),
+      }
+      tf_example = tf.train.Example(
+          features=tf.train.Features(feature=feature_map))
+      writer.write(tf_example.SerializeToString())
+
+
 def get_mock_graph_path():
   return os.path.join(tf.test.get_temp_dir(), 'mock_graph.pb')
 
@@ -72,6 +98,32 @@ def create_mock_graph():
     fl.write(graph_def.SerializeToString())
 
 
+def create_mock_batched_graph():
+  g = tf.Graph()
+  with g.as_default():
+    in_image_tensor = tf.placeholder(
+        tf.uint8, shape=[None, None, None, 3], name='image_tensor')
+    batch_size = tf.shape(in_image_tensor)[0]
+    tf.fill([batch_size], 2.0, name='num_detections')
+    tf.tile(
+        tf.constant(
+            [[[0, 0.4, 0.5, 0.5], [0.1, 0.2, 0.25, 0.45], [0.2, 0.3, 0.4, 0.5]]
+            ]), [batch_size, 1, 1],
+        name='detection_boxes')
+    tf.tile(
+        tf.constant([[0.1, 0.2, 0.3]]), [batch_size, 1],
+        name='detection_scores')
+    tf.identity(
+        tf.constant([[1.0, 2.0, 3.0]]) * tf.reduce_sum(
+            tf.cast(in_image_tensor, dtype=tf.float32),
+            axis=[1, 2, 3], keep_dims=True)[:, :, 0, 0],
+        name='detection_classes')
+    graph_def = g.as_graph_def()
+
+  with tf.gfile.Open(get_mock_graph_path(), 'w') as fl:
+    fl.write(graph_def.SerializeToString())
+
+
 class InferDetectionsTests(tf.test.TestCase):
 
   def test_simple(self):
@@ -171,6 +223,82 @@ class InferDetectionsTests(tf.test.TestCase):
             value { float_list { value: [1.0, 2.0, 3.0, 4.0] } } } }
     """, tf_example)
 
+  def test_batched(self):
+    create_mock_batched_graph()
+    create_mock_batched_tfrecord()
+
+    (serialized_examples_tensor, image_tensor,
+     image_shape_tensor) = detection_inference.build_batched_input(
+         [get_mock_batched_tfrecord_path()], batch_size=2)
+    self.assertAllEqual(image_tensor.get_shape().as_list(),
+                        [None, None, None, 3])
+
+    (num_detections_tensor, detected_boxes_tensor, detected_scores_tensor,
+     detected_labels_tensor) = detection_inference.build_batched_inference_graph(
+         image_tensor, image_shape_tensor, get_mock_graph_path())
+
+    with self.test_session(use_gpu=False):
+      tf_examples = detection_inference.infer_detections_and_add_to_examples(
+          serialized_examples_tensor, num_detections_tensor,
+          detected_boxes_tensor, detected_scores_tensor,
+          detected_labels_tensor, True)
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        detection_inference.infer_detections_and_add_to_examples(
+            serialized_examples_tensor, num_detections_tensor,
+            detected_boxes_tensor, detected_scores_tensor,
+            detected_labels_tensor, True)
+
+    self.assertEqual(len(tf_examples), 2)
+    # The first image is padded from 1x1 to 2x2, so its boxes are rescaled.
+    self.assertProtoEquals(r"""
+        features {
+          feature {
+            key: "image/detection/bbox/ymin"
+            value { float_list { value: [0.0, 0.2] } } }
+          feature {
+            key: "image/detection/bbox/xmin"
+            value { float_list { value: [0.8, 0.4] } } }
+          feature {
+            key: "image/detection/bbox/ymax"
+            value { float_list { value: [1.0, 0.5] } } }
+          feature {
+            key: "image/detection/bbox/xmax"
+            value { float_list { value: [1.0, 0.9] } } }
+          feature {
+            key: "image/detection/label"
+            value { int64_list { value: [123, 246] } } }
+          feature {
+            key: "image/detection/score"
+            value { float_list { value: [0.1, 0.2] } } }
+          feature {
+            key: "test_field"
+            value { float_list { value: [0.0] } } } }
+    """, tf_examples[0])
+    self.assertProtoEquals(r"""
+        features {
+          feature {
+            key: "image/detection/bbox/ymin"
+            value { float_list { value: [0.0, 0.1] } } }
+          feature {
+            key: "image/detection/bbox/xmin"
+            value { float_list { value: [0.4, 0.2] } } }
+          feature {
+            key: "image/detection/bbox/ymax"
+            value { float_list { value: [0.5, 0.25] } } }
+          feature {
+            key: "image/detection/bbox/xmax"
+            value { float_list { value: [0.5, 0.45] } } }
+          feature {
+            key: "image/detection/label"
+            value { int64_list { value: [2, 4] } } }
+          feature {
+            key: "image/detection/score"
+            value { float_list { value: [0.1, 0.2] } } }
+          feature {
+            key: "test_field"
+            value { float_list { value: [1.0] } } } }
+    """, tf_examples[1])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -32,10 +32,22 @@ The script can also discard the image pixels in the output. This greatly
 reduces the output size and can potentially accelerate reading data in
 subsequent processing steps that don't require the images (e.g. computing
 metrics).
+
+Images are read, decoded and batched by a tf.data pipeline that runs in
+parallel with inference. With --batch_size greater than 1 the images of a batch
+are zero-padded to a common size; the detected boxes are rescaled to the
+original images. Note that detections on padded images may differ slightly
+from those on unpadded images, depending on the image resizer of the model.
+With --num_output_shards greater than 1 the output is written to
+<output_tfrecord_path>-?????-of-<num_output_shards> files, assigning examples
+to shards round-robin in input order.
 """
 
+import contextlib2
 import itertools
+import time
 import tensorflow as tf
+from object_detection.dataset_tools import oid_tfrecord_creation
 from object_detection.inference import detection_inference
 
 tf.flags.DEFINE_string('input_tfrecord_paths', None,
@@ -49,6 +61,13 @@ tf.flags.DEFINE_boolean('discard_image_pixels', False,
                         ' significantly reduces the output size and is useful'
                         ' if the subsequent tools don\'t need access to the'
                         ' images (e.g. when computing evaluation measures).')
+tf.flags.DEFINE_integer('batch_size', 1, 'Number of images per inference call.')
+tf.flags.DEFINE_integer('num_parallel_reads', 1,
+                        'Number of input TFRecords read in parallel.')
+tf.flags.DEFINE_integer('num_parallel_calls', 4,
+                        'Number of images decoded in parallel.')
+tf.flags.DEFINE_integer('num_output_shards', 1,
+                        'Number of output TFRecord shards.')
 
 FLAGS = tf.flags.FLAGS
 
@@ -66,31 +85,92 @@ def main(_):
     input_tfrecord_paths = [
         v for v in FLAGS.input_tfrecord_paths.split(',') if v]
     tf.logging.info('Reading input from %d files', len(input_tfrecord_paths))
-    serialized_example_tensor, image_tensor = detection_inference.build_input(
-        input_tfrecord_paths)
+    (serialized_examples_tensor, image_tensor,
+     image_shape_tensor) = detection_inference.build_batched_input(
+         input_tfrecord_paths, FLAGS.batch_size,
+         num_parallel_reads=FLAGS.num_parallel_reads,
+         num_parallel_calls=FLAGS.num_parallel_calls)
     tf.logging.info('Reading graph and building model...')
-    (detected_boxes_tensor, detected_scores_tensor,
-     detected_labels_tensor) = detection_inference.build_inference_graph(
-         image_tensor, FLAGS.inference_graph)
+    (num_detections_tensor, detected_boxes_tensor, detected_scores_tensor,
+     detected_labels_tensor) = detection_inference.build_batched_inference_graph(
+         image_tensor, image_shape_tensor, FLAGS.inference_graph)
 
     tf.logging.info('Running inference and writing output to {}'.format(
         FLAGS.output_tfrecord_path))
     sess.run(tf.local_variables_initializer())
-    tf.train.start_queue_runners()
-    with tf.python_io.TFRecordWriter(
-        FLAGS.output_tfrecord_path) as tf_record_writer:
+    num_images = 0
+    input_seconds = 0.0
+    inference_seconds = 0.0
+    output_seconds = 0.0
+    start_time = time.time()
+    with contextlib2.ExitStack() as tf_record_close_stack:
+      if FLAGS.num_output_shards > 1:
+        tf_record_writers = (
+            oid_tfrecord_creation.open_sharded_output_tfrecords(
+                tf_record_close_stack, FLAGS.output_tfrecord_path,
+                FLAGS.num_output_shards))
+      else:
+        tf_record_writers = [
+            tf_record_close_stack.enter_context(
+                tf.python_io.TFRecordWriter(FLAGS.output_tfrecord_path))
+        ]
       try:
-        for counter in itertools.count():
+        for num_batches in itertools.count():
           tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 10,
-                                 counter)
-          tf_example = detection_inference.infer_detections_and_add_to_example(
-              serialized_example_tensor, detected_boxes_tensor,
-              detected_scores_tensor, detected_labels_tensor,
-              FLAGS.discard_image_pixels)
-          tf_record_writer.write(tf_example.SerializeToString())
+                                 num_images)
+          # The input and the inference are run separately, feeding the input
+          # batch to the inference, so that their latencies can be told apart.
+          input_start_time = time.time()
+          serialized_examples, images, image_shapes = sess.run(
+              [serialized_examples_tensor, image_tensor, image_shape_tensor])
+          inference_start_time = time.time()
+          (num_detections, detected_boxes, detected_scores,
+           detected_labels) = sess.run(
+               [num_detections_tensor, detected_boxes_tensor,
+                detected_scores_tensor, detected_labels_tensor],
+               feed_dict={image_tensor: images,
+                          image_shape_tensor: image_shapes})
+          output_start_time = time.time()
+          tf_examples = detection_inference.add_detections_to_examples(
+              serialized_examples, num_detections, detected_boxes,
+              detected_scores, detected_labels, FLAGS.discard_image_pixels)
+          for tf_example in tf_examples:
+            shard_idx = num_images % len(tf_record_writers)
+            tf_record_writers[shard_idx].write(tf_example.SerializeToString())
+            num_images += 1
+          input_seconds += inference_start_time - input_start_time
+          inference_seconds += output_start_time - inference_start_time
+          output_seconds += time.time() - output_start_time
       except tf.errors.OutOfRangeError:
         tf.logging.info('Finished processing records')
 
+    _log_throughput(num_images, num_batches, time.time() - start_time,
+                    input_seconds, inference_seconds, output_seconds)
+
+
+def _log_throughput(num_images, num_batches, total_seconds, input_seconds,
+                    inference_seconds, output_seconds):
+  """Logs the overall throughput and the mean latency of each stage.
+
+  Args:
+    num_images: Number of processed images.
+    num_batches: Number of processed batches.
+    total_seconds: Wall time of the processing loop.
+    input_seconds: Time spent waiting for batches of the input pipeline.
+    inference_seconds: Time spent running inference on the batches.
+    output_seconds: Time spent adding detections to the examples and writing
+      them to the output.
+  """
+  tf.logging.info('Processed %d images in %d batches in %.2f seconds '
+                  '(%.2f images/sec)', num_images, num_batches, total_seconds,
+                  num_images / max(total_seconds, 1e-9))
+  for stage, seconds in [('input', input_seconds),
+                         ('inference', inference_seconds),
+                         ('output', output_seconds)]:
+    tf.logging.info('Mean %s latency: %.2f ms/batch, %.2f ms/image', stage,
+                    1000.0 * seconds / max(num_batches, 1),
+                    1000.0 * seconds / max(num_images, 1))
+
 
 if __name__ == '__main__':
   tf.app.run()
@@ -22,7 +22,14 @@ from object_detection.utils import object_detection_evaluation
 
 
 class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
-  """Class to evaluate COCO detection metrics."""
+  """Class to evaluate COCO detection metrics.
+
+  The detections of every image are matched to its groundtruth as soon as they
+  are added, so that `evaluate` only accumulates the per image results. The
+  groundtruth and its COCO index are kept by `clear_detections`, which allows
+  evaluating several sets of detections (e.g. one per checkpoint) on the same
+  groundtruth without rebuilding it.
+  """
 
   def __init__(self,
                categories,
@@ -45,9 +52,17 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     # indicate whether a corresponding detection has been added.
     self._image_ids = {}
     self._groundtruth_list = []
+    # Maps image ids to the groundtruth annotations of the image.
+    self._groundtruth_annotations = {}
     self._detection_boxes_list = []
+    # Maps image ids to the per image evaluations of the image's detections.
+    self._image_evaluations = {}
     self._category_id_set = set([cat['id'] for cat in self._categories])
     self._annotation_id = 1
+    self._detection_id = 1
+    self._coco_wrapped_groundtruth = None
+    self._image_evaluator = coco_tools.COCOEvalWrapper(agnostic_mode=False)
+    self._image_evaluator.params.catIds = sorted(self._category_id_set)
     self._metrics = None
     self._include_metrics_per_category = include_metrics_per_category
     self._all_metrics_per_category = all_metrics_per_category
@@ -56,7 +71,17 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     """Clears the state to prepare for a fresh evaluation."""
     self._image_ids.clear()
     self._groundtruth_list = []
+    self._groundtruth_annotations.clear()
+    self._coco_wrapped_groundtruth = None
+    self.clear_detections()
+
+  def clear_detections(self):
+    """Clears the detections but keeps the groundtruth for a new evaluation."""
+    for image_id in self._image_ids:
+      self._image_ids[image_id] = False
     self._detection_boxes_list = []
+    self._image_evaluations.clear()
+    self._detection_id = 1
 
   def add_single_ground_truth_image_info(self,
                                          image_id,
@@ -88,20 +113,22 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     if groundtruth_is_crowd is not None and not groundtruth_is_crowd.shape[0]:
       groundtruth_is_crowd = None
 
-    self._groundtruth_list.extend(
-        coco_tools.ExportSingleImageGroundtruthToCoco(
-            image_id=image_id,
-            next_annotation_id=self._annotation_id,
-            category_id_set=self._category_id_set,
-            groundtruth_boxes=groundtruth_dict[
-                standard_fields.InputDataFields.groundtruth_boxes],
-            groundtruth_classes=groundtruth_dict[
-                standard_fields.InputDataFields.groundtruth_classes],
-            groundtruth_is_crowd=groundtruth_is_crowd))
+    groundtruth_annotations = coco_tools.ExportSingleImageGroundtruthToCoco(
+        image_id=image_id,
+        next_annotation_id=self._annotation_id,
+        category_id_set=self._category_id_set,
+        groundtruth_boxes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_boxes],
+        groundtruth_classes=groundtruth_dict[
+            standard_fields.InputDataFields.groundtruth_classes],
+        groundtruth_is_crowd=groundtruth_is_crowd)
+    self._groundtruth_list.extend(groundtruth_annotations)
+    self._groundtruth_annotations[image_id] = groundtruth_annotations
     self._annotation_id += groundtruth_dict[standard_fields.InputDataFields.
                                             groundtruth_boxes].shape[0]
     # Boolean to indicate whether a detection has been added for this image.
     self._image_ids[image_id] = False
+    self._coco_wrapped_groundtruth = None
 
   def add_single_detected_image_info(self,
                                      image_id,
@@ -133,19 +160,29 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
                          'previously added', image_id)
       return
 
-    self._detection_boxes_list.extend(
-        coco_tools.ExportSingleImageDetectionBoxesToCoco(
-            image_id=image_id,
-            category_id_set=self._category_id_set,
-            detection_boxes=detections_dict[standard_fields.
-                                            DetectionResultFields
-                                            .detection_boxes],
-            detection_scores=detections_dict[standard_fields.
-                                             DetectionResultFields.
-                                             detection_scores],
-            detection_classes=detections_dict[standard_fields.
-                                              DetectionResultFields.
-                                              detection_classes]))
+    detection_annotations = coco_tools.ExportSingleImageDetectionBoxesToCoco(
+        image_id=image_id,
+        category_id_set=self._category_id_set,
+        detection_boxes=detections_dict[standard_fields.
+                                        DetectionResultFields
+                                        .detection_boxes],
+        detection_scores=detections_dict[standard_fields.
+                                         DetectionResultFields.
+                                         detection_scores],
+        detection_classes=detections_dict[standard_fields.
+                                          DetectionResultFields.
+                                          detection_classes])
+    # Same fields as set by COCOWrapper.LoadAnnotations.
+    for detection in detection_annotations:
+      detection['area'] = detection['bbox'][2] * detection['bbox'][3]
+      detection['id'] = self._detection_id
+      detection['iscrowd'] = 0
+      self._detection_id += 1
+    self._detection_boxes_list.extend(detection_annotations)
+    self._image_evaluations[image_id] = (
+        self._image_evaluator.EvaluateSingleImage(
+            image_id, self._groundtruth_annotations[image_id],
+            detection_annotations))
     self._image_ids[image_id] = True
 
   def evaluate(self):
@@ -183,16 +220,24 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
       'PerformanceByCategory' is included in the output regardless of
       all_metrics_per_category.
     """
-    groundtruth_dict = {
-        'annotations': self._groundtruth_list,
-        'images': [{'id': image_id} for image_id in self._image_ids],
-        'categories': self._categories
-    }
-    coco_wrapped_groundtruth = coco_tools.COCOWrapper(groundtruth_dict)
-    coco_wrapped_detections = coco_wrapped_groundtruth.LoadAnnotations(
-        self._detection_boxes_list)
+    if self._coco_wrapped_groundtruth is None:
+      groundtruth_dict = {
+          'annotations': self._groundtruth_list,
+          'images': [{'id': image_id} for image_id in self._image_ids],
+          'categories': self._categories
+      }
+      self._coco_wrapped_groundtruth = coco_tools.COCOWrapper(groundtruth_dict)
+    per_image_evaluations = {}
+    for image_id in self._image_ids:
+      if image_id in self._image_evaluations:
+        per_image_evaluations[image_id] = self._image_evaluations[image_id]
+      else:
+        per_image_evaluations[image_id] = (
+            self._image_evaluator.EvaluateSingleImage(
+                image_id, self._groundtruth_annotations[image_id], []))
     box_evaluator = coco_tools.COCOEvalWrapper(
-        coco_wrapped_groundtruth, coco_wrapped_detections, agnostic_mode=False)
+        self._coco_wrapped_groundtruth, agnostic_mode=False)
+    box_evaluator.LoadEvaluatedImages(per_image_evaluations)
     box_metrics, box_per_category_ap = box_evaluator.ComputeMetrics(
         include_metrics_per_category=self._include_metrics_per_category,
         all_metrics_per_category=self._all_metrics_per_category)
@@ -158,6 +158,58 @@ class CocoDetectionEvaluationTest(tf.test.TestCase):
     metrics = coco_evaluator.evaluate()
     self.assertAlmostEqual(metrics['DetectionBoxes_Precision/mAP'], 1.0)
 
+  def testClearDetectionsKeepsGroundtruth(self):
+    """Tests evaluating two sets of detections on the same groundtruth."""
+    category_list = [{'id': 1, 'name': 'cat'}, {'id': 2, 'name': 'dog'}]
+    coco_evaluator = coco_evaluation.CocoDetectionEvaluator(category_list)
+    coco_evaluator.add_single_ground_truth_image_info(
+        image_id='image1',
+        groundtruth_dict={
+            standard_fields.InputDataFields.groundtruth_boxes:
+            np.array([[100., 100., 200., 200.]]),
+            standard_fields.InputDataFields.groundtruth_classes: np.array([1])
+        })
+    coco_evaluator.add_single_ground_truth_image_info(
+        image_id='image2',
+        groundtruth_dict={
+            standard_fields.InputDataFields.groundtruth_boxes:
+            np.array([[50., 50., 100., 100.]]),
+            standard_fields.InputDataFields.groundtruth_classes: np.array([2])
+        })
+    coco_evaluator.add_single_detected_image_info(
+        image_id='image1',
+        detections_dict={
+            standard_fields.DetectionResultFields.detection_boxes:
+            np.array([[100., 100., 200., 200.]]),
+            standard_fields.DetectionResultFields.detection_scores:
+            np.array([.8]),
+            standard_fields.DetectionResultFields.detection_classes:
+            np.array([1])
+        })
+    # No detections for image2, so the dog is missed.
+    metrics = coco_evaluator.evaluate()
+    self.assertAlmostEqual(metrics['DetectionBoxes_Precision/mAP'], 0.5)
+    self.assertAlmostEqual(metrics['DetectionBoxes_Recall/AR@100'], 0.5)
+
+    coco_evaluator.clear_detections()
+    self.assertFalse(coco_evaluator._detection_boxes_list)
+    self.assertEqual(len(coco_evaluator._groundtruth_list), 2)
+    for image_id, box in [('image1', [100., 100., 200., 200.]),
+                          ('image2', [50., 50., 100., 100.])]:
+      coco_evaluator.add_single_detected_image_info(
+          image_id=image_id,
+          detections_dict={
+              standard_fields.DetectionResultFields.detection_boxes:
+              np.array([box]),
+              standard_fields.DetectionResultFields.detection_scores:
+              np.array([.8]),
+              standard_fields.DetectionResultFields.detection_classes:
+              np.array([1 if image_id == 'image1' else 2])
+          })
+    metrics = coco_evaluator.evaluate()
+    self.assertAlmostEqual(metrics['DetectionBoxes_Precision/mAP'], 1.0)
+    self.assertAlmostEqual(metrics['DetectionBoxes_Recall/AR@100'], 1.0)
+
   def testRejectionOnDuplicateGroundtruth(self):
     """Tests that groundtruth cannot be added more than once for an image."""
     categories = [{'id': 1, 'name': 'cat'},
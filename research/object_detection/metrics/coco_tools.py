@@ -39,6 +39,7 @@ then evaluation (in multi-class mode) can be invoked as follows:
   metrics = evaluator.ComputeMetrics()
 
 """
+from collections import defaultdict
 from collections import OrderedDict
 import copy
 import time
@@ -170,6 +171,7 @@ class COCOEvalWrapper(cocoeval.COCOeval):
                                iouType=iou_type)
     if agnostic_mode:
       self.params.useCats = 0
+    self._evaluated_images_loaded = False
 
   def GetCategory(self, category_id):
     """Fetches dictionary holding category information given category id.
@@ -189,6 +191,73 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     """Returns list of valid category ids."""
     return self.params.catIds
 
+  def EvaluateSingleImage(self, image_id, groundtruth_annotations,
+                          detection_annotations):
+    """Matches the detections of a single image to its groundtruth.
+
+    This computes the same per image results as `evaluate` does, so that an
+    image can be evaluated as soon as its detections are available. See
+    LoadEvaluatedImages. Only bounding box evaluation is supported.
+
+    Args:
+      image_id: the id of the image.
+      groundtruth_annotations: list of the groundtruth annotations of the image
+        as returned by ExportSingleImageGroundtruthToCoco.
+      detection_annotations: list of the detections of the image as returned
+        by ExportSingleImageDetectionBoxesToCoco, with 'id', 'area' and
+        'iscrowd' set as done by COCOWrapper.LoadAnnotations.
+
+    Returns:
+      a list of per image evaluations, one for every category of
+      params.catIds (a single one in agnostic mode) and every area range of
+      params.areaRng, with the area range varying fastest.
+
+    Raises:
+      ValueError: if the iou type is not `bbox`.
+    """
+    p = self.params
+    if p.iouType != 'bbox':
+      raise ValueError('Unsupported iou type: {}'.format(p.iouType))
+    p.catIds = sorted(set(p.catIds))
+    category_ids = p.catIds if p.useCats else [-1]
+    self._gts = defaultdict(list)
+    self._dts = defaultdict(list)
+    for gt in groundtruth_annotations:
+      gt['ignore'] = 'iscrowd' in gt and gt['iscrowd']
+      self._gts[image_id, gt['category_id']].append(gt)
+    for dt in detection_annotations:
+      self._dts[image_id, dt['category_id']].append(dt)
+    self.ious = {(image_id, category_id): self.computeIoU(image_id, category_id)
+                 for category_id in category_ids}
+    max_detections = max(p.maxDets)
+    return [self.evaluateImg(image_id, category_id, area_range, max_detections)
+            for category_id in category_ids for area_range in p.areaRng]
+
+  def LoadEvaluatedImages(self, per_image_evaluations):
+    """Loads per image evaluations so that ComputeMetrics skips `evaluate`.
+
+    Args:
+      per_image_evaluations: a dictionary mapping the id of every image to
+        evaluate to its result of EvaluateSingleImage, computed with the same
+        categories and parameters as this object's.
+    """
+    p = self.params
+    p.imgIds = list(np.unique(list(per_image_evaluations)))
+    if p.useCats:
+      p.catIds = list(np.unique(p.catIds))
+    p.maxDets = sorted(p.maxDets)
+    num_categories = len(p.catIds) if p.useCats else 1
+    num_area_ranges = len(p.areaRng)
+    self.evalImgs = [
+        per_image_evaluations[image_id][category_index * num_area_ranges +
+                                        area_range_index]
+        for category_index in range(num_categories)
+        for area_range_index in range(num_area_ranges)
+        for image_id in p.imgIds
+    ]
+    self._paramsEval = copy.deepcopy(p)
+    self._evaluated_images_loaded = True
+
   def ComputeMetrics(self,
                      include_metrics_per_category=False,
                      all_metrics_per_category=False):
@@ -233,7 +302,8 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     Raises:
       ValueError: If category_stats does not exist.
     """
-    self.evaluate()
+    if not self._evaluated_images_loaded:
+      self.evaluate()
     self.accumulate()
     self.summarize()
 
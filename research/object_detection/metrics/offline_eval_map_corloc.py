@@ -30,8 +30,12 @@ Example usage:
         --eval_dir=path/to/eval_dir \
         --eval_config_path=path/to/evaluation/configuration/file \
         --input_config_path=path/to/input/configuration/file
+
+Sharded inputs can be evaluated by several processes in parallel with
+--num_workers=N; the reported metrics do not depend on the number of workers.
 """
 import csv
+import multiprocessing
 import os
 import re
 import tensorflow as tf
@@ -41,6 +45,7 @@ from object_detection.core import standard_fields
 from object_detection.metrics import tf_example_parser
 from object_detection.utils import config_util
 from object_detection.utils import label_map_util
+from object_detection.utils import object_detection_evaluation
 
 flags = tf.app.flags
 tf.logging.set_verbosity(tf.logging.INFO)
@@ -50,6 +55,9 @@ flags.DEFINE_string('eval_config_path', None,
                     'Path to an eval_pb2.EvalConfig config file.')
 flags.DEFINE_string('input_config_path', None,
                     'Path to an eval_pb2.InputConfig config file.')
+flags.DEFINE_integer('num_workers', 1,
+                     'Number of processes used to read and evaluate input '
+                     'shards in parallel.')
 
 FLAGS = flags.FLAGS
 
@@ -73,23 +81,93 @@ def _generate_filenames(filenames):
   return result
 
 
-def read_data_and_evaluate(input_config, eval_config):
+def _add_records_to_evaluator(input_path, object_detection_evaluator):
+  """Adds groundtruth and detections stored in a tf_record to an evaluator.
+
+  Args:
+    input_path: path to a tf_record file of tf.train.Example protos holding
+      both groundtruth and detections for an image.
+    object_detection_evaluator: the DetectionEvaluator to add images to.
+
+  Returns:
+    A tuple (processed_images, skipped_images) with the number of records read
+    from the file and the number of records that could not be parsed.
+  """
+  tf.logging.info('Processing file: {0}'.format(input_path))
+
+  record_iterator = tf.python_io.tf_record_iterator(path=input_path)
+  data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+
+  skipped_images = 0
+  processed_images = 0
+  for string_record in record_iterator:
+    tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
+                           processed_images)
+    processed_images += 1
+
+    example = tf.train.Example()
+    example.ParseFromString(string_record)
+    decoded_dict = data_parser.parse(example)
+
+    if decoded_dict:
+      object_detection_evaluator.add_single_ground_truth_image_info(
+          decoded_dict[standard_fields.DetectionResultFields.key],
+          decoded_dict)
+      object_detection_evaluator.add_single_detected_image_info(
+          decoded_dict[standard_fields.DetectionResultFields.key],
+          decoded_dict)
+    else:
+      skipped_images += 1
+      tf.logging.info('Skipped images: {0}'.format(skipped_images))
+  return processed_images, skipped_images
+
+
+def _evaluate_shard(args):
+  """Accumulates a single tf_record shard into a fresh evaluator.
+
+  Runs in a worker process of read_data_and_evaluate.
+
+  Args:
+    args: a tuple (input_path, eval_config, categories).
+
+  Returns:
+    A tuple (object_detection_evaluator, processed_images, skipped_images)
+    where object_detection_evaluator holds the partial evaluation state of the
+    shard.
+  """
+  input_path, eval_config, categories = args
+  object_detection_evaluator = evaluator.get_evaluators(
+      eval_config, categories)[0]
+  processed_images, skipped_images = _add_records_to_evaluator(
+      input_path, object_detection_evaluator)
+  return object_detection_evaluator, processed_images, skipped_images
+
+
+def read_data_and_evaluate(input_config, eval_config, num_workers=1):
   """Reads pre-computed object detections and groundtruth from tf_record.
 
+  If num_workers is greater than 1, the input shards are distributed over a
+  pool of worker processes. Each worker accumulates the images of a shard in
+  its own evaluator and the partial evaluators are merged in input order, so
+  that the returned metrics are identical to the ones of a serial evaluation.
+
   Args:
     input_config: input config proto of type
       object_detection.protos.InputReader.
     eval_config: evaluation config proto of type
       object_detection.protos.EvalConfig.
+    num_workers: number of processes used to read and evaluate input shards.
 
   Returns:
     Evaluated detections metrics.
 
   Raises:
-    ValueError: if input_reader type is not supported or metric type is unknown.
+    ValueError: if input_reader type is not supported or metric type is unknown,
+      or if the metric does not support multi-process evaluation.
   """
   if input_config.WhichOneof('input_reader') == 'tf_record_input_reader':
-    input_paths = input_config.tf_record_input_reader.input_path
+    input_paths = _generate_filenames(
+        input_config.tf_record_input_reader.input_path)
 
     label_map = label_map_util.load_labelmap(input_config.label_map_path)
     max_num_classes = max([item.id for item in label_map.item])
@@ -103,31 +181,31 @@ def read_data_and_evaluate(input_config, eval_config):
 
     skipped_images = 0
     processed_images = 0
-    for input_path in _generate_filenames(input_paths):
-      tf.logging.info('Processing file: {0}'.format(input_path))
-
-      record_iterator = tf.python_io.tf_record_iterator(path=input_path)
-      data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
-
-      for string_record in record_iterator:
-        tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
-                               processed_images)
-        processed_images += 1
-
-        example = tf.train.Example()
-        example.ParseFromString(string_record)
-        decoded_dict = data_parser.parse(example)
-
-        if decoded_dict:
-          object_detection_evaluator.add_single_ground_truth_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-          object_detection_evaluator.add_single_detected_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-        else:
-          skipped_images += 1
-          tf.logging.info('Skipped images: {0}'.format(skipped_images))
+    if num_workers > 1:
+      if not isinstance(object_detection_evaluator,
+                        object_detection_evaluation.ObjectDetectionEvaluator):
+        raise ValueError('Multi-process evaluation is not supported for {}.'
+                         .format(type(object_detection_evaluator).__name__))
+      pool = multiprocessing.Pool(num_workers)
+      try:
+        shard_args = [(input_path, eval_config, categories)
+                      for input_path in input_paths]
+        for (shard_evaluator, shard_processed_images,
+             shard_skipped_images) in pool.imap(_evaluate_shard, shard_args):
+          object_detection_evaluator.merge(shard_evaluator)
+          processed_images += shard_processed_images
+          skipped_images += shard_skipped_images
+      finally:
+        pool.terminate()
+        pool.join()
+    else:
+      for input_path in input_paths:
+        shard_processed_images, shard_skipped_images = (
+            _add_records_to_evaluator(input_path, object_detection_evaluator))
+        processed_images += shard_processed_images
+        skipped_images += shard_skipped_images
+    tf.logging.info('Processed {0} images, skipped {1} images.'.format(
+        processed_images, skipped_images))
 
     return object_detection_evaluator.evaluate()
 
@@ -163,7 +241,8 @@ def main(argv):
   eval_config = configs['eval_config']
   input_config = configs['eval_input_config']
 
-  metrics = read_data_and_evaluate(input_config, eval_config)
+  metrics = read_data_and_evaluate(input_config, eval_config,
+                                   num_workers=FLAGS.num_workers)
 
   # Save metrics
   write_metrics(metrics, FLAGS.eval_dir)
@@ -14,9 +14,16 @@
 # ==============================================================================
 """Tests for utilities in offline_eval_map_corloc binary."""
 
+import os
+
+import numpy as np
 import tensorflow as tf
 
+from object_detection.core import standard_fields as fields
 from object_detection.metrics import offline_eval_map_corloc as offline_eval
+from object_detection.protos import eval_pb2
+from object_detection.protos import input_reader_pb2
+from object_detection.utils import dataset_util
 
 
 class OfflineEvalMapCorlocTest(tf.test.TestCase):
@@ -53,6 +60,62 @@ class OfflineEvalMapCorlocTest(tf.test.TestCase):
         '/path/to/-00001-of-00003.record', '/path/to/-00002-of-00003.record'
     ])
 
+  def _write_records(self, path, image_ids, random_state):
+    """Writes records with random groundtruth and detections of 2 classes."""
+    with tf.python_io.TFRecordWriter(path) as writer:
+      for image_id in image_ids:
+        features = {
+            fields.TfExampleFields.source_id:
+                dataset_util.bytes_feature(str(image_id).encode('utf8'))
+        }
+        for prefix, num_boxes in [('image/object/', 3),
+                                  ('image/detection/', 5)]:
+          mins = random_state.uniform(0, 0.5, size=[2, num_boxes])
+          maxs = mins + random_state.uniform(0.1, 0.5, size=[2, num_boxes])
+          for name, values in zip(['ymin', 'xmin', 'ymax', 'xmax'],
+                                  [mins[0], mins[1], maxs[0], maxs[1]]):
+            features[prefix + 'bbox/' + name] = (
+                dataset_util.float_list_feature(values.tolist()))
+        features[fields.TfExampleFields.object_class_label] = (
+            dataset_util.int64_list_feature(
+                random_state.randint(1, 3, size=3).tolist()))
+        features[fields.TfExampleFields.object_difficult] = (
+            dataset_util.int64_list_feature([0, 0, 1]))
+        features[fields.TfExampleFields.object_group_of] = (
+            dataset_util.int64_list_feature([0, 0, 0]))
+        features[fields.TfExampleFields.detection_class_label] = (
+            dataset_util.int64_list_feature(
+                random_state.randint(1, 3, size=5).tolist()))
+        features[fields.TfExampleFields.detection_score] = (
+            dataset_util.float_list_feature(
+                random_state.uniform(size=5).tolist()))
+        writer.write(tf.train.Example(
+            features=tf.train.Features(feature=features)).SerializeToString())
+
+  def test_readDataAndEvaluateWithWorkers(self):
+    data_dir = self.get_temp_dir()
+    label_map_path = os.path.join(data_dir, 'label_map.pbtxt')
+    with tf.gfile.GFile(label_map_path, 'w') as f:
+      f.write("item { id: 1 name: 'cat' } item { id: 2 name: 'dog' }")
+    random_state = np.random.RandomState(0)
+    for shard in range(3):
+      self._write_records(
+          os.path.join(data_dir, 'eval-%.5d-of-00003.record' % shard),
+          range(shard * 4, shard * 4 + 4), random_state)
+
+    input_config = input_reader_pb2.InputReader(label_map_path=label_map_path)
+    input_config.tf_record_input_reader.input_path.append(
+        os.path.join(data_dir, 'eval@3.record'))
+    eval_config = eval_pb2.EvalConfig(
+        metrics_set=['pascal_voc_detection_metrics'])
+
+    metrics = offline_eval.read_data_and_evaluate(input_config, eval_config)
+    sharded_metrics = offline_eval.read_data_and_evaluate(
+        input_config, eval_config, num_workers=2)
+    self.assertEqual(sorted(metrics), sorted(sharded_metrics))
+    for name in metrics:
+      np.testing.assert_equal(metrics[name], sharded_metrics[name])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -0,0 +1,241 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Stores for the groundtruth boxes of an object detection evaluation.
+
+A store holds, for every image key, the groundtruth boxes, class labels and
+difficult and group-of flags of the image. GroundtruthStore keeps a small numpy
+array per image and field. ColumnarGroundtruthStore appends the fields of all
+images to a few contiguous arrays, located through an offset index, which avoids
+the per-array overhead when evaluating millions of images. Its arrays can
+optionally be memory-mapped from files, so that the groundtruth of a large
+dataset is paged in by the operating system instead of being kept in memory.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+INITIAL_IMAGE_CAPACITY = 1024
+INITIAL_BOX_CAPACITY = 8192
+
+
+class GroundtruthStore(object):
+  """Stores the groundtruth of every image in separate numpy arrays."""
+
+  def __init__(self):
+    self._boxes = {}
+    self._class_labels = {}
+    self._is_difficult_list = {}
+    self._is_group_of_list = {}
+
+  def __contains__(self, image_key):
+    return image_key in self._boxes
+
+  def __len__(self):
+    return len(self._boxes)
+
+  def keys(self):
+    """Returns a list of the image keys of the store."""
+    return list(self._boxes.keys())
+
+  def add(self, image_key, boxes, class_labels, is_difficult_list,
+          is_group_of_list):
+    """Adds the groundtruth of a single image.
+
+    Args:
+      image_key: A unique string/integer identifier for the image. It must not
+        already be in the store.
+      boxes: float numpy array of shape [num_boxes, 4].
+      class_labels: integer numpy array of shape [num_boxes].
+      is_difficult_list: boolean numpy array of shape [num_boxes].
+      is_group_of_list: boolean numpy array of shape [num_boxes].
+    """
+    self._boxes[image_key] = boxes
+    self._class_labels[image_key] = class_labels
+    self._is_difficult_list[image_key] = is_difficult_list
+    self._is_group_of_list[image_key] = is_group_of_list
+
+  def get(self, image_key):
+    """Returns the groundtruth of a single image.
+
+    Args:
+      image_key: The identifier of an image in the store.
+
+    Returns:
+      A tuple (boxes, class_labels, is_difficult_list, is_group_of_list) of
+      numpy arrays as passed to add.
+    """
+    return (self._boxes[image_key], self._class_labels[image_key],
+            self._is_difficult_list[image_key],
+            self._is_group_of_list[image_key])
+
+  def get_all(self):
+    """Returns the groundtruth of all images concatenated in key order.
+
+    Returns:
+      image_keys: A list with the keys of all images.
+      num_boxes: int64 numpy array with the number of boxes of every image.
+      boxes: float numpy array of shape [total_num_boxes, 4].
+      class_labels: int numpy array of shape [total_num_boxes].
+      is_difficult_list: bool numpy array of shape [total_num_boxes].
+      is_group_of_list: bool numpy array of shape [total_num_boxes].
+    """
+    image_keys = self.keys()
+    num_boxes = np.array([self._boxes[key].shape[0] for key in image_keys],
+                         dtype=np.int64)
+    if not image_keys:
+      return (image_keys, num_boxes, np.empty([0, 4], dtype=float),
+              np.empty([0], dtype=int), np.empty([0], dtype=bool),
+              np.empty([0], dtype=bool))
+    return (image_keys, num_boxes,
+            np.concatenate([self._boxes[key] for key in image_keys]).astype(
+                float, copy=False),
+            np.concatenate([self._class_labels[key] for key in image_keys
+                           ]).astype(int, copy=False),
+            np.concatenate([self._is_difficult_list[key] for key in image_keys
+                           ]).astype(bool, copy=False),
+            np.concatenate([self._is_group_of_list[key] for key in image_keys
+                           ]).astype(bool, copy=False))
+
+  def add_all(self, image_keys, num_boxes, boxes, class_labels,
+              is_difficult_list, is_group_of_list):
+    """Adds the groundtruth of many images, in the format returned by get_all.
+
+    Args:
+      image_keys: A list of image keys, none of which is in the store.
+      num_boxes: integer numpy array with the number of boxes of every image.
+      boxes: float numpy array of shape [sum(num_boxes), 4].
+      class_labels: integer numpy array of shape [sum(num_boxes)].
+      is_difficult_list: boolean numpy array of shape [sum(num_boxes)].
+      is_group_of_list: boolean numpy array of shape [sum(num_boxes)].
+    """
+    boundaries = np.cumsum(num_boxes)[:-1]
+    for fields in zip(image_keys,
+                      np.split(boxes, boundaries),
+                      np.split(class_labels, boundaries),
+                      np.split(is_difficult_list, boundaries),
+                      np.split(is_group_of_list, boundaries)):
+      self.add(*fields)
+
+  def update(self, other):
+    """Adds the groundtruth of all images of another store."""
+    self.add_all(*other.get_all())
+
+
+class ColumnarGroundtruthStore(GroundtruthStore):
+  """Stores the groundtruth of all images in contiguous arrays.
+
+  The boxes of image i are rows offsets[i]:offsets[i + 1] of the box columns,
+  and get returns views into these columns. Boxes are stored as float64, class
+  labels as int32. The columns grow geometrically as images are added.
+  """
+
+  def __init__(self, directory=None):
+    """Constructor.
+
+    Args:
+      directory: (optional) directory in which the columns are memory-mapped.
+        The files are unlinked as soon as they are created (their space is
+        released when the store is garbage collected), so the directory should
+        be on a local POSIX filesystem. If None, the columns are kept in memory.
+    """
+    self._directory = directory
+    self._image_index = {}
+    self._image_keys = []
+    self._offsets = self._new_column([INITIAL_IMAGE_CAPACITY + 1], np.int64)
+    self._offsets[0] = 0
+    self._boxes = self._new_column([INITIAL_BOX_CAPACITY, 4], np.float64)
+    self._class_labels = self._new_column([INITIAL_BOX_CAPACITY], np.int32)
+    self._is_difficult_list = self._new_column([INITIAL_BOX_CAPACITY], bool)
+    self._is_group_of_list = self._new_column([INITIAL_BOX_CAPACITY], bool)
+
+  def _new_column(self, shape, dtype):
+    if self._directory is None:
+      return np.empty(shape, dtype=dtype)
+    handle, path = tempfile.mkstemp(dir=self._directory, suffix='.column')
+    os.close(handle)
+    column = np.memmap(path, dtype=dtype, mode='w+', shape=tuple(shape))
+    os.remove(path)
+    return column
+
+  def _resize_column(self, column, capacity, size):
+    resized = self._new_column([capacity] + list(column.shape[1:]),
+                               column.dtype)
+    resized[:size] = column[:size]
+    return resized
+
+  def _reserve(self, num_images, num_boxes):
+    """Grows the columns to hold `num_images` images with `num_boxes` boxes."""
+    image_capacity = self._offsets.shape[0] - 1
+    if num_images > image_capacity:
+      self._offsets = self._resize_column(
+          self._offsets, max(num_images, 2 * image_capacity) + 1,
+          len(self._image_keys) + 1)
+    box_capacity = self._boxes.shape[0]
+    if num_boxes > box_capacity:
+      box_capacity = max(num_boxes, 2 * box_capacity)
+      size = self._offsets[len(self._image_keys)]
+      self._boxes = self._resize_column(self._boxes, box_capacity, size)
+      self._class_labels = self._resize_column(self._class_labels,
+                                               box_capacity, size)
+      self._is_difficult_list = self._resize_column(self._is_difficult_list,
+                                                    box_capacity, size)
+      self._is_group_of_list = self._resize_column(self._is_group_of_list,
+                                                   box_capacity, size)
+
+  def __contains__(self, image_key):
+    return image_key in self._image_index
+
+  def __len__(self):
+    return len(self._image_keys)
+
+  def keys(self):
+    return list(self._image_keys)
+
+  def add(self, image_key, boxes, class_labels, is_difficult_list,
+          is_group_of_list):
+    self.add_all([image_key], [boxes.shape[0]], boxes, class_labels,
+                 is_difficult_list, is_group_of_list)
+
+  def get(self, image_key):
+    index = self._image_index[image_key]
+    start, end = self._offsets[index:index + 2]
+    return (self._boxes[start:end], self._class_labels[start:end],
+            self._is_difficult_list[start:end],
+            self._is_group_of_list[start:end])
+
+  def get_all(self):
+    num_images = len(self._image_keys)
+    end = self._offsets[num_images]
+    return (self.keys(), np.diff(self._offsets[:num_images + 1]),
+            self._boxes[:end], self._class_labels[:end],
+            self._is_difficult_list[:end], self._is_group_of_list[:end])
+
+  def add_all(self, image_keys, num_boxes, boxes, class_labels,
+              is_difficult_list, is_group_of_list):
+    num_images = len(self._image_keys)
+    start = self._offsets[num_images]
+    end = start + boxes.shape[0]
+    self._reserve(num_images + len(image_keys), end)
+    self._offsets[num_images + 1:num_images + len(image_keys) + 1] = (
+        start + np.cumsum(num_boxes))
+    self._boxes[start:end] = boxes
+    self._class_labels[start:end] = class_labels
+    self._is_difficult_list[start:end] = is_difficult_list
+    self._is_group_of_list[start:end] = is_group_of_list
+    for index, image_key in enumerate(image_keys, num_images):
+      self._image_index[image_key] = index
+    self._image_keys.extend(image_keys)
+
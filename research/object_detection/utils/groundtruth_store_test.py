@@ -0,0 +1,103 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for object_detection.utils.groundtruth_store."""
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.utils import groundtruth_store
+
+
+def _random_groundtruth(num_images, seed=0):
+  random_state = np.random.RandomState(seed)
+  groundtruth = []
+  for image_index in range(num_images):
+    num_boxes = random_state.randint(0, 6)
+    groundtruth.append(('img%d' % image_index,
+                        random_state.rand(num_boxes, 4),
+                        random_state.randint(0, 10, size=num_boxes),
+                        random_state.rand(num_boxes) < 0.2,
+                        random_state.rand(num_boxes) < 0.2))
+  return groundtruth
+
+
+class GroundtruthStoreTest(tf.test.TestCase):
+
+  def _create_stores(self):
+    return [
+        groundtruth_store.GroundtruthStore(),
+        groundtruth_store.ColumnarGroundtruthStore(),
+        groundtruth_store.ColumnarGroundtruthStore(
+            directory=self.get_temp_dir()),
+    ]
+
+  def _assert_contains(self, store, groundtruth):
+    self.assertEqual(len(groundtruth), len(store))
+    self.assertEqual([fields[0] for fields in groundtruth], store.keys())
+    for fields in groundtruth:
+      self.assertTrue(fields[0] in store)
+      for expected, stored in zip(fields[1:], store.get(fields[0])):
+        self.assertAllEqual(expected, stored)
+
+  def test_add_and_get(self):
+    # Enough images to grow the columns of the columnar stores.
+    groundtruth = _random_groundtruth(3000)
+    for store in self._create_stores():
+      for fields in groundtruth:
+        store.add(*fields)
+      self._assert_contains(store, groundtruth)
+      self.assertFalse('img3000' in store)
+
+  def test_get_all_and_add_all(self):
+    groundtruth = _random_groundtruth(50)
+    for store in self._create_stores():
+      for fields in groundtruth:
+        store.add(*fields)
+      (image_keys, num_boxes, boxes, class_labels, is_difficult_list,
+       is_group_of_list) = store.get_all()
+      self.assertEqual([fields[0] for fields in groundtruth], image_keys)
+      self.assertAllEqual([fields[1].shape[0] for fields in groundtruth],
+                          num_boxes)
+      self.assertAllEqual([sum(num_boxes), 4], boxes.shape)
+      for restored_store in self._create_stores():
+        restored_store.add_all(image_keys, num_boxes, boxes, class_labels,
+                               is_difficult_list, is_group_of_list)
+        self._assert_contains(restored_store, groundtruth)
+
+  def test_get_all_on_empty_store(self):
+    for store in self._create_stores():
+      image_keys, num_boxes, boxes = store.get_all()[:3]
+      self.assertEqual([], image_keys)
+      self.assertAllEqual([0], num_boxes.shape)
+      self.assertAllEqual([0, 4], boxes.shape)
+
+  def test_update(self):
+    groundtruth = _random_groundtruth(20)
+    num_store_types = len(self._create_stores())
+    for store_index in range(num_store_types):
+      for other_store_index in range(num_store_types):
+        store = self._create_stores()[store_index]
+        other_store = self._create_stores()[other_store_index]
+        for fields in groundtruth[:10]:
+          store.add(*fields)
+        for fields in groundtruth[10:]:
+          other_store.add(*fields)
+        store.update(other_store)
+        self._assert_contains(store, groundtruth)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -19,11 +19,17 @@ Example box operations that are supported:
   * Areas: compute bounding box areas
   * IOU: pairwise intersection-over-union scores
 """
+import collections
+
 import numpy as np
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_ops
 
+# Number of boxes whose pairwise overlaps are computed at once by non maximum
+# suppression.
+NMS_BLOCK_SIZE = 256
+
 
 class SortOrder(object):
   """Enum class for sort order.
@@ -161,7 +167,8 @@ def sort_by_field(boxlist, field, order=SortOrder.DESCEND):
 def non_max_suppression(boxlist,
                         max_output_size=10000,
                         iou_threshold=1.0,
-                        score_threshold=-10.0):
+                        score_threshold=-10.0,
+                        soft_nms_sigma=0.0):
   """Non maximum suppression.
 
   This op greedily selects a subset of detection bounding boxes, pruning
@@ -169,6 +176,11 @@ def non_max_suppression(boxlist,
   with already selected boxes. In each iteration, the detected bounding box with
   highest score in the available pool is selected.
 
+  If soft_nms_sigma is positive, Soft-NMS is performed instead: rather than
+  being pruned, the boxes overlapping a selected box have their score decayed by
+  exp(-0.5 * iou^2 / soft_nms_sigma) (boxes with IOU > iou_threshold are still
+  pruned), and boxes whose score falls below score_threshold are removed.
+
   Args:
     boxlist: BoxList holding N boxes.  Must contain a 'scores' field
       representing detection scores. All scores belong to the same class.
@@ -178,6 +190,9 @@ def non_max_suppression(boxlist,
                      less than this value. Default value is set to -10. A very
                      low threshold to pass pretty much all the boxes, unless
                      the user sets a different score threshold.
+    soft_nms_sigma: if positive, the sigma of the gaussian score decay of
+                    Soft-NMS. The returned 'scores' field then holds the decayed
+                    scores.
 
   Returns:
     a BoxList holding M boxes where M <= max_output_size
@@ -185,6 +200,7 @@ def non_max_suppression(boxlist,
     ValueError: if 'scores' field does not exist
     ValueError: if threshold is not in [0, 1]
     ValueError: if max_output_size < 0
+    ValueError: if soft_nms_sigma < 0
   """
   if not boxlist.has_field('scores'):
     raise ValueError('Field scores does not exist')
@@ -192,6 +208,8 @@ def non_max_suppression(boxlist,
     raise ValueError('IOU threshold must be in [0, 1]')
   if max_output_size < 0:
     raise ValueError('max_output_size must be bigger than 0.')
+  if soft_nms_sigma < 0:
+    raise ValueError('soft_nms_sigma must be non-negative.')
 
   boxlist = filter_scores_greater_than(boxlist, score_threshold)
   if boxlist.num_boxes() == 0:
@@ -199,6 +217,17 @@ def non_max_suppression(boxlist,
 
   boxlist = sort_by_field(boxlist, 'scores')
 
+  if soft_nms_sigma > 0:
+    selected_indices, selected_scores = _soft_non_max_suppression(
+        boxlist.get(), boxlist.get_field('scores'), max_output_size,
+        iou_threshold, score_threshold, soft_nms_sigma)
+    selected_boxlist = gather(
+        boxlist, selected_indices,
+        fields=[field for field in boxlist.get_extra_fields()
+                if field != 'scores'])
+    selected_boxlist.add_field('scores', selected_scores)
+    return selected_boxlist
+
   # Prevent further computation if NMS is disabled.
   if iou_threshold == 1.0:
     if boxlist.num_boxes() > max_output_size:
@@ -207,33 +236,67 @@ def non_max_suppression(boxlist,
     else:
       return boxlist
 
-  boxes = boxlist.get()
-  num_boxes = boxlist.num_boxes()
-  # is_index_valid is True only for all remaining valid boxes,
-  is_index_valid = np.full(num_boxes, 1, dtype=bool)
-  selected_indices = []
-  num_output = 0
-  for i in range(num_boxes):
-    if num_output < max_output_size:
-      if is_index_valid[i]:
-        num_output += 1
-        selected_indices.append(i)
-        is_index_valid[i] = False
-        valid_indices = np.where(is_index_valid)[0]
-        if valid_indices.size == 0:
-          break
-
-        intersect_over_union = np_box_ops.iou(
-            np.expand_dims(boxes[i, :], axis=0), boxes[valid_indices, :])
-        intersect_over_union = np.squeeze(intersect_over_union, axis=0)
-        is_index_valid[valid_indices] = np.logical_and(
-            is_index_valid[valid_indices],
-            intersect_over_union <= iou_threshold)
-  return gather(boxlist, np.array(selected_indices))
+  selected_indices = _greedy_non_max_suppression(
+      boxlist.get(), max_output_size, iou_threshold)
+  return gather(boxlist, selected_indices)
+
+
+def non_max_suppression_per_class(boxlist,
+                                  max_output_size=10000,
+                                  iou_threshold=1.0,
+                                  score_threshold=-10.0):
+  """Applies non_max_suppression to the boxes of every class separately.
+
+  All classes are suppressed in a single pass as in
+  multi_class_non_max_suppression, but every box has a single class given by
+  its 'classes' field instead of a score per class.
+
+  Args:
+    boxlist: BoxList holding N boxes.  Must contain a 'scores' field
+      representing detection scores and an integer 'classes' field holding the
+      class of every box.
+    max_output_size: maximum number of retained boxes per class.
+    iou_threshold: intersection over union threshold.
+    score_threshold: minimum score threshold. Remove the boxes with scores
+                     less than this value.
+
+  Returns:
+    a BoxList holding the retained boxes grouped by increasing class and sorted
+    by decreasing score within each class. Boxes of the same class with equal
+    scores are ordered by decreasing index.
+  Raises:
+    ValueError: if 'scores' or 'classes' field does not exist
+    ValueError: if threshold is not in [0, 1]
+    ValueError: if max_output_size < 0
+  """
+  if not boxlist.has_field('scores'):
+    raise ValueError('Field scores does not exist')
+  if not boxlist.has_field('classes'):
+    raise ValueError('Field classes does not exist')
+  if iou_threshold < 0. or iou_threshold > 1.0:
+    raise ValueError('IOU threshold must be in [0, 1]')
+  if max_output_size < 0:
+    raise ValueError('max_output_size must be bigger than 0.')
+
+  boxlist = filter_scores_greater_than(boxlist, score_threshold)
+  scores = boxlist.get_field('scores')
+  classes = boxlist.get_field('classes')
+  order = np.lexsort((-np.arange(boxlist.num_boxes()), -scores, classes))
+  boxlist = gather(boxlist, order)
+  classes = classes[order]
+
+  if iou_threshold == 1.0:
+    class_starts = np.searchsorted(classes, classes)
+    selected_indices = np.where(
+        np.arange(classes.size) - class_starts < max_output_size)[0]
+  else:
+    selected_indices = _greedy_non_max_suppression(
+        boxlist.get(), max_output_size, iou_threshold, classes)
+  return gather(boxlist, selected_indices)
 
 
 def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
-                                    max_output_size):
+                                    max_output_size, soft_nms_sigma=0.0):
   """Multi-class version of non maximum suppression.
 
   This op greedily selects a subset of detection bounding boxes, pruning
@@ -243,6 +306,11 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
   pruning boxes with score less than a provided threshold prior to
   applying NMS.
 
+  All classes are suppressed in a single pass over the (box, class) pairs
+  grouped by class, in which boxes of different classes never suppress each
+  other. The result is the same as applying non_max_suppression to every class
+  separately.
+
   Args:
     boxlist: BoxList holding N boxes.  Must contain a 'scores' field
       representing detection scores.  This scores field is a tensor that can
@@ -255,6 +323,8 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
     iou_thresh: scalar threshold for IOU (boxes that that high IOU overlap
       with previously selected boxes are removed).
     max_output_size: maximum number of retained boxes per class.
+    soft_nms_sigma: if positive, Soft-NMS with this gaussian sigma is performed
+      instead of hard NMS (see non_max_suppression).
 
   Returns:
     a BoxList holding M boxes with a rank-1 scores field representing
@@ -270,6 +340,8 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
     raise ValueError('boxlist must be a BoxList')
   if not boxlist.has_field('scores'):
     raise ValueError('input boxlist must have \'scores\' field')
+  if soft_nms_sigma < 0:
+    raise ValueError('soft_nms_sigma must be non-negative.')
   scores = boxlist.get_field('scores')
   if len(scores.shape) == 1:
     scores = np.reshape(scores, [-1, 1])
@@ -286,25 +358,169 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
   if num_boxes != num_scores:
     raise ValueError('Incorrect scores field length: actual vs expected.')
 
-  selected_boxes_list = []
+  # Candidates of every class above the score threshold, grouped by class and
+  # sorted by decreasing score within each class as done by sort_by_field.
+  candidate_indices_list = []
+  candidate_classes_list = []
   for class_idx in range(num_classes):
-    boxlist_and_class_scores = np_box_list.BoxList(boxlist.get())
-    class_scores = np.reshape(scores[0:num_scores, class_idx], [-1])
-    boxlist_and_class_scores.add_field('scores', class_scores)
-    boxlist_filt = filter_scores_greater_than(boxlist_and_class_scores,
-                                              score_thresh)
-    nms_result = non_max_suppression(boxlist_filt,
-                                     max_output_size=max_output_size,
-                                     iou_threshold=iou_thresh,
-                                     score_threshold=score_thresh)
-    nms_result.add_field(
-        'classes', np.zeros_like(nms_result.get_field('scores')) + class_idx)
-    selected_boxes_list.append(nms_result)
-  selected_boxes = concatenate(selected_boxes_list)
+    class_scores = scores[:, class_idx]
+    high_score_indices = np.where(np.greater(class_scores, score_thresh))[0]
+    order = np.argsort(class_scores[high_score_indices])[::-1]
+    candidate_indices_list.append(high_score_indices[order])
+    candidate_classes_list.append(
+        np.full(high_score_indices.size, class_idx, dtype=np.int64))
+  candidate_indices = np.concatenate(candidate_indices_list)
+  candidate_classes = np.concatenate(candidate_classes_list)
+  candidate_scores = scores[candidate_indices, candidate_classes]
+  candidate_boxes = boxlist.get()[candidate_indices]
+
+  if soft_nms_sigma > 0:
+    selected, selected_scores = _soft_non_max_suppression(
+        candidate_boxes, candidate_scores, max_output_size, iou_thresh,
+        score_thresh, soft_nms_sigma, candidate_classes)
+    candidate_scores[selected] = selected_scores
+  elif iou_thresh == 1.0:
+    class_starts = np.searchsorted(candidate_classes, candidate_classes)
+    selected = np.where(
+        np.arange(candidate_classes.size) - class_starts < max_output_size)[0]
+  else:
+    selected = _greedy_non_max_suppression(candidate_boxes, max_output_size,
+                                           iou_thresh, candidate_classes)
+
+  selected_boxes = np_box_list.BoxList(candidate_boxes[selected])
+  selected_boxes.add_field('scores', candidate_scores[selected])
+  selected_boxes.add_field(
+      'classes', candidate_classes[selected].astype(scores.dtype))
   sorted_boxes = sort_by_field(selected_boxes, 'scores')
   return sorted_boxes
 
 
+def _greedy_non_max_suppression(boxes, max_output_size, iou_threshold,
+                                classes=None):
+  """Greedily selects boxes sorted by decreasing score.
+
+  Boxes are processed in blocks of NMS_BLOCK_SIZE. The boxes of a block that
+  have not been pruned yet are resolved using their pairwise IOU, and the boxes
+  selected from the block then prune all the following boxes of their class in
+  a single IOU computation. A box is pruned if its IOU with a selected box is
+  not smaller than or equal to iou_threshold, so exactly the same boxes are
+  selected as when every selected box is compared against the following boxes
+  one at a time.
+
+  Args:
+    boxes: a numpy array of shape [N, 4] holding boxes grouped by class and
+      sorted by decreasing score within each class.
+    max_output_size: maximum number of selected boxes per class.
+    iou_threshold: intersection over union threshold.
+    classes: (optional) non-decreasing integer numpy array of shape [N] holding
+      the class of every box. Boxes of different classes do not suppress each
+      other. If None, all boxes belong to the same class.
+
+  Returns:
+    an integer numpy array holding the indices of the selected boxes in
+    increasing order.
+  """
+  num_boxes = boxes.shape[0]
+  if classes is None:
+    classes = np.zeros(num_boxes, dtype=np.int64)
+  # Index following the last box of the class of every box.
+  class_ends = np.searchsorted(classes, classes, side='right')
+  num_selected_per_class = collections.defaultdict(int)
+  is_index_valid = np.full(num_boxes, 1, dtype=bool)
+  selected_indices = []
+  for start in range(0, num_boxes, NMS_BLOCK_SIZE):
+    end = min(start + NMS_BLOCK_SIZE, num_boxes)
+    candidates = start + np.where(is_index_valid[start:end])[0]
+    if candidates.size == 0:
+      continue
+    candidate_boxes = boxes[candidates]
+    candidate_classes = classes[candidates]
+    is_suppressing = np.logical_and(
+        np.logical_not(
+            np_box_ops.iou(candidate_boxes, candidate_boxes) <= iou_threshold),
+        np.equal(np.expand_dims(candidate_classes, axis=1),
+                 np.expand_dims(candidate_classes, axis=0)))
+    is_candidate_valid = np.full(candidates.size, 1, dtype=bool)
+    block_selected_indices = []
+    for i in range(candidates.size):
+      class_idx = candidate_classes[i]
+      if (not is_candidate_valid[i] or
+          num_selected_per_class[class_idx] >= max_output_size):
+        continue
+      block_selected_indices.append(candidates[i])
+      num_selected_per_class[class_idx] += 1
+      is_candidate_valid[i + 1:] = np.logical_and(
+          is_candidate_valid[i + 1:], np.logical_not(is_suppressing[i, i + 1:]))
+      if num_selected_per_class[class_idx] >= max_output_size:
+        is_index_valid[end:class_ends[candidates[i]]] = False
+    if not block_selected_indices:
+      continue
+    selected_indices.extend(block_selected_indices)
+
+    block_selected = np.array(block_selected_indices)
+    following = end + np.where(
+        is_index_valid[end:class_ends[block_selected[-1]]])[0]
+    if following.size == 0:
+      continue
+    is_suppressed = np.logical_and(
+        np.logical_not(
+            np_box_ops.iou(boxes[block_selected], boxes[following]) <=
+            iou_threshold),
+        np.equal(np.expand_dims(classes[block_selected], axis=1),
+                 np.expand_dims(classes[following], axis=0)))
+    is_index_valid[following[np.any(is_suppressed, axis=0)]] = False
+  return np.array(selected_indices, dtype=np.int64)
+
+
+def _soft_non_max_suppression(boxes, scores, max_output_size, iou_threshold,
+                              score_threshold, sigma, classes=None):
+  """Performs Soft-NMS with a gaussian score decay.
+
+  Args:
+    boxes: a numpy array of shape [N, 4] holding boxes grouped by class.
+    scores: a numpy array of shape [N] holding box scores.
+    max_output_size: maximum number of selected boxes per class.
+    iou_threshold: boxes with a higher IOU with a selected box are pruned.
+    score_threshold: boxes whose decayed score is not greater than this value
+      are pruned.
+    sigma: sigma of the gaussian score decay.
+    classes: (optional) non-decreasing integer numpy array of shape [N] holding
+      the class of every box. Boxes of different classes do not suppress each
+      other. If None, all boxes belong to the same class.
+
+  Returns:
+    selected_indices: an integer numpy array holding the indices of the
+      selected boxes, grouped by class and in the order in which they were
+      selected within each class.
+    selected_scores: a numpy array holding the decayed scores of the selected
+      boxes.
+  """
+  num_boxes = boxes.shape[0]
+  if classes is None:
+    classes = np.zeros(num_boxes, dtype=np.int64)
+  scores = np.array(scores, dtype=float)
+  unique_classes = np.unique(classes)
+  class_starts = np.searchsorted(classes, unique_classes, side='left')
+  class_ends = np.searchsorted(classes, unique_classes, side='right')
+  selected_indices = []
+  for class_start, class_end in zip(class_starts, class_ends):
+    remaining = class_start + np.where(
+        scores[class_start:class_end] > score_threshold)[0]
+    num_selected = 0
+    while remaining.size and num_selected < max_output_size:
+      best = remaining[np.argmax(scores[remaining])]
+      selected_indices.append(best)
+      num_selected += 1
+      remaining = remaining[remaining != best]
+      overlaps = np_box_ops.iou(boxes[best:best + 1], boxes[remaining])[0]
+      decay = np.where(overlaps <= iou_threshold,
+                       np.exp(-0.5 * overlaps * overlaps / sigma), 0.0)
+      scores[remaining] *= decay
+      remaining = remaining[scores[remaining] > score_threshold]
+  selected_indices = np.array(selected_indices, dtype=np.int64)
+  return selected_indices, scores[selected_indices]
+
+
 def scale(boxlist, y_scale, x_scale):
   """Scale box coordinates in x and y dimensions.
 
@@ -15,11 +15,37 @@
 
 """Tests for object_detection.utils.np_box_list_ops."""
 
+import time
+
 import numpy as np
 import tensorflow as tf
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_list_ops
+from object_detection.utils import np_box_ops
+
+
+def _loop_non_max_suppression_indices(boxes, max_output_size, iou_threshold):
+  """Reference NMS comparing every selected box to all remaining boxes."""
+  is_index_valid = np.full(boxes.shape[0], 1, dtype=bool)
+  selected_indices = []
+  for i in range(boxes.shape[0]):
+    if len(selected_indices) < max_output_size and is_index_valid[i]:
+      selected_indices.append(i)
+      is_index_valid[i] = False
+      valid_indices = np.where(is_index_valid)[0]
+      intersect_over_union = np.squeeze(np_box_ops.iou(
+          np.expand_dims(boxes[i, :], axis=0), boxes[valid_indices, :]), axis=0)
+      is_index_valid[valid_indices] = np.logical_and(
+          is_index_valid[valid_indices], intersect_over_union <= iou_threshold)
+  return np.array(selected_indices, dtype=int)
+
+
+def _random_boxes(random_state, num_boxes):
+  """Creates random boxes of size up to 30 in a 130x130 window."""
+  corners = random_state.rand(num_boxes, 2) * 100
+  sizes = random_state.rand(num_boxes, 2) * 30 + 0.5
+  return np.concatenate([corners, corners + sizes], axis=1)
 
 
 class AreaRelatedTest(tf.test.TestCase):
@@ -409,6 +435,131 @@ class NonMaximumSuppressionTest(tf.test.TestCase):
     self.assertAllClose(classes_clean, expected_classes)
     self.assertAllClose(boxes, expected_boxes)
 
+  def test_nms_matches_loop_reference(self):
+    random_state = np.random.RandomState(0)
+    boxes = _random_boxes(random_state, 1000)
+    # Rounded scores create ties.
+    scores = np.round(random_state.rand(1000), 2)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', scores)
+    sorted_boxes = np_box_list_ops.sort_by_field(boxlist, 'scores').get()
+    for iou_threshold in [0.0, 0.3, 0.7]:
+      for max_output_size in [1, 50, 10000]:
+        expected_boxes = sorted_boxes[_loop_non_max_suppression_indices(
+            sorted_boxes, max_output_size, iou_threshold)]
+        nms_boxlist = np_box_list_ops.non_max_suppression(
+            boxlist, max_output_size, iou_threshold)
+        self.assertAllEqual(expected_boxes, nms_boxlist.get())
+
+  def test_multiclass_nms_matches_per_class_nms(self):
+    random_state = np.random.RandomState(1)
+    boxes = _random_boxes(random_state, 500)
+    scores = np.round(random_state.rand(500, 4), 2)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', scores)
+    boxlist_clean = np_box_list_ops.multi_class_non_max_suppression(
+        boxlist, score_thresh=0.3, iou_thresh=0.5, max_output_size=20)
+    classes_clean = boxlist_clean.get_field('classes')
+    for class_idx in range(4):
+      class_boxlist = np_box_list.BoxList(boxes)
+      class_boxlist.add_field('scores', scores[:, class_idx])
+      class_boxlist = np_box_list_ops.filter_scores_greater_than(
+          class_boxlist, 0.3)
+      expected_boxlist = np_box_list_ops.non_max_suppression(
+          class_boxlist, max_output_size=20, iou_threshold=0.5)
+      self.assertAllEqual(
+          np.sort(expected_boxlist.get_field('scores')),
+          np.sort(boxlist_clean.get_field('scores')[
+              classes_clean == class_idx]))
+      self.assertEqual(20, expected_boxlist.num_boxes())
+
+  def test_nms_per_class_matches_per_class_nms(self):
+    random_state = np.random.RandomState(2)
+    boxes = _random_boxes(random_state, 300)
+    scores = random_state.rand(300)
+    classes = random_state.randint(0, 5, 300)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', scores)
+    boxlist.add_field('classes', classes)
+    nms_boxlist = np_box_list_ops.non_max_suppression_per_class(
+        boxlist, max_output_size=15, iou_threshold=0.4)
+    self.assertTrue(np.all(np.diff(nms_boxlist.get_field('classes')) >= 0))
+    for class_idx in range(5):
+      class_boxlist = np_box_list.BoxList(boxes[classes == class_idx])
+      class_boxlist.add_field('scores', scores[classes == class_idx])
+      expected_boxlist = np_box_list_ops.non_max_suppression(
+          class_boxlist, max_output_size=15, iou_threshold=0.4)
+      is_class = nms_boxlist.get_field('classes') == class_idx
+      self.assertAllEqual(expected_boxlist.get(), nms_boxlist.get()[is_class])
+      self.assertAllEqual(expected_boxlist.get_field('scores'),
+                          nms_boxlist.get_field('scores')[is_class])
+
+  def test_soft_nms(self):
+    boxes = np.array([[0, 0, 1, 1], [0, 0.5, 1, 1.5], [0, 10, 1, 11],
+                      [0, 0, 1, 1]], dtype=float)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', np.array([.9, .8, .7, .1]))
+    nms_boxlist = np_box_list_ops.non_max_suppression(
+        boxlist, max_output_size=10, iou_threshold=0.9, score_threshold=0.05,
+        soft_nms_sigma=0.5)
+    # The second box has an IOU of 1/3 with the first one and its score is
+    # decayed by exp(-0.5 * (1/3)^2 / 0.5), the last box is pruned since it is
+    # identical to the first one.
+    expected_boxes = np.array([[0, 0, 1, 1], [0, 0.5, 1, 1.5], [0, 10, 1, 11]],
+                              dtype=float)
+    expected_scores = np.array([.9, .8 * np.exp(-1. / 9.), .7])
+    self.assertAllClose(expected_boxes, nms_boxlist.get())
+    self.assertAllClose(expected_scores, nms_boxlist.get_field('scores'))
+
+  def test_multiclass_soft_nms(self):
+    boxlist = np_box_list.BoxList(
+        np.array([[0, 0, 1, 1], [0, 0.5, 1, 1.5]], dtype=float))
+    boxlist.add_field('scores', np.array([[.9, .2], [.8, .6]]))
+    boxlist_clean = np_box_list_ops.multi_class_non_max_suppression(
+        boxlist, score_thresh=0.1, iou_thresh=1.0, max_output_size=10,
+        soft_nms_sigma=0.5)
+    expected_scores = np.array([.9, .8 * np.exp(-1. / 9.), .6,
+                                .2 * np.exp(-1. / 9.)])
+    expected_classes = np.array([0, 0, 1, 1])
+    self.assertAllClose(expected_scores, boxlist_clean.get_field('scores'))
+    self.assertAllClose(expected_classes, boxlist_clean.get_field('classes'))
+
+
+class NonMaximumSuppressionBenchmarks(tf.test.Benchmark):
+  """Compares non maximum suppression against a per-box loop."""
+
+  def benchmark_multiclass_nms_dense_ssd_output(self):
+    random_state = np.random.RandomState(0)
+    num_boxes = 5000
+    num_classes = 90
+    boxes = _random_boxes(random_state, num_boxes)
+    scores = random_state.rand(num_boxes, num_classes)
+    boxlist = np_box_list.BoxList(boxes)
+    boxlist.add_field('scores', scores)
+
+    start = time.time()
+    for class_idx in range(num_classes):
+      class_scores = scores[:, class_idx]
+      high_score_indices = np.where(class_scores > 0.05)[0]
+      class_boxes = boxes[high_score_indices[
+          np.argsort(class_scores[high_score_indices])[::-1]]]
+      _loop_non_max_suppression_indices(class_boxes, 100, 0.5)
+    loop_time = time.time() - start
+
+    start = time.time()
+    np_box_list_ops.multi_class_non_max_suppression(
+        boxlist, score_thresh=0.05, iou_thresh=0.5, max_output_size=100)
+    batched_time = time.time() - start
+
+    self.report_benchmark(
+        iters=1,
+        wall_time=batched_time,
+        name='multiclass_nms_%d_boxes_%d_classes' % (num_boxes, num_classes),
+        extras={
+            'per_box_loop_wall_time': loop_time,
+            'speedup': loop_time / batched_time
+        })
+
 
 if __name__ == '__main__':
   tf.test.main()
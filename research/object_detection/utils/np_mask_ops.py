@@ -17,11 +17,14 @@
 
 Example mask operations that are supported:
   * Areas: compute mask areas
+  * Bounding boxes: compute tight bounding boxes of masks
   * IOU: pairwise intersection-over-union scores
 """
 import numpy as np
 
 EPSILON = 1e-7
+# Upper bound on the memory used by the flattened mask blocks in intersection.
+MAX_BLOCK_BYTES = 64 * 1024 * 1024
 
 
 def area(masks):
@@ -42,17 +45,73 @@ def area(masks):
   return np.sum(masks, axis=(1, 2), dtype=np.float32)
 
 
-def intersection(masks1, masks2):
+def bounding_boxes(masks):
+  """Computes tight bounding boxes of masks.
+
+  Args:
+    masks: Numpy array with shape [N, height, width] holding N masks. Masks
+      values are of type np.uint8 and values are in {0,1}.
+
+  Returns:
+    a numpy array with shape [N, 4] of type np.int64 holding
+    [y_min, x_min, y_max, x_max] for every mask, where the max coordinates are
+    exclusive. Empty masks get the degenerate box [0, 0, 0, 0].
+
+  Raises:
+    ValueError: If masks.dtype is not np.uint8
+  """
+  if masks.dtype != np.uint8:
+    raise ValueError('Masks type should be np.uint8')
+  n, height, width = masks.shape
+  boxes = np.zeros([n, 4], dtype=np.int64)
+  if n == 0 or height == 0 or width == 0:
+    return boxes
+  rows = np.any(masks, axis=2)
+  cols = np.any(masks, axis=1)
+  non_empty = np.any(rows, axis=1)
+  boxes[:, 0] = np.argmax(rows, axis=1)
+  boxes[:, 1] = np.argmax(cols, axis=1)
+  boxes[:, 2] = height - np.argmax(rows[:, ::-1], axis=1)
+  boxes[:, 3] = width - np.argmax(cols[:, ::-1], axis=1)
+  boxes[~non_empty] = 0
+  return boxes
+
+
+def _overlapping_boxes(boxes1, boxes2):
+  """Returns a [N, M] boolean matrix of pairs of boxes with non-empty overlap."""
+  y_overlap = np.logical_and(
+      np.expand_dims(boxes1[:, 0], axis=1) < np.expand_dims(boxes2[:, 2],
+                                                            axis=0),
+      np.expand_dims(boxes2[:, 0], axis=0) < np.expand_dims(boxes1[:, 2],
+                                                            axis=1))
+  x_overlap = np.logical_and(
+      np.expand_dims(boxes1[:, 1], axis=1) < np.expand_dims(boxes2[:, 3],
+                                                            axis=0),
+      np.expand_dims(boxes2[:, 1], axis=0) < np.expand_dims(boxes1[:, 3],
+                                                            axis=1))
+  return np.logical_and(y_overlap, x_overlap)
+
+
+def intersection(masks1, masks2, max_block_bytes=MAX_BLOCK_BYTES):
   """Compute pairwise intersection areas between masks.
 
+  Masks are culled using their tight bounding boxes: only masks that overlap
+  at least one mask of the other collection take part in the computation, and
+  only the pixels inside the region covered by those masks are read. The
+  remaining masks are flattened into {0,1} matrices and pairwise intersections
+  are obtained as a single matrix product, computed in blocks of pixels so that
+  memory use stays bounded for high resolution masks.
+
   Args:
     masks1: a numpy array with shape [N, height, width] holding N masks. Masks
       values are of type np.uint8 and values are in {0,1}.
     masks2: a numpy array with shape [M, height, width] holding M masks. Masks
       values are of type np.uint8 and values are in {0,1}.
+    max_block_bytes: upper bound on the size in bytes of the flattened mask
+      blocks materialized at once.
 
   Returns:
-    a numpy array with shape [N*M] representing pairwise intersection area.
+    a numpy array with shape [N, M] representing pairwise intersection area.
 
   Raises:
     ValueError: If masks1 and masks2 are not of type np.uint8.
@@ -62,9 +121,36 @@ def intersection(masks1, masks2):
   n = masks1.shape[0]
   m = masks2.shape[0]
   answer = np.zeros([n, m], dtype=np.float32)
-  for i in np.arange(n):
-    for j in np.arange(m):
-      answer[i, j] = np.sum(np.minimum(masks1[i], masks2[j]), dtype=np.float32)
+  if n == 0 or m == 0:
+    return answer
+  boxes1 = bounding_boxes(masks1)
+  boxes2 = bounding_boxes(masks2)
+  overlaps = _overlapping_boxes(boxes1, boxes2)
+  indices1 = np.where(np.any(overlaps, axis=1))[0]
+  indices2 = np.where(np.any(overlaps, axis=0))[0]
+  if indices1.size == 0:
+    return answer
+  # Every overlapping pair lies within the intersection of the regions spanned
+  # by the participating masks of each collection.
+  y_min = max(np.min(boxes1[indices1, 0]), np.min(boxes2[indices2, 0]))
+  x_min = max(np.min(boxes1[indices1, 1]), np.min(boxes2[indices2, 1]))
+  y_max = min(np.max(boxes1[indices1, 2]), np.max(boxes2[indices2, 2]))
+  x_max = min(np.max(boxes1[indices1, 3]), np.max(boxes2[indices2, 3]))
+  num_pixels = (y_max - y_min) * (x_max - x_min)
+  # float32 accumulates {0,1} products exactly up to 2**24.
+  dtype = np.float32 if num_pixels < 2**24 else np.float64
+  flat1 = masks1[indices1, y_min:y_max, x_min:x_max].reshape(
+      [indices1.size, num_pixels])
+  flat2 = masks2[indices2, y_min:y_max, x_min:x_max].reshape(
+      [indices2.size, num_pixels])
+  bytes_per_pixel = (indices1.size + indices2.size) * np.dtype(dtype).itemsize
+  block_size = max(1, max_block_bytes // bytes_per_pixel)
+  partial = np.zeros([indices1.size, indices2.size], dtype=dtype)
+  for start in range(0, num_pixels, block_size):
+    end = min(start + block_size, num_pixels)
+    partial += np.dot(flat1[:, start:end].astype(dtype),
+                      flat2[:, start:end].astype(dtype).T)
+  answer[np.ix_(indices1, indices2)] = partial
   return answer
 
 
@@ -15,12 +15,36 @@
 
 """Tests for object_detection.np_mask_ops."""
 
+import time
+
 import numpy as np
 import tensorflow as tf
 
 from object_detection.utils import np_mask_ops
 
 
+def _pairwise_loop_intersection(masks1, masks2):
+  """Reference per-pair implementation of np_mask_ops.intersection."""
+  answer = np.zeros([masks1.shape[0], masks2.shape[0]], dtype=np.float32)
+  for i in np.arange(masks1.shape[0]):
+    for j in np.arange(masks2.shape[0]):
+      answer[i, j] = np.sum(np.minimum(masks1[i], masks2[j]), dtype=np.float32)
+  return answer
+
+
+def _random_masks(random_state, num_masks, height, width):
+  """Creates random masks, each filling part of a random rectangle."""
+  masks = np.zeros([num_masks, height, width], dtype=np.uint8)
+  for k in range(num_masks):
+    y_min = random_state.randint(0, height)
+    x_min = random_state.randint(0, width)
+    y_max = random_state.randint(y_min, height + 1)
+    x_max = random_state.randint(x_min, width + 1)
+    masks[k, y_min:y_max, x_min:x_max] = random_state.rand(
+        y_max - y_min, x_max - x_min) > 0.3
+  return masks
+
+
 class MaskOpsTests(tf.test.TestCase):
 
   def setUp(self):
@@ -64,12 +88,48 @@ class MaskOpsTests(tf.test.TestCase):
     expected_areas = np.array([8.0, 10.0], dtype=np.float32)
     self.assertAllClose(expected_areas, areas)
 
+  def testBoundingBoxes(self):
+    masks = np.concatenate(
+        [self.masks1, np.zeros([1, 5, 8], dtype=np.uint8)], axis=0)
+    boxes = np_mask_ops.bounding_boxes(masks)
+    expected_boxes = np.array([[3, 0, 5, 4], [0, 0, 2, 8], [0, 0, 0, 0]])
+    self.assertAllEqual(expected_boxes, boxes)
+
   def testIntersection(self):
     intersection = np_mask_ops.intersection(self.masks1, self.masks2)
     expected_intersection = np.array(
         [[8.0, 0.0, 8.0], [0.0, 9.0, 7.0]], dtype=np.float32)
     self.assertAllClose(intersection, expected_intersection)
 
+  def testIntersectionWithSmallBlocks(self):
+    intersection = np_mask_ops.intersection(
+        self.masks1, self.masks2, max_block_bytes=1)
+    expected_intersection = np.array(
+        [[8.0, 0.0, 8.0], [0.0, 9.0, 7.0]], dtype=np.float32)
+    self.assertAllClose(intersection, expected_intersection)
+
+  def testIntersectionWithEmptyInputs(self):
+    empty_masks = np.zeros([0, 5, 8], dtype=np.uint8)
+    self.assertAllEqual(
+        np_mask_ops.intersection(empty_masks, self.masks2).shape, [0, 3])
+    self.assertAllEqual(
+        np_mask_ops.intersection(self.masks1, empty_masks).shape, [2, 0])
+    blank_masks = np.zeros([2, 5, 8], dtype=np.uint8)
+    self.assertAllEqual(
+        np_mask_ops.intersection(blank_masks, self.masks2),
+        np.zeros([2, 3], dtype=np.float32))
+
+  def testIntersectionMatchesPairwiseLoop(self):
+    random_state = np.random.RandomState(0)
+    masks1 = _random_masks(random_state, 20, 37, 53)
+    masks2 = _random_masks(random_state, 30, 37, 53)
+    expected_intersection = _pairwise_loop_intersection(masks1, masks2)
+    self.assertAllEqual(
+        np_mask_ops.intersection(masks1, masks2), expected_intersection)
+    self.assertAllEqual(
+        np_mask_ops.intersection(masks1, masks2, max_block_bytes=1000),
+        expected_intersection)
+
   def testIOU(self):
     iou = np_mask_ops.iou(self.masks1, self.masks2)
     expected_iou = np.array(
@@ -84,5 +144,41 @@ class MaskOpsTests(tf.test.TestCase):
     self.assertAllClose(ioa21, expected_ioa21)
 
 
+class MaskOpsBenchmarks(tf.test.Benchmark):
+  """Compares np_mask_ops.intersection against a per-pair loop."""
+
+  def _benchmark_intersection(self, num_masks1, num_masks2, height, width):
+    random_state = np.random.RandomState(0)
+    masks1 = _random_masks(random_state, num_masks1, height, width)
+    masks2 = _random_masks(random_state, num_masks2, height, width)
+    name = '%dx%d_masks_%dx%d' % (num_masks1, num_masks2, height, width)
+
+    start = time.time()
+    _pairwise_loop_intersection(masks1, masks2)
+    loop_time = time.time() - start
+
+    start = time.time()
+    np_mask_ops.intersection(masks1, masks2)
+    batched_time = time.time() - start
+
+    self.report_benchmark(
+        iters=1,
+        wall_time=batched_time,
+        name='intersection_' + name,
+        extras={
+            'pairwise_loop_wall_time': loop_time,
+            'speedup': loop_time / batched_time
+        })
+
+  def benchmark_intersection_small_masks(self):
+    self._benchmark_intersection(100, 20, 28, 28)
+
+  def benchmark_intersection_coco_masks(self):
+    self._benchmark_intersection(100, 20, 480, 640)
+
+  def benchmark_intersection_many_detections(self):
+    self._benchmark_intersection(300, 50, 512, 512)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -23,6 +23,8 @@ It supports the following operations:
 3) Evaluate detection metrics on already inserted detection results.
 4) Write evaluation result into a pickle file for future processing or
    visualization.
+5) Save, restore and merge the accumulated state of an evaluation, e.g. to
+   combine evaluations of disjoint parts of a dataset.
 
 Note: This module operates on numpy boxes and box lists.
 """
@@ -34,10 +36,15 @@ import logging
 import numpy as np
 
 from object_detection.core import standard_fields
+from object_detection.utils import groundtruth_store as groundtruth_store_lib
 from object_detection.utils import label_map_util
 from object_detection.utils import metrics
 from object_detection.utils import per_image_evaluation
 
+# Initial number of detections the columnar buffers of ObjectDetectionEvaluation
+# can hold; the buffers grow geometrically beyond that.
+INITIAL_DETECTION_CAPACITY = 1024
+
 
 class DetectionEvaluator(object):
   """Interface for object detection evalution classes.
@@ -111,7 +118,9 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
                metric_prefix=None,
                use_weighted_mean_ap=False,
                evaluate_masks=False,
-               group_of_weight=0.0):
+               group_of_weight=0.0,
+               columnar_groundtruth=False,
+               groundtruth_directory=None):
     """Constructor.
 
     Args:
@@ -135,6 +144,11 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         matching_iou_threshold, weight group_of_weight is added to true
         positives. Consequently, if no detection falls within a group-of box,
         weight group_of_weight is added to false negatives.
+      columnar_groundtruth: If True, the groundtruth of all images is kept in a
+        groundtruth_store.ColumnarGroundtruthStore, which needs much less memory
+        than per-image arrays when evaluating millions of images.
+      groundtruth_directory: (optional) local directory in which the columnar
+        groundtruth store is memory-mapped. Implies columnar_groundtruth.
 
     Raises:
       ValueError: If the category ids are not 1-indexed.
@@ -148,15 +162,27 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
     self._label_id_offset = 1
     self._evaluate_masks = evaluate_masks
     self._group_of_weight = group_of_weight
-    self._evaluation = ObjectDetectionEvaluation(
+    self._columnar_groundtruth = (
+        columnar_groundtruth or groundtruth_directory is not None)
+    self._groundtruth_directory = groundtruth_directory
+    self._evaluation = self._create_evaluation()
+    self._image_ids = set([])
+    self._evaluate_corlocs = evaluate_corlocs
+    self._metric_prefix = (metric_prefix + '_') if metric_prefix else ''
+
+  def _create_evaluation(self):
+    if self._columnar_groundtruth:
+      store = groundtruth_store_lib.ColumnarGroundtruthStore(
+          directory=self._groundtruth_directory)
+    else:
+      store = groundtruth_store_lib.GroundtruthStore()
+    return ObjectDetectionEvaluation(
         num_groundtruth_classes=self._num_classes,
         matching_iou_threshold=self._matching_iou_threshold,
         use_weighted_mean_ap=self._use_weighted_mean_ap,
         label_id_offset=self._label_id_offset,
-        group_of_weight=self._group_of_weight)
-    self._image_ids = set([])
-    self._evaluate_corlocs = evaluate_corlocs
-    self._metric_prefix = (metric_prefix + '_') if metric_prefix else ''
+        group_of_weight=self._group_of_weight,
+        groundtruth_store=store)
 
   def add_single_ground_truth_image_info(self, image_id, groundtruth_dict):
     """Adds groundtruth for a single image to be used for evaluation.
@@ -300,13 +326,38 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
 
     return pascal_metrics
 
+  def merge(self, other):
+    """Merges the images accumulated by another evaluator into this one.
+
+    This allows disjoint subsets of a dataset to be evaluated by separate
+    evaluators (e.g. in different processes) and combined before calling
+    evaluate(). Detections of `other` are appended after the detections of this
+    evaluator, so merging partial evaluators in input order yields the same
+    metrics as adding all images to a single evaluator.
+
+    Args:
+      other: An evaluator of the same class and configuration as this one.
+
+    Raises:
+      ValueError: If `other` is of a different class or configuration, or if
+        both evaluators contain the same image.
+    """
+    if type(other) is not type(self):
+      raise ValueError('Cannot merge {} into {}.'.format(
+          type(other).__name__, type(self).__name__))
+    if (self._evaluate_masks != other._evaluate_masks or
+        self._metric_prefix != other._metric_prefix):
+      raise ValueError('Cannot merge evaluators with different configurations.')
+    duplicate_image_ids = self._image_ids & other._image_ids
+    if duplicate_image_ids:
+      raise ValueError('Images with ids {} added to both evaluators.'.format(
+          sorted(duplicate_image_ids)[:10]))
+    self._evaluation.merge(other._evaluation)
+    self._image_ids.update(other._image_ids)
+
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
-    self._evaluation = ObjectDetectionEvaluation(
-        num_groundtruth_classes=self._num_classes,
-        matching_iou_threshold=self._matching_iou_threshold,
-        use_weighted_mean_ap=self._use_weighted_mean_ap,
-        label_id_offset=self._label_id_offset)
+    self._evaluation = self._create_evaluation()
     self._image_ids.clear()
 
 
@@ -394,7 +445,9 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
                matching_iou_threshold=0.5,
                evaluate_corlocs=False,
                metric_prefix='OpenImagesV2',
-               group_of_weight=0.0):
+               group_of_weight=0.0,
+               columnar_groundtruth=False,
+               groundtruth_directory=None):
     """Constructor.
 
     Args:
@@ -412,13 +465,19 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
         weight group_of_weight is added to true positives. Consequently, if no
         detection falls within a group-of box, weight group_of_weight is added
         to false negatives.
+      columnar_groundtruth: If True, keeps the groundtruth in a
+        groundtruth_store.ColumnarGroundtruthStore.
+      groundtruth_directory: (optional) local directory in which the columnar
+        groundtruth store is memory-mapped. Implies columnar_groundtruth.
     """
     super(OpenImagesDetectionEvaluator, self).__init__(
         categories,
         matching_iou_threshold,
         evaluate_corlocs,
         metric_prefix=metric_prefix,
-        group_of_weight=group_of_weight)
+        group_of_weight=group_of_weight,
+        columnar_groundtruth=columnar_groundtruth,
+        groundtruth_directory=groundtruth_directory)
 
   def add_single_ground_truth_image_info(self, image_id, groundtruth_dict):
     """Adds groundtruth for a single image to be used for evaluation.
@@ -486,7 +545,9 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesDetectionEvaluator):
                categories,
                matching_iou_threshold=0.5,
                evaluate_corlocs=False,
-               group_of_weight=1.0):
+               group_of_weight=1.0,
+               columnar_groundtruth=False,
+               groundtruth_directory=None):
     """Constructor.
 
     Args:
@@ -503,13 +564,19 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesDetectionEvaluator):
         weight group_of_weight is added to true positives. Consequently, if no
         detection falls within a group-of box, weight group_of_weight is added
         to false negatives.
+      columnar_groundtruth: If True, keeps the groundtruth in a
+        groundtruth_store.ColumnarGroundtruthStore.
+      groundtruth_directory: (optional) local directory in which the columnar
+        groundtruth store is memory-mapped. Implies columnar_groundtruth.
     """
     super(OpenImagesDetectionChallengeEvaluator, self).__init__(
         categories,
         matching_iou_threshold,
         evaluate_corlocs,
         metric_prefix='OpenImagesChallenge2018',
-        group_of_weight=group_of_weight)
+        group_of_weight=group_of_weight,
+        columnar_groundtruth=columnar_groundtruth,
+        groundtruth_directory=groundtruth_directory)
 
     self._evaluatable_labels = {}
 
@@ -586,6 +653,20 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesDetectionEvaluator):
         detected_scores=detected_scores,
         detected_class_labels=detection_classes)
 
+  def merge(self, other):
+    """Merges the images accumulated by another evaluator into this one.
+
+    Args:
+      other: An OpenImagesDetectionChallengeEvaluator with the same
+        configuration as this one.
+
+    Raises:
+      ValueError: If `other` is of a different class or configuration, or if
+        both evaluators contain the same image.
+    """
+    super(OpenImagesDetectionChallengeEvaluator, self).merge(other)
+    self._evaluatable_labels.update(other._evaluatable_labels)
+
   def clear(self):
     """Clears stored data."""
 
@@ -593,6 +674,13 @@ class OpenImagesDetectionChallengeEvaluator(OpenImagesDetectionEvaluator):
     self._evaluatable_labels.clear()
 
 
+def _concatenate_or_empty(arrays, shape=(0,), dtype=float):
+  """Concatenates arrays, or returns an empty array of `shape` if none."""
+  if not arrays:
+    return np.empty(shape, dtype=dtype)
+  return np.concatenate(arrays).astype(dtype, copy=False)
+
+
 ObjectDetectionEvalMetrics = collections.namedtuple(
     'ObjectDetectionEvalMetrics', [
         'average_precisions', 'mean_ap', 'precisions', 'recalls', 'corlocs',
@@ -610,7 +698,28 @@ class ObjectDetectionEvaluation(object):
                nms_max_output_boxes=10000,
                use_weighted_mean_ap=False,
                label_id_offset=0,
-               group_of_weight=0.0):
+               group_of_weight=0.0,
+               groundtruth_store=None):
+    """Constructor.
+
+    Args:
+      num_groundtruth_classes: Number of groundtruth classes.
+      matching_iou_threshold: IOU threshold used for matching detected boxes to
+        groundtruth boxes.
+      nms_iou_threshold: IOU threshold used for non-maximum suppression.
+      nms_max_output_boxes: Maximum number of boxes returned by non-maximum
+        suppression.
+      use_weighted_mean_ap: If True, the mean average precision is computed
+        directly from the scores and tp_fp_labels of all classes.
+      label_id_offset: The label id offset.
+      group_of_weight: Weight of group-of boxes.
+      groundtruth_store: (optional) an empty groundtruth_store.GroundtruthStore
+        (e.g. a ColumnarGroundtruthStore) holding the groundtruth boxes. If
+        None, a GroundtruthStore is used.
+
+    Raises:
+      ValueError: If there is no groundtruth class.
+    """
     if num_groundtruth_classes < 1:
       raise ValueError('Need at least 1 groundtruth class for evaluation.')
 
@@ -625,11 +734,11 @@ class ObjectDetectionEvaluation(object):
     self.use_weighted_mean_ap = use_weighted_mean_ap
     self.label_id_offset = label_id_offset
 
-    self.groundtruth_boxes = {}
-    self.groundtruth_class_labels = {}
+    if groundtruth_store is None:
+      groundtruth_store = groundtruth_store_lib.GroundtruthStore()
+    self.groundtruth_store = groundtruth_store
+    # Masks are only kept for images without detections.
     self.groundtruth_masks = {}
-    self.groundtruth_is_difficult_list = {}
-    self.groundtruth_is_group_of_list = {}
     self.num_gt_instances_per_class = np.zeros(self.num_class, dtype=float)
     self.num_gt_imgs_per_class = np.zeros(self.num_class, dtype=int)
 
@@ -637,8 +746,14 @@ class ObjectDetectionEvaluation(object):
 
   def _initialize_detections(self):
     self.detection_keys = set()
-    self.scores_per_class = [[] for _ in range(self.num_class)]
-    self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+    # Scores and tp/fp labels of all classes are accumulated in columnar
+    # buffers, of which only the first _num_detections entries are valid.
+    self._num_detections = 0
+    self._detection_class_labels = np.empty(
+        INITIAL_DETECTION_CAPACITY, dtype=np.int32)
+    self._detection_scores = np.empty(INITIAL_DETECTION_CAPACITY, dtype=float)
+    self._detection_tp_fp_labels = np.empty(
+        INITIAL_DETECTION_CAPACITY, dtype=float)
     self.num_images_correctly_detected_per_class = np.zeros(self.num_class)
     self.average_precision_per_class = np.empty(self.num_class, dtype=float)
     self.average_precision_per_class.fill(np.nan)
@@ -649,6 +764,86 @@ class ObjectDetectionEvaluation(object):
   def clear_detections(self):
     self._initialize_detections()
 
+  def _append_detections(self, class_labels, scores, tp_fp_labels):
+    """Appends scored detections to the columnar detection buffers.
+
+    Args:
+      class_labels: integer numpy array of shape [K] containing 0-indexed
+        classes of the detections.
+      scores: float numpy array of shape [K] containing detection scores.
+      tp_fp_labels: float numpy array of shape [K] containing the true positive
+        weight of every detection.
+    """
+    start = self._num_detections
+    end = start + class_labels.shape[0]
+    capacity = self._detection_scores.shape[0]
+    if end > capacity:
+      capacity = max(end, 2 * capacity)
+      self._detection_class_labels = np.resize(self._detection_class_labels,
+                                               capacity)
+      self._detection_scores = np.resize(self._detection_scores, capacity)
+      self._detection_tp_fp_labels = np.resize(self._detection_tp_fp_labels,
+                                               capacity)
+    self._detection_class_labels[start:end] = class_labels
+    self._detection_scores[start:end] = scores
+    self._detection_tp_fp_labels[start:end] = tp_fp_labels
+    self._num_detections = end
+
+  def _get_detections_per_class(self):
+    """Splits the accumulated detections by class.
+
+    Returns:
+      scores_per_class: A list of num_class float numpy arrays with the scores
+        of the detections of every class, in the order they were added.
+      tp_fp_labels_per_class: A list of num_class float numpy arrays with the
+        corresponding true positive weights.
+    """
+    class_labels = self._detection_class_labels[:self._num_detections]
+    # A stable sort keeps the detections of every class in insertion order.
+    order = np.argsort(class_labels, kind='mergesort')
+    boundaries = np.cumsum(
+        np.bincount(class_labels, minlength=self.num_class))[:-1]
+    scores_per_class = np.split(
+        self._detection_scores[:self._num_detections][order], boundaries)
+    tp_fp_labels_per_class = np.split(
+        self._detection_tp_fp_labels[:self._num_detections][order], boundaries)
+    return scores_per_class, tp_fp_labels_per_class
+
+  @property
+  def scores_per_class(self):
+    """List with, for every class, a list holding its detection scores."""
+    return [[scores] if scores.size else []
+            for scores in self._get_detections_per_class()[0]]
+
+  @property
+  def tp_fp_labels_per_class(self):
+    """List with, for every class, a list holding its tp/fp labels."""
+    return [[tp_fp_labels] if tp_fp_labels.size else []
+            for tp_fp_labels in self._get_detections_per_class()[1]]
+
+  def _get_groundtruth_field(self, field_index):
+    return {
+        image_key: self.groundtruth_store.get(image_key)[field_index]
+        for image_key in self.groundtruth_store.keys()
+    }
+
+  # The per-image groundtruth as dictionaries keyed by image, for inspection.
+  @property
+  def groundtruth_boxes(self):
+    return self._get_groundtruth_field(0)
+
+  @property
+  def groundtruth_class_labels(self):
+    return self._get_groundtruth_field(1)
+
+  @property
+  def groundtruth_is_difficult_list(self):
+    return self._get_groundtruth_field(2)
+
+  @property
+  def groundtruth_is_group_of_list(self):
+    return self._get_groundtruth_field(3)
+
   def add_single_ground_truth_image_info(self,
                                          image_key,
                                          groundtruth_boxes,
@@ -675,25 +870,24 @@ class ObjectDetectionEvaluation(object):
         [num_boxes, height, width] containing `num_boxes` groundtruth masks.
         The mask values range from 0 to 1.
     """
-    if image_key in self.groundtruth_boxes:
+    if image_key in self.groundtruth_store:
       logging.warn(
           'image %s has already been added to the ground truth database.',
           image_key)
       return
 
-    self.groundtruth_boxes[image_key] = groundtruth_boxes
-    self.groundtruth_class_labels[image_key] = groundtruth_class_labels
-    self.groundtruth_masks[image_key] = groundtruth_masks
+    if groundtruth_masks is not None:
+      self.groundtruth_masks[image_key] = groundtruth_masks
     if groundtruth_is_difficult_list is None:
       num_boxes = groundtruth_boxes.shape[0]
       groundtruth_is_difficult_list = np.zeros(num_boxes, dtype=bool)
-    self.groundtruth_is_difficult_list[
-        image_key] = groundtruth_is_difficult_list.astype(dtype=bool)
     if groundtruth_is_group_of_list is None:
       num_boxes = groundtruth_boxes.shape[0]
       groundtruth_is_group_of_list = np.zeros(num_boxes, dtype=bool)
-    self.groundtruth_is_group_of_list[
-        image_key] = groundtruth_is_group_of_list.astype(dtype=bool)
+    self.groundtruth_store.add(
+        image_key, groundtruth_boxes, groundtruth_class_labels,
+        groundtruth_is_difficult_list.astype(dtype=bool),
+        groundtruth_is_group_of_list.astype(dtype=bool))
 
     self._update_ground_truth_statistics(
         groundtruth_class_labels,
@@ -736,17 +930,13 @@ class ObjectDetectionEvaluation(object):
       return
 
     self.detection_keys.add(image_key)
-    if image_key in self.groundtruth_boxes:
-      groundtruth_boxes = self.groundtruth_boxes[image_key]
-      groundtruth_class_labels = self.groundtruth_class_labels[image_key]
+    if image_key in self.groundtruth_store:
+      (groundtruth_boxes, groundtruth_class_labels,
+       groundtruth_is_difficult_list,
+       groundtruth_is_group_of_list) = self.groundtruth_store.get(image_key)
       # Masks are popped instead of look up. The reason is that we do not want
       # to keep all masks in memory which can cause memory overflow.
-      groundtruth_masks = self.groundtruth_masks.pop(
-          image_key)
-      groundtruth_is_difficult_list = self.groundtruth_is_difficult_list[
-          image_key]
-      groundtruth_is_group_of_list = self.groundtruth_is_group_of_list[
-          image_key]
+      groundtruth_masks = self.groundtruth_masks.pop(image_key, None)
     else:
       groundtruth_boxes = np.empty(shape=[0, 4], dtype=float)
       groundtruth_class_labels = np.array([], dtype=int)
@@ -768,10 +958,21 @@ class ObjectDetectionEvaluation(object):
             detected_masks=detected_masks,
             groundtruth_masks=groundtruth_masks))
 
-    for i in range(self.num_class):
-      if scores[i].shape[0] > 0:
-        self.scores_per_class[i].append(scores[i])
-        self.tp_fp_labels_per_class[i].append(tp_fp_labels[i])
+    # Only classes with detections in the image can have scored entries.
+    detected_classes = [
+        class_index
+        for class_index in np.unique(detected_class_labels).astype(int)
+        if 0 <= class_index < self.num_class and scores[class_index].size
+    ]
+    if detected_classes:
+      self._append_detections(
+          np.repeat(detected_classes,
+                    [scores[class_index].shape[0]
+                     for class_index in detected_classes]),
+          np.concatenate([scores[class_index]
+                          for class_index in detected_classes]),
+          np.concatenate([tp_fp_labels[class_index]
+                          for class_index in detected_classes]))
     (self.num_images_correctly_detected_per_class
     ) += is_class_correctly_detected_in_image
 
@@ -793,16 +994,195 @@ class ObjectDetectionEvaluation(object):
       groundtruth_is_group_of_list: A boolean numpy array of length M denoting
           whether a ground truth box is a group-of box or not
     """
-    for class_index in range(self.num_class):
-      num_gt_instances = np.sum(groundtruth_class_labels[
-          ~groundtruth_is_difficult_list
-          & ~groundtruth_is_group_of_list] == class_index)
-      num_groupof_gt_instances = self.group_of_weight * np.sum(
-          groundtruth_class_labels[groundtruth_is_group_of_list] == class_index)
-      self.num_gt_instances_per_class[
-          class_index] += num_gt_instances + num_groupof_gt_instances
-      if np.any(groundtruth_class_labels == class_index):
-        self.num_gt_imgs_per_class[class_index] += 1
+    groundtruth_class_labels = groundtruth_class_labels.astype(int)
+    is_valid_class = ((groundtruth_class_labels >= 0) &
+                      (groundtruth_class_labels < self.num_class))
+    num_gt_instances = np.bincount(
+        groundtruth_class_labels[is_valid_class
+                                 & ~groundtruth_is_difficult_list
+                                 & ~groundtruth_is_group_of_list],
+        minlength=self.num_class)
+    num_groupof_gt_instances = self.group_of_weight * np.bincount(
+        groundtruth_class_labels[is_valid_class
+                                 & groundtruth_is_group_of_list],
+        minlength=self.num_class)
+    self.num_gt_instances_per_class += (
+        num_gt_instances + num_groupof_gt_instances)
+    self.num_gt_imgs_per_class[
+        np.unique(groundtruth_class_labels[is_valid_class])] += 1
+
+  def merge(self, other):
+    """Merges the groundtruth and detections of another evaluation into this.
+
+    Per-class scores and tp/fp labels of `other` are appended after the ones
+    accumulated by this evaluation, and groundtruth statistics are summed.
+
+    Args:
+      other: An ObjectDetectionEvaluation with the same configuration as this
+        one, holding groundtruth and detections for a disjoint set of images.
+
+    Raises:
+      ValueError: If the evaluations are configured differently or if both of
+        them contain groundtruth or detections for the same image.
+    """
+    if (self.num_class != other.num_class or
+        self.group_of_weight != other.group_of_weight or
+        self.use_weighted_mean_ap != other.use_weighted_mean_ap or
+        self.label_id_offset != other.label_id_offset or
+        self.per_image_eval.matching_iou_threshold !=
+        other.per_image_eval.matching_iou_threshold or
+        self.per_image_eval.nms_iou_threshold !=
+        other.per_image_eval.nms_iou_threshold or
+        self.per_image_eval.nms_max_output_boxes !=
+        other.per_image_eval.nms_max_output_boxes):
+      raise ValueError('Cannot merge evaluations with different configurations.')
+    duplicate_keys = (
+        set(key for key in other.groundtruth_store.keys()
+            if key in self.groundtruth_store) |
+        (self.detection_keys & other.detection_keys))
+    if duplicate_keys:
+      raise ValueError('Images {} added to both evaluations.'.format(
+          sorted(duplicate_keys)[:10]))
+
+    self.groundtruth_store.update(other.groundtruth_store)
+    self.groundtruth_masks.update(other.groundtruth_masks)
+    self.num_gt_instances_per_class += other.num_gt_instances_per_class
+    self.num_gt_imgs_per_class += other.num_gt_imgs_per_class
+
+    self.detection_keys.update(other.detection_keys)
+    self._append_detections(
+        other._detection_class_labels[:other._num_detections],
+        other._detection_scores[:other._num_detections],
+        other._detection_tp_fp_labels[:other._num_detections])
+    (self.num_images_correctly_detected_per_class
+    ) += other.num_images_correctly_detected_per_class
+
+  def to_state(self):
+    """Returns the accumulated groundtruth and detections as numpy arrays.
+
+    Per-image arrays are concatenated into a few flat arrays so that the state
+    can be stored compactly (see save_state) and restored with from_state.
+    Scores and tp/fp labels are stored concatenated over images per class, in
+    class order. Image keys should all be of the same type (e.g. all strings).
+
+    Returns:
+      A dictionary mapping names to numpy arrays.
+    """
+    (image_keys, num_boxes, boxes, class_labels, is_difficult_list,
+     is_group_of_list) = self.groundtruth_store.get_all()
+    mask_keys = [key for key in image_keys if key in self.groundtruth_masks]
+    scores_per_class, tp_fp_labels_per_class = (
+        self._get_detections_per_class())
+    state = {
+        'num_class': np.array(self.num_class),
+        'matching_iou_threshold':
+            np.array(self.per_image_eval.matching_iou_threshold),
+        'nms_iou_threshold': np.array(self.per_image_eval.nms_iou_threshold),
+        'nms_max_output_boxes':
+            np.array(self.per_image_eval.nms_max_output_boxes),
+        'use_weighted_mean_ap': np.array(self.use_weighted_mean_ap),
+        'label_id_offset': np.array(self.label_id_offset),
+        'group_of_weight': np.array(self.group_of_weight),
+        'groundtruth_image_keys': np.array(image_keys),
+        'groundtruth_num_boxes': np.asarray(num_boxes, dtype=np.int64),
+        'groundtruth_boxes': np.asarray(boxes, dtype=float),
+        'groundtruth_class_labels': np.asarray(class_labels, dtype=int),
+        'groundtruth_is_difficult_list': np.asarray(is_difficult_list,
+                                                    dtype=bool),
+        'groundtruth_is_group_of_list': np.asarray(is_group_of_list,
+                                                   dtype=bool),
+        'groundtruth_mask_image_keys': np.array(mask_keys),
+        'groundtruth_mask_shapes': np.array(
+            [self.groundtruth_masks[key].shape for key in mask_keys],
+            dtype=np.int64).reshape([-1, 3]),
+        'groundtruth_masks': _concatenate_or_empty(
+            [self.groundtruth_masks[key].ravel() for key in mask_keys],
+            dtype=np.uint8),
+        'num_gt_instances_per_class': self.num_gt_instances_per_class,
+        'num_gt_imgs_per_class': self.num_gt_imgs_per_class,
+        'detection_keys': np.array(list(self.detection_keys)),
+        'num_detections_per_class': np.array(
+            [scores.shape[0] for scores in scores_per_class], dtype=np.int64),
+        'scores': np.concatenate(scores_per_class),
+        'tp_fp_labels': np.concatenate(tp_fp_labels_per_class),
+        'num_images_correctly_detected_per_class':
+            self.num_images_correctly_detected_per_class,
+    }
+    return state
+
+  @classmethod
+  def from_state(cls, state, groundtruth_store=None):
+    """Creates an ObjectDetectionEvaluation from the output of to_state.
+
+    Args:
+      state: A dictionary (or an NpzFile) of numpy arrays as returned by
+        to_state.
+      groundtruth_store: (optional) an empty groundtruth_store.GroundtruthStore
+        into which the groundtruth of `state` is loaded.
+
+    Returns:
+      An ObjectDetectionEvaluation holding the groundtruth and detections of
+      `state`.
+    """
+    evaluation = cls(
+        num_groundtruth_classes=int(state['num_class']),
+        matching_iou_threshold=float(state['matching_iou_threshold']),
+        nms_iou_threshold=float(state['nms_iou_threshold']),
+        nms_max_output_boxes=int(state['nms_max_output_boxes']),
+        use_weighted_mean_ap=bool(state['use_weighted_mean_ap']),
+        label_id_offset=int(state['label_id_offset']),
+        group_of_weight=float(state['group_of_weight']),
+        groundtruth_store=groundtruth_store)
+
+    evaluation.detection_keys = set(state['detection_keys'].tolist())
+    evaluation.groundtruth_store.add_all(
+        state['groundtruth_image_keys'].tolist(),
+        state['groundtruth_num_boxes'], state['groundtruth_boxes'],
+        state['groundtruth_class_labels'],
+        state['groundtruth_is_difficult_list'],
+        state['groundtruth_is_group_of_list'])
+    mask_shapes = state['groundtruth_mask_shapes']
+    mask_boundaries = np.cumsum(np.prod(mask_shapes, axis=1))[:-1]
+    for key, shape, masks in zip(
+        state['groundtruth_mask_image_keys'].tolist(), mask_shapes,
+        np.split(state['groundtruth_masks'], mask_boundaries)):
+      evaluation.groundtruth_masks[key] = masks.reshape(shape)
+    evaluation.num_gt_instances_per_class = np.array(
+        state['num_gt_instances_per_class'], dtype=float)
+    evaluation.num_gt_imgs_per_class = np.array(
+        state['num_gt_imgs_per_class'], dtype=int)
+
+    evaluation._append_detections(
+        np.repeat(np.arange(evaluation.num_class),
+                  state['num_detections_per_class']),
+        state['scores'], state['tp_fp_labels'])
+    evaluation.num_images_correctly_detected_per_class = np.array(
+        state['num_images_correctly_detected_per_class'], dtype=float)
+    return evaluation
+
+  def save_state(self, file_or_path):
+    """Writes the state returned by to_state into a compressed .npz file.
+
+    Args:
+      file_or_path: A filename or a writable file-like object, e.g. a
+        tf.gfile.GFile.
+    """
+    np.savez_compressed(file_or_path, **self.to_state())
+
+  @classmethod
+  def load_state(cls, file_or_path, groundtruth_store=None):
+    """Creates an ObjectDetectionEvaluation from a file written by save_state.
+
+    Args:
+      file_or_path: A filename or a readable file-like object.
+      groundtruth_store: (optional) an empty groundtruth_store.GroundtruthStore
+        into which the saved groundtruth is loaded.
+
+    Returns:
+      An ObjectDetectionEvaluation holding the saved groundtruth and detections.
+    """
+    with np.load(file_or_path) as state:
+      return cls.from_state(state, groundtruth_store=groundtruth_store)
 
   def evaluate(self):
     """Compute evaluation result.
@@ -827,15 +1207,13 @@ class ObjectDetectionEvaluation(object):
     if self.use_weighted_mean_ap:
       all_scores = np.array([], dtype=float)
       all_tp_fp_labels = np.array([], dtype=bool)
+    scores_per_class, tp_fp_labels_per_class = (
+        self._get_detections_per_class())
     for class_index in range(self.num_class):
       if self.num_gt_instances_per_class[class_index] == 0:
         continue
-      if not self.scores_per_class[class_index]:
-        scores = np.array([], dtype=float)
-        tp_fp_labels = np.array([], dtype=float)
-      else:
-        scores = np.concatenate(self.scores_per_class[class_index])
-        tp_fp_labels = np.concatenate(self.tp_fp_labels_per_class[class_index])
+      scores = scores_per_class[class_index]
+      tp_fp_labels = tp_fp_labels_per_class[class_index]
       if self.use_weighted_mean_ap:
         all_scores = np.append(all_scores, scores)
         all_tp_fp_labels = np.append(all_tp_fp_labels, tp_fp_labels)
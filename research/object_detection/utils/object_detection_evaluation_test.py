@@ -19,6 +19,7 @@ import numpy as np
 import tensorflow as tf
 
 from object_detection.core import standard_fields
+from object_detection.utils import groundtruth_store
 from object_detection.utils import object_detection_evaluation
 
 
@@ -102,7 +103,7 @@ class OpenImagesV2EvaluationTest(tf.test.TestCase):
 
 class OpenImagesDetectionChallengeEvaluatorTest(tf.test.TestCase):
 
-  def test_returns_correct_metric_values(self):
+  def _assert_correct_metric_values(self, **evaluator_kwargs):
     categories = [{
         'id': 1,
         'name': 'cat'
@@ -115,7 +116,7 @@ class OpenImagesDetectionChallengeEvaluatorTest(tf.test.TestCase):
     }]
     oivchallenge_evaluator = (
         object_detection_evaluation.OpenImagesDetectionChallengeEvaluator(
-            categories, group_of_weight=0.5))
+            categories, group_of_weight=0.5, **evaluator_kwargs))
 
     image_key = 'img1'
     groundtruth_boxes = np.array(
@@ -219,6 +220,16 @@ class OpenImagesDetectionChallengeEvaluatorTest(tf.test.TestCase):
     oivchallenge_evaluator.clear()
     self.assertFalse(oivchallenge_evaluator._image_ids)
 
+  def test_returns_correct_metric_values(self):
+    self._assert_correct_metric_values()
+
+  def test_returns_correct_metric_values_with_columnar_groundtruth(self):
+    self._assert_correct_metric_values(columnar_groundtruth=True)
+
+  def test_returns_correct_metric_values_with_memory_mapped_groundtruth(self):
+    self._assert_correct_metric_values(
+        groundtruth_directory=self.get_temp_dir())
+
 
 class PascalEvaluationTest(tf.test.TestCase):
 
@@ -655,6 +666,23 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
         expected_num_images_correctly_detected_per_class,
         self.od_eval.num_images_correctly_detected_per_class))
 
+  def test_add_many_detected_images(self):
+    od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=2)
+    num_images = 3000
+    for image_index in range(num_images):
+      od_eval.add_single_detected_image_info(
+          'img%d' % image_index, np.array([[0, 0, 1, 1]], dtype=float),
+          np.array([image_index], dtype=float),
+          np.array([image_index % 2], dtype=int))
+    scores_per_class = od_eval.scores_per_class
+    self.assertEqual(1, len(scores_per_class[0]))
+    self.assertEqual(1, len(scores_per_class[1]))
+    self.assertAllEqual(np.arange(0, num_images, 2), scores_per_class[0][0])
+    self.assertAllEqual(np.arange(1, num_images, 2), scores_per_class[1][0])
+    self.assertAllEqual(np.zeros(num_images // 2),
+                        od_eval.tp_fp_labels_per_class[0][0])
+
   def test_evaluate(self):
     (average_precision_per_class, mean_ap, precisions_per_class,
      recalls_per_class, corloc_per_class,
@@ -682,6 +710,149 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(expected_mean_ap, mean_ap)
     self.assertAlmostEqual(expected_mean_corloc, mean_corloc)
 
+  def test_merge(self):
+    other_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=3)
+    image_key4 = 'img4'
+    groundtruth_boxes4 = np.array([[0, 0, 1, 1], [5, 5, 8, 8]], dtype=float)
+    groundtruth_class_labels4 = np.array([1, 0], dtype=int)
+    detected_boxes4 = np.array([[0, 0, 1, 1], [5, 5, 8, 8]], dtype=float)
+    detected_class_labels4 = np.array([1, 0], dtype=int)
+    detected_scores4 = np.array([0.6, 0.75], dtype=float)
+    other_od_eval.add_single_ground_truth_image_info(
+        image_key4, groundtruth_boxes4, groundtruth_class_labels4)
+    other_od_eval.add_single_detected_image_info(
+        image_key4, detected_boxes4, detected_scores4, detected_class_labels4)
+    self.od_eval.merge(other_od_eval)
+
+    expected_num_gt_instances_per_class = np.array([4, 2, 1], dtype=int)
+    expected_num_gt_imgs_per_class = np.array([3, 2, 2], dtype=int)
+    expected_num_images_correctly_detected_per_class = np.array([1, 1, 0],
+                                                                dtype=int)
+    self.assertAllEqual(expected_num_gt_instances_per_class,
+                        self.od_eval.num_gt_instances_per_class)
+    self.assertAllEqual(expected_num_gt_imgs_per_class,
+                        self.od_eval.num_gt_imgs_per_class)
+    self.assertAllEqual(expected_num_images_correctly_detected_per_class,
+                        self.od_eval.num_images_correctly_detected_per_class)
+    self.assertAllClose(groundtruth_boxes4,
+                        self.od_eval.groundtruth_boxes[image_key4])
+
+    (average_precision_per_class, mean_ap, _, _, corloc_per_class,
+     mean_corloc) = self.od_eval.evaluate()
+    expected_average_precision_per_class = np.array([1. / 3., 1. / 2., 0],
+                                                    dtype=float)
+    expected_corloc_per_class = np.array([1. / 3., 1. / 2., 0], dtype=float)
+    self.assertAllClose(expected_average_precision_per_class,
+                        average_precision_per_class)
+    self.assertAllClose(expected_corloc_per_class, corloc_per_class)
+    self.assertAlmostEqual(5. / 18., mean_ap)
+    self.assertAlmostEqual(5. / 18., mean_corloc)
+
+  def test_to_state_and_from_state(self):
+    restored_od_eval = (
+        object_detection_evaluation.ObjectDetectionEvaluation.from_state(
+            self.od_eval.to_state()))
+    self.assertEqual(self.od_eval.detection_keys,
+                     restored_od_eval.detection_keys)
+    self.assertItemsEqual(self.od_eval.groundtruth_store.keys(),
+                          restored_od_eval.groundtruth_store.keys())
+    for image_key in self.od_eval.groundtruth_store.keys():
+      for expected, restored in zip(
+          self.od_eval.groundtruth_store.get(image_key),
+          restored_od_eval.groundtruth_store.get(image_key)):
+        self.assertAllClose(expected, restored)
+    self.assertAllEqual(self.od_eval.num_gt_instances_per_class,
+                        restored_od_eval.num_gt_instances_per_class)
+    self.assertAllEqual(self.od_eval.num_gt_imgs_per_class,
+                        restored_od_eval.num_gt_imgs_per_class)
+    for expected, restored in zip(self.od_eval.evaluate(),
+                                  restored_od_eval.evaluate()):
+      if isinstance(expected, list):
+        for expected_array, restored_array in zip(expected, restored):
+          self.assertAllClose(expected_array, restored_array)
+      else:
+        self.assertAllClose(expected, restored)
+
+  def test_save_and_load_state(self):
+    od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=2, matching_iou_threshold=0.4,
+        group_of_weight=0.5)
+    groundtruth_masks = np.zeros([2, 4, 5], dtype=np.uint8)
+    groundtruth_masks[0, :2, :2] = 1
+    groundtruth_masks[1, 2:, 3:] = 1
+    od_eval.add_single_ground_truth_image_info(
+        'img1', np.array([[0, 0, 2, 2], [2, 3, 4, 5]], dtype=float),
+        np.array([0, 1], dtype=int), groundtruth_masks=groundtruth_masks)
+    state_path = self.get_temp_dir() + '/state.npz'
+    od_eval.save_state(state_path)
+
+    restored_od_eval = (
+        object_detection_evaluation.ObjectDetectionEvaluation.load_state(
+            state_path))
+    self.assertEqual(2, restored_od_eval.num_class)
+    self.assertAlmostEqual(
+        0.4, restored_od_eval.per_image_eval.matching_iou_threshold)
+    self.assertAlmostEqual(0.5, restored_od_eval.group_of_weight)
+    self.assertAllEqual(groundtruth_masks,
+                        restored_od_eval.groundtruth_masks['img1'])
+
+    detected_masks = groundtruth_masks[::-1]
+    restored_od_eval.add_single_detected_image_info(
+        'img1', np.array([[2, 3, 4, 5], [0, 0, 2, 2]], dtype=float),
+        np.array([0.9, 0.8], dtype=float), np.array([1, 0], dtype=int),
+        detected_masks=detected_masks)
+    average_precision_per_class = restored_od_eval.evaluate()[0]
+    self.assertAllClose([1.0, 1.0], average_precision_per_class)
+
+  def test_columnar_groundtruth_store(self):
+    columnar_od_eval = (
+        object_detection_evaluation.ObjectDetectionEvaluation.from_state(
+            self.od_eval.to_state(),
+            groundtruth_store=groundtruth_store.ColumnarGroundtruthStore(
+                directory=self.get_temp_dir())))
+    for image_key in self.od_eval.groundtruth_store.keys():
+      for expected, columnar in zip(
+          self.od_eval.groundtruth_store.get(image_key),
+          columnar_od_eval.groundtruth_store.get(image_key)):
+        self.assertAllClose(expected, columnar)
+    detected_boxes = np.array([[0, 0, 1, 1], [0, 0, 2.5, 2.5]], dtype=float)
+    detected_scores = np.array([0.6, 0.4], dtype=float)
+    detected_class_labels = np.array([0, 2], dtype=int)
+    for od_eval in [self.od_eval, columnar_od_eval]:
+      od_eval.add_single_detected_image_info(
+          'img1', detected_boxes, detected_scores, detected_class_labels)
+    for expected, columnar in zip(self.od_eval.evaluate(),
+                                  columnar_od_eval.evaluate()):
+      if isinstance(expected, list):
+        for expected_array, columnar_array in zip(expected, columnar):
+          self.assertAllClose(expected_array, columnar_array)
+      else:
+        self.assertAllClose(expected, columnar)
+
+  def test_merge_raises_on_duplicate_images(self):
+    other_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=3)
+    other_od_eval.add_single_ground_truth_image_info(
+        'img1', np.array([[0, 0, 1, 1]], dtype=float),
+        np.array([0], dtype=int))
+    with self.assertRaises(ValueError):
+      self.od_eval.merge(other_od_eval)
+
+  def test_merge_raises_on_different_configurations(self):
+    other_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=3, matching_iou_threshold=0.7)
+    with self.assertRaises(ValueError):
+      self.od_eval.merge(other_od_eval)
+    other_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=3, nms_iou_threshold=0.5)
+    with self.assertRaises(ValueError):
+      self.od_eval.merge(other_od_eval)
+    other_od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes=3, nms_max_output_boxes=100)
+    with self.assertRaises(ValueError):
+      self.od_eval.merge(other_od_eval)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -18,12 +18,14 @@ Annotate each detected result as true positives or false positive according to
 a predefined IOU ratio. Non Maximum Supression is used by default. Multi class
 detection is supported by default.
 Based on the settings, per image evaluation is either performed on boxes or
-on object masks.
+on object masks. Boxes of all classes are evaluated in a single pass, masks one
+class at a time.
 """
 import numpy as np
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_list_ops
+from object_detection.utils import np_box_ops
 from object_detection.utils import np_box_mask_list
 from object_detection.utils import np_box_mask_list_ops
 
@@ -164,6 +166,10 @@ class PerImageEvaluation(object):
           'If `detected_masks` is provided, then `groundtruth_masks` should '
           'also be provided.'
       )
+    if detected_masks is None:
+      return self._compute_cor_loc_for_all_classes(
+          detected_boxes, detected_scores, detected_class_labels,
+          groundtruth_boxes, groundtruth_class_labels)
 
     is_class_correctly_detected_in_image = np.zeros(
         self.num_groundtruth_classes, dtype=int)
@@ -184,6 +190,46 @@ class PerImageEvaluation(object):
 
     return is_class_correctly_detected_in_image
 
+  def _compute_cor_loc_for_all_classes(self, detected_boxes, detected_scores,
+                                       detected_class_labels, groundtruth_boxes,
+                                       groundtruth_class_labels):
+    """Computes CorLoc of the detected boxes of all classes at once.
+
+    Gives the same result as _compute_is_class_correctly_detected_in_image for
+    every class: a class is correctly detected if its highest scoring detection
+    (the first one in case of ties) overlaps a groundtruth box of the class.
+
+    Args:
+      detected_boxes: A float numpy array of shape [N, 4].
+      detected_scores: A float numpy array of shape [N].
+      detected_class_labels: An integer numpy array of shape [N].
+      groundtruth_boxes: A float numpy array of shape [M, 4].
+      groundtruth_class_labels: An integer numpy array of shape [M].
+
+    Returns:
+      is_class_correctly_detected_in_image: a numpy integer array of
+          shape [C], indicating whether the correponding class has a least
+          one instance being correctly detected in the image
+    """
+    num_classes = self.num_groundtruth_classes
+    is_class_correctly_detected_in_image = np.zeros(num_classes, dtype=int)
+    detected_indices = np.where((detected_class_labels >= 0) &
+                                (detected_class_labels < num_classes))[0]
+    if detected_indices.size == 0 or groundtruth_boxes.size == 0:
+      return is_class_correctly_detected_in_image
+    order = detected_indices[np.lexsort(
+        (detected_indices, -detected_scores[detected_indices],
+         detected_class_labels[detected_indices]))]
+    classes, first = np.unique(detected_class_labels[order].astype(int),
+                               return_index=True)
+    top_detections = order[first]
+    iou = np_box_ops.iou(detected_boxes[top_detections], groundtruth_boxes)
+    iou[np.not_equal(np.expand_dims(classes, axis=1),
+                     np.expand_dims(groundtruth_class_labels, axis=0))] = -1
+    is_class_correctly_detected_in_image[classes] = (
+        np.max(iou, axis=1) >= self.matching_iou_threshold)
+    return is_class_correctly_detected_in_image
+
   def _compute_is_class_correctly_detected_in_image(
       self, detected_boxes, detected_scores, groundtruth_boxes,
       detected_masks=None, groundtruth_masks=None):
@@ -275,6 +321,11 @@ class PerImageEvaluation(object):
     if detected_masks is None and groundtruth_masks is not None:
       raise ValueError(
           'Groundtruth masks is available but detected masks is not.')
+    if detected_masks is None:
+      return self._compute_tp_fp_for_all_classes(
+          detected_boxes, detected_scores, detected_class_labels,
+          groundtruth_boxes, groundtruth_class_labels,
+          groundtruth_is_difficult_list, groundtruth_is_group_of_list)
 
     result_scores = []
     result_tp_fp_labels = []
@@ -303,6 +354,126 @@ class PerImageEvaluation(object):
       result_tp_fp_labels.append(tp_fp_labels)
     return result_scores, result_tp_fp_labels
 
+  def _compute_tp_fp_for_all_classes(
+      self, detected_boxes, detected_scores, detected_class_labels,
+      groundtruth_boxes, groundtruth_class_labels,
+      groundtruth_is_difficult_list, groundtruth_is_group_of_list):
+    """Labels true/false positives of the detected boxes of all classes at once.
+
+    Gives the same result as calling _compute_tp_fp_for_single_class for every
+    class, but sorts and suppresses the detections of all classes together,
+    computes a single IOU (and IOA) matrix in which boxes of different classes
+    do not overlap, and matches the detections of all classes simultaneously:
+    the first detection matched to a groundtruth box is its true positive.
+
+    Args:
+      detected_boxes: A float numpy array of shape [N, 4].
+      detected_scores: A float numpy array of shape [N].
+      detected_class_labels: An integer numpy array of shape [N].
+      groundtruth_boxes: A float numpy array of shape [M, 4].
+      groundtruth_class_labels: An integer numpy array of shape [M].
+      groundtruth_is_difficult_list: A boolean numpy array of length M.
+      groundtruth_is_group_of_list: A boolean numpy array of length M.
+
+    Returns:
+      result_scores: A list of C float numpy arrays, see _compute_tp_fp.
+      result_tp_fp_labels: A list of C numpy arrays, see _compute_tp_fp.
+    """
+    num_classes = self.num_groundtruth_classes
+    result_scores = [np.array([], dtype=float)] * num_classes
+    result_tp_fp_labels = [np.array([], dtype=bool)] * num_classes
+
+    is_detection_valid = ((detected_class_labels >= 0) &
+                          (detected_class_labels < num_classes))
+    if not np.any(is_detection_valid):
+      return result_scores, result_tp_fp_labels
+    detected_boxlist = np_box_list.BoxList(detected_boxes[is_detection_valid])
+    detected_boxlist.add_field('scores', detected_scores[is_detection_valid])
+    detected_boxlist.add_field('classes',
+                               detected_class_labels[is_detection_valid])
+    detected_boxlist = np_box_list_ops.non_max_suppression_per_class(
+        detected_boxlist, self.nms_max_output_boxes, self.nms_iou_threshold)
+    boxes = detected_boxlist.get()
+    scores = detected_boxlist.get_field('scores')
+    classes = detected_boxlist.get_field('classes').astype(int)
+    num_detected_boxes = detected_boxlist.num_boxes()
+
+    is_groundtruth_valid = ((groundtruth_class_labels >= 0) &
+                            (groundtruth_class_labels < num_classes))
+    num_groundtruth_per_class = np.bincount(
+        groundtruth_class_labels[is_groundtruth_valid].astype(int),
+        minlength=num_classes)
+    is_non_group_of = is_groundtruth_valid & ~groundtruth_is_group_of_list
+    is_group_of = is_groundtruth_valid & groundtruth_is_group_of_list
+
+    tp_fp_labels = np.zeros(num_detected_boxes, dtype=bool)
+    is_matched_to_difficult_box = np.zeros(num_detected_boxes, dtype=bool)
+    is_matched_to_group_of_box = np.zeros(num_detected_boxes, dtype=bool)
+    detection_indices = np.arange(num_detected_boxes)
+
+    # Tp-fp evaluation for non-group of boxes (if any).
+    if np.any(is_non_group_of):
+      iou = np_box_ops.iou(boxes, groundtruth_boxes[is_non_group_of])
+      iou[np.not_equal(
+          np.expand_dims(classes, axis=1),
+          np.expand_dims(groundtruth_class_labels[is_non_group_of],
+                         axis=0))] = -1
+      max_overlap_gt_ids = np.argmax(iou, axis=1)
+      is_matched = (iou[detection_indices, max_overlap_gt_ids] >=
+                    self.matching_iou_threshold)
+      is_matched_to_difficult_box = is_matched & groundtruth_is_difficult_list[
+          is_non_group_of][max_overlap_gt_ids].astype(bool)
+      matched = np.where(is_matched & ~is_matched_to_difficult_box)[0]
+      # Detections are sorted by decreasing score, so the first detection
+      # matched to a groundtruth box is its true positive.
+      _, first_matched = np.unique(max_overlap_gt_ids[matched],
+                                   return_index=True)
+      tp_fp_labels[matched[first_matched]] = True
+
+    scores_group_of = np.zeros(np.count_nonzero(is_group_of), dtype=float)
+    # Tp-fp evaluation for group of boxes.
+    if scores_group_of.size:
+      ioa = np.transpose(
+          np_box_ops.ioa(groundtruth_boxes[is_group_of], boxes))
+      ioa[np.not_equal(
+          np.expand_dims(classes, axis=1),
+          np.expand_dims(groundtruth_class_labels[is_group_of], axis=0))] = -1
+      max_overlap_group_of_gt_ids = np.argmax(ioa, axis=1)
+      is_matched_to_group_of_box = (
+          ~tp_fp_labels & ~is_matched_to_difficult_box &
+          (ioa[detection_indices, max_overlap_group_of_gt_ids] >=
+           self.matching_iou_threshold))
+      np.maximum.at(scores_group_of,
+                    max_overlap_group_of_gt_ids[is_matched_to_group_of_box],
+                    scores[is_matched_to_group_of_box])
+
+    is_kept = ~is_matched_to_difficult_box & ~is_matched_to_group_of_box
+    group_of_classes = groundtruth_class_labels[is_group_of]
+    group_of_order = np.argsort(group_of_classes, kind='mergesort')
+    group_of_class_starts = np.searchsorted(group_of_classes[group_of_order],
+                                            np.arange(num_classes + 1))
+    class_starts = np.searchsorted(classes, np.arange(num_classes + 1))
+    for class_index in np.unique(classes):
+      start, end = class_starts[class_index], class_starts[class_index + 1]
+      if not num_groundtruth_per_class[class_index]:
+        result_scores[class_index] = scores[start:end]
+        result_tp_fp_labels[class_index] = np.zeros(end - start, dtype=bool)
+        continue
+      class_scores_group_of = scores_group_of[group_of_order[
+          group_of_class_starts[class_index]:
+          group_of_class_starts[class_index + 1]]]
+      class_tp_fp_labels_group_of = self.group_of_weight * np.ones(
+          class_scores_group_of.size, dtype=float)
+      selector = np.where((class_scores_group_of > 0) &
+                          (class_tp_fp_labels_group_of > 0))
+      class_is_kept = is_kept[start:end]
+      result_scores[class_index] = np.concatenate(
+          (scores[start:end][class_is_kept], class_scores_group_of[selector]))
+      result_tp_fp_labels[class_index] = np.concatenate(
+          (tp_fp_labels[start:end][class_is_kept].astype(float),
+           class_tp_fp_labels_group_of[selector]))
+    return result_scores, result_tp_fp_labels
+
   def _get_overlaps_and_scores_mask_mode(
       self, detected_boxes, detected_scores, detected_masks, groundtruth_boxes,
       groundtruth_masks, groundtruth_is_group_of_list):
@@ -15,12 +15,59 @@
 
 """Tests for object_detection.utils.per_image_evaluation."""
 
+import time
+
 import numpy as np
 import tensorflow as tf
 
 from object_detection.utils import per_image_evaluation
 
 
+def _random_image(random_state, num_classes, num_groundtruth, num_detections):
+  """Creates groundtruth and noisy detections around it in a 100x100 image."""
+  corners = random_state.rand(num_groundtruth, 2) * 80
+  sizes = random_state.rand(num_groundtruth, 2) * 20 + 1
+  groundtruth_boxes = np.concatenate([corners, corners + sizes], axis=1)
+  groundtruth_class_labels = random_state.randint(0, num_classes,
+                                                  num_groundtruth)
+  groundtruth_is_difficult_list = random_state.rand(num_groundtruth) < 0.1
+  groundtruth_is_group_of_list = random_state.rand(num_groundtruth) < 0.2
+  matched = random_state.randint(0, num_groundtruth, num_detections)
+  detected_boxes = groundtruth_boxes[matched] + random_state.normal(
+      0, 2, (num_detections, 4))
+  detected_boxes[:, 2:] = np.maximum(detected_boxes[:, 2:],
+                                     detected_boxes[:, :2] + 0.5)
+  detected_class_labels = np.where(
+      random_state.rand(num_detections) < 0.8,
+      groundtruth_class_labels[matched],
+      random_state.randint(0, num_classes, num_detections))
+  detected_scores = random_state.rand(num_detections)
+  return (detected_boxes, detected_scores, detected_class_labels,
+          groundtruth_boxes, groundtruth_class_labels,
+          groundtruth_is_difficult_list, groundtruth_is_group_of_list)
+
+
+def _per_class_tp_fp(per_image_eval, detected_boxes, detected_scores,
+                     detected_class_labels, groundtruth_boxes,
+                     groundtruth_class_labels, groundtruth_is_difficult_list,
+                     groundtruth_is_group_of_list):
+  """Evaluates every class separately with _compute_tp_fp_for_single_class."""
+  scores = []
+  tp_fp_labels = []
+  for i in range(per_image_eval.num_groundtruth_classes):
+    is_class = groundtruth_class_labels == i
+    class_scores, class_tp_fp_labels = (
+        per_image_eval._compute_tp_fp_for_single_class(
+            detected_boxes[detected_class_labels == i],
+            detected_scores[detected_class_labels == i],
+            groundtruth_boxes[is_class],
+            groundtruth_is_difficult_list[is_class],
+            groundtruth_is_group_of_list[is_class]))
+    scores.append(class_scores)
+    tp_fp_labels.append(class_tp_fp_labels)
+  return scores, tp_fp_labels
+
+
 class SingleClassTpFpWithDifficultBoxesTest(tf.test.TestCase):
 
   def setUp(self):
@@ -505,6 +552,22 @@ class MultiClassesTpFpTest(tf.test.TestCase):
       self.assertTrue(np.allclose(expected_scores[i], scores[i]))
       self.assertTrue(np.array_equal(expected_tp_fp_labels[i], tp_fp_labels[i]))
 
+  def test_tp_fp_matches_per_class_evaluation(self):
+    random_state = np.random.RandomState(0)
+    eval1 = per_image_evaluation.PerImageEvaluation(
+        num_groundtruth_classes=10,
+        matching_iou_threshold=0.5,
+        nms_iou_threshold=0.5,
+        nms_max_output_boxes=5,
+        group_of_weight=0.5)
+    for _ in range(20):
+      image = _random_image(random_state, 10, 30, 100)
+      scores, tp_fp_labels = eval1._compute_tp_fp(*image)
+      expected_scores, expected_tp_fp_labels = _per_class_tp_fp(eval1, *image)
+      for i in range(10):
+        self.assertAllEqual(expected_scores[i], scores[i])
+        self.assertAllEqual(expected_tp_fp_labels[i], tp_fp_labels[i])
+
 
 class CorLocTest(tf.test.TestCase):
 
@@ -556,6 +619,57 @@ class CorLocTest(tf.test.TestCase):
     self.assertTrue(np.array_equal(expected_result,
                                    is_class_correctly_detected_in_image))
 
+  def test_compute_corloc_matches_per_class_evaluation(self):
+    random_state = np.random.RandomState(0)
+    eval1 = per_image_evaluation.PerImageEvaluation(10, 0.7)
+    for _ in range(20):
+      (detected_boxes, detected_scores, detected_class_labels,
+       groundtruth_boxes, groundtruth_class_labels, _,
+       _) = _random_image(random_state, 10, 10, 30)
+      expected_result = [
+          eval1._compute_is_class_correctly_detected_in_image(
+              detected_boxes[detected_class_labels == i],
+              detected_scores[detected_class_labels == i],
+              groundtruth_boxes[groundtruth_class_labels == i])
+          for i in range(10)]
+      self.assertAllEqual(
+          expected_result,
+          eval1._compute_cor_loc(detected_boxes, detected_scores,
+                                 detected_class_labels, groundtruth_boxes,
+                                 groundtruth_class_labels))
+
+
+class PerImageEvaluationBenchmarks(tf.test.Benchmark):
+  """Compares the single pass evaluation against a per class loop."""
+
+  def benchmark_open_images_sized_label_set(self):
+    random_state = np.random.RandomState(0)
+    num_classes = 545
+    num_images = 20
+    eval1 = per_image_evaluation.PerImageEvaluation(
+        num_classes, nms_iou_threshold=1.0, nms_max_output_boxes=10000)
+    images = [_random_image(random_state, num_classes, 30, 300)
+              for _ in range(num_images)]
+
+    start = time.time()
+    for image in images:
+      _per_class_tp_fp(eval1, *image)
+    loop_time = (time.time() - start) / num_images
+
+    start = time.time()
+    for image in images:
+      eval1._compute_tp_fp(*image)
+    single_pass_time = (time.time() - start) / num_images
+
+    self.report_benchmark(
+        iters=num_images,
+        wall_time=single_pass_time,
+        name='tp_fp_%d_classes' % num_classes,
+        extras={
+            'per_class_loop_wall_time': loop_time,
+            'speedup': loop_time / single_pass_time
+        })
+
 
 if __name__ == "__main__":
   tf.test.main()